@@ -1,46 +1,568 @@
-from app.api.dependencies import get_current_user
+from datetime import datetime
+from typing import Any, Optional
+
+from app.api.dependencies import get_admin_user, get_current_user
+from app.api.serialization import (
+    BODY_FORMAT_SCOPE_KEY,
+    MSGPACK_MEDIA_TYPE,
+    ModelJSONResponse,
+    ModelJSONRoute,
+    body_validation_error,
+    model_body,
+    model_request_body,
+)
 from app.api.tenant import get_tenant_id
+from app.core.config import settings
+from app.db.database import get_db
+from app.models.user import User
 from app.schemas import alumbrado as schemas
-from app.services.alumbrado_calculator import (
-    FAOMS_MARINO,
-    METODOLOGIA,
-    calculate_alumbrado_costs,
-    get_faoml_for_year,
+from app.services.alumbrado_batch import calculate_alumbrado_batch, format_validation_error
+from app.services.alumbrado_cache import (
+    calculate_with_cache,
+    calculation_cache,
+    calculation_hash,
+    etag_for,
+    etag_matches,
+)
+from app.services.alumbrado_calculator import METODOLOGIA, RegulatoryParameters
+from app.services.alumbrado_import import (
+    InventoryImportError,
+    calculate_from_columns,
+    calculate_from_inventory,
+)
+from app.services.alumbrado_inventory import (
+    get_inventory,
+    inventory_cache,
+    inventory_cache_group,
+    inventory_key,
+    inventory_totals,
+    pin_inventory_version,
+)
+from app.services.alumbrado_montecarlo import run_monte_carlo
+from app.services.alumbrado_offload import (
+    OffloadedCalculation,
+    offload_calculation,
+    parse_calculation_body,
+    references_inventory,
+    should_offload,
 )
+from app.services.alumbrado_outages import aggregate_outage_log, apply_outage_events
+from app.services.alumbrado_parameters import (
+    get_parameters,
+    list_parameter_versions,
+    publish_parameters,
+)
+from app.services.alumbrado_pool import PoolSaturatedError
+from app.services.alumbrado_profiling import stage_histograms, stage_timer
 from app.services.alumbrado_receipt import build_simple_receipt
-from fastapi import APIRouter, Depends, HTTPException, Query
+from app.services.alumbrado_scenarios import project_alumbrado_cap, sweep_alumbrado_scenarios
+from app.services.alumbrado_store import get_calculation, get_calculation_by_hash
+from app.services.alumbrado_streaming import calculate_from_ndjson
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    File,
+    Form,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
 
 router = APIRouter(
     prefix="/alumbrado",
     tags=["alumbrado"],
     dependencies=[Depends(get_current_user)],
+    route_class=ModelJSONRoute,
 )
 
+ENGINE_PATTERN = "^(python|numpy)$"
+
+
+def get_tenant_parameters(
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+) -> RegulatoryParameters:
+    """Parámetros regulatorios vigentes del tenant con los que se calcula la solicitud."""
+    return get_parameters(db, tenant_id)
+
 
 @router.get("/parametros")
 def read_alumbrado_parameters(
     anno: int = Query(..., ge=2022),
+    parameters: RegulatoryParameters = Depends(get_tenant_parameters),
 ):
     return {
         "metodologia": METODOLOGIA,
+        "version": parameters.version,
         "anno": anno,
         "faom_n": 0.04,
-        "faoml": get_faoml_for_year(anno),
-        "faoms_marino": FAOMS_MARINO,
+        "faoml": parameters.faoml(anno),
+        "faoms_marino": parameters.faoms_marino,
         "ne_fraccion": 0.041,
-        "eficacia_referencia_lm_w": 130,
+        "eficacia_referencia_lm_w": parameters.eficacia_referencia,
         "porcentaje_terreno": 0.069,
         "tope_costos_ambientales_sobre_caom": 0.05,
     }
 
 
-@router.post("/calcular", response_model=schemas.AlumbradoCalculoResultado)
-def calculate_alumbrado(
-    payload: schemas.AlumbradoCalculoEntrada,
+@router.post(
+    "/parametros",
+    response_model=schemas.ParametrosRegulatorios,
+    status_code=status.HTTP_201_CREATED,
+)
+def publish_alumbrado_parameters(
+    changes: schemas.ParametrosRegulatoriosEntrada,
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+    _: User = Depends(get_admin_user),
+):
+    """
+    Publica una nueva versión de los parámetros regulatorios del tenant.
+
+    Los cálculos nuevos la usan de inmediato en este proceso y, en los demás,
+    al vencer `ALUMBRADO_PARAMETERS_CACHE_TTL_SECONDS`. Los cálculos guardados
+    se actualizan con `POST /alumbrado/trabajos/recalculo`.
+    """
+    try:
+        return publish_parameters(db, tenant_id=tenant_id, changes=changes)
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
+@router.get("/parametros/versiones", response_model=list[schemas.ParametrosRegulatorios])
+def read_alumbrado_parameter_versions(
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """Versiones publicadas del tenant, desde la 0 (valores de la resolución)"""
+    return list_parameter_versions(db, tenant_id=tenant_id)
+
+
+@router.get("/metricas")
+def read_alumbrado_metrics():
+    return {
+        "cache": calculation_cache.stats(),
+        "inventarios": inventory_cache.stats(),
+        "etapas": stage_histograms.stats(),
+    }
+
+
+def _calculate_in_thread(
+    body: bytes,
+    msgpack_body: bool,
+    tenant_id: str,
+    motor: Optional[str],
+    if_none_match: Optional[str],
+    db: Session,
+    parameters: RegulatoryParameters,
+) -> Response:
+    try:
+        with stage_timer().measure("validacion", len(body)):
+            payload = parse_calculation_body(body, msgpack_body)
+    except ValidationError as exc:
+        raise body_validation_error(exc.errors(include_url=False))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    inventario = None
+    if payload.inventario_id is not None:
+        inventario = get_inventory(db, tenant_id=tenant_id, inventario_id=payload.inventario_id)
+        if inventario is None:
+            raise HTTPException(status_code=404, detail="Inventario no encontrado")
+        try:
+            payload = pin_inventory_version(payload, inventario)
+        except ValueError as exc:
+            raise HTTPException(status_code=404, detail=str(exc))
+
+    content_hash = calculation_hash(
+        payload,
+        tenant_id,
+        inventory_key=inventory_key(inventario, payload.inventario_version) if inventario else None,
+        parameters_version=parameters.version,
+    )
+    etag = etag_for(content_hash)
+    if etag_matches(if_none_match, content_hash):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    try:
+        result = calculate_with_cache(
+            payload=payload,
+            tenant_id=tenant_id,
+            engine=motor,
+            content_hash=content_hash,
+            inventory_totals=(
+                inventory_totals(
+                    db, inventario, payload.tasa_retorno, parameters, payload.inventario_version
+                )
+                if inventario
+                else None
+            ),
+            parameters=parameters,
+            group=inventory_cache_group(inventario) if inventario else None,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return ModelJSONResponse(result, headers={"ETag": etag})
+
+
+def _pool_saturated(exc: PoolSaturatedError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(exc),
+        headers={"Retry-After": str(settings.ALUMBRADO_POOL_RETRY_AFTER_SECONDS)},
+    )
+
+
+def _offloaded_response(outcome: OffloadedCalculation, if_none_match: str | None) -> Response:
+    if outcome.validation_errors is not None:
+        raise body_validation_error(outcome.validation_errors)
+    if outcome.error is not None:
+        raise HTTPException(status_code=400, detail=outcome.error)
+    etag = etag_for(outcome.content_hash)
+    if etag_matches(if_none_match, outcome.content_hash):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return ModelJSONResponse(outcome.result, headers={"ETag": etag})
+
+
+# `/calcular` lee el cuerpo por su cuenta para decidir, antes de validarlo,
+# si lo valida y calcula en el pool; el esquema se documenta aparte.
+@router.post(
+    "/calcular",
+    response_model=schemas.AlumbradoCalculoResultado,
+    responses={
+        304: {"description": "El resultado no cambió respecto al ETag enviado"},
+        503: {"description": "El pool de cálculo está saturado; reintentar tras `Retry-After`"},
+    },
+    openapi_extra=model_request_body(schemas.AlumbradoCalculoEntrada),
+)
+async def calculate_alumbrado(
+    request: Request,
     tenant_id: str = Depends(get_tenant_id),
+    motor: Optional[str] = Query(default=None, pattern=ENGINE_PATTERN),
+    if_none_match: Optional[str] = Header(default=None),
+    db: Session = Depends(get_db),
+    parameters: RegulatoryParameters = Depends(get_tenant_parameters),
 ):
+    """
+    Calcula el CAP de una entrada (`AlumbradoCalculoEntrada`).
+
+    El resultado se identifica con un ETag derivado del tenant, de la entrada
+    canónica y de la versión de parámetros; si `If-None-Match` coincide se
+    responde 304 sin recalcular.
+    Con `inventario_id` las UCAP, terrenos y aforos del inventario se suman a
+    las listas de la entrada, y la versión del inventario entra en el ETag.
+    Se leen las filas de `inventario_version`, o de la versión vigente si no
+    se indica.
+
+    Las entradas con al menos `ALUMBRADO_OFFLOAD_MIN_ITEMS` filas y sin
+    `inventario_id` se validan y calculan en el pool de procesos, sin retener
+    el GIL del proceso web; un cuerpo repetido se responde desde la caché sin
+    volver al pool. Si el pool está saturado se responde 503 con
+    `Retry-After`. Las demás se resuelven en un hilo del servidor.
+    """
+    body = await request.body()
+    msgpack_body = request.scope.get(BODY_FORMAT_SCOPE_KEY) == MSGPACK_MEDIA_TYPE
+    if should_offload(body) and not references_inventory(body, msgpack_body):
+        try:
+            with stage_timer().measure("pool", len(body)):
+                outcome = await offload_calculation(
+                    body,
+                    tenant_id=tenant_id,
+                    engine=motor,
+                    msgpack_body=msgpack_body,
+                    parameters=parameters,
+                )
+        except PoolSaturatedError as exc:
+            raise _pool_saturated(exc)
+        # Las referencias a inventario necesitan la base de datos del proceso web.
+        if not outcome.inventario:
+            return _offloaded_response(outcome, if_none_match)
+    return await run_in_threadpool(
+        _calculate_in_thread, body, msgpack_body, tenant_id, motor, if_none_match, db, parameters
+    )
+
+
+@router.post(
+    "/calcular/lote",
+    response_model=schemas.AlumbradoLoteResultado,
+    responses={
+        503: {"description": "El pool de cálculo está saturado; reintentar tras `Retry-After`"},
+    },
+)
+def calculate_alumbrado_batch_endpoint(
+    payloads: list[dict[str, Any]] = Body(...),
+    tenant_id: str = Depends(get_tenant_id),
+    motor: Optional[str] = Query(default=None, pattern=ENGINE_PATTERN),
+    parameters: RegulatoryParameters = Depends(get_tenant_parameters),
+):
+    """
+    Calcula varias entradas de `/calcular` en una sola solicitud.
+
+    Cada ítem se valida y calcula por separado; los errores se reportan por
+    índice sin fallar el lote completo. Los lotes grandes ocupan cupos del
+    pool de procesos; si está saturado se responde 503 con `Retry-After`.
+    """
+    if not payloads:
+        raise HTTPException(status_code=400, detail="El lote no puede estar vacío")
+    if len(payloads) > settings.ALUMBRADO_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                "El lote excede el máximo permitido de "
+                f"{settings.ALUMBRADO_BATCH_MAX_ITEMS} cálculos"
+            ),
+        )
+    try:
+        result = calculate_alumbrado_batch(
+            raw_payloads=payloads, tenant_id=tenant_id, engine=motor, parameters=parameters
+        )
+    except PoolSaturatedError as exc:
+        raise _pool_saturated(exc)
+    return ModelJSONResponse(result)
+
+
+@router.post(
+    "/calcular/columnas",
+    response_model=schemas.AlumbradoCalculoResultado,
+    openapi_extra=model_request_body(schemas.AlumbradoCalculoColumnasEntrada),
+)
+def calculate_alumbrado_columns(
+    payload: schemas.AlumbradoCalculoColumnasEntrada = Depends(
+        model_body(schemas.AlumbradoCalculoColumnasEntrada)
+    ),
+    tenant_id: str = Depends(get_tenant_id),
+    parameters: RegulatoryParameters = Depends(get_tenant_parameters),
+):
+    """
+    Calcula el CAP de una entrada con aforos, UCAP, terrenos y eventos en columnas.
+
+    Es la entrada de `/calcular` más `columnas`, donde cada sección llega
+    como arreglos paralelos (por ejemplo `ucap.cr_i`, `ucap.vida_util_anios`)
+    que se validan por columna y pasan al motor vectorizado sin construir un
+    objeto por fila. No admite `inventario_id` (400).
+    """
     try:
-        return calculate_alumbrado_costs(payload=payload, tenant_id=tenant_id)
+        return ModelJSONResponse(
+            calculate_from_columns(payload=payload, tenant_id=tenant_id, parameters=parameters)
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.post(
+    "/calcular/flujo",
+    response_model=schemas.AlumbradoCalculoResultado,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/x-ndjson": {"schema": {"type": "string"}}},
+        }
+    },
+)
+async def calculate_alumbrado_stream(
+    request: Request,
+    tenant_id: str = Depends(get_tenant_id),
+    parameters: RegulatoryParameters = Depends(get_tenant_parameters),
+):
+    """
+    Calcula el CAP a partir de un cuerpo NDJSON.
+
+    La primera línea es el encabezado de `/calcular` y cada línea siguiente
+    un aforo, UCAP, terreno o evento con su `seccion`. Las líneas se validan
+    y acumulan a medida que llegan, sin materializar el inventario. El
+    encabezado no admite `inventario_id` (400).
+    """
+    try:
+        return await calculate_from_ndjson(
+            request.stream(), tenant_id=tenant_id, parameters=parameters
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.post("/calcular/inventario", response_model=schemas.AlumbradoCalculoResultado)
+async def calculate_alumbrado_from_inventory(
+    encabezado: str = Form(...),
+    ucap: Optional[UploadFile] = File(default=None),
+    aforos: Optional[UploadFile] = File(default=None),
+    terrenos: Optional[UploadFile] = File(default=None),
+    interrupciones: Optional[UploadFile] = File(default=None),
+    interrupciones_desde: Optional[datetime] = Form(default=None),
+    interrupciones_hasta: Optional[datetime] = Form(default=None),
+    tenant_id: str = Depends(get_tenant_id),
+    parameters: RegulatoryParameters = Depends(get_tenant_parameters),
+):
+    """
+    Calcula el CAP con inventarios en CSV o Parquet.
+
+    `encabezado` es el JSON de `/calcular`; cada archivo trae la columna
+    `nivel_tension` y las columnas de su sección. `interrupciones` es el
+    registro crudo de `/interrupciones`, cuyos eventos se suman a los de
+    disponibilidad y VCEEI. Si alguna fila es inválida se responde 400 con
+    el detalle por fila. El encabezado no admite `inventario_id` (400).
+    """
+    try:
+        header = schemas.AlumbradoCalculoEntrada.model_validate_json(encabezado)
+    except ValidationError as exc:
+        raise HTTPException(status_code=400, detail=format_validation_error(exc))
+
+    files = {}
+    for section, upload in {"ucap": ucap, "aforos": aforos, "terrenos": terrenos}.items():
+        if upload is not None:
+            files[section] = (upload.filename or "", await upload.read())
+
+    try:
+        if interrupciones is not None:
+            outages = await run_in_threadpool(
+                aggregate_outage_log,
+                filename=interrupciones.filename or "",
+                stream=interrupciones.file,
+                desde=interrupciones_desde,
+                hasta=interrupciones_hasta,
+            )
+            header = apply_outage_events(header, outages)
+        return await run_in_threadpool(
+            calculate_from_inventory,
+            header=header,
+            files=files,
+            tenant_id=tenant_id,
+            parameters=parameters,
+        )
+    except InventoryImportError as exc:
+        raise HTTPException(status_code=400, detail=exc.report())
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.post("/interrupciones", response_model=schemas.AlumbradoInterrupcionesResultado)
+async def aggregate_outages(
+    registros: UploadFile = File(...),
+    desde: Optional[datetime] = Query(default=None),
+    hasta: Optional[datetime] = Query(default=None),
+):
+    """
+    Resume un registro crudo de interrupciones en eventos de disponibilidad y VCEEI.
+
+    El archivo (CSV o Parquet) trae una fila por interrupción con `circuito`,
+    `nivel_tension`, `potencia_kw`, `inicio` y `fin`. Los intervalos que se
+    solapan en un mismo circuito cuentan una sola vez; `desde` y `hasta`
+    recortan los intervalos al periodo.
+    """
+    try:
+        return await run_in_threadpool(
+            aggregate_outage_log,
+            filename=registros.filename or "",
+            stream=registros.file,
+            desde=desde,
+            hasta=hasta,
+        )
+    except InventoryImportError as exc:
+        raise HTTPException(status_code=400, detail=exc.report())
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.post(
+    "/escenarios",
+    response_model=schemas.AlumbradoEscenariosResultado,
+    openapi_extra=model_request_body(schemas.AlumbradoEscenariosEntrada),
+)
+def sweep_alumbrado(
+    payload: schemas.AlumbradoEscenariosEntrada = Depends(
+        model_body(schemas.AlumbradoEscenariosEntrada)
+    ),
+    tenant_id: str = Depends(get_tenant_id),
+    parameters: RegulatoryParameters = Depends(get_tenant_parameters),
+):
+    """
+    Evalúa una entrada base sobre la grilla de tasas de retorno, años de
+    aplicación y actualizaciones IPP, devolviendo una tabla compacta.
+
+    La entrada base no admite `inventario_id` (400): la tabla no se podría
+    reproducir tras editar el inventario.
+    """
+    if payload.total_escenarios > settings.ALUMBRADO_SWEEP_MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                "La grilla excede el máximo permitido de "
+                f"{settings.ALUMBRADO_SWEEP_MAX_POINTS} escenarios"
+            ),
+        )
+    try:
+        return ModelJSONResponse(
+            sweep_alumbrado_scenarios(payload=payload, tenant_id=tenant_id, parameters=parameters)
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.post(
+    "/proyeccion",
+    response_model=schemas.AlumbradoProyeccionResultado,
+    openapi_extra=model_request_body(schemas.AlumbradoProyeccionEntrada),
+)
+def project_alumbrado(
+    payload: schemas.AlumbradoProyeccionEntrada = Depends(
+        model_body(schemas.AlumbradoProyeccionEntrada)
+    ),
+    tenant_id: str = Depends(get_tenant_id),
+    parameters: RegulatoryParameters = Depends(get_tenant_parameters),
+):
+    """
+    Proyecta CAP, CINV, CAOM y FAOML para cada año del rango indicado.
+
+    La entrada base no admite `inventario_id` (400).
+    """
+    if payload.total_annos > settings.ALUMBRADO_SWEEP_MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                "El rango excede el máximo permitido de "
+                f"{settings.ALUMBRADO_SWEEP_MAX_POINTS} años"
+            ),
+        )
+    try:
+        return project_alumbrado_cap(payload=payload, tenant_id=tenant_id, parameters=parameters)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.post(
+    "/montecarlo",
+    response_model=schemas.AlumbradoMonteCarloResultado,
+    openapi_extra=model_request_body(schemas.AlumbradoMonteCarloEntrada),
+)
+def simulate_alumbrado_monte_carlo(
+    payload: schemas.AlumbradoMonteCarloEntrada = Depends(
+        model_body(schemas.AlumbradoMonteCarloEntrada)
+    ),
+    tenant_id: str = Depends(get_tenant_id),
+    parameters: RegulatoryParameters = Depends(get_tenant_parameters),
+):
+    """
+    Estima la distribución de CAP muestreando los campos declarados como inciertos.
+
+    La entrada base no admite `inventario_id` (400).
+    """
+    if payload.muestras > settings.ALUMBRADO_MONTE_CARLO_MAX_SAMPLES:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                "La simulación excede el máximo permitido de "
+                f"{settings.ALUMBRADO_MONTE_CARLO_MAX_SAMPLES} muestras"
+            ),
+        )
+    try:
+        return run_monte_carlo(payload=payload, tenant_id=tenant_id, parameters=parameters)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
 
@@ -76,16 +598,47 @@ def create_simple_receipt_from_template(
     payload: schemas.ReciboSimpleDesdePlantillaEntrada,
     tenant_id: str = Depends(get_tenant_id),
 ):
-    return build_simple_receipt(
-        tenant_id=tenant_id,
-        municipio=payload.municipio,
-        periodo=payload.periodo,
-        metodologia=payload.metodologia,
-        metadata=payload.metadata,
-        componentes=payload.componentes,
+    return ModelJSONResponse(
+        build_simple_receipt(
+            tenant_id=tenant_id,
+            municipio=payload.municipio,
+            periodo=payload.periodo,
+            metodologia=payload.metodologia,
+            metadata=payload.metadata,
+            componentes=payload.componentes,
+        )
     )
 
 
+def _receipt_source(
+    payload: schemas.ReciboSimpleDesdeCalculoEntrada,
+    tenant_id: str,
+    db: Session,
+):
+    """Resultado (o fila del historial) del que salen los componentes del recibo."""
+    if payload.calculo_id is not None:
+        source = get_calculation(db, tenant_id=tenant_id, calculo_id=payload.calculo_id)
+    elif payload.hash_calculo is not None:
+        # El hash incluye el tenant, pero se verifica de nuevo antes de usar la caché.
+        source = calculation_cache.peek(payload.hash_calculo)
+        if source is None or source.tenant_id != tenant_id:
+            source = get_calculation_by_hash(
+                db, tenant_id=tenant_id, content_hash=payload.hash_calculo
+            )
+    else:
+        try:
+            return calculate_with_cache(
+                payload=payload.calculo,
+                tenant_id=tenant_id,
+                parameters=get_parameters(db, tenant_id),
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    if source is None:
+        raise HTTPException(status_code=404, detail="Cálculo no encontrado")
+    return source
+
+
 @router.post(
     "/recibo/simple/desde-calculo",
     response_model=schemas.ReciboSimpleResultado,
@@ -93,24 +646,29 @@ def create_simple_receipt_from_template(
 def create_simple_receipt_from_calculation(
     payload: schemas.ReciboSimpleDesdeCalculoEntrada,
     tenant_id: str = Depends(get_tenant_id),
+    db: Session = Depends(get_db),
 ):
-    try:
-        result = calculate_alumbrado_costs(payload=payload.calculo, tenant_id=tenant_id)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail=str(exc))
+    """
+    Genera el recibo simple de un cálculo.
 
+    Con `calculo_id` o `hash_calculo` los componentes se leen del resultado
+    guardado (caché o historial), sin recalcular; reimprimir o corregir la
+    metadata solo cuesta el renderizado.
+    """
+    source = _receipt_source(payload, tenant_id, db)
     components = schemas.ReciboComponentesEntrada(
-        csee=result.csee,
-        cinv=result.cinv,
-        caom=result.caom,
-        cotr=result.cotr,
+        csee=source.csee,
+        cinv=source.cinv,
+        caom=source.caom,
+        cotr=source.cotr,
     )
-    return build_simple_receipt(
-        tenant_id=tenant_id,
-        municipio=result.municipio,
-        periodo=result.periodo,
-        metodologia=result.metodologia,
-        metadata=payload.metadata,
-        componentes=components,
+    return ModelJSONResponse(
+        build_simple_receipt(
+            tenant_id=tenant_id,
+            municipio=source.municipio,
+            periodo=source.periodo,
+            metodologia=METODOLOGIA,
+            metadata=payload.metadata,
+            componentes=components,
+        )
     )
-
@@ -0,0 +1,249 @@
+from typing import Optional
+
+from app.api.dependencies import get_current_user
+from app.api.serialization import ModelJSONRoute, model_body, model_request_body
+from app.api.tenant import get_tenant_id
+from app.db.database import get_db
+from app.models.alumbrado import CalculoAlumbrado
+from app.schemas import alumbrado as schemas
+from app.services.alumbrado_allocation import list_charges
+from app.services.alumbrado_cache import calculation_hash
+from app.services.alumbrado_calculator import (
+    add_section_totals,
+    build_calculation_result,
+    reduce_sections,
+)
+from app.services.alumbrado_comparison import compare_calculations, compare_periods
+from app.services.alumbrado_inventory import (
+    get_inventory,
+    inventory_key,
+    inventory_totals,
+    pin_inventory_version,
+)
+from app.services.alumbrado_parameters import get_parameters
+from app.services.alumbrado_patch import patch_calculation
+from app.services.alumbrado_store import (
+    get_calculation,
+    list_calculations,
+    load_input,
+    load_result,
+    save_calculation,
+)
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+router = APIRouter(
+    prefix="/alumbrado/calculos",
+    tags=["alumbrado"],
+    dependencies=[Depends(get_current_user)],
+    route_class=ModelJSONRoute,
+)
+
+
+def _to_saved(calculo: CalculoAlumbrado) -> schemas.CalculoAlumbradoGuardado:
+    summary = schemas.CalculoAlumbradoResumen.model_validate(calculo)
+    return schemas.CalculoAlumbradoGuardado(
+        **summary.model_dump(),
+        resultado=load_result(calculo),
+    )
+
+
+def _get_or_404(db: Session, tenant_id: str, calculo_id: int) -> CalculoAlumbrado:
+    calculo = get_calculation(db, tenant_id=tenant_id, calculo_id=calculo_id)
+    if calculo is None:
+        raise HTTPException(status_code=404, detail="Cálculo no encontrado")
+    return calculo
+
+
+@router.post(
+    "/",
+    response_model=schemas.CalculoAlumbradoGuardado,
+    openapi_extra=model_request_body(schemas.AlumbradoCalculoEntrada),
+)
+def create_calculation(
+    payload: schemas.AlumbradoCalculoEntrada = Depends(model_body(schemas.AlumbradoCalculoEntrada)),
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """
+    Calcula el CAP y guarda entrada y resultado en el historial del tenant.
+
+    Con `inventario_id` la entrada se guarda con `inventario_version` fijada
+    (la pedida o la vigente): el cálculo se puede recalcular con las mismas
+    filas aunque el inventario cambie después.
+    """
+    inventario = None
+    if payload.inventario_id is not None:
+        inventario = get_inventory(db, tenant_id=tenant_id, inventario_id=payload.inventario_id)
+        if inventario is None:
+            raise HTTPException(status_code=404, detail="Inventario no encontrado")
+        try:
+            payload = pin_inventory_version(payload, inventario)
+        except ValueError as exc:
+            raise HTTPException(status_code=404, detail=str(exc))
+
+    # Las sumas por nivel se guardan junto al resultado para recálculos parciales.
+    parameters = get_parameters(db, tenant_id)
+    try:
+        totals = reduce_sections(payload, parameters=parameters)
+        if inventario is not None:
+            totals = add_section_totals(
+                totals,
+                inventory_totals(
+                    db, inventario, payload.tasa_retorno, parameters, payload.inventario_version
+                ),
+            )
+        result = build_calculation_result(
+            payload=payload, tenant_id=tenant_id, totals=totals, parameters=parameters
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    calculo = save_calculation(
+        db,
+        tenant_id=tenant_id,
+        payload=payload,
+        result=result,
+        totals=totals,
+        content_hash=calculation_hash(
+            payload,
+            tenant_id,
+            inventory_key=(
+                inventory_key(inventario, payload.inventario_version) if inventario else None
+            ),
+            parameters_version=parameters.version,
+        ),
+    )
+    return _to_saved(calculo)
+
+
+@router.get("/", response_model=schemas.CalculoAlumbradoPagina)
+def read_calculations(
+    db: Session = Depends(get_db),
+    municipio: Optional[str] = None,
+    periodo_desde: Optional[str] = None,
+    periodo_hasta: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """Lista cálculos guardados por municipio y rango de periodos"""
+    try:
+        items, next_cursor = list_calculations(
+            db,
+            tenant_id=tenant_id,
+            municipio=municipio,
+            periodo_desde=periodo_desde,
+            periodo_hasta=periodo_hasta,
+            cursor=cursor,
+            limit=limit,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return schemas.CalculoAlumbradoPagina(items=items, siguiente_cursor=next_cursor)
+
+
+@router.get("/comparacion", response_model=schemas.AlumbradoComparacion)
+def compare_two_calculations(
+    base_id: int = Query(..., ge=1),
+    comparado_id: int = Query(..., ge=1),
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """Compara dos cálculos guardados por componente y por nivel sin recalcularlos"""
+    return compare_calculations(
+        _get_or_404(db, tenant_id, base_id),
+        _get_or_404(db, tenant_id, comparado_id),
+    )
+
+
+@router.get("/comparacion/periodos", response_model=schemas.AlumbradoComparacionPeriodos)
+def compare_calculation_periods(
+    db: Session = Depends(get_db),
+    municipio: Optional[str] = None,
+    periodo_desde: Optional[str] = None,
+    periodo_hasta: Optional[str] = None,
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """
+    Compara cada periodo con el anterior guardado, por municipio.
+
+    Sin `municipio` devuelve el informe periodo a periodo de todo el tenant.
+    """
+    return schemas.AlumbradoComparacionPeriodos(
+        tenant_id=tenant_id,
+        municipio=municipio,
+        periodo_desde=periodo_desde,
+        periodo_hasta=periodo_hasta,
+        comparaciones=compare_periods(
+            db,
+            tenant_id=tenant_id,
+            municipio=municipio,
+            periodo_desde=periodo_desde,
+            periodo_hasta=periodo_hasta,
+        ),
+    )
+
+
+@router.get("/{calculo_id}", response_model=schemas.CalculoAlumbradoGuardado)
+def read_calculation(
+    calculo_id: int,
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """Obtiene un cálculo guardado sin recalcularlo"""
+    return _to_saved(_get_or_404(db, tenant_id, calculo_id))
+
+
+@router.patch("/{calculo_id}", response_model=schemas.CalculoAlumbradoParcheResultado)
+def update_calculation(
+    calculo_id: int,
+    patch: schemas.CalculoAlumbradoParche,
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """Corrige una sección del cálculo y recalcula solo los componentes afectados"""
+    calculo = _get_or_404(db, tenant_id, calculo_id)
+    try:
+        result, delta = patch_calculation(db, calculo, patch)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    summary = schemas.CalculoAlumbradoResumen.model_validate(calculo)
+    return schemas.CalculoAlumbradoParcheResultado(
+        **summary.model_dump(),
+        resultado=result,
+        delta=delta,
+    )
+
+
+@router.get("/{calculo_id}/entrada", response_model=schemas.AlumbradoCalculoEntrada)
+def read_calculation_input(
+    calculo_id: int,
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """Obtiene la entrada original de un cálculo guardado"""
+    return load_input(_get_or_404(db, tenant_id, calculo_id))
+
+
+@router.get("/{calculo_id}/cargos", response_model=schemas.CargoAlumbradoPagina)
+def read_calculation_charges(
+    calculo_id: int,
+    db: Session = Depends(get_db),
+    estrato: Optional[int] = None,
+    despues_de: int = Query(0, ge=0, description="Último `cliente_id` de la página anterior"),
+    limit: int = Query(500, ge=1, le=5000),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """Cargos por cliente de la última distribución del CAP del cálculo"""
+    _get_or_404(db, tenant_id, calculo_id)
+    items, next_cliente_id = list_charges(
+        db,
+        tenant_id=tenant_id,
+        calculo_id=calculo_id,
+        after_cliente_id=despues_de,
+        limit=limit,
+        estrato=estrato,
+    )
+    return schemas.CargoAlumbradoPagina(items=items, siguiente_cliente_id=next_cliente_id)
@@ -0,0 +1,157 @@
+from typing import Optional
+
+from app.api.dependencies import get_admin_user, get_current_user
+from app.api.serialization import ModelJSONRoute
+from app.api.tenant import get_tenant_id
+from app.db.database import get_db
+from app.models.alumbrado import InventarioAlumbrado
+from app.models.user import User
+from app.schemas import alumbrado as schemas
+from app.services.alumbrado_batch import format_validation_error
+from app.services.alumbrado_inventory import (
+    INVENTORY_SECTIONS,
+    SECTION_PATTERN,
+    create_inventory,
+    delete_inventory,
+    delete_inventory_row,
+    get_inventory,
+    inventory_row_counts,
+    list_inventories,
+    list_inventory_rows,
+    upsert_inventory_rows,
+)
+from fastapi import APIRouter, Body, Depends, HTTPException, Path, Query, status
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.orm import Session
+
+router = APIRouter(
+    prefix="/alumbrado/inventarios",
+    tags=["alumbrado"],
+    dependencies=[Depends(get_current_user)],
+    route_class=ModelJSONRoute,
+)
+
+ROW_ADAPTERS = {
+    section: TypeAdapter(list[row_schema])
+    for section, (_, row_schema) in INVENTORY_SECTIONS.items()
+}
+
+
+def _get_or_404(db: Session, tenant_id: str, inventario_id: int) -> InventarioAlumbrado:
+    inventario = get_inventory(db, tenant_id=tenant_id, inventario_id=inventario_id)
+    if inventario is None:
+        raise HTTPException(status_code=404, detail="Inventario no encontrado")
+    return inventario
+
+
+@router.get("/", response_model=list[schemas.InventarioAlumbrado])
+def read_inventories(
+    db: Session = Depends(get_db),
+    skip: int = 0,
+    limit: int = 100,
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """Lista los inventarios de alumbrado del tenant"""
+    return list_inventories(db, tenant_id=tenant_id, skip=skip, limit=limit)
+
+
+@router.post("/", response_model=schemas.InventarioAlumbrado)
+def create_inventory_endpoint(
+    inventario: schemas.InventarioAlumbradoCrear,
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+    _: User = Depends(get_admin_user),
+):
+    """Crea un inventario vacío"""
+    try:
+        return create_inventory(db, tenant_id=tenant_id, nombre=inventario.nombre)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.get("/{inventario_id}", response_model=schemas.InventarioAlumbradoDetalle)
+def read_inventory(
+    inventario_id: int,
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """Obtiene un inventario con el número de filas por sección"""
+    inventario = _get_or_404(db, tenant_id, inventario_id)
+    return schemas.InventarioAlumbradoDetalle(
+        **schemas.InventarioAlumbrado.model_validate(inventario).model_dump(),
+        filas=inventory_row_counts(db, inventario),
+    )
+
+
+@router.delete("/{inventario_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_inventory_endpoint(
+    inventario_id: int,
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+    _: User = Depends(get_admin_user),
+):
+    """Elimina un inventario y todas sus filas, si ningún cálculo guardado lo referencia"""
+    try:
+        delete_inventory(db, _get_or_404(db, tenant_id, inventario_id))
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
+@router.get("/{inventario_id}/{seccion}")
+def read_inventory_rows(
+    inventario_id: int,
+    seccion: str = Path(..., pattern=SECTION_PATTERN),
+    nivel_tension: Optional[int] = Query(default=None, ge=1, le=2),
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """Lista las filas de una sección (`ucap`, `terrenos` o `aforos`)"""
+    inventario = _get_or_404(db, tenant_id, inventario_id)
+    rows = list_inventory_rows(
+        db, inventario, seccion, nivel_tension=nivel_tension, skip=skip, limit=limit
+    )
+    return ROW_ADAPTERS[seccion].dump_python(
+        ROW_ADAPTERS[seccion].validate_python(rows, from_attributes=True)
+    )
+
+
+@router.put("/{inventario_id}/{seccion}", response_model=schemas.InventarioCargaResultado)
+def upsert_inventory_rows_endpoint(
+    inventario_id: int,
+    seccion: str = Path(..., pattern=SECTION_PATTERN),
+    filas: list[dict] = Body(...),
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+    _: User = Depends(get_admin_user),
+):
+    """
+    Carga masiva de filas de una sección.
+
+    Las filas se identifican por `codigo`: las existentes se actualizan y las
+    nuevas se insertan. Cada carga aumenta la versión del inventario.
+    """
+    inventario = _get_or_404(db, tenant_id, inventario_id)
+    try:
+        rows = ROW_ADAPTERS[seccion].validate_python(filas)
+    except ValidationError as exc:
+        raise HTTPException(status_code=400, detail=format_validation_error(exc))
+    return upsert_inventory_rows(db, inventario, seccion, rows)
+
+
+@router.delete(
+    "/{inventario_id}/{seccion}/{codigo}", status_code=status.HTTP_204_NO_CONTENT
+)
+def delete_inventory_row_endpoint(
+    inventario_id: int,
+    codigo: str,
+    seccion: str = Path(..., pattern=SECTION_PATTERN),
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+    _: User = Depends(get_admin_user),
+):
+    """Elimina una fila de una sección por su código"""
+    inventario = _get_or_404(db, tenant_id, inventario_id)
+    if not delete_inventory_row(db, inventario, seccion, codigo):
+        raise HTTPException(status_code=404, detail="Fila de inventario no encontrada")
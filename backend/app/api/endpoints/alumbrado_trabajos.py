@@ -0,0 +1,180 @@
+from typing import Any, Optional
+
+from app.api.dependencies import get_admin_user, get_current_user
+from app.api.endpoints.alumbrado import ENGINE_PATTERN
+from app.api.serialization import ModelJSONRoute, model_body, model_request_body
+from app.api.tenant import get_tenant_id
+from app.core.config import settings
+from app.db.database import get_db
+from app.models.alumbrado import TrabajoAlumbrado
+from app.models.user import User
+from app.schemas import alumbrado as schemas
+from app.services.alumbrado_inventory import get_inventory, pin_inventory_version
+from app.services.alumbrado_jobs import (
+    COMPLETED,
+    get_job,
+    load_job_result,
+    submit_allocation_job,
+    submit_batch_job,
+    submit_calculation_job,
+    submit_recalculation_job,
+)
+from app.services.alumbrado_parameters import load_parameters
+from app.services.alumbrado_store import get_calculation
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response, status
+from sqlalchemy.orm import Session
+
+router = APIRouter(
+    prefix="/alumbrado/trabajos",
+    tags=["alumbrado"],
+    dependencies=[Depends(get_current_user)],
+    route_class=ModelJSONRoute,
+)
+
+
+def _get_or_404(db: Session, tenant_id: str, trabajo_id: int) -> TrabajoAlumbrado:
+    trabajo = get_job(db, tenant_id=tenant_id, job_id=trabajo_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return trabajo
+
+
+@router.post(
+    "/calculo",
+    response_model=schemas.TrabajoAlumbrado,
+    status_code=status.HTTP_202_ACCEPTED,
+    openapi_extra=model_request_body(schemas.AlumbradoCalculoEntrada),
+)
+def submit_calculation(
+    payload: schemas.AlumbradoCalculoEntrada = Depends(model_body(schemas.AlumbradoCalculoEntrada)),
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+    motor: Optional[str] = Query(default=None, pattern=ENGINE_PATTERN),
+):
+    """
+    Encola un cálculo de `/alumbrado/calcular` y responde de inmediato.
+
+    El avance se consulta en `GET /alumbrado/trabajos/{id}` y el resultado,
+    una vez completado, en `GET /alumbrado/trabajos/{id}/resultado`.
+    """
+    if payload.inventario_id is not None:
+        inventario = get_inventory(db, tenant_id=tenant_id, inventario_id=payload.inventario_id)
+        if inventario is None:
+            raise HTTPException(status_code=404, detail="Inventario no encontrado")
+        try:
+            payload = pin_inventory_version(payload, inventario)
+        except ValueError as exc:
+            raise HTTPException(status_code=404, detail=str(exc))
+    return submit_calculation_job(db, tenant_id=tenant_id, payload=payload, engine=motor)
+
+
+@router.post(
+    "/lote",
+    response_model=schemas.TrabajoAlumbrado,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def submit_batch(
+    payloads: list[dict[str, Any]] = Body(...),
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+    motor: Optional[str] = Query(default=None, pattern=ENGINE_PATTERN),
+):
+    """
+    Encola un lote de `/alumbrado/calcular/lote` con hasta `ALUMBRADO_JOB_MAX_ITEMS` ítems.
+
+    Los ítems se validan al ejecutarse; los inválidos se reportan por índice
+    en el resultado, igual que en el lote síncrono.
+    """
+    if not payloads:
+        raise HTTPException(status_code=400, detail="El lote no puede estar vacío")
+    if len(payloads) > settings.ALUMBRADO_JOB_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                "El lote excede el máximo permitido de "
+                f"{settings.ALUMBRADO_JOB_MAX_ITEMS} cálculos"
+            ),
+        )
+    return submit_batch_job(db, tenant_id=tenant_id, raw_payloads=payloads, engine=motor)
+
+
+@router.post(
+    "/recalculo",
+    response_model=schemas.TrabajoAlumbrado,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def submit_recalculation(
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+    motor: Optional[str] = Query(default=None, pattern=ENGINE_PATTERN),
+    _: User = Depends(get_admin_user),
+):
+    """
+    Encola el recálculo de los cálculos guardados con la versión vigente de parámetros.
+
+    Solo se recalculan los componentes afectados por el cambio; el resultado
+    (`AlumbradoRecalculoResultado`) lista el delta de cada cálculo que cambió
+    y los que no pudieron recalcularse, que conservan su versión anterior.
+    """
+    parameters = load_parameters(db, tenant_id)
+    return submit_recalculation_job(db, tenant_id=tenant_id, parameters=parameters, engine=motor)
+
+
+@router.post(
+    "/distribucion",
+    response_model=schemas.TrabajoAlumbrado,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def submit_allocation(
+    payload: schemas.DistribucionAlumbradoEntrada,
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+    _: User = Depends(get_admin_user),
+):
+    """
+    Encola la distribución del CAP de un cálculo guardado entre los clientes del tenant.
+
+    Cada cliente paga según el peso de su estrato y los cargos se redondean
+    al centavo cuadrando la suma con el CAP. Reemplaza la distribución
+    anterior del cálculo; los cargos se consultan en
+    `GET /alumbrado/calculos/{id}/cargos`.
+    """
+    if get_calculation(db, tenant_id=tenant_id, calculo_id=payload.calculo_id) is None:
+        raise HTTPException(status_code=404, detail="Cálculo no encontrado")
+    return submit_allocation_job(db, tenant_id=tenant_id, payload=payload)
+
+
+@router.get("/{trabajo_id}", response_model=schemas.TrabajoAlumbrado)
+def read_job(
+    trabajo_id: int,
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """Estado y avance de un trabajo del tenant"""
+    return _get_or_404(db, tenant_id, trabajo_id)
+
+
+@router.get(
+    "/{trabajo_id}/resultado",
+    responses={
+        200: {
+            "description": (
+                "`AlumbradoCalculoResultado`, `AlumbradoLoteResultado`, "
+                "`AlumbradoRecalculoResultado` o `AlumbradoDistribucionResultado` según el tipo"
+            )
+        }
+    },
+)
+def read_job_result(
+    trabajo_id: int,
+    db: Session = Depends(get_db),
+    tenant_id: str = Depends(get_tenant_id),
+):
+    """Resultado de un trabajo completado, servido tal como se guardó"""
+    trabajo = _get_or_404(db, tenant_id, trabajo_id)
+    if trabajo.estado != COMPLETED:
+        raise HTTPException(
+            status_code=409,
+            detail=f"El trabajo no está completado (estado: {trabajo.estado})",
+        )
+    return Response(content=load_job_result(trabajo), media_type="application/json")
@@ -0,0 +1,289 @@
+import json
+from contextvars import ContextVar
+from typing import Any, Callable, Coroutine, TypeVar
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, ValidationError
+from pydantic.json_schema import models_json_schema
+
+from app.core.config import settings
+from app.services.alumbrado_profiling import profiled, stage_histograms, stage_timer
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - depende del entorno
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - depende del entorno
+    pa = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+MSGPACK_ALIASES = {MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack"}
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# Formato del cuerpo de la solicitud, anotado en el scope cuando no es JSON.
+BODY_FORMAT_SCOPE_KEY = "alumbrado.formato_cuerpo"
+
+# Formato negociado para la respuesta de la solicitud en curso.
+response_media_type: ContextVar[str] = ContextVar(
+    "alumbrado_response_media_type", default=JSON_MEDIA_TYPE
+)
+
+
+def _media_type(value: str | None) -> str:
+    return (value or "").split(";", 1)[0].strip().lower()
+
+
+def negotiate_media_type(accept: str | None, table: bool = False) -> str:
+    """
+    Elige el formato de respuesta según `Accept`; JSON si nada más aplica.
+
+    MessagePack se ofrece si `msgpack` está instalado y Arrow IPC solo para
+    respuestas tabulares (`columnas` y `filas`) si `pyarrow` está instalado.
+    """
+    offers = {JSON_MEDIA_TYPE, "application/*", "*/*"}
+    if msgpack is not None:
+        offers |= MSGPACK_ALIASES
+    if pa is not None and table:
+        offers.add(ARROW_MEDIA_TYPE)
+
+    best, best_quality = JSON_MEDIA_TYPE, 0.0
+    for item in (accept or "").split(","):
+        media_type, _, params = item.partition(";")
+        media_type = _media_type(media_type)
+        if media_type not in offers:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > best_quality:
+            best_quality = quality
+            if media_type in MSGPACK_ALIASES:
+                best = MSGPACK_MEDIA_TYPE
+            elif media_type == ARROW_MEDIA_TYPE:
+                best = ARROW_MEDIA_TYPE
+            else:
+                best = JSON_MEDIA_TYPE
+    return best
+
+
+def _encode_msgpack(data: Any) -> bytes:
+    return msgpack.packb(data, use_bin_type=True)
+
+
+def _encode_arrow(data: dict[str, Any]) -> bytes:
+    """Tabla `columnas`/`filas` como stream Arrow IPC; el resto va en los metadatos."""
+    columns = data["columnas"]
+    values = list(zip(*data["filas"])) or [()] * len(columns)
+    table = pa.table(
+        {name: list(column) for name, column in zip(columns, values)},
+        metadata={
+            key: json.dumps(value)
+            for key, value in data.items()
+            if key not in {"columnas", "filas"}
+        },
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+ENCODERS: dict[str, Callable[[Any], bytes]] = {
+    MSGPACK_MEDIA_TYPE: _encode_msgpack,
+    ARROW_MEDIA_TYPE: _encode_arrow,
+}
+
+
+def _is_table_model(model: Any) -> bool:
+    return (
+        isinstance(model, type)
+        and issubclass(model, BaseModel)
+        and {"columnas", "filas"} <= model.model_fields.keys()
+    )
+
+
+class MessagePackRequest(Request):
+    """
+    Solicitud cuyo cuerpo MessagePack se decodifica en `json()`.
+
+    FastAPI lee los cuerpos con `Content-Type` JSON a través de `json()`; con
+    el header reescrito por `_msgpack_scope` el cuerpo llega aquí y se
+    decodifica con `msgpack` en vez de `json`.
+    """
+
+    async def json(self) -> Any:
+        if self.scope.get(BODY_FORMAT_SCOPE_KEY) != MSGPACK_MEDIA_TYPE:
+            return await super().json()
+        return msgpack.unpackb(await self.body())
+
+
+def body_validation_error(errors: list[dict[str, Any]]) -> RequestValidationError:
+    """Errores de validación del cuerpo con el `loc` que usa FastAPI."""
+    return RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in errors])
+
+
+def model_body(model: type[ModelT]) -> Callable[[Request], Coroutine[Any, Any, ModelT]]:
+    """
+    Dependencia que valida el cuerpo con `model_validate_json` desde los bytes.
+
+    Evita el paso intermedio por `json.loads` y el recorrido del diccionario
+    que hace FastAPI con un parámetro de cuerpo. Un cuerpo MessagePack se
+    decodifica y se valida en modo Python. Los errores se reportan como un
+    422 con el formato habitual de FastAPI.
+
+    El esquema no queda en OpenAPI al no ser un parámetro de cuerpo; se
+    documenta con `openapi_extra=model_request_body(model)`.
+    """
+
+    async def parse_body(request: Request) -> ModelT:
+        body = await request.body()
+        try:
+            with stage_timer().measure("validacion", len(body)):
+                if request.scope.get(BODY_FORMAT_SCOPE_KEY) == MSGPACK_MEDIA_TYPE:
+                    return model.model_validate(msgpack.unpackb(body))
+                return model.model_validate_json(body)
+        except ValidationError as exc:
+            raise body_validation_error(exc.errors(include_url=False))
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+    return parse_body
+
+
+# Modelos documentados con `model_request_body`, para `request_body_schemas`.
+REQUEST_BODY_MODELS: dict[str, type[BaseModel]] = {}
+
+
+def model_request_body(model: type[BaseModel]) -> dict[str, Any]:
+    """`openapi_extra` que documenta `model` como cuerpo JSON o MessagePack."""
+    REQUEST_BODY_MODELS[model.__name__] = model
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                media_type: {"schema": {"$ref": f"#/components/schemas/{model.__name__}"}}
+                for media_type in (JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE)
+            },
+        }
+    }
+
+
+def request_body_schemas() -> dict[str, Any]:
+    """Esquemas de los modelos de `model_request_body` y de los que referencian."""
+    _, schema = models_json_schema(
+        [(model, "validation") for model in REQUEST_BODY_MODELS.values()],
+        ref_template="#/components/schemas/{model}",
+    )
+    return schema.get("$defs", {})
+
+
+def _msgpack_scope(request: Request) -> dict[str, Any]:
+    """
+    Scope con el cuerpo MessagePack anotado y `Content-Type` JSON.
+
+    Con el header reescrito FastAPI lee el cuerpo con
+    `MessagePackRequest.json()`, y `model_body` lo valida en modo Python.
+    """
+    if msgpack is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="El formato application/msgpack requiere instalar msgpack",
+        )
+    headers = [
+        (name, JSON_MEDIA_TYPE.encode() if name == b"content-type" else value)
+        for name, value in request.scope["headers"]
+    ]
+    return {**request.scope, "headers": headers, BODY_FORMAT_SCOPE_KEY: MSGPACK_MEDIA_TYPE}
+
+
+def encode_response(response: Response, media_type: str) -> Response:
+    """Recodifica una respuesta JSON ya renderizada al formato negociado."""
+    if not response.body or _media_type(response.headers.get("content-type")) != JSON_MEDIA_TYPE:
+        return response
+    with stage_timer().measure("serializacion"):
+        response.body = ENCODERS[media_type](json.loads(response.body))
+    response.headers["content-type"] = media_type
+    response.headers["content-length"] = str(len(response.body))
+    return response
+
+
+class ModelJSONRoute(APIRoute):
+    """
+    Ruta que negocia el formato de cuerpo y respuesta.
+
+    Acepta cuerpos `application/msgpack` y responde MessagePack o Arrow IPC
+    según `Accept`, con JSON por defecto.
+    `ModelJSONResponse` codifica el modelo directamente en el formato
+    negociado; las demás respuestas JSON se recodifican al salir.
+
+    Con `ENABLE_ALUMBRADO_PROFILING` cada solicitud se perfila: la respuesta
+    lleva el header `Server-Timing` y los tiempos se suman a los histogramas
+    de `stage_histograms`.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+        table = _is_table_model(self.response_model)
+
+        async def respond(request: Request, media_type: str) -> Response:
+            response = await handler(request)
+            if media_type != JSON_MEDIA_TYPE:
+                response = encode_response(response, media_type)
+            return response
+
+        async def route_handler(request: Request) -> Response:
+            scope = request.scope
+            if _media_type(request.headers.get("content-type")) in MSGPACK_ALIASES:
+                scope = _msgpack_scope(request)
+            request = MessagePackRequest(scope, request.receive)
+            media_type = negotiate_media_type(request.headers.get("accept"), table=table)
+            token = response_media_type.set(media_type)
+            try:
+                if not settings.ENABLE_ALUMBRADO_PROFILING:
+                    response = await respond(request, media_type)
+                else:
+                    with profiled() as profile:
+                        response = await respond(request, media_type)
+                    if profile.stages:
+                        response.headers["Server-Timing"] = profile.server_timing()
+                        stage_histograms.record(profile)
+            finally:
+                response_media_type.reset(token)
+            response.headers.add_vary_header("Accept")
+            return response
+
+        return route_handler
+
+
+class ModelJSONResponse(Response):
+    """
+    Serializa un modelo Pydantic a JSON una sola vez con el serializador de pydantic-core.
+
+    Devolverla desde un endpoint evita que FastAPI vuelva a validar el
+    resultado contra `response_model`; úsese solo cuando el modelo es
+    exactamente el esquema declarado. Si la ruta negoció MessagePack o Arrow
+    el modelo se codifica directamente en ese formato.
+    """
+
+    media_type = JSON_MEDIA_TYPE
+
+    def render(self, content: BaseModel) -> bytes:
+        media_type = response_media_type.get()
+        with stage_timer().measure("serializacion"):
+            if media_type == JSON_MEDIA_TYPE:
+                return content.__pydantic_serializer__.to_json(content)
+            self.media_type = media_type
+            return ENCODERS[media_type](content.model_dump(mode="json"))
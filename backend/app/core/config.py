@@ -48,6 +48,33 @@ class Settings(BaseSettings):
         "default-src 'none'; frame-ancestors 'none'; base-uri 'none';"
     )
 
+    # Alumbrado público settings
+    ALUMBRADO_CALCULATION_ENGINE: str = "python"
+    ALUMBRADO_POOL_WORKERS: int = 4
+    ALUMBRADO_POOL_MAX_PENDING: int = 8
+    ALUMBRADO_POOL_RETRY_AFTER_SECONDS: int = 5
+    ALUMBRADO_OFFLOAD_MIN_ITEMS: int = 50000
+    ENABLE_ALUMBRADO_POOL_WARMUP: bool = True
+    ALUMBRADO_BATCH_MAX_ITEMS: int = 1000
+    ALUMBRADO_BATCH_PARALLEL_MIN_ITEMS: int = 16
+    ALUMBRADO_SWEEP_MAX_POINTS: int = 10000
+    ALUMBRADO_STREAM_MAX_LINE_BYTES: int = 65536
+    ALUMBRADO_MONTE_CARLO_MAX_SAMPLES: int = 1000000
+    ALUMBRADO_OUTAGE_MAX_RECORDS: int = 10000000
+    ENABLE_ALUMBRADO_RESULT_CACHE: bool = True
+    ALUMBRADO_CACHE_MAX_ENTRIES: int = 256
+    ALUMBRADO_CACHE_TTL_SECONDS: int = 600
+    ALUMBRADO_PARAMETERS_CACHE_TTL_SECONDS: int = 60
+    ENABLE_ALUMBRADO_PROFILING: bool = False
+    ALUMBRADO_JOB_WORKERS: int = 2
+    ALUMBRADO_JOB_MAX_ITEMS: int = 100000
+    ALUMBRADO_JOB_PROGRESS_CHUNK: int = 200
+    ALUMBRADO_JOB_LEASE_SECONDS: int = 1800
+    ALUMBRADO_JOB_POLL_SECONDS: float = 2.0
+    ALUMBRADO_JOB_MAX_ATTEMPTS: int = 3
+    ALUMBRADO_JOB_STOP_TIMEOUT_SECONDS: float = 30.0
+    ALUMBRADO_ALLOCATION_CHUNK: int = 50000
+
     @field_validator("DATABASE_URL", mode="before")
     @classmethod
     def normalize_database_url(cls, value: Any) -> str:
@@ -123,6 +150,51 @@ class Settings(BaseSettings):
             raise ValueError("Los valores de pool de base de datos no pueden ser negativos")
         return value
 
+    @field_validator("ALUMBRADO_CALCULATION_ENGINE")
+    @classmethod
+    def validate_alumbrado_engine(cls, value: str) -> str:
+        engine = value.strip().lower()
+        if engine not in {"python", "numpy"}:
+            raise ValueError("ALUMBRADO_CALCULATION_ENGINE debe ser 'python' o 'numpy'")
+        return engine
+
+    @field_validator(
+        "ALUMBRADO_POOL_WORKERS",
+        "ALUMBRADO_POOL_MAX_PENDING",
+        "ALUMBRADO_POOL_RETRY_AFTER_SECONDS",
+        "ALUMBRADO_BATCH_MAX_ITEMS",
+        "ALUMBRADO_SWEEP_MAX_POINTS",
+        "ALUMBRADO_STREAM_MAX_LINE_BYTES",
+        "ALUMBRADO_MONTE_CARLO_MAX_SAMPLES",
+        "ALUMBRADO_OUTAGE_MAX_RECORDS",
+        "ALUMBRADO_CACHE_MAX_ENTRIES",
+        "ALUMBRADO_CACHE_TTL_SECONDS",
+        "ALUMBRADO_PARAMETERS_CACHE_TTL_SECONDS",
+        "ALUMBRADO_JOB_MAX_ITEMS",
+        "ALUMBRADO_JOB_PROGRESS_CHUNK",
+        "ALUMBRADO_JOB_LEASE_SECONDS",
+        "ALUMBRADO_JOB_POLL_SECONDS",
+        "ALUMBRADO_JOB_MAX_ATTEMPTS",
+        "ALUMBRADO_JOB_STOP_TIMEOUT_SECONDS",
+        "ALUMBRADO_ALLOCATION_CHUNK",
+    )
+    @classmethod
+    def validate_alumbrado_positive_values(cls, value: int) -> int:
+        if value <= 0:
+            raise ValueError("Los parámetros de cálculo de alumbrado deben ser mayores que 0")
+        return value
+
+    @field_validator(
+        "ALUMBRADO_BATCH_PARALLEL_MIN_ITEMS",
+        "ALUMBRADO_JOB_WORKERS",
+        "ALUMBRADO_OFFLOAD_MIN_ITEMS",
+    )
+    @classmethod
+    def validate_alumbrado_non_negative_values(cls, value: int) -> int:
+        if value < 0:
+            raise ValueError("Los umbrales de cálculo de alumbrado no pueden ser negativos")
+        return value
+
     @field_validator("DEFAULT_TENANT_ID")
     @classmethod
     def validate_default_tenant(cls, value: str) -> str:
@@ -2,13 +2,29 @@ from contextlib import asynccontextmanager
 import logging
 
 import app.models  # noqa: F401
-from app.api.endpoints import alumbrado, auth, clientes, facturas, pqrs, users
+from app.api.endpoints import (
+    alumbrado,
+    alumbrado_calculos,
+    alumbrado_inventarios,
+    alumbrado_trabajos,
+    auth,
+    clientes,
+    facturas,
+    pqrs,
+    users,
+)
+from app.api.serialization import request_body_schemas
 from app.api.tenant import TENANT_HEADER_NAME, normalize_tenant_id
 from app.core.config import settings
-from app.db.database import Base, engine, get_db
+from app.db.database import Base, SessionLocal, engine, get_db
+from app.services.alumbrado_jobs import job_workers
+from app.services.alumbrado_offload import warm_offload_pool
+from app.services.alumbrado_pool import shutdown_calculation_pool
 from fastapi import FastAPI, Request, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.openapi.utils import get_openapi
 from fastapi.responses import JSONResponse
 from starlette.middleware.httpsredirect import HTTPSRedirectMiddleware
 from starlette.middleware.trustedhost import TrustedHostMiddleware
@@ -32,8 +48,17 @@ async def lifespan(_: FastAPI):
         finally:
             db.close()
 
+    if settings.ALUMBRADO_JOB_WORKERS > 0:
+        job_workers.start(SessionLocal, settings.ALUMBRADO_JOB_WORKERS)
+
+    if settings.ALUMBRADO_OFFLOAD_MIN_ITEMS > 0 and settings.ENABLE_ALUMBRADO_POOL_WARMUP:
+        warm_offload_pool()
+
     yield
 
+    job_workers.stop()
+    shutdown_calculation_pool()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -109,11 +134,33 @@ app.include_router(clientes.router, prefix=settings.API_PREFIX)
 app.include_router(facturas.router, prefix=settings.API_PREFIX)
 app.include_router(pqrs.router, prefix=settings.API_PREFIX)
 app.include_router(alumbrado.router, prefix=settings.API_PREFIX)
+app.include_router(alumbrado_calculos.router, prefix=settings.API_PREFIX)
+app.include_router(alumbrado_inventarios.router, prefix=settings.API_PREFIX)
+app.include_router(alumbrado_trabajos.router, prefix=settings.API_PREFIX)
+
+
+def custom_openapi():
+    """Agrega los esquemas de los cuerpos que se validan con `model_body`."""
+    if app.openapi_schema is None:
+        openapi_schema = get_openapi(
+            title=app.title,
+            version=app.version,
+            description=app.description,
+            routes=app.routes,
+        )
+        schemas = openapi_schema.setdefault("components", {}).setdefault("schemas", {})
+        for name, schema in request_body_schemas().items():
+            schemas.setdefault(name, schema)
+        app.openapi_schema = openapi_schema
+    return app.openapi_schema
+
+
+app.openapi = custom_openapi
 
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    content = {"detail": exc.errors()}
+    content = {"detail": jsonable_encoder(exc.errors())}
     if settings.DEBUG:
         content["body"] = exc.body
     return JSONResponse(
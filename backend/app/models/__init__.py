@@ -1,4 +1,14 @@
 
+from app.models.alumbrado import (
+    CalculoAlumbrado,
+    CargoAlumbrado,
+    InventarioAforo,
+    InventarioAlumbrado,
+    InventarioTerreno,
+    InventarioUcap,
+    ParametrosAlumbrado,
+    TrabajoAlumbrado,
+)
 from app.models.cliente import Cliente
 from app.models.factura import ConceptoFactura, Factura
 from app.models.pqr import PQR, EstadoPQR, TipoPQR
@@ -0,0 +1,293 @@
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from app.db.database import Base
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    UniqueConstraint,
+)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class CalculoAlumbrado(Base):
+    """
+    Cálculo de alumbrado persistido con su entrada y resultado.
+
+    Entrada y resultado se guardan como JSON comprimido; los totales quedan en
+    columnas para listar y comparar sin descomprimir. Las sumas por nivel sin
+    redondear se guardan aparte para recalcular solo la sección que cambia.
+    `version_parametros` es la versión de parámetros regulatorios del tenant
+    con la que se calculó. Si la entrada referencia un inventario,
+    `inventario_version` es la versión fijada de sus filas.
+    """
+    __tablename__ = "alumbrado_calculos"
+    __table_args__ = (
+        Index(
+            "ix_alumbrado_calculos_tenant_municipio_periodo",
+            "tenant_id",
+            "municipio",
+            "periodo",
+            "id",
+        ),
+        Index("ix_alumbrado_calculos_tenant_periodo", "tenant_id", "periodo", "id"),
+        Index("ix_alumbrado_calculos_tenant_hash", "tenant_id", "hash_entrada"),
+        Index("ix_alumbrado_calculos_tenant_version", "tenant_id", "version_parametros", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(
+        String(64),
+        nullable=False,
+        default="public",
+        server_default="public",
+    )
+    municipio = Column(String(200), nullable=False)
+    periodo = Column(String(32), nullable=False)
+    anno_aplicacion = Column(Integer, nullable=False)
+    hash_entrada = Column(String(64), nullable=False)
+    csee = Column(Float, nullable=False)
+    cinv = Column(Float, nullable=False)
+    caom = Column(Float, nullable=False)
+    cotr = Column(Float, nullable=False)
+    cap = Column(Float, nullable=False)
+    entrada_comprimida = Column(LargeBinary, nullable=False)
+    resultado_comprimido = Column(LargeBinary, nullable=False)
+    totales_comprimidos = Column(LargeBinary, nullable=False)
+    version_parametros = Column(Integer, nullable=False, default=0, server_default="0")
+    inventario_id = Column(Integer, ForeignKey("alumbrado_inventarios.id"), nullable=True)
+    inventario_version = Column(Integer, nullable=True)
+    fecha_creacion = Column(DateTime(timezone=True), nullable=False, default=_utcnow)
+
+    def __repr__(self):
+        return (
+            f"<CalculoAlumbrado(id={self.id}, municipio='{self.municipio}', "
+            f"periodo='{self.periodo}', cap={self.cap})>"
+        )
+
+
+class ParametrosAlumbrado(Base):
+    """
+    Versión de los parámetros regulatorios de un tenant.
+
+    Las versiones no se modifican: cada cambio inserta la siguiente completa.
+    Un tenant sin filas usa los valores del código (versión 0).
+    """
+    __tablename__ = "alumbrado_parametros"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "version", name="uq_alumbrado_parametros_tenant_version"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(
+        String(64),
+        nullable=False,
+        default="public",
+        server_default="public",
+    )
+    version = Column(Integer, nullable=False)
+    descripcion = Column(String(500), nullable=True)
+    eficacia_referencia = Column(Float, nullable=False)
+    faoms_marino = Column(Float, nullable=False)
+    faoml_por_anno = Column(Text, nullable=False)
+    faoml_minimo = Column(Float, nullable=False)
+    anno_faoml_minimo = Column(Integer, nullable=False)
+    fecha_creacion = Column(DateTime(timezone=True), nullable=False, default=_utcnow)
+
+    def __repr__(self):
+        return f"<ParametrosAlumbrado(tenant_id='{self.tenant_id}', version={self.version})>"
+
+
+class InventarioAlumbrado(Base):
+    """
+    Inventario de luminarias de un tenant, referenciable desde los cálculos.
+
+    `version` aumenta con cada cambio en sus filas; los agregados en caché se
+    identifican por (clave, versión) y nunca quedan desactualizados. `clave`
+    no se repite aunque la base reutilice el id de un inventario borrado.
+
+    Las filas no se editan en su lugar: cada cambio cierra la fila anterior
+    (`version_hasta`) y agrega una nueva (`version_desde`), así que cualquier
+    versión anterior se puede leer tal como estaba.
+    """
+    __tablename__ = "alumbrado_inventarios"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "nombre", name="uq_alumbrado_inventarios_tenant_nombre"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(
+        String(64),
+        nullable=False,
+        index=True,
+        default="public",
+        server_default="public",
+    )
+    nombre = Column(String(200), nullable=False)
+    clave = Column(String(32), nullable=False, unique=True, default=lambda: uuid4().hex)
+    version = Column(Integer, nullable=False, default=1)
+    fecha_actualizacion = Column(
+        DateTime(timezone=True), nullable=False, default=_utcnow, onupdate=_utcnow
+    )
+
+    def __repr__(self):
+        return (
+            f"<InventarioAlumbrado(id={self.id}, nombre='{self.nombre}', "
+            f"version={self.version})>"
+        )
+
+
+def _inventory_item_table_args(table_name: str) -> tuple:
+    return (
+        UniqueConstraint(
+            "inventario_id",
+            "codigo",
+            "version_desde",
+            name=f"uq_{table_name}_inventario_codigo_version",
+        ),
+        Index(f"ix_{table_name}_inventario_nivel", "inventario_id", "nivel_tension"),
+    )
+
+
+class InventarioUcap(Base):
+    """UCAP de un inventario; `codigo` identifica la fila en cargas masivas."""
+    __tablename__ = "alumbrado_inventario_ucap"
+    __table_args__ = _inventory_item_table_args(__tablename__)
+
+    id = Column(Integer, primary_key=True)
+    inventario_id = Column(
+        Integer, ForeignKey("alumbrado_inventarios.id", ondelete="CASCADE"), nullable=False
+    )
+    codigo = Column(String(64), nullable=False)
+    version_desde = Column(Integer, nullable=False, default=1)
+    version_hasta = Column(Integer, nullable=True)
+    nivel_tension = Column(Integer, nullable=False)
+    cr_i = Column(Float, nullable=False, default=0)
+    cr_l_base = Column(Float, nullable=False, default=0)
+    eficacia_lm_w = Column(Float, nullable=True)
+    vida_util_anios = Column(Integer, nullable=False)
+
+
+class InventarioTerreno(Base):
+    """Terreno de un inventario; `codigo` identifica la fila en cargas masivas."""
+    __tablename__ = "alumbrado_inventario_terrenos"
+    __table_args__ = _inventory_item_table_args(__tablename__)
+
+    id = Column(Integer, primary_key=True)
+    inventario_id = Column(
+        Integer, ForeignKey("alumbrado_inventarios.id", ondelete="CASCADE"), nullable=False
+    )
+    codigo = Column(String(64), nullable=False)
+    version_desde = Column(Integer, nullable=False, default=1)
+    version_hasta = Column(Integer, nullable=True)
+    nivel_tension = Column(Integer, nullable=False)
+    area_m2 = Column(Float, nullable=False)
+    valor_catastral_m2 = Column(Float, nullable=False)
+
+
+class InventarioAforo(Base):
+    """Aforo de un inventario; `codigo` identifica la fila en cargas masivas."""
+    __tablename__ = "alumbrado_inventario_aforos"
+    __table_args__ = _inventory_item_table_args(__tablename__)
+
+    id = Column(Integer, primary_key=True)
+    inventario_id = Column(
+        Integer, ForeignKey("alumbrado_inventarios.id", ondelete="CASCADE"), nullable=False
+    )
+    codigo = Column(String(64), nullable=False)
+    version_desde = Column(Integer, nullable=False, default=1)
+    version_hasta = Column(Integer, nullable=True)
+    nivel_tension = Column(Integer, nullable=False)
+    clase_iluminacion = Column(Integer, nullable=False)
+    carga_kw = Column(Float, nullable=False)
+    horas_diarias = Column(Float, nullable=False)
+    dias_facturacion = Column(Float, nullable=False)
+
+
+class TrabajoAlumbrado(Base):
+    """
+    Trabajo en segundo plano (cálculo, lote, recálculo o distribución) de la cola de alumbrado.
+
+    La tabla es la cola: los workers reclaman el trabajo pendiente más antiguo
+    y `fecha_actualizacion` funciona como latido. Un trabajo en proceso cuyo
+    latido vence se considera abandonado y puede reclamarse de nuevo.
+    """
+    __tablename__ = "alumbrado_trabajos"
+    __table_args__ = (
+        Index("ix_alumbrado_trabajos_estado", "estado", "id"),
+        Index("ix_alumbrado_trabajos_tenant", "tenant_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(
+        String(64),
+        nullable=False,
+        default="public",
+        server_default="public",
+    )
+    tipo = Column(String(16), nullable=False)
+    estado = Column(String(16), nullable=False, default="pendiente")
+    motor = Column(String(16), nullable=True)
+    total_items = Column(Integer, nullable=False, default=1)
+    items_procesados = Column(Integer, nullable=False, default=0)
+    intentos = Column(Integer, nullable=False, default=0)
+    entrada_comprimida = Column(LargeBinary, nullable=False)
+    resultado_comprimido = Column(LargeBinary, nullable=True)
+    error = Column(Text, nullable=True)
+    fecha_creacion = Column(DateTime(timezone=True), nullable=False, default=_utcnow)
+    fecha_inicio = Column(DateTime(timezone=True), nullable=True)
+    fecha_actualizacion = Column(DateTime(timezone=True), nullable=False, default=_utcnow)
+    fecha_fin = Column(DateTime(timezone=True), nullable=True)
+
+    @property
+    def progreso(self) -> float:
+        return round(self.items_procesados / self.total_items, 4) if self.total_items else 1.0
+
+    def __repr__(self):
+        return (
+            f"<TrabajoAlumbrado(id={self.id}, tipo='{self.tipo}', estado='{self.estado}')>"
+        )
+
+
+class CargoAlumbrado(Base):
+    """
+    Parte del CAP de un cálculo asignada a un suscriptor según su estrato.
+
+    El valor se guarda en centavos para que la suma de los cargos coincida
+    exactamente con el CAP distribuido.
+    """
+    __tablename__ = "alumbrado_cargos"
+    __table_args__ = (
+        UniqueConstraint("calculo_id", "cliente_id", name="uq_alumbrado_cargos_calculo_cliente"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    tenant_id = Column(
+        String(64),
+        nullable=False,
+        default="public",
+        server_default="public",
+    )
+    calculo_id = Column(
+        Integer, ForeignKey("alumbrado_calculos.id", ondelete="CASCADE"), nullable=False
+    )
+    cliente_id = Column(Integer, ForeignKey("clientes.id", ondelete="CASCADE"), nullable=False)
+    estrato = Column(Integer, nullable=False)
+    valor_centavos = Column(BigInteger, nullable=False)
+
+    def __repr__(self):
+        return (
+            f"<CargoAlumbrado(calculo_id={self.calculo_id}, cliente_id={self.cliente_id}, "
+            f"valor_centavos={self.valor_centavos})>"
+        )
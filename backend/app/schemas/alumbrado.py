@@ -1,13 +1,38 @@
-from typing import Optional
+from datetime import datetime
+from typing import Annotated, Literal, Optional, Union
 
 from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 
 class AforoClaseEntrada(BaseModel):
+    """Aforo con `horas_diarias` a carga plena o con el `perfil` de carga que lo describe."""
+
     clase_iluminacion: int = Field(..., ge=1, le=3)
     carga_kw: float = Field(..., gt=0)
-    horas_diarias: float = Field(..., gt=0)
+    horas_diarias: Optional[float] = Field(default=None, gt=0)
     dias_facturacion: float = Field(..., gt=0)
+    perfil: Optional[str] = Field(default=None, min_length=1, max_length=64)
+
+    @model_validator(mode="after")
+    def validate_hours_or_profile(self) -> "AforoClaseEntrada":
+        if self.horas_diarias is None and self.perfil is None:
+            raise ValueError("Cada aforo necesita horas_diarias o perfil")
+        if self.horas_diarias is not None and self.perfil is not None:
+            raise ValueError("Un aforo no puede tener horas_diarias y perfil a la vez")
+        return self
+
+
+class PerfilCargaEntrada(BaseModel):
+    """
+    Perfil horario de carga, como fracción de `carga_kw` en cada hora.
+
+    Con 24 valores es un día tipo que se repite `dias_facturacion` veces; con
+    otra longitud es la serie de todo el periodo y `dias_facturacion` no
+    aplica. Los aforos lo referencian por `nombre`.
+    """
+
+    nombre: str = Field(..., min_length=1, max_length=64)
+    factores: list[Annotated[float, Field(ge=0)]] = Field(..., min_length=24, max_length=8784)
 
 
 class EnergiaNivelEntrada(BaseModel):
@@ -95,6 +120,23 @@ class AlumbradoCalculoEntrada(BaseModel):
     cotr: COTREntrada = Field(default_factory=COTREntrada)
     actualizacion_ipp: Optional[ActualizacionIPPEntrada] = None
     usar_formulacion_mixta_cee: bool = True
+    inventario_id: Optional[int] = Field(
+        default=None,
+        gt=0,
+        description=(
+            "Inventario cuyas filas se suman a las listas de la entrada. Lo aceptan "
+            "`/calcular`, `/calculos` y los trabajos de cálculo."
+        ),
+    )
+    inventario_version: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description=(
+            "Versión del inventario cuyas filas se leen; por defecto la vigente. "
+            "`/calculos` guarda la versión usada."
+        ),
+    )
+    perfiles_carga: list[PerfilCargaEntrada] = Field(default_factory=list)
 
     @model_validator(mode="after")
     def validate_non_empty_sections(self) -> "AlumbradoCalculoEntrada":
@@ -104,9 +146,106 @@ class AlumbradoCalculoEntrada(BaseModel):
             raise ValueError("inversion_niveles no puede estar vacío")
         if not self.aom_niveles:
             raise ValueError("aom_niveles no puede estar vacío")
+        names = [perfil.nombre for perfil in self.perfiles_carga]
+        if len(set(names)) != len(names):
+            raise ValueError("Los nombres de perfiles_carga deben ser únicos")
+        if self.inventario_version is not None and self.inventario_id is None:
+            raise ValueError("inventario_version requiere inventario_id")
         return self
 
 
+NivelTension = Annotated[int, Field(ge=1, le=2)]
+NoNegativo = Annotated[float, Field(ge=0)]
+Positivo = Annotated[float, Field(gt=0)]
+
+
+class ColumnasSeccion(BaseModel):
+    """
+    Sección de entrada como arreglos paralelos, un valor por fila.
+
+    Cada columna se valida como lista de números, sin construir un objeto
+    por fila; las columnas opcionales que se omiten toman su valor por
+    defecto en todas las filas.
+    """
+
+    @model_validator(mode="after")
+    def validate_lengths(self) -> "ColumnasSeccion":
+        lengths = {len(values) for _, values in self if values is not None}
+        if len(lengths) > 1:
+            raise ValueError("Las columnas de la sección deben tener la misma longitud")
+        return self
+
+    @property
+    def filas(self) -> int:
+        return next((len(values) for _, values in self if values is not None), 0)
+
+
+class AforoColumnas(ColumnasSeccion):
+    nivel_tension: list[NivelTension]
+    clase_iluminacion: list[Annotated[int, Field(ge=1, le=3)]]
+    carga_kw: list[Positivo]
+    horas_diarias: Optional[list[Optional[Positivo]]] = None
+    dias_facturacion: list[Positivo]
+    perfil: Optional[list[Optional[Annotated[str, Field(min_length=1, max_length=64)]]]] = None
+
+
+class UcapColumnas(ColumnasSeccion):
+    nivel_tension: list[NivelTension]
+    cr_i: Optional[list[NoNegativo]] = None
+    cr_l_base: Optional[list[NoNegativo]] = None
+    eficacia_lm_w: Optional[list[Optional[Positivo]]] = None
+    vida_util_anios: list[Annotated[int, Field(gt=0)]]
+
+    @model_validator(mode="after")
+    def validate_luminous_efficacy(self) -> "UcapColumnas":
+        if not self.cr_l_base:
+            return self
+        efficacies = self.eficacia_lm_w or [None] * len(self.cr_l_base)
+        for index, (cr_l_base, efficacy) in enumerate(zip(self.cr_l_base, efficacies)):
+            if cr_l_base > 0 and efficacy is None:
+                raise ValueError(
+                    "eficacia_lm_w es obligatoria cuando cr_l_base es mayor a cero "
+                    f"(fila {index})"
+                )
+        return self
+
+
+class TerrenoColumnas(ColumnasSeccion):
+    nivel_tension: list[NivelTension]
+    area_m2: list[Positivo]
+    valor_catastral_m2: list[NoNegativo]
+
+
+class EventoDisponibilidadColumnas(ColumnasSeccion):
+    potencia_kw: list[NoNegativo]
+    horas_sin_servicio: list[NoNegativo]
+
+
+class EventoVceeiColumnas(ColumnasSeccion):
+    nivel_tension: list[NivelTension]
+    potencia_kw: list[NoNegativo]
+    horas_indisponibilidad: list[NoNegativo]
+
+
+class SeccionesColumnas(BaseModel):
+    aforos: Optional[AforoColumnas] = None
+    ucap: Optional[UcapColumnas] = None
+    terrenos: Optional[TerrenoColumnas] = None
+    eventos_disponibilidad: Optional[EventoDisponibilidadColumnas] = None
+    vceei_eventos: Optional[EventoVceeiColumnas] = None
+
+
+class AlumbradoCalculoColumnasEntrada(AlumbradoCalculoEntrada):
+    """
+    Entrada de `/calcular` con las secciones grandes en `columnas`.
+
+    Las filas de `columnas` se suman a las listas por nivel del encabezado;
+    cada sección con nivel trae la columna `nivel_tension`.
+    """
+
+    columnas: SeccionesColumnas = Field(default_factory=SeccionesColumnas)
+
+
 class EnergiaNivelResultado(BaseModel):
     nivel_tension: int
     tee: float
@@ -175,6 +314,520 @@ class AlumbradoCalculoResultado(BaseModel):
     recibo: ReciboResultado
     actualizacion_ipp: Optional[ActualizacionIPPResultado] = None
     alertas: list[str] = Field(default_factory=list)
+    version_parametros: int = 0
+
+
+class AlumbradoLoteItemResultado(BaseModel):
+    indice: int
+    resultado: Optional[AlumbradoCalculoResultado] = None
+    error: Optional[str] = None
+
+
+class AlumbradoLoteResultado(BaseModel):
+    tenant_id: str
+    total: int
+    exitosos: int
+    fallidos: int
+    resultados: list[AlumbradoLoteItemResultado]
+
+
+class AlumbradoEscenariosEntrada(BaseModel):
+    calculo: AlumbradoCalculoEntrada
+    tasas_retorno: list[float] = Field(default_factory=list)
+    annos_aplicacion: list[int] = Field(default_factory=list)
+    actualizaciones_ipp: list[ActualizacionIPPEntrada] = Field(default_factory=list)
+
+    @model_validator(mode="after")
+    def validate_grid_values(self) -> "AlumbradoEscenariosEntrada":
+        if any(rate <= 0 for rate in self.tasas_retorno):
+            raise ValueError("tasas_retorno debe contener valores mayores a cero")
+        if any(year < 2022 for year in self.annos_aplicacion):
+            raise ValueError("annos_aplicacion debe contener años desde 2022")
+        return self
+
+    @property
+    def total_escenarios(self) -> int:
+        return (
+            max(len(self.tasas_retorno), 1)
+            * max(len(self.annos_aplicacion), 1)
+            * max(len(self.actualizaciones_ipp), 1)
+        )
+
+
+class AlumbradoEscenariosResultado(BaseModel):
+    tenant_id: str
+    municipio: str
+    periodo: str
+    total_escenarios: int
+    columnas: list[str]
+    filas: list[list[Union[float, int, bool, None]]]
+
+
+class AlumbradoProyeccionEntrada(BaseModel):
+    calculo: AlumbradoCalculoEntrada
+    anno_inicio: int = Field(..., ge=2022)
+    anno_fin: int = Field(..., ge=2022)
+    actualizaciones_ipp: dict[int, ActualizacionIPPEntrada] = Field(default_factory=dict)
+
+    @model_validator(mode="after")
+    def validate_year_range(self) -> "AlumbradoProyeccionEntrada":
+        if self.anno_fin < self.anno_inicio:
+            raise ValueError("anno_fin debe ser mayor o igual a anno_inicio")
+        return self
+
+    @property
+    def total_annos(self) -> int:
+        return self.anno_fin - self.anno_inicio + 1
+
+
+class AlumbradoProyeccionAnno(BaseModel):
+    anno_aplicacion: int
+    faoml: float
+    csee: float
+    cinv: float
+    caom: float
+    cotr: float
+    cap: float
+    factor_ipp: Optional[float] = None
+    cap_actualizado: Optional[float] = None
+    cumple_tope_ambiental: bool
+
+
+class AlumbradoProyeccionResultado(BaseModel):
+    tenant_id: str
+    municipio: str
+    periodo: str
+    tasa_retorno: float
+    annos: list[AlumbradoProyeccionAnno]
+
+
+class DistribucionEntrada(BaseModel):
+    """
+    Distribución de un campo de entrada para el análisis Monte Carlo.
+
+    `tee` y `cee_medido_kwh` se muestrean por nivel; los campos `factor_*`
+    multiplican las sumas de aforos o de horas de indisponibilidad.
+    """
+
+    campo: Literal[
+        "tee",
+        "cee_medido_kwh",
+        "factor_carga_aforos",
+        "factor_horas_indisponibilidad",
+        "factor_horas_vceei",
+        "tasa_retorno",
+    ]
+    nivel_tension: Optional[int] = Field(default=None, ge=1, le=2)
+    tipo: Literal["normal", "uniforme", "triangular"]
+    media: Optional[float] = None
+    desviacion: Optional[float] = Field(default=None, ge=0)
+    minimo: Optional[float] = None
+    moda: Optional[float] = None
+    maximo: Optional[float] = None
+
+    @model_validator(mode="after")
+    def validate_parameters(self) -> "DistribucionEntrada":
+        per_level = self.campo in {
+            "tee",
+            "cee_medido_kwh",
+            "factor_carga_aforos",
+            "factor_horas_vceei",
+        }
+        if per_level and self.nivel_tension is None:
+            raise ValueError(f"{self.campo} requiere nivel_tension")
+        if not per_level and self.nivel_tension is not None:
+            raise ValueError(f"{self.campo} no admite nivel_tension")
+
+        if self.tipo == "normal":
+            if self.media is None or self.desviacion is None:
+                raise ValueError("La distribución normal requiere media y desviacion")
+        elif self.minimo is None or self.maximo is None or self.minimo > self.maximo:
+            raise ValueError(f"La distribución {self.tipo} requiere minimo <= maximo")
+        elif self.tipo == "triangular" and (
+            self.moda is None or not self.minimo <= self.moda <= self.maximo
+        ):
+            raise ValueError("La distribución triangular requiere minimo <= moda <= maximo")
+        return self
+
+
+class AlumbradoMonteCarloEntrada(BaseModel):
+    calculo: AlumbradoCalculoEntrada
+    distribuciones: list[DistribucionEntrada] = Field(..., min_length=1)
+    muestras: int = Field(default=10000, ge=1)
+    semilla: Optional[int] = Field(default=None, ge=0)
+    percentiles: list[float] = Field(default_factory=lambda: [5.0, 50.0, 95.0])
+
+    @model_validator(mode="after")
+    def validate_unique_distributions(self) -> "AlumbradoMonteCarloEntrada":
+        keys = [(item.campo, item.nivel_tension) for item in self.distribuciones]
+        if len(keys) != len(set(keys)):
+            raise ValueError("Cada campo y nivel de tensión admite una sola distribución")
+        if any(not 0 <= value <= 100 for value in self.percentiles):
+            raise ValueError("percentiles debe contener valores entre 0 y 100")
+        return self
+
+
+class AlumbradoMonteCarloComponente(BaseModel):
+    media: float
+    desviacion: float
+    percentiles: list[float]
+
+
+class AlumbradoMonteCarloResultado(BaseModel):
+    tenant_id: str
+    municipio: str
+    periodo: str
+    muestras: int
+    semilla: int
+    percentiles: list[float]
+    componentes: dict[str, AlumbradoMonteCarloComponente]
+    fraccion_cumple_tope_ambiental: float
+
+
+class AforoLinea(AforoClaseEntrada):
+    seccion: Literal["aforo"]
+    nivel_tension: int = Field(..., ge=1, le=2)
+
+
+class UcapLinea(UcapEntrada):
+    seccion: Literal["ucap"]
+    nivel_tension: int = Field(..., ge=1, le=2)
+
+
+class TerrenoLinea(TerrenoEntrada):
+    seccion: Literal["terreno"]
+    nivel_tension: int = Field(..., ge=1, le=2)
+
+
+class EventoDisponibilidadLinea(EventoDisponibilidadEntrada):
+    seccion: Literal["evento_disponibilidad"]
+
+
+class EventoVceeiLinea(EventoVceeiEntrada):
+    seccion: Literal["vceei_evento"]
+    nivel_tension: int = Field(..., ge=1, le=2)
+
+
+# Una línea NDJSON después del encabezado; `seccion` decide el esquema.
+AlumbradoFlujoLinea = Annotated[
+    Union[AforoLinea, UcapLinea, TerrenoLinea, EventoDisponibilidadLinea, EventoVceeiLinea],
+    Field(discriminator="seccion"),
+]
+
+
+class InterrupcionesNivelResultado(BaseModel):
+    nivel_tension: int
+    vceei_eventos: list[EventoVceeiEntrada]
+    vceei_kw_h: float
+
+
+class AlumbradoInterrupcionesResultado(BaseModel):
+    """Eventos para `disponibilidad.eventos` y `vceei_eventos`, uno por circuito y potencia."""
+
+    registros: int
+    interrupciones: int
+    circuitos: int
+    indisponibilidad_kw_h: float
+    eventos_disponibilidad: list[EventoDisponibilidadEntrada]
+    niveles: list[InterrupcionesNivelResultado]
+
+
+class InventarioErrorFila(BaseModel):
+    seccion: str
+    fila: int
+    columna: str
+    mensaje: str
+
+
+class CalculoAlumbradoResumen(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    tenant_id: str
+    municipio: str
+    periodo: str
+    anno_aplicacion: int
+    hash_entrada: str
+    csee: float
+    cinv: float
+    caom: float
+    cotr: float
+    cap: float
+    version_parametros: int
+    inventario_id: Optional[int] = None
+    inventario_version: Optional[int] = None
+    fecha_creacion: datetime
+
+
+class CalculoAlumbradoGuardado(CalculoAlumbradoResumen):
+    resultado: AlumbradoCalculoResultado
+
+
+class CalculoAlumbradoPagina(BaseModel):
+    items: list[CalculoAlumbradoResumen]
+    siguiente_cursor: Optional[str] = None
+
+
+class AgregarVceeiEventosEntrada(BaseModel):
+    nivel_tension: int = Field(..., ge=1, le=2)
+    eventos: list[EventoVceeiEntrada] = Field(..., min_length=1)
+
+
+class CalculoAlumbradoParche(BaseModel):
+    """Cambio sobre una sola sección de un cálculo guardado."""
+
+    energia_nivel: Optional[EnergiaNivelEntrada] = None
+    inversion_nivel: Optional[InversionNivelEntrada] = None
+    aom_nivel: Optional[AOMNivelEntrada] = None
+    disponibilidad: Optional[DisponibilidadEntrada] = None
+    agregar_vceei_eventos: Optional[AgregarVceeiEventosEntrada] = None
+
+    @model_validator(mode="after")
+    def validate_single_section(self) -> "CalculoAlumbradoParche":
+        if len(self.model_fields_set) != 1 or None in self.model_dump(
+            exclude_unset=True
+        ).values():
+            raise ValueError("El parche debe modificar exactamente una sección")
+        return self
+
+
+class CalculoAlumbradoDelta(BaseModel):
+    componentes_afectados: list[str]
+    id_disponibilidad: float
+    csee: float
+    cinv: float
+    caom: float
+    cap: float
+
+
+class CalculoAlumbradoParcheResultado(CalculoAlumbradoGuardado):
+    delta: CalculoAlumbradoDelta
+
+
+class AlumbradoVariacion(BaseModel):
+    base: float
+    comparado: float
+    delta: float
+    variacion_porcentual: Optional[float] = None
+
+
+class AlumbradoComparacionNivel(BaseModel):
+    nivel_tension: int
+    csee_n: AlumbradoVariacion
+    cinv_n: AlumbradoVariacion
+    caom_n: AlumbradoVariacion
+    vceei_n: AlumbradoVariacion
+
+
+class CalculoAlumbradoReferencia(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    municipio: str
+    periodo: str
+
+
+class AlumbradoComparacion(BaseModel):
+    """Diferencias de `comparado` frente a `base`; sin variación porcentual si la base es 0."""
+
+    base: CalculoAlumbradoReferencia
+    comparado: CalculoAlumbradoReferencia
+    componentes: dict[str, AlumbradoVariacion]
+    niveles: list[AlumbradoComparacionNivel]
+
+
+class AlumbradoComparacionPeriodos(BaseModel):
+    tenant_id: str
+    municipio: Optional[str] = None
+    periodo_desde: Optional[str] = None
+    periodo_hasta: Optional[str] = None
+    comparaciones: list[AlumbradoComparacion]
+
+
+class InventarioAlumbradoCrear(BaseModel):
+    nombre: str = Field(..., min_length=2, max_length=200)
+
+
+class InventarioAlumbrado(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    tenant_id: str
+    nombre: str
+    version: int
+    fecha_actualizacion: datetime
+
+
+class InventarioAlumbradoDetalle(InventarioAlumbrado):
+    filas: dict[str, int]
+
+
+class InventarioUcapFila(UcapEntrada):
+    model_config = ConfigDict(from_attributes=True)
+
+    codigo: str = Field(..., min_length=1, max_length=64)
+    nivel_tension: int = Field(..., ge=1, le=2)
+
+
+class InventarioTerrenoFila(TerrenoEntrada):
+    model_config = ConfigDict(from_attributes=True)
+
+    codigo: str = Field(..., min_length=1, max_length=64)
+    nivel_tension: int = Field(..., ge=1, le=2)
+
+
+class InventarioAforoFila(AforoClaseEntrada):
+    """Los inventarios guardan horas a carga plena; los perfiles solo viajan en la entrada."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    codigo: str = Field(..., min_length=1, max_length=64)
+    nivel_tension: int = Field(..., ge=1, le=2)
+    horas_diarias: float = Field(..., gt=0)
+    perfil: None = Field(default=None, exclude=True)
+
+
+class InventarioCargaResultado(BaseModel):
+    inventario_id: int
+    version: int
+    insertadas: int
+    actualizadas: int
+
+
+class TrabajoAlumbrado(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    tenant_id: str
+    tipo: Literal["calculo", "lote", "recalculo", "distribucion"]
+    estado: Literal["pendiente", "en_proceso", "completado", "fallido"]
+    motor: Optional[str] = None
+    total_items: int
+    items_procesados: int
+    progreso: float
+    intentos: int
+    error: Optional[str] = None
+    fecha_creacion: datetime
+    fecha_inicio: Optional[datetime] = None
+    fecha_actualizacion: datetime
+    fecha_fin: Optional[datetime] = None
+
+
+class ParametrosRegulatoriosEntrada(BaseModel):
+    """Cambios de una nueva versión; lo omitido conserva el valor de la versión vigente."""
+
+    descripcion: Optional[str] = Field(default=None, max_length=500)
+    eficacia_referencia: Optional[Positivo] = None
+    faoms_marino: Optional[NoNegativo] = None
+    faoml_por_anno: dict[int, NoNegativo] = Field(default_factory=dict)
+    faoml_minimo: Optional[NoNegativo] = None
+    anno_faoml_minimo: Optional[int] = Field(default=None, ge=2022)
+
+    @model_validator(mode="after")
+    def validate_years(self) -> "ParametrosRegulatoriosEntrada":
+        if any(year < 2022 for year in self.faoml_por_anno):
+            raise ValueError("faoml_por_anno solo admite años desde 2022")
+        return self
+
+
+class ParametrosRegulatorios(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    version: int
+    descripcion: Optional[str] = None
+    eficacia_referencia: float
+    faoms_marino: float
+    faoml_por_anno: dict[int, float]
+    faoml_minimo: float
+    anno_faoml_minimo: int
+    fecha_creacion: Optional[datetime] = None
+
+
+class RecalculoDiferencia(BaseModel):
+    """Cambio de un cálculo guardado; sin `delta` si no se pudo recalcular."""
+
+    calculo_id: int
+    municipio: str
+    periodo: str
+    version_anterior: int
+    cap_anterior: float
+    cap_nuevo: Optional[float] = None
+    delta: Optional[CalculoAlumbradoDelta] = None
+    error: Optional[str] = None
+
+
+class AlumbradoRecalculoResultado(BaseModel):
+    """
+    Reporte de un recálculo por cambio de parámetros.
+
+    `diferencias` solo lista los cálculos que cambiaron o fallaron;
+    `ultimo_calculo_id` es hasta dónde se revisó, por orden de id.
+    """
+
+    tenant_id: str
+    version_parametros: int
+    revisados: int = 0
+    actualizados: int = 0
+    sin_cambios: int = 0
+    fallidos: int = 0
+    ultimo_calculo_id: int = 0
+    diferencias: list[RecalculoDiferencia] = Field(default_factory=list)
+
+
+class DistribucionAlumbradoEntrada(BaseModel):
+    """
+    Distribución del CAP de un cálculo guardado entre los clientes del tenant.
+
+    Cada cliente paga en proporción al peso de su estrato; todos los estratos
+    con clientes deben tener peso.
+    """
+
+    calculo_id: int = Field(..., ge=1)
+    pesos: dict[int, NoNegativo] = Field(..., min_length=1)
+
+    @model_validator(mode="after")
+    def validate_weights(self) -> "DistribucionAlumbradoEntrada":
+        if not any(self.pesos.values()):
+            raise ValueError("Al menos un estrato debe tener peso mayor que cero")
+        return self
+
+
+class DistribucionEstrato(BaseModel):
+    """
+    Cargos de un estrato. `valor_exacto` es la parte sin redondear; los
+    primeros `suscriptores_con_ajuste` por id pagan un centavo más que
+    `valor_base` para que la suma cuadre con el CAP.
+    """
+
+    estrato: int
+    peso: float
+    suscriptores: int
+    valor_exacto: float
+    valor_base: float
+    suscriptores_con_ajuste: int
+    total: float
+
+
+class AlumbradoDistribucionResultado(BaseModel):
+    tenant_id: str
+    calculo_id: int
+    cap: float
+    suscriptores: int
+    total_distribuido: float
+    estratos: list[DistribucionEstrato]
+
+
+class CargoAlumbrado(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    cliente_id: int
+    estrato: int
+    valor: float
+
+
+class CargoAlumbradoPagina(BaseModel):
+    items: list[CargoAlumbrado]
+    siguiente_cliente_id: Optional[int] = None
 
 
 class ReciboSimpleMetadataEntrada(BaseModel):
@@ -202,9 +855,25 @@ class ReciboSimpleDesdePlantillaEntrada(BaseModel):
 
 
 class ReciboSimpleDesdeCalculoEntrada(BaseModel):
-    calculo: AlumbradoCalculoEntrada
+    """
+    Recibo a partir de un cálculo: la entrada completa o una referencia.
+
+    `calculo_id` apunta al historial de cálculos y `hash_calculo` al hash de
+    contenido (el ETag de `/calcular`); con una referencia no se recalcula.
+    """
+
+    calculo: Optional[AlumbradoCalculoEntrada] = None
+    calculo_id: Optional[int] = Field(default=None, ge=1)
+    hash_calculo: Optional[str] = Field(default=None, pattern="^[0-9a-f]{64}$")
     metadata: ReciboSimpleMetadataEntrada = Field(default_factory=ReciboSimpleMetadataEntrada)
 
+    @model_validator(mode="after")
+    def validate_single_source(self) -> "ReciboSimpleDesdeCalculoEntrada":
+        sources = [self.calculo, self.calculo_id, self.hash_calculo]
+        if sum(source is not None for source in sources) != 1:
+            raise ValueError("Indique exactamente uno de calculo, calculo_id o hash_calculo")
+        return self
+
 
 class ReciboSimpleResultado(BaseModel):
     numero_recibo: str
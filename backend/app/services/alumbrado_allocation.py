@@ -0,0 +1,237 @@
+import math
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+from fractions import Fraction
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.alumbrado import CalculoAlumbrado, CargoAlumbrado
+from app.models.cliente import Cliente
+from app.schemas import alumbrado as schemas
+
+
+@dataclass(frozen=True)
+class EstratoShare:
+    """
+    Parte de cada suscriptor de un estrato, en centavos.
+
+    `exact` es la parte sin redondear; los primeros `extra` suscriptores del
+    estrato, por id, pagan `base + 1`.
+    """
+
+    estrato: int
+    weight: float
+    subscribers: int
+    exact: Fraction
+    base: int
+    extra: int
+
+    @property
+    def total(self) -> int:
+        return self.base * self.subscribers + self.extra
+
+
+def to_centavos(value: float) -> int:
+    return int((Decimal(str(value)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def plan_allocation(
+    total_centavos: int, subscribers: dict[int, int], weights: dict[int, float]
+) -> dict[int, EstratoShare]:
+    """
+    Reparte `total_centavos` entre estratos por peso y número de suscriptores.
+
+    Cada suscriptor recibe el piso de su parte exacta; el residuo se asigna
+    de a un centavo por el método del mayor residuo, empezando por el estrato
+    cuya parte tiene la mayor fracción. Con aritmética exacta la suma de los
+    cargos es siempre `total_centavos` y ningún cargo se aparta más de un
+    centavo de su parte exacta.
+    """
+    exact_weights = {estrato: Fraction(weights[estrato]) for estrato in subscribers}
+    total_weight = sum(exact_weights[estrato] * count for estrato, count in subscribers.items())
+    if total_weight == 0:
+        raise ValueError("Los estratos con clientes deben tener al menos un peso mayor que cero")
+
+    exact = {
+        estrato: total_centavos * exact_weights[estrato] / total_weight for estrato in subscribers
+    }
+    base = {estrato: math.floor(share) for estrato, share in exact.items()}
+    residue = total_centavos - sum(base[estrato] * count for estrato, count in subscribers.items())
+    shares = {}
+    for estrato in sorted(subscribers, key=lambda key: (base[key] - exact[key], key)):
+        extra = min(subscribers[estrato], residue)
+        residue -= extra
+        shares[estrato] = EstratoShare(
+            estrato=estrato,
+            weight=weights[estrato],
+            subscribers=subscribers[estrato],
+            exact=exact[estrato],
+            base=base[estrato],
+            extra=extra,
+        )
+    return shares
+
+
+def allocate_chunk(
+    estratos: np.ndarray, shares: dict[int, EstratoShare], assigned: dict[int, int]
+) -> np.ndarray:
+    """
+    Cargos en centavos de un bloque de suscriptores ordenado por id.
+
+    `assigned` lleva cuántos suscriptores de cada estrato se cargaron en
+    bloques anteriores, para saber quiénes reciben el centavo de ajuste.
+    """
+    values = np.empty(len(estratos), dtype=np.int64)
+    for estrato in np.unique(estratos).tolist():
+        share = shares.get(estrato)
+        if share is None:
+            raise KeyError(estrato)
+        mask = estratos == estrato
+        ranks = assigned[estrato] + np.arange(np.count_nonzero(mask))
+        values[mask] = share.base + (ranks < share.extra)
+        assigned[estrato] += len(ranks)
+    return values
+
+
+def count_subscribers(db: Session, tenant_id: str) -> dict[int | None, int]:
+    return dict(
+        db.query(Cliente.estrato, func.count(Cliente.id))
+        .filter(Cliente.tenant_id == tenant_id)
+        .group_by(Cliente.estrato)
+        .all()
+    )
+
+
+def _client_chunks(db: Session, tenant_id: str, size: int) -> Iterator[list[tuple[int, int]]]:
+    """
+    Clientes del tenant en bloques de `size`, en orden de id.
+
+    Cada bloque es una consulta propia paginada por id (`id > último`), sin
+    un cursor abierto entre bloques, así que quien consume puede confirmar
+    la transacción entre uno y otro.
+    """
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(Cliente.id, Cliente.estrato)
+            .where(Cliente.tenant_id == tenant_id, Cliente.id > last_id)
+            .order_by(Cliente.id)
+            .limit(size)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def _changed_during_allocation(db: Session, calculo: CalculoAlumbrado) -> ValueError:
+    db.rollback()
+    db.execute(delete(CargoAlumbrado).where(CargoAlumbrado.calculo_id == calculo.id))
+    return ValueError("Los clientes del tenant cambiaron durante la distribución; reintente")
+
+
+def allocate_cap(
+    db: Session,
+    tenant_id: str,
+    calculo: CalculoAlumbrado,
+    weights: dict[int, float],
+    on_partition: Callable[[int], None] | None = None,
+) -> schemas.AlumbradoDistribucionResultado:
+    """
+    Distribuye el CAP de un cálculo guardado entre los clientes del tenant.
+
+    Reemplaza los cargos anteriores del cálculo sin confirmar la transacción:
+    quien llama decide cuándo guardar los cargos. Los clientes se leen en
+    orden de id en bloques de `ALUMBRADO_ALLOCATION_CHUNK` filas paginados
+    por id; cada bloque se calcula por estrato con numpy y se inserta en una
+    sola sentencia, así que la memoria no depende del número de clientes.
+    Tras insertar cada bloque se llama a `on_partition` con los clientes
+    cargados hasta ese momento, que puede confirmar la transacción. Si los
+    clientes cambian durante la distribución se descartan los cargos del
+    cálculo, también los de bloques ya confirmados.
+    """
+    subscribers = count_subscribers(db, tenant_id)
+    if not subscribers:
+        raise ValueError("El tenant no tiene clientes para distribuir el CAP")
+    missing = [estrato for estrato in subscribers if estrato not in weights]
+    if missing:
+        labels = sorted("sin estrato" if estrato is None else str(estrato) for estrato in missing)
+        raise ValueError(f"Faltan pesos para los estratos: {', '.join(labels)}")
+
+    shares = plan_allocation(to_centavos(calculo.cap), subscribers, weights)
+    assigned = dict.fromkeys(shares, 0)
+    db.execute(delete(CargoAlumbrado).where(CargoAlumbrado.calculo_id == calculo.id))
+    # Inserción de Core: evita el procesamiento por fila de la inserción masiva del ORM.
+    insert_charges = insert(CargoAlumbrado.__table__).values(
+        tenant_id=tenant_id, calculo_id=calculo.id
+    )
+    for rows in _client_chunks(db, tenant_id, settings.ALUMBRADO_ALLOCATION_CHUNK):
+        client_ids, estratos = zip(*rows)
+        try:
+            # Un estrato nulo o sin plan indica un cliente creado o editado tras el conteo.
+            values = allocate_chunk(np.array(estratos, dtype=np.int64), shares, assigned)
+        except (TypeError, KeyError):
+            raise _changed_during_allocation(db, calculo) from None
+        db.execute(
+            insert_charges,
+            [
+                {"cliente_id": cliente_id, "estrato": estrato, "valor_centavos": valor}
+                for cliente_id, estrato, valor in zip(client_ids, estratos, values.tolist())
+            ],
+        )
+        if on_partition is not None:
+            on_partition(sum(assigned.values()))
+    if assigned != subscribers:
+        raise _changed_during_allocation(db, calculo)
+
+    ordered = [shares[estrato] for estrato in sorted(shares)]
+    return schemas.AlumbradoDistribucionResultado(
+        tenant_id=tenant_id,
+        calculo_id=calculo.id,
+        cap=calculo.cap,
+        suscriptores=sum(subscribers.values()),
+        total_distribuido=sum(share.total for share in ordered) / 100,
+        estratos=[
+            schemas.DistribucionEstrato(
+                estrato=share.estrato,
+                peso=share.weight,
+                suscriptores=share.subscribers,
+                valor_exacto=float(share.exact) / 100,
+                valor_base=share.base / 100,
+                suscriptores_con_ajuste=share.extra,
+                total=share.total / 100,
+            )
+            for share in ordered
+        ],
+    )
+
+
+def list_charges(
+    db: Session,
+    tenant_id: str,
+    calculo_id: int,
+    after_cliente_id: int = 0,
+    limit: int = 500,
+    estrato: int | None = None,
+) -> tuple[list[schemas.CargoAlumbrado], int | None]:
+    """Cargos de un cálculo por cliente, paginados por id de cliente."""
+    query = db.query(CargoAlumbrado).filter(
+        CargoAlumbrado.tenant_id == tenant_id,
+        CargoAlumbrado.calculo_id == calculo_id,
+        CargoAlumbrado.cliente_id > after_cliente_id,
+    )
+    if estrato is not None:
+        query = query.filter(CargoAlumbrado.estrato == estrato)
+    rows = query.order_by(CargoAlumbrado.cliente_id).limit(limit + 1).all()
+    items = [
+        schemas.CargoAlumbrado(
+            cliente_id=row.cliente_id, estrato=row.estrato, valor=row.valor_centavos / 100
+        )
+        for row in rows[:limit]
+    ]
+    next_cliente_id = rows[limit - 1].cliente_id if len(rows) > limit else None
+    return items, next_cliente_id
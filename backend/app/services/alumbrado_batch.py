@@ -0,0 +1,115 @@
+import math
+from typing import Any
+
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.schemas import alumbrado as schemas
+from app.services.alumbrado_calculator import (
+    DEFAULT_PARAMETERS,
+    RegulatoryParameters,
+    calculate_alumbrado_costs,
+)
+from app.services.alumbrado_pool import PoolSaturatedError, submit_calculation
+
+
+def format_validation_error(exc: ValidationError) -> str:
+    messages = []
+    for error in exc.errors(include_url=False):
+        location = ".".join(str(part) for part in error["loc"])
+        messages.append(f"{location}: {error['msg']}" if location else error["msg"])
+    return "; ".join(messages)
+
+
+def _calculate_item(
+    raw_payload: dict[str, Any],
+    tenant_id: str,
+    engine: str | None,
+    parameters: RegulatoryParameters,
+) -> tuple[schemas.AlumbradoCalculoResultado | None, str | None]:
+    try:
+        payload = schemas.AlumbradoCalculoEntrada.model_validate(raw_payload)
+        result = calculate_alumbrado_costs(
+            payload=payload, tenant_id=tenant_id, engine=engine, parameters=parameters
+        )
+        return result, None
+    except ValidationError as exc:
+        return None, format_validation_error(exc)
+    except ValueError as exc:
+        return None, str(exc)
+
+
+def _calculate_chunk(
+    raw_payloads: list[dict[str, Any]],
+    tenant_id: str,
+    engine: str,
+    parameters: RegulatoryParameters,
+) -> list[tuple[schemas.AlumbradoCalculoResultado | None, str | None]]:
+    return [
+        _calculate_item(raw_payload, tenant_id, engine, parameters)
+        for raw_payload in raw_payloads
+    ]
+
+
+def calculate_alumbrado_batch(
+    raw_payloads: list[dict[str, Any]],
+    tenant_id: str,
+    engine: str | None = None,
+    parameters: RegulatoryParameters = DEFAULT_PARAMETERS,
+    inline_when_saturated: bool = False,
+) -> schemas.AlumbradoLoteResultado:
+    """
+    Calcula un lote de entradas conservando el orden original.
+
+    La validación y el cálculo de cada ítem ocurren dentro del worker, de modo
+    que un ítem inválido solo se reporta como error sin afectar al resto.
+    Lotes pequeños se resuelven en el hilo actual para evitar el costo de IPC.
+    Los bloques se envían con `submit_calculation` y cuentan para
+    `ALUMBRADO_POOL_MAX_PENDING`: si el pool se satura se cancelan los
+    bloques enviados y se lanza `PoolSaturatedError`, o con
+    `inline_when_saturated` los bloques restantes se calculan en el hilo
+    actual.
+    """
+    # El motor se resuelve aquí para que los workers no dependan de su propia configuración.
+    engine = engine or settings.ALUMBRADO_CALCULATION_ENGINE
+    if len(raw_payloads) < max(settings.ALUMBRADO_BATCH_PARALLEL_MIN_ITEMS, 2):
+        outcomes = _calculate_chunk(raw_payloads, tenant_id, engine, parameters)
+    else:
+        chunk_size = max(
+            1,
+            math.ceil(len(raw_payloads) / (settings.ALUMBRADO_POOL_WORKERS * 4)),
+        )
+        chunks = [
+            raw_payloads[start : start + chunk_size]
+            for start in range(0, len(raw_payloads), chunk_size)
+        ]
+        futures = []
+        try:
+            for chunk in chunks:
+                futures.append(
+                    submit_calculation(_calculate_chunk, chunk, tenant_id, engine, parameters)
+                )
+        except PoolSaturatedError:
+            if not inline_when_saturated:
+                for future in futures:
+                    future.cancel()
+                raise
+        remaining = [
+            outcome
+            for chunk in chunks[len(futures) :]
+            for outcome in _calculate_chunk(chunk, tenant_id, engine, parameters)
+        ]
+        outcomes = [outcome for future in futures for outcome in future.result()] + remaining
+
+    items = [
+        schemas.AlumbradoLoteItemResultado(indice=index, resultado=result, error=error)
+        for index, (result, error) in enumerate(outcomes)
+    ]
+    failed = sum(1 for item in items if item.error is not None)
+    return schemas.AlumbradoLoteResultado(
+        tenant_id=tenant_id,
+        total=len(items),
+        exitosos=len(items) - failed,
+        fallidos=failed,
+        resultados=items,
+    )
@@ -0,0 +1,234 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future
+from threading import Lock
+from typing import Any
+
+from app.core.config import settings
+from app.schemas import alumbrado as schemas
+from app.services.alumbrado_calculator import (
+    DEFAULT_PARAMETERS,
+    RegulatoryParameters,
+    SectionTotals,
+    calculate_alumbrado_costs,
+)
+
+
+def calculation_hash(
+    payload: schemas.AlumbradoCalculoEntrada,
+    tenant_id: str,
+    inventory_key: str | None = None,
+    parameters_version: int = 0,
+) -> str:
+    """
+    Hash canónico de una entrada validada dentro de un tenant.
+
+    `model_dump_json` serializa los campos en el orden del esquema y con los
+    valores por defecto ya aplicados, así que dos cuerpos equivalentes
+    (distinto orden de claves, defaults omitidos) producen el mismo hash.
+    Con un inventario referenciado, su clave y su versión (`inventory_key`)
+    también forman parte del hash, igual que la versión de parámetros
+    regulatorios cuando no es la 0.
+    """
+    return payload_json_hash(
+        payload.model_dump_json().encode(), tenant_id, inventory_key, parameters_version
+    )
+
+
+def payload_json_hash(
+    payload_json: bytes,
+    tenant_id: str,
+    inventory_key: str | None = None,
+    parameters_version: int = 0,
+) -> str:
+    """`calculation_hash` sobre el JSON canónico ya serializado, como el que se guarda."""
+    digest = hashlib.sha256()
+    digest.update(tenant_id.encode())
+    digest.update(b"\n")
+    digest.update(payload_json)
+    if inventory_key is not None:
+        digest.update(f"\ninventario:{inventory_key}".encode())
+    if parameters_version:
+        digest.update(f"\nparametros:{parameters_version}".encode())
+    return digest.hexdigest()
+
+
+def etag_for(content_hash: str) -> str:
+    return f'"{content_hash}"'
+
+
+def etag_matches(if_none_match: str | None, content_hash: str) -> bool:
+    if not if_none_match:
+        return False
+    etag = etag_for(content_hash)
+    candidates = {candidate.strip() for candidate in if_none_match.split(",")}
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+class CalculationCache:
+    """
+    Caché LRU con expiración para resultados de cálculo.
+
+    Las solicitudes concurrentes con la misma clave se agrupan: solo la
+    primera calcula y las demás esperan su resultado (o su excepción). Cada
+    entrada puede llevar un grupo (por ejemplo, el inventario del que
+    depende) para invalidar juntas todas sus entradas.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, Any, str | None]] = OrderedDict()
+        self._inflight: dict[str, Future] = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_compute(
+        self, key: str, compute: Callable[[], Any], group: str | None = None
+    ) -> Any:
+        found, value, future, leader = self._claim(key)
+        if found:
+            return value
+        if not leader:
+            return future.result()
+        try:
+            value = compute()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(value)
+            self.put(key, value, group)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def get_or_compute_async(
+        self, key: str, compute: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Como `get_or_compute`, pero las solicitudes agrupadas esperan sin ocupar un hilo."""
+        found, value, future, leader = self._claim(key)
+        if found:
+            return value
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            value = await compute()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(value)
+            self.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _claim(self, key: str) -> tuple[bool, Any, Future | None, bool]:
+        """Valor vigente de `key` o el futuro del cálculo en curso y si quien llama calcula."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value, _ = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value, None, False
+                del self._entries[key]
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return False, None, future, False
+            future = self._inflight[key] = Future()
+            self.misses += 1
+            return False, None, future, True
+
+    def put(self, key: str, value: Any, group: str | None = None) -> None:
+        """Guarda un valor calculado por otra vía, sin contarlo como fallo."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value, group)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def peek(self, key: str) -> Any | None:
+        """Devuelve el valor vigente de `key` sin calcularlo."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_group(self, group: str) -> None:
+        """Descarta todas las entradas guardadas con `group`."""
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[2] == group]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.coalesced = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "habilitada": settings.ENABLE_ALUMBRADO_RESULT_CACHE,
+                "entradas": len(self._entries),
+                "max_entradas": self.max_entries,
+                "ttl_segundos": self.ttl_seconds,
+                "aciertos": self.hits,
+                "fallos": self.misses,
+                "agrupadas": self.coalesced,
+                "en_curso": len(self._inflight),
+            }
+
+
+calculation_cache = CalculationCache(
+    max_entries=settings.ALUMBRADO_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ALUMBRADO_CACHE_TTL_SECONDS,
+)
+
+
+def calculate_with_cache(
+    payload: schemas.AlumbradoCalculoEntrada,
+    tenant_id: str,
+    engine: str | None = None,
+    content_hash: str | None = None,
+    inventory_totals: SectionTotals | None = None,
+    parameters: RegulatoryParameters = DEFAULT_PARAMETERS,
+    group: str | None = None,
+) -> schemas.AlumbradoCalculoResultado:
+    def compute() -> schemas.AlumbradoCalculoResultado:
+        return calculate_alumbrado_costs(
+            payload=payload,
+            tenant_id=tenant_id,
+            engine=engine,
+            inventory_totals=inventory_totals,
+            parameters=parameters,
+        )
+
+    if not settings.ENABLE_ALUMBRADO_RESULT_CACHE:
+        return compute()
+    return calculation_cache.get_or_compute(
+        content_hash
+        or calculation_hash(payload, tenant_id, parameters_version=parameters.version),
+        compute,
+        group,
+    )
@@ -1,7 +1,17 @@
 import re
-from collections.abc import Iterable
+from collections import Counter
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass
+from functools import lru_cache
+from operator import attrgetter
+from typing import NamedTuple
 
+import numpy as np
+
+from app.core.config import settings
 from app.schemas import alumbrado as schemas
+from app.services import alumbrado_vectorized as vectorized
+from app.services.alumbrado_profiling import stage_timer
 
 METODOLOGIA = "CREG 101 013 de 2022"
 EFICACIA_REFERENCIA = 130.0
@@ -18,17 +28,48 @@ FAOML_BY_YEAR = {
 FAOML_MIN_2028 = 0.063
 
 
+@dataclass(frozen=True)
+class RegulatoryParameters:
+    """
+    Parámetros regulatorios con los que se evalúa un cálculo.
+
+    La versión 0 son los valores de la resolución incluidos en el código; las
+    versiones siguientes las publica cada tenant en `alumbrado_parametros`.
+    """
+
+    version: int
+    eficacia_referencia: float
+    faoms_marino: float
+    faoml_por_anno: Mapping[int, float]
+    faoml_minimo: float
+    anno_faoml_minimo: int
+
+    def faoml(self, year: int) -> float:
+        if year >= self.anno_faoml_minimo:
+            return self.faoml_minimo
+        return self.faoml_por_anno.get(year, self.faoml_por_anno[min(self.faoml_por_anno)])
+
+
+DEFAULT_PARAMETERS = RegulatoryParameters(
+    version=0,
+    eficacia_referencia=EFICACIA_REFERENCIA,
+    faoms_marino=FAOMS_MARINO,
+    faoml_por_anno=FAOML_BY_YEAR,
+    faoml_minimo=FAOML_MIN_2028,
+    anno_faoml_minimo=2028,
+)
+
+
 def get_faoml_for_year(year: int) -> float:
-    if year >= 2028:
-        return FAOML_MIN_2028
-    return FAOML_BY_YEAR.get(year, FAOML_BY_YEAR[2022])
+    return DEFAULT_PARAMETERS.faoml(year)
 
 
-def _money(value: float) -> float:
+def money(value: float) -> float:
     return round(value, 2)
 
 
-def _annualization_factor(rate: float, useful_life: int) -> float:
+@lru_cache(maxsize=4096)
+def annualization_factor(rate: float, useful_life: int) -> float:
     if useful_life <= 0:
         raise ValueError("vida_util_anios debe ser mayor a cero")
     if rate == 0:
@@ -44,7 +85,346 @@ def _sanitize_receipt_fragment(value: str) -> str:
     return normalized[:10] or "MUNICIPIO"
 
 
-def _to_level_map(values: Iterable, attr_name: str) -> dict[int, object]:
+@dataclass(frozen=True)
+class SectionTotals:
+    """Sumas por nivel de las listas de entrada que consumen las etapas del cálculo."""
+
+    cee_aforado_kwh: dict[int, float]
+    caae: dict[int, float]
+    terrenos_valor: dict[int, float]
+    indisponibilidad_kw_h: float
+    vceei_kw_h: dict[int, float]
+
+
+AFORO_SPEC = attrgetter("carga_kw", "horas_diarias", "dias_facturacion", "perfil")
+AVAILABILITY_EVENT_SPEC = attrgetter("potencia_kw", "horas_sin_servicio")
+VCEEI_EVENT_SPEC = attrgetter("potencia_kw", "horas_indisponibilidad")
+
+
+@dataclass(frozen=True)
+class UcapGroup:
+    """UCAP con la misma vida útil y eficacia; los costos se guardan sumados."""
+
+    vida_util_anios: int
+    eficacia_lm_w: float | None
+    cantidad: int
+    cr_i: float
+    cr_l_base: float
+
+    def capital(self, eficacia_referencia: float) -> float:
+        if self.eficacia_lm_w is None:
+            return self.cr_i
+        return self.cr_i + (self.eficacia_lm_w / eficacia_referencia) * self.cr_l_base
+
+
+@dataclass(frozen=True)
+class NormalizedSections:
+    """
+    Forma agrupada de las listas de entrada.
+
+    Aforos y eventos idénticos se colapsan con su multiplicidad y las UCAP se
+    agrupan por (vida_util_anios, eficacia_lm_w), de modo que el costo de
+    `totals` depende de las especificaciones distintas y no del número de
+    luminarias. No depende de la tasa de retorno ni de los parámetros regulatorios.
+    """
+
+    aforos: dict[int, Counter]
+    ucap: dict[int, list[UcapGroup]]
+    terrenos_valor: dict[int, float]
+    eventos_disponibilidad: Counter
+    vceei_eventos: dict[int, Counter]
+
+    def totals(
+        self, rate: float, parameters: RegulatoryParameters = DEFAULT_PARAMETERS
+    ) -> SectionTotals:
+        return SectionTotals(
+            cee_aforado_kwh={
+                level: aforo_energy_sum(specs) for level, specs in self.aforos.items()
+            },
+            caae={
+                level: ucap_caae_sum(groups, rate, parameters.eficacia_referencia)
+                for level, groups in self.ucap.items()
+            },
+            terrenos_valor=dict(self.terrenos_valor),
+            indisponibilidad_kw_h=weighted_event_sum(self.eventos_disponibilidad),
+            vceei_kw_h={
+                level: weighted_event_sum(events)
+                for level, events in self.vceei_eventos.items()
+            },
+        )
+
+
+HOURS_PER_DAY = 24
+
+
+@dataclass(frozen=True)
+class LoadProfile:
+    """Perfil de carga integrado: horas equivalentes a carga plena por día o por periodo."""
+
+    horas: float
+    diario: bool
+
+
+def integrate_load_profiles(payload: schemas.AlumbradoCalculoEntrada) -> dict[str, LoadProfile]:
+    """Integra cada perfil una sola vez; los aforos solo guardan su nombre."""
+    return {
+        perfil.nombre: LoadProfile(
+            horas=float(np.sum(np.asarray(perfil.factores, dtype=np.float64))),
+            diario=len(perfil.factores) == HOURS_PER_DAY,
+        )
+        for perfil in payload.perfiles_carga
+    }
+
+
+def resolve_aforo(
+    carga_kw: float,
+    horas_diarias: float | None,
+    dias_facturacion: float,
+    perfil: str | None,
+    profiles: dict[str, LoadProfile],
+) -> tuple[float, float, float]:
+    """(carga_kw, horas, días) equivalentes de un aforo, con o sin perfil."""
+    if perfil is None:
+        if horas_diarias is None:
+            raise ValueError("Cada aforo necesita horas_diarias o perfil")
+        return carga_kw, horas_diarias, dias_facturacion
+    if horas_diarias is not None:
+        raise ValueError("Un aforo no puede tener horas_diarias y perfil a la vez")
+    profile = profiles.get(perfil)
+    if profile is None:
+        raise ValueError(f"El perfil de carga {perfil} no está declarado en perfiles_carga")
+    return carga_kw, profile.horas, dias_facturacion if profile.diario else 1.0
+
+
+def aforo_specs(
+    aforos: list[schemas.AforoClaseEntrada], profiles: dict[str, LoadProfile]
+) -> Counter:
+    """Aforos colapsados por especificación y luego resueltos contra sus perfiles."""
+    resolved: Counter = Counter()
+    for spec, count in Counter(map(AFORO_SPEC, aforos)).items():
+        resolved[resolve_aforo(*spec, profiles)] += count
+    return resolved
+
+
+def aforo_energy_sum(specs: Counter) -> float:
+    return sum(
+        count * carga_kw * horas_diarias * dias_facturacion
+        for (carga_kw, horas_diarias, dias_facturacion), count in specs.items()
+    )
+
+
+def ucap_caae_sum(groups: list[UcapGroup], rate: float, eficacia_referencia: float) -> float:
+    return sum(
+        group.capital(eficacia_referencia) * annualization_factor(rate, group.vida_util_anios)
+        for group in groups
+    )
+
+
+def weighted_event_sum(events: Counter) -> float:
+    return sum(count * potencia_kw * horas for (potencia_kw, horas), count in events.items())
+
+
+def terrenos_value(terrenos: list[schemas.TerrenoEntrada]) -> float:
+    return sum(terreno.area_m2 * terreno.valor_catastral_m2 for terreno in terrenos)
+
+
+def group_ucaps(ucaps: list[schemas.UcapEntrada]) -> list[UcapGroup]:
+    grouped: dict[tuple[int, float | None], list[float]] = {}
+    for ucap in ucaps:
+        key = (ucap.vida_util_anios, ucap.eficacia_lm_w)
+        sums = grouped.get(key)
+        if sums is None:
+            sums = grouped[key] = [0, 0.0, 0.0]
+        sums[0] += 1
+        sums[1] += ucap.cr_i
+        sums[2] += ucap.cr_l_base
+    return [
+        UcapGroup(
+            vida_util_anios=life,
+            eficacia_lm_w=efficacy,
+            cantidad=count,
+            cr_i=cr_i,
+            cr_l_base=cr_l_base,
+        )
+        for (life, efficacy), (count, cr_i, cr_l_base) in grouped.items()
+    ]
+
+
+def normalize_sections(payload: schemas.AlumbradoCalculoEntrada) -> NormalizedSections:
+    profiles = integrate_load_profiles(payload)
+    return NormalizedSections(
+        aforos={
+            item.nivel_tension: aforo_specs(item.aforos, profiles)
+            for item in payload.energia_niveles
+        },
+        ucap={item.nivel_tension: group_ucaps(item.ucap) for item in payload.inversion_niveles},
+        terrenos_valor={
+            item.nivel_tension: terrenos_value(item.terrenos)
+            for item in payload.inversion_niveles
+        },
+        eventos_disponibilidad=Counter(
+            map(AVAILABILITY_EVENT_SPEC, payload.disponibilidad.eventos)
+        ),
+        vceei_eventos={
+            item.nivel_tension: Counter(map(VCEEI_EVENT_SPEC, item.vceei_eventos))
+            for item in payload.aom_niveles
+        },
+    )
+
+
+def _reduce_sections_python(
+    payload: schemas.AlumbradoCalculoEntrada, parameters: RegulatoryParameters
+) -> SectionTotals:
+    return normalize_sections(payload).totals(payload.tasa_retorno, parameters)
+
+
+def _columns(items: list, *attr_names: str) -> dict[str, np.ndarray]:
+    return {
+        attr_name: np.fromiter(
+            map(attrgetter(attr_name), items), dtype=np.float64, count=len(items)
+        )
+        for attr_name in attr_names
+    }
+
+
+def apply_load_profiles(
+    columns: dict[str, np.ndarray],
+    perfiles: Sequence[str | None],
+    profiles: dict[str, LoadProfile],
+) -> dict[str, np.ndarray]:
+    """
+    Reemplaza horas y días de los aforos que referencian un perfil de carga.
+
+    Sin perfiles se devuelven las columnas tal cual. Con perfiles, cada aforo
+    se traduce a un índice en la tabla de perfiles integrados y las horas y
+    días salen de esa tabla con operaciones de arreglo.
+    """
+    hours = columns["horas_diarias"]
+    if not any(perfiles) and not np.isnan(hours).any():
+        return columns
+
+    names = list(profiles)
+    position = {name: index for index, name in enumerate(names)}
+    no_profile = len(names)
+    profile_hours = np.array([profiles[name].horas for name in names] + [np.nan])
+    period_series = np.array([not profiles[name].diario for name in names] + [False])
+    index = np.fromiter(
+        (no_profile if perfil is None else position.get(perfil, -1) for perfil in perfiles),
+        dtype=np.int64,
+        count=len(perfiles),
+    )
+    if np.any(index < 0):
+        missing = perfiles[int(np.flatnonzero(index < 0)[0])]
+        raise ValueError(f"El perfil de carga {missing} no está declarado en perfiles_carga")
+    with_profile = index < no_profile
+    if np.any(with_profile & ~np.isnan(hours)):
+        raise ValueError("Un aforo no puede tener horas_diarias y perfil a la vez")
+    if np.any(~with_profile & np.isnan(hours)):
+        raise ValueError("Cada aforo necesita horas_diarias o perfil")
+    return {
+        **columns,
+        "horas_diarias": np.where(with_profile, profile_hours[index], hours),
+        "dias_facturacion": np.where(period_series[index], 1.0, columns["dias_facturacion"]),
+    }
+
+
+def _aforo_columns(
+    aforos: list[schemas.AforoClaseEntrada], profiles: dict[str, LoadProfile]
+) -> dict[str, np.ndarray]:
+    columns = _columns(aforos, "carga_kw", "horas_diarias", "dias_facturacion")
+    return apply_load_profiles(columns, [aforo.perfil for aforo in aforos], profiles)
+
+
+def payload_columns(payload: schemas.AlumbradoCalculoEntrada) -> vectorized.SectionColumns:
+    profiles = integrate_load_profiles(payload)
+    ucap_columns = {}
+    for item in payload.inversion_niveles:
+        columns = _columns(item.ucap, "cr_i", "cr_l_base", "vida_util_anios")
+        columns["eficacia_lm_w"] = np.fromiter(
+            (ucap.eficacia_lm_w or 0.0 for ucap in item.ucap),
+            dtype=np.float64,
+            count=len(item.ucap),
+        )
+        ucap_columns[item.nivel_tension] = columns
+
+    return vectorized.SectionColumns(
+        aforos={
+            item.nivel_tension: _aforo_columns(item.aforos, profiles)
+            for item in payload.energia_niveles
+        },
+        ucap=ucap_columns,
+        terrenos={
+            item.nivel_tension: _columns(item.terrenos, "area_m2", "valor_catastral_m2")
+            for item in payload.inversion_niveles
+        },
+        eventos_disponibilidad=_columns(
+            payload.disponibilidad.eventos, "potencia_kw", "horas_sin_servicio"
+        ),
+        vceei_eventos={
+            item.nivel_tension: _columns(
+                item.vceei_eventos, "potencia_kw", "horas_indisponibilidad"
+            )
+            for item in payload.aom_niveles
+        },
+    )
+
+
+def reduce_section_columns(
+    columns: vectorized.SectionColumns,
+    rate: float,
+    parameters: RegulatoryParameters = DEFAULT_PARAMETERS,
+) -> SectionTotals:
+    return SectionTotals(
+        cee_aforado_kwh={
+            level: vectorized.aforo_energy_kwh(**aforos)
+            for level, aforos in columns.aforos.items()
+        },
+        caae={
+            level: vectorized.ucap_caae(
+                **ucap, rate=rate, eficacia_referencia=parameters.eficacia_referencia
+            )
+            for level, ucap in columns.ucap.items()
+        },
+        terrenos_valor={
+            level: vectorized.weighted_sum(terrenos["area_m2"], terrenos["valor_catastral_m2"])
+            for level, terrenos in columns.terrenos.items()
+        },
+        indisponibilidad_kw_h=vectorized.weighted_sum(
+            columns.eventos_disponibilidad["potencia_kw"],
+            columns.eventos_disponibilidad["horas_sin_servicio"],
+        ),
+        vceei_kw_h={
+            level: vectorized.weighted_sum(events["potencia_kw"], events["horas_indisponibilidad"])
+            for level, events in columns.vceei_eventos.items()
+        },
+    )
+
+
+def _reduce_sections_numpy(
+    payload: schemas.AlumbradoCalculoEntrada, parameters: RegulatoryParameters
+) -> SectionTotals:
+    return reduce_section_columns(payload_columns(payload), payload.tasa_retorno, parameters)
+
+
+SECTION_REDUCERS = {
+    "python": _reduce_sections_python,
+    "numpy": _reduce_sections_numpy,
+}
+
+
+def reduce_sections(
+    payload: schemas.AlumbradoCalculoEntrada,
+    engine: str | None = None,
+    parameters: RegulatoryParameters = DEFAULT_PARAMETERS,
+) -> SectionTotals:
+    engine = engine or settings.ALUMBRADO_CALCULATION_ENGINE
+    reducer = SECTION_REDUCERS.get(engine)
+    if reducer is None:
+        raise ValueError(f"Motor de cálculo no soportado: {engine}")
+    return reducer(payload, parameters)
+
+
+def to_level_map(values: Iterable, attr_name: str) -> dict[int, object]:
     level_map: dict[int, object] = {}
     for value in values:
         level = getattr(value, attr_name)
@@ -54,91 +434,273 @@ def _to_level_map(values: Iterable, attr_name: str) -> dict[int, object]:
     return level_map
 
 
+def _add_level_sums(
+    base: dict[int, float],
+    extra: dict[int, float],
+    section: str,
+) -> dict[int, float]:
+    undeclared = sorted(set(extra) - set(base))
+    if undeclared:
+        raise ValueError(
+            f"El nivel de tensión {undeclared[0]} del inventario no está declarado en {section}"
+        )
+    return {level: value + extra.get(level, 0.0) for level, value in base.items()}
+
+
+def add_section_totals(base: SectionTotals, extra: SectionTotals) -> SectionTotals:
+    """Suma dos juegos de totales; los niveles de `extra` deben existir en `base`."""
+    return SectionTotals(
+        cee_aforado_kwh=_add_level_sums(
+            base.cee_aforado_kwh, extra.cee_aforado_kwh, "energia_niveles"
+        ),
+        caae=_add_level_sums(base.caae, extra.caae, "inversion_niveles"),
+        terrenos_valor=_add_level_sums(
+            base.terrenos_valor, extra.terrenos_valor, "inversion_niveles"
+        ),
+        indisponibilidad_kw_h=base.indisponibilidad_kw_h + extra.indisponibilidad_kw_h,
+        vceei_kw_h=_add_level_sums(base.vceei_kw_h, extra.vceei_kw_h, "aom_niveles"),
+    )
+
+
+def section_item_count(payload: schemas.AlumbradoCalculoEntrada) -> int:
+    """Cantidad de aforos, UCAP, terrenos y eventos de la entrada."""
+    return (
+        sum(len(item.aforos) for item in payload.energia_niveles)
+        + sum(len(item.ucap) + len(item.terrenos) for item in payload.inversion_niveles)
+        + len(payload.disponibilidad.eventos)
+        + sum(len(item.vceei_eventos) for item in payload.aom_niveles)
+    )
+
+
+def reject_inventory_reference(payload: schemas.AlumbradoCalculoEntrada) -> None:
+    """
+    Rechaza `inventario_id` donde la entrada no se resuelve contra la base.
+
+    Solo `/calcular`, `/calculos` y los trabajos de cálculo leen las filas de
+    un inventario; las operaciones derivadas (escenarios, proyección, Monte
+    Carlo) y las entradas por archivo o columnas reciben las filas completas.
+    """
+    if payload.inventario_id is not None:
+        raise ValueError(
+            "inventario_id no está soportado en esta operación: solo /calcular, /calculos "
+            "y los trabajos de cálculo leen inventarios; envíe las filas en la entrada"
+        )
+
+
+# Fórmulas de cada etapa. Aceptan escalares o arreglos de numpy con una
+# muestra por posición, así que el cálculo, los escenarios, la proyección y
+# Monte Carlo evalúan la misma expresión.
+
+ENVIRONMENTAL_COST_SHARE = 0.05
+
+
+class InvestmentLevelCosts(NamedTuple):
+    caane_n: float
+    caa_n: float
+    cinv_n: float
+
+
+class AOMLevelCosts(NamedTuple):
+    vceei_n: float
+    crta_n: float
+    caom_n: float
+
+
+def cee_total_kwh(cee_medido_kwh, cee_aforado_kwh, formulacion_mixta: bool):
+    """CEE_n: medida más aforada en la formulación mixta; si no, la medida cuando es positiva."""
+    if formulacion_mixta:
+        return cee_medido_kwh + cee_aforado_kwh
+    if np.ndim(cee_medido_kwh) == 0 and np.ndim(cee_aforado_kwh) == 0:
+        return cee_medido_kwh if cee_medido_kwh > 0 else cee_aforado_kwh
+    return np.where(np.asarray(cee_medido_kwh) > 0, cee_medido_kwh, cee_aforado_kwh)
+
+
+def availability_index(indisponibilidad_kw_h, potencia_total_kw: float, horas_periodo: float):
+    """ID antes de acotarlo a [0, 1]."""
+    return 1 - indisponibilidad_kw_h / (potencia_total_kw * horas_periodo)
+
+
+def capital_by_life(groups: list[UcapGroup], eficacia_referencia: float) -> dict[int, float]:
+    """Capital de las UCAP sumado por vida útil, para anualizarlo con cualquier tasa."""
+    capital: dict[int, float] = {}
+    for group in groups:
+        life = group.vida_util_anios
+        capital[life] = capital.get(life, 0.0) + group.capital(eficacia_referencia)
+    return capital
+
+
+def annualized_capital(capital: Mapping[int, float], rate):
+    """CAAE_n de un nivel a partir de su capital por vida útil."""
+    if np.ndim(rate) == 0:
+        return sum(
+            annualization_factor(rate, life) * value for life, value in capital.items()
+        )
+    return sum(
+        rate / (1 - (1 + rate) ** (-life)) * value for life, value in capital.items()
+    )
+
+
+def investment_level_costs(caae_n, cat_n: float, ne_fraccion: float, id_value):
+    caane_n = ne_fraccion * caae_n
+    caa_n = caae_n + cat_n + caane_n
+    return InvestmentLevelCosts(caane_n=caane_n, caa_n=caa_n, cinv_n=caa_n * id_value)
+
+
+def aom_level_costs(
+    cra_n: float,
+    cral_n: float,
+    tee,
+    vceei_kw_h,
+    *,
+    cral_total: float,
+    faom_n: float,
+    faoml: float,
+    faoms: float,
+    id_value,
+):
+    vceei_n = tee * vceei_kw_h
+    crta_n = cra_n + cral_n
+    caom_n = ((cra_n * faom_n) + (cral_total * faoml) + (crta_n * faoms)) * id_value - vceei_n
+    return AOMLevelCosts(vceei_n=vceei_n, crta_n=crta_n, caom_n=caom_n)
+
+
+def total_cotr(cotr: schemas.COTREntrada) -> float:
+    return (
+        cotr.interventoria
+        + cotr.costos_ambientales
+        + cotr.polizas
+        + cotr.tramites_impuestos
+        + cotr.otros
+    )
+
+
+def environmental_cost_limit(caom):
+    """Tope de los costos ambientales: una fracción del CAOM, si es positivo."""
+    if np.ndim(caom) == 0:
+        return max(caom, 0) * ENVIRONMENTAL_COST_SHARE
+    return np.maximum(caom, 0) * ENVIRONMENTAL_COST_SHARE
+
+
+def within_environmental_cap(costos_ambientales: float, caom):
+    return costos_ambientales <= environmental_cost_limit(caom) + 1e-9
+
+
+def ipp_factor(ipp: schemas.ActualizacionIPPEntrada) -> float:
+    return ipp.ipp_mes_anterior / ipp.ipp_base
+
+
 def calculate_alumbrado_costs(
     payload: schemas.AlumbradoCalculoEntrada,
     tenant_id: str,
+    engine: str | None = None,
+    inventory_totals: SectionTotals | None = None,
+    parameters: RegulatoryParameters = DEFAULT_PARAMETERS,
 ) -> schemas.AlumbradoCalculoResultado:
+    """
+    Calcula el CAP según la metodología CREG 101 013 de 2022.
+
+    `engine` selecciona cómo se reducen las listas de entrada ("python" o
+    "numpy"); si no se indica se usa `ALUMBRADO_CALCULATION_ENGINE`. Ambos
+    motores producen el mismo resultado. Si la entrada referencia un
+    inventario, `inventory_totals` trae sus sumas ya resueltas con los mismos
+    `parameters`.
+    """
+    timer = stage_timer()
+    timer.restart()
+    totals = reduce_sections(payload, engine=engine, parameters=parameters)
+    if inventory_totals is not None:
+        totals = add_section_totals(totals, inventory_totals)
+    else:
+        reject_inventory_reference(payload)
+    timer.mark("reduccion", section_item_count(payload))
+    return build_calculation_result(
+        payload=payload, tenant_id=tenant_id, totals=totals, parameters=parameters
+    )
+
+
+def build_calculation_result(
+    payload: schemas.AlumbradoCalculoEntrada,
+    tenant_id: str,
+    totals: SectionTotals,
+    parameters: RegulatoryParameters = DEFAULT_PARAMETERS,
+) -> schemas.AlumbradoCalculoResultado:
+    """
+    Ejecuta las etapas numeradas del cálculo a partir de las sumas por nivel.
+
+    Los campos escalares se leen de `payload`; las listas (aforos, UCAP,
+    terrenos y eventos) ya vienen resumidas en `totals`, calculadas con la
+    misma eficacia de referencia de `parameters`.
+    """
+    timer = stage_timer()
+    timer.restart()
     alerts: list[str] = []
 
-    energy_level_map = _to_level_map(payload.energia_niveles, "nivel_tension")
-    investment_level_map = _to_level_map(payload.inversion_niveles, "nivel_tension")
-    aom_level_map = _to_level_map(payload.aom_niveles, "nivel_tension")
+    energy_level_map = to_level_map(payload.energia_niveles, "nivel_tension")
+    investment_level_map = to_level_map(payload.inversion_niveles, "nivel_tension")
+    aom_level_map = to_level_map(payload.aom_niveles, "nivel_tension")
 
     # 1) CSEE
     csee_total = 0.0
     energy_results: list[schemas.EnergiaNivelResultado] = []
     for level in sorted(energy_level_map):
         item = energy_level_map[level]
-        cee_aforado = sum(
-            aforo.carga_kw * aforo.horas_diarias * aforo.dias_facturacion
-            for aforo in item.aforos
+        cee_aforado = totals.cee_aforado_kwh[level]
+        cee_total = cee_total_kwh(
+            item.cee_medido_kwh, cee_aforado, payload.usar_formulacion_mixta_cee
         )
-        if payload.usar_formulacion_mixta_cee:
-            cee_total_kwh = item.cee_medido_kwh + cee_aforado
-        else:
-            cee_total_kwh = item.cee_medido_kwh if item.cee_medido_kwh > 0 else cee_aforado
-        csee_n = item.tee * cee_total_kwh
+        csee_n = item.tee * cee_total
         csee_total += csee_n
         energy_results.append(
             schemas.EnergiaNivelResultado(
                 nivel_tension=level,
-                tee=_money(item.tee),
-                cee_medido_kwh=_money(item.cee_medido_kwh),
-                cee_aforado_kwh=_money(cee_aforado),
-                cee_total_kwh=_money(cee_total_kwh),
-                csee_n=_money(csee_n),
+                tee=money(item.tee),
+                cee_medido_kwh=money(item.cee_medido_kwh),
+                cee_aforado_kwh=money(cee_aforado),
+                cee_total_kwh=money(cee_total),
+                csee_n=money(csee_n),
             )
         )
+    timer.mark("csee", len(energy_level_map))
 
     # 2) ID
-    id_penalty = sum(
-        (event.potencia_kw * event.horas_sin_servicio)
-        / (payload.disponibilidad.potencia_total_kw * payload.disponibilidad.horas_periodo)
-        for event in payload.disponibilidad.eventos
+    id_value = availability_index(
+        totals.indisponibilidad_kw_h,
+        payload.disponibilidad.potencia_total_kw,
+        payload.disponibilidad.horas_periodo,
     )
-    id_value = 1 - id_penalty
     if id_value < 0:
         alerts.append("El índice de disponibilidad calculado fue menor a 0; se ajustó a 0")
         id_value = 0.0
     if id_value > 1:
         alerts.append("El índice de disponibilidad calculado fue mayor a 1; se ajustó a 1")
         id_value = 1.0
+    timer.mark("id")
 
     # 3) CINV
     cinv_total = 0.0
     investment_results: list[schemas.InversionNivelResultado] = []
     for level in sorted(investment_level_map):
         item = investment_level_map[level]
-        caae_n = 0.0
-        for ucap in item.ucap:
-            annualization = _annualization_factor(payload.tasa_retorno, ucap.vida_util_anios)
-            cr_l_adjusted = 0.0
-            if ucap.cr_l_base > 0:
-                cr_l_adjusted = (ucap.eficacia_lm_w / EFICACIA_REFERENCIA) * ucap.cr_l_base
-            caae_n += (ucap.cr_i + cr_l_adjusted) * annualization
-
-        cat_n = item.porcentaje_terreno * sum(
-            terreno.area_m2 * terreno.valor_catastral_m2 for terreno in item.terrenos
-        )
-        caane_n = payload.ne_fraccion * caae_n
-        caa_n = caae_n + cat_n + caane_n
-        cinv_n = caa_n * id_value
-        cinv_total += cinv_n
+        caae_n = totals.caae[level]
+        cat_n = item.porcentaje_terreno * totals.terrenos_valor[level]
+        costs = investment_level_costs(caae_n, cat_n, payload.ne_fraccion, id_value)
+        cinv_total += costs.cinv_n
 
         investment_results.append(
             schemas.InversionNivelResultado(
                 nivel_tension=level,
-                caae_n=_money(caae_n),
-                cat_n=_money(cat_n),
-                caane_n=_money(caane_n),
-                caa_n=_money(caa_n),
-                cinv_n=_money(cinv_n),
+                caae_n=money(caae_n),
+                cat_n=money(cat_n),
+                caane_n=money(costs.caane_n),
+                caa_n=money(costs.caa_n),
+                cinv_n=money(costs.cinv_n),
             )
         )
+    timer.mark("cinv", len(investment_level_map))
 
     # 4) CAOM
-    faoml = get_faoml_for_year(payload.anno_aplicacion)
-    faoms = FAOMS_MARINO if payload.ambiente_marino else 0.0
+    faoml = parameters.faoml(payload.anno_aplicacion)
+    faoms = parameters.faoms_marino if payload.ambiente_marino else 0.0
     cral_total = sum(item.cral_n for item in payload.aom_niveles)
 
     caom_total = 0.0
@@ -152,65 +714,56 @@ def calculate_alumbrado_costs(
                 "se requiere para calcular VCEEI_n"
             )
 
-        vceei_n = energy_item.tee * sum(
-            event.potencia_kw * event.horas_indisponibilidad
-            for event in item.vceei_eventos
+        costs = aom_level_costs(
+            item.cra_n,
+            item.cral_n,
+            energy_item.tee,
+            totals.vceei_kw_h[level],
+            cral_total=cral_total,
+            faom_n=payload.faom_n,
+            faoml=faoml,
+            faoms=faoms,
+            id_value=id_value,
         )
-        crta_n = item.cra_n + item.cral_n
-        caom_n = (
-            (
-                (item.cra_n * payload.faom_n)
-                + (cral_total * faoml)
-                + (crta_n * faoms)
-            )
-            * id_value
-            - vceei_n
-        )
-        caom_total += caom_n
+        caom_total += costs.caom_n
         aom_results.append(
             schemas.AOMNivelResultado(
                 nivel_tension=level,
-                vceei_n=_money(vceei_n),
-                crta_n=_money(crta_n),
-                caom_n=_money(caom_n),
+                vceei_n=money(costs.vceei_n),
+                crta_n=money(costs.crta_n),
+                caom_n=money(costs.caom_n),
             )
         )
+    timer.mark("caom", len(aom_level_map))
 
     # 5) COTR
-    cotr_total = (
-        payload.cotr.interventoria
-        + payload.cotr.costos_ambientales
-        + payload.cotr.polizas
-        + payload.cotr.tramites_impuestos
-        + payload.cotr.otros
-    )
+    cotr_total = total_cotr(payload.cotr)
 
-    max_environmental_cost = max(caom_total, 0) * 0.05
-    if payload.cotr.costos_ambientales > max_environmental_cost + 1e-9:
+    if not within_environmental_cap(payload.cotr.costos_ambientales, caom_total):
         raise ValueError(
             "Los costos ambientales no pueden exceder el 5% del CAOM "
-            f"(límite: {max_environmental_cost:.2f})"
+            f"(límite: {environmental_cost_limit(caom_total):.2f})"
         )
+    timer.mark("cotr")
 
     # 6) CAP
     cap_total = csee_total + cinv_total + caom_total + cotr_total
+    timer.mark("cap")
 
     # 7) Actualización por IPP (opcional)
     ipp_result: schemas.ActualizacionIPPResultado | None = None
     if payload.actualizacion_ipp:
-        factor_ipp = (
-            payload.actualizacion_ipp.ipp_mes_anterior
-            / payload.actualizacion_ipp.ipp_base
-        )
+        factor_ipp = ipp_factor(payload.actualizacion_ipp)
         cinv_updated = cinv_total * factor_ipp
         caom_updated = caom_total * factor_ipp
         cap_updated = csee_total + cinv_updated + caom_updated + cotr_total
         ipp_result = schemas.ActualizacionIPPResultado(
-            factor_ipp=_money(factor_ipp),
-            cinv_actualizado=_money(cinv_updated),
-            caom_actualizado=_money(caom_updated),
-            cap_actualizado=_money(cap_updated),
+            factor_ipp=money(factor_ipp),
+            cinv_actualizado=money(cinv_updated),
+            caom_actualizado=money(caom_updated),
+            cap_actualizado=money(cap_updated),
         )
+    timer.mark("ipp", int(ipp_result is not None))
 
     # 8) Recibo
     municipio_fragment = _sanitize_receipt_fragment(payload.municipio)
@@ -222,13 +775,14 @@ def calculate_alumbrado_costs(
         periodo=payload.periodo,
         metodologia=METODOLOGIA,
         lineas=[
-            schemas.ReciboLinea(concepto="CSEE", valor=_money(csee_total)),
-            schemas.ReciboLinea(concepto="CINV", valor=_money(cinv_total)),
-            schemas.ReciboLinea(concepto="CAOM", valor=_money(caom_total)),
-            schemas.ReciboLinea(concepto="COTR", valor=_money(cotr_total)),
+            schemas.ReciboLinea(concepto="CSEE", valor=money(csee_total)),
+            schemas.ReciboLinea(concepto="CINV", valor=money(cinv_total)),
+            schemas.ReciboLinea(concepto="CAOM", valor=money(caom_total)),
+            schemas.ReciboLinea(concepto="COTR", valor=money(cotr_total)),
         ],
-        total=_money(cap_total),
+        total=money(cap_total),
     )
+    timer.mark("recibo", len(receipt.lineas))
 
     return schemas.AlumbradoCalculoResultado(
         tenant_id=tenant_id,
@@ -236,19 +790,20 @@ def calculate_alumbrado_costs(
         municipio=payload.municipio,
         periodo=payload.periodo,
         anno_aplicacion=payload.anno_aplicacion,
-        id_disponibilidad=_money(id_value),
-        faoml=_money(faoml),
-        faoms=_money(faoms),
-        csee=_money(csee_total),
-        cinv=_money(cinv_total),
-        caom=_money(caom_total),
-        cotr=_money(cotr_total),
-        cap=_money(cap_total),
+        id_disponibilidad=money(id_value),
+        faoml=money(faoml),
+        faoms=money(faoms),
+        csee=money(csee_total),
+        cinv=money(cinv_total),
+        caom=money(caom_total),
+        cotr=money(cotr_total),
+        cap=money(cap_total),
         energia_niveles=energy_results,
         inversion_niveles=investment_results,
         aom_niveles=aom_results,
         recibo=receipt,
         actualizacion_ipp=ipp_result,
         alertas=alerts,
+        version_parametros=parameters.version,
     )
 
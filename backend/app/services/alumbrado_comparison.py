@@ -0,0 +1,111 @@
+from itertools import groupby
+
+from sqlalchemy.orm import Session, defer
+
+from app.models.alumbrado import CalculoAlumbrado
+from app.schemas import alumbrado as schemas
+from app.services.alumbrado_calculator import money
+from app.services.alumbrado_store import load_result
+
+COMPONENTS = ("csee", "cinv", "caom", "cotr", "cap")
+
+
+def _variation(base: float, compared: float) -> schemas.AlumbradoVariacion:
+    return schemas.AlumbradoVariacion(
+        base=base,
+        comparado=compared,
+        delta=money(compared - base),
+        variacion_porcentual=round((compared - base) / base * 100, 4) if base else None,
+    )
+
+
+def _level_values(result: schemas.AlumbradoCalculoResultado) -> dict[int, dict[str, float]]:
+    levels: dict[int, dict[str, float]] = {}
+    for energia in result.energia_niveles:
+        levels.setdefault(energia.nivel_tension, {})["csee_n"] = energia.csee_n
+    for inversion in result.inversion_niveles:
+        levels.setdefault(inversion.nivel_tension, {})["cinv_n"] = inversion.cinv_n
+    for aom in result.aom_niveles:
+        values = levels.setdefault(aom.nivel_tension, {})
+        values["caom_n"] = aom.caom_n
+        values["vceei_n"] = aom.vceei_n
+    return levels
+
+
+def compare_calculations(
+    base: CalculoAlumbrado, compared: CalculoAlumbrado
+) -> schemas.AlumbradoComparacion:
+    """
+    Diferencias por componente y por nivel entre dos cálculos guardados.
+
+    Los totales salen de las columnas y los valores por nivel del resultado
+    guardado; un nivel ausente en uno de los dos cálculos cuenta como 0.
+    """
+    base_levels = _level_values(load_result(base))
+    compared_levels = _level_values(load_result(compared))
+    niveles = []
+    for level in sorted(base_levels.keys() | compared_levels.keys()):
+        before = base_levels.get(level, {})
+        after = compared_levels.get(level, {})
+        niveles.append(
+            schemas.AlumbradoComparacionNivel(
+                nivel_tension=level,
+                **{
+                    field: _variation(before.get(field, 0.0), after.get(field, 0.0))
+                    for field in ("csee_n", "cinv_n", "caom_n", "vceei_n")
+                },
+            )
+        )
+    return schemas.AlumbradoComparacion(
+        base=schemas.CalculoAlumbradoReferencia.model_validate(base),
+        comparado=schemas.CalculoAlumbradoReferencia.model_validate(compared),
+        componentes={
+            name: _variation(getattr(base, name), getattr(compared, name))
+            for name in COMPONENTS
+        },
+        niveles=niveles,
+    )
+
+
+def compare_periods(
+    db: Session,
+    tenant_id: str,
+    municipio: str | None = None,
+    periodo_desde: str | None = None,
+    periodo_hasta: str | None = None,
+) -> list[schemas.AlumbradoComparacion]:
+    """
+    Compara cada periodo guardado con el anterior, por municipio.
+
+    Todo sale de una consulta ordenada por (municipio, periodo, id), el orden
+    del índice del tenant, sin cargar las entradas comprimidas. Si un periodo
+    tiene varios cálculos se usa el más reciente.
+    """
+    query = (
+        db.query(CalculoAlumbrado)
+        .options(
+            defer(CalculoAlumbrado.entrada_comprimida),
+            defer(CalculoAlumbrado.totales_comprimidos),
+        )
+        .filter(CalculoAlumbrado.tenant_id == tenant_id)
+    )
+    if municipio:
+        query = query.filter(CalculoAlumbrado.municipio == municipio)
+    if periodo_desde:
+        query = query.filter(CalculoAlumbrado.periodo >= periodo_desde)
+    if periodo_hasta:
+        query = query.filter(CalculoAlumbrado.periodo <= periodo_hasta)
+    rows = query.order_by(
+        CalculoAlumbrado.municipio, CalculoAlumbrado.periodo, CalculoAlumbrado.id
+    ).all()
+
+    comparisons = []
+    for _, municipio_rows in groupby(rows, key=lambda row: row.municipio):
+        latest = [
+            list(period_rows)[-1]
+            for _, period_rows in groupby(municipio_rows, key=lambda row: row.periodo)
+        ]
+        comparisons.extend(
+            compare_calculations(base, compared) for base, compared in zip(latest, latest[1:])
+        )
+    return comparisons
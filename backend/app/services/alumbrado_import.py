@@ -0,0 +1,487 @@
+import csv
+import io
+from itertools import chain
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from app.schemas import alumbrado as schemas
+from app.services import alumbrado_vectorized as vectorized
+from app.services.alumbrado_calculator import (
+    DEFAULT_PARAMETERS,
+    RegulatoryParameters,
+    apply_load_profiles,
+    build_calculation_result,
+    integrate_load_profiles,
+    payload_columns,
+    reduce_section_columns,
+    reject_inventory_reference,
+)
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depende del entorno
+    pq = None
+
+MAX_REPORTED_ERRORS = 100
+
+
+@dataclass(frozen=True)
+class ColumnSpec:
+    """Reglas de una columna importada; replican las restricciones del esquema."""
+
+    name: str
+    required: bool = True
+    default: float = 0.0
+    integer: bool = False
+    gt: float | None = None
+    ge: float | None = None
+    le: float | None = None
+
+
+LEVEL_COLUMN = ColumnSpec("nivel_tension", integer=True, ge=1, le=2)
+
+SECTION_SPECS: dict[str, list[ColumnSpec]] = {
+    "ucap": [
+        LEVEL_COLUMN,
+        ColumnSpec("cr_i", required=False, ge=0),
+        ColumnSpec("cr_l_base", required=False, ge=0),
+        ColumnSpec("eficacia_lm_w", required=False, gt=0),
+        ColumnSpec("vida_util_anios", integer=True, gt=0),
+    ],
+    "aforos": [
+        LEVEL_COLUMN,
+        ColumnSpec("clase_iluminacion", integer=True, ge=1, le=3),
+        ColumnSpec("carga_kw", gt=0),
+        ColumnSpec("horas_diarias", gt=0),
+        ColumnSpec("dias_facturacion", gt=0),
+    ],
+    "terrenos": [
+        LEVEL_COLUMN,
+        ColumnSpec("area_m2", gt=0),
+        ColumnSpec("valor_catastral_m2", ge=0),
+    ],
+}
+
+# Sección del encabezado donde debe estar declarado cada nivel importado.
+HEADER_SECTIONS = {
+    "ucap": "inversion_niveles",
+    "aforos": "energia_niveles",
+    "terrenos": "inversion_niveles",
+}
+
+
+class InventoryImportError(ValueError):
+    """Errores por fila de una importación; `errors` trae los primeros reportados."""
+
+    def __init__(self, errors: list[schemas.InventarioErrorFila], total: int):
+        super().__init__(f"La importación tiene {total} errores")
+        self.errors = errors
+        self.total = total
+
+    def report(self) -> dict:
+        return {
+            "mensaje": str(self),
+            "total_errores": self.total,
+            "errores": [error.model_dump() for error in self.errors[:MAX_REPORTED_ERRORS]],
+        }
+
+
+@dataclass
+class ImportedSection:
+    """
+    Columnas de una sección importada; los vacíos se leen como NaN.
+
+    Si al leer se descartaron líneas en blanco, `line_numbers` guarda para
+    cada fila leída su número en el archivo, y los errores se reportan con él.
+    """
+
+    section: str
+    columns: dict[str, np.ndarray] = field(default_factory=dict)
+    rows: int = 0
+    errors: list[schemas.InventarioErrorFila] = field(default_factory=list)
+    error_count: int = 0
+    line_numbers: list[int] | None = None
+
+    def error(self, row: int, column: str, message: str) -> None:
+        if row and self.line_numbers is not None:
+            row = self.line_numbers[row - 1]
+        # Se cuentan todos los errores pero solo se conserva el detalle de los primeros.
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(
+                schemas.InventarioErrorFila(
+                    seccion=self.section, fila=row, columna=column, mensaje=message
+                )
+            )
+
+
+def _parse_text_column(
+    imported: ImportedSection,
+    name: str,
+    values: np.ndarray,
+    decimal_comma: bool,
+) -> np.ndarray:
+    text = np.char.strip(values)
+    if decimal_comma:
+        text = np.char.replace(text, ",", ".")
+    # `np.where` amplía el ancho de la columna si sus celdas son más cortas que "nan".
+    text = np.where(text == "", "nan", text)
+    try:
+        return text.astype(np.float64)
+    except ValueError:
+        pass
+
+    # Solo si la conversión en bloque falla se recorre la columna celda a celda.
+    parsed = np.full(len(values), np.nan)
+    for index, value in enumerate(text):
+        try:
+            parsed[index] = float(value)
+        except ValueError:
+            imported.error(index + 1, name, f"Valor no numérico: {str(values[index])!r}")
+    return parsed
+
+
+def read_csv_section(section: str, data: bytes) -> ImportedSection:
+    """
+    Lee un CSV con encabezado en columnas de punto flotante.
+
+    Acepta `,` o `;` como separador; con `;` las comas decimales se convierten
+    a punto. Solo se convierten las columnas de `SECTION_SPECS`; las demás
+    (por ejemplo `codigo`) se ignoran. Las filas se numeran desde 1 sin
+    contar el encabezado; las líneas en blanco se omiten pero conservan su
+    número, así que los errores señalan la línea del archivo.
+    """
+    imported = ImportedSection(section=section)
+    text = data.decode("utf-8-sig")
+    first_line = text.split("\n", 1)[0]
+    delimiter = ";" if first_line.count(";") > first_line.count(",") else ","
+
+    # Sin comillas se evita `csv.reader`: las celdas se separan con un solo
+    # split sobre todo el texto, que es lo que domina con millones de filas.
+    if '"' in text:
+        reader = csv.reader(io.StringIO(text), delimiter=delimiter)
+        rows, numbers = [], []
+        for row in reader:
+            if row:
+                rows.append(row)
+                numbers.append(reader.line_num)
+        if not rows:
+            return imported
+        if numbers[-1] != len(numbers):
+            imported.line_numbers = [number - numbers[0] for number in numbers[1:]]
+        names = [name.strip().lower() for name in rows[0]]
+        cells = [_pad_row(imported, index, row, len(names)) for index, row in enumerate(rows[1:])]
+        flat = list(chain.from_iterable(cells))
+    else:
+        all_lines = text.splitlines()
+        lines = [line for line in all_lines if line.strip()]
+        if not lines:
+            return imported
+        if len(lines) != len(all_lines):
+            numbers = [number for number, line in enumerate(all_lines) if line.strip()]
+            imported.line_numbers = [number - numbers[0] for number in numbers[1:]]
+        names = [name.strip().lower() for name in lines[0].split(delimiter)]
+        lines = lines[1:]
+        expected = len(names) - 1
+        for index, line in enumerate(lines):
+            if line.count(delimiter) != expected:
+                row = _pad_row(imported, index, line.split(delimiter), len(names))
+                lines[index] = delimiter.join(row)
+        flat = delimiter.join(lines).split(delimiter) if lines else []
+
+    width = len(names)
+    imported.rows = len(flat) // width
+    if not imported.rows:
+        return imported
+    declared = _declared_columns(section)
+    for position, name in enumerate(names):
+        if name not in declared:
+            continue
+        cells = flat[position::width]
+        try:
+            imported.columns[name] = np.array(cells, dtype=np.float64)
+        except ValueError:
+            imported.columns[name] = _parse_text_column(
+                imported, name, np.asarray(cells, dtype=str), decimal_comma=delimiter == ";"
+            )
+    return imported
+
+
+def _declared_columns(section: str) -> set[str]:
+    return {spec.name for spec in SECTION_SPECS[section]}
+
+
+def _pad_row(imported: ImportedSection, index: int, row: list[str], width: int) -> list[str]:
+    if len(row) != width:
+        imported.error(
+            index + 1, "", f"Se esperaban {width} columnas y se encontraron {len(row)}"
+        )
+        row = (row + [""] * width)[:width]
+    return row
+
+
+def read_parquet_section(section: str, data: bytes) -> ImportedSection:
+    if pq is None:
+        raise ValueError("La importación Parquet requiere instalar pyarrow")
+    table = pq.read_table(io.BytesIO(data))
+    imported = ImportedSection(section=section, rows=table.num_rows)
+    declared = _declared_columns(section)
+    for name in table.column_names:
+        if name.strip().lower() not in declared:
+            continue
+        column = table.column(name)
+        try:
+            imported.columns[name.strip().lower()] = (
+                column.cast("float64").to_numpy(zero_copy_only=False)
+            )
+        except Exception:
+            imported.error(0, name, "La columna no es numérica")
+    return imported
+
+
+def validate_section(imported: ImportedSection) -> None:
+    """Aplica las reglas de `SECTION_SPECS` de forma vectorizada sobre cada columna."""
+    for spec in SECTION_SPECS[imported.section]:
+        values = imported.columns.get(spec.name)
+        if values is None:
+            if spec.required:
+                imported.error(0, spec.name, "Falta la columna obligatoria")
+                continue
+            values = np.full(imported.rows, np.nan)
+            imported.columns[spec.name] = values
+
+        blank = np.isnan(values)
+        checks = []
+        if spec.required:
+            checks.append((blank, "Valor obligatorio"))
+        present = ~blank
+        checks.append((present & np.isinf(values), "Valor no finito"))
+        if spec.integer:
+            checks.append((present & (values != np.floor(values)), "Debe ser un entero"))
+        if spec.gt is not None:
+            checks.append((present & ~(values > spec.gt), f"Debe ser mayor a {spec.gt:g}"))
+        if spec.ge is not None:
+            checks.append(
+                (present & ~(values >= spec.ge), f"Debe ser mayor o igual a {spec.ge:g}")
+            )
+        if spec.le is not None:
+            checks.append(
+                (present & ~(values <= spec.le), f"Debe ser menor o igual a {spec.le:g}")
+            )
+        for mask, message in checks:
+            for index in np.flatnonzero(mask):
+                imported.error(int(index) + 1, spec.name, message)
+
+        if not spec.required:
+            imported.columns[spec.name] = np.where(blank, spec.default, values)
+
+    if imported.section == "ucap" and "eficacia_lm_w" in imported.columns:
+        # Misma regla de `UcapEntrada`: la eficacia es obligatoria si hay CR_L.
+        missing = (imported.columns["cr_l_base"] > 0) & (imported.columns["eficacia_lm_w"] == 0)
+        for index in np.flatnonzero(missing):
+            imported.error(
+                int(index) + 1,
+                "eficacia_lm_w",
+                "eficacia_lm_w es obligatoria cuando cr_l_base es mayor a cero",
+            )
+
+
+def _split_by_level(
+    imported: ImportedSection,
+    declared_levels: set[int],
+) -> dict[int, dict[str, np.ndarray]]:
+    levels = imported.columns["nivel_tension"]
+    undeclared = ~np.isin(levels, list(declared_levels))
+    for index in np.flatnonzero(undeclared):
+        imported.error(
+            int(index) + 1,
+            "nivel_tension",
+            f"El nivel {int(levels[index])} no está declarado en "
+            f"{HEADER_SECTIONS[imported.section]}",
+        )
+    names = [spec.name for spec in SECTION_SPECS[imported.section] if spec is not LEVEL_COLUMN]
+    by_level = {}
+    for level in declared_levels:
+        mask = levels == level
+        by_level[level] = {name: imported.columns[name][mask] for name in names}
+    return by_level
+
+
+def _merge_level_columns(
+    base: dict[int, dict[str, np.ndarray]],
+    imported: dict[int, dict[str, np.ndarray]],
+) -> dict[int, dict[str, np.ndarray]]:
+    return {
+        level: {
+            name: np.concatenate([values, imported[level][name]])
+            for name, values in columns.items()
+        }
+        for level, columns in base.items()
+    }
+
+
+def calculate_from_inventory(
+    header: schemas.AlumbradoCalculoEntrada,
+    files: dict[str, tuple[str, bytes]],
+    tenant_id: str,
+    parameters: RegulatoryParameters = DEFAULT_PARAMETERS,
+) -> schemas.AlumbradoCalculoResultado:
+    """
+    Calcula el CAP con inventarios importados desde CSV o Parquet.
+
+    `files` asocia cada sección (`ucap`, `aforos`, `terrenos`) con el nombre y
+    contenido del archivo. Las filas importadas se suman a las listas que ya
+    traiga el encabezado y llegan al motor vectorizado como arreglos, sin
+    construir un objeto por fila.
+    """
+    reject_inventory_reference(header)
+    columns = payload_columns(header)
+    merged = {
+        "ucap": columns.ucap,
+        "aforos": columns.aforos,
+        "terrenos": columns.terrenos,
+    }
+    errors: list[schemas.InventarioErrorFila] = []
+    error_count = 0
+    for section, (filename, data) in files.items():
+        if filename.lower().endswith(".parquet"):
+            imported = read_parquet_section(section, data)
+        else:
+            imported = read_csv_section(section, data)
+        validate_section(imported)
+        if not imported.error_count:
+            by_level = _split_by_level(imported, set(merged[section]))
+            merged[section] = _merge_level_columns(merged[section], by_level)
+        errors.extend(imported.errors)
+        error_count += imported.error_count
+
+    if error_count:
+        raise InventoryImportError(errors, error_count)
+
+    totals = reduce_section_columns(
+        vectorized.SectionColumns(
+            aforos=merged["aforos"],
+            ucap=merged["ucap"],
+            terrenos=merged["terrenos"],
+            eventos_disponibilidad=columns.eventos_disponibilidad,
+            vceei_eventos=columns.vceei_eventos,
+        ),
+        header.tasa_retorno,
+        parameters,
+    )
+    return build_calculation_result(
+        payload=header, tenant_id=tenant_id, totals=totals, parameters=parameters
+    )
+
+
+# Columnas de `SeccionesColumnas` que llegan al motor y su valor si se omiten;
+# NaN marca las horas que deben salir de un perfil de carga.
+COLUMNAR_SECTIONS: dict[str, tuple[str, dict[str, float]]] = {
+    "aforos": (
+        "energia_niveles",
+        {"carga_kw": 0.0, "horas_diarias": np.nan, "dias_facturacion": 0.0},
+    ),
+    "ucap": (
+        "inversion_niveles",
+        {"cr_i": 0.0, "cr_l_base": 0.0, "eficacia_lm_w": np.nan, "vida_util_anios": 0.0},
+    ),
+    "terrenos": ("inversion_niveles", {"area_m2": 0.0, "valor_catastral_m2": 0.0}),
+    "vceei_eventos": (
+        "aom_niveles",
+        {"potencia_kw": 0.0, "horas_indisponibilidad": 0.0},
+    ),
+}
+
+
+def _block_arrays(
+    block: schemas.ColumnasSeccion, defaults: dict[str, float]
+) -> dict[str, np.ndarray]:
+    arrays = {}
+    for name, default in defaults.items():
+        values = getattr(block, name)
+        if values is None:
+            arrays[name] = np.full(block.filas, default)
+        else:
+            # Los vacíos (None) de las columnas opcionales quedan como NaN.
+            arrays[name] = np.array(values, dtype=np.float64)
+    return arrays
+
+
+def _split_block_by_level(
+    section: str,
+    block: schemas.ColumnasSeccion,
+    arrays: dict[str, np.ndarray],
+    declared_levels: set[int],
+) -> dict[int, dict[str, np.ndarray]]:
+    levels = np.array(block.nivel_tension, dtype=np.int64)
+    undeclared = np.setdiff1d(levels, list(declared_levels))
+    if undeclared.size:
+        raise ValueError(
+            f"El nivel de tensión {int(undeclared[0])} de columnas.{section} no está "
+            f"declarado en {COLUMNAR_SECTIONS[section][0]}"
+        )
+    by_level = {}
+    for level in declared_levels:
+        mask = levels == level
+        by_level[level] = {name: values[mask] for name, values in arrays.items()}
+    return by_level
+
+
+def calculate_from_columns(
+    payload: schemas.AlumbradoCalculoColumnasEntrada,
+    tenant_id: str,
+    parameters: RegulatoryParameters = DEFAULT_PARAMETERS,
+) -> schemas.AlumbradoCalculoResultado:
+    """
+    Calcula el CAP de una entrada con secciones en columnas.
+
+    Las columnas ya validadas se convierten en arreglos, se reparten por
+    nivel y se concatenan con las listas del encabezado antes de la
+    reducción vectorizada, sin pasar por un objeto por fila.
+    """
+    reject_inventory_reference(payload)
+    columns = payload_columns(payload)
+    merged = {
+        "aforos": columns.aforos,
+        "ucap": columns.ucap,
+        "terrenos": columns.terrenos,
+        "vceei_eventos": columns.vceei_eventos,
+    }
+    for section, (_, defaults) in COLUMNAR_SECTIONS.items():
+        block = getattr(payload.columnas, section)
+        if block is None:
+            continue
+        arrays = _block_arrays(block, defaults)
+        if section == "aforos":
+            arrays = apply_load_profiles(
+                arrays, block.perfil or [None] * block.filas, integrate_load_profiles(payload)
+            )
+        elif section == "ucap":
+            efficacy = arrays["eficacia_lm_w"]
+            arrays["eficacia_lm_w"] = np.where(np.isnan(efficacy), 0.0, efficacy)
+        by_level = _split_block_by_level(section, block, arrays, set(merged[section]))
+        merged[section] = _merge_level_columns(merged[section], by_level)
+
+    events = columns.eventos_disponibilidad
+    block = payload.columnas.eventos_disponibilidad
+    if block is not None:
+        events = {
+            name: np.concatenate([values, np.array(getattr(block, name), dtype=np.float64)])
+            for name, values in events.items()
+        }
+
+    totals = reduce_section_columns(
+        vectorized.SectionColumns(
+            aforos=merged["aforos"],
+            ucap=merged["ucap"],
+            terrenos=merged["terrenos"],
+            eventos_disponibilidad=events,
+            vceei_eventos=merged["vceei_eventos"],
+        ),
+        payload.tasa_retorno,
+        parameters,
+    )
+    return build_calculation_result(
+        payload=payload, tenant_id=tenant_id, totals=totals, parameters=parameters
+    )
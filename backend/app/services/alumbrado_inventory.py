@@ -0,0 +1,372 @@
+from dataclasses import dataclass
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.alumbrado import (
+    CalculoAlumbrado,
+    InventarioAforo,
+    InventarioAlumbrado,
+    InventarioTerreno,
+    InventarioUcap,
+)
+from app.schemas import alumbrado as schemas
+from app.services.alumbrado_cache import CalculationCache, calculation_cache
+from app.services.alumbrado_calculator import (
+    DEFAULT_PARAMETERS,
+    RegulatoryParameters,
+    SectionTotals,
+    UcapGroup,
+    ucap_caae_sum,
+)
+
+INVENTORY_SECTIONS = {
+    "ucap": (InventarioUcap, schemas.InventarioUcapFila),
+    "terrenos": (InventarioTerreno, schemas.InventarioTerrenoFila),
+    "aforos": (InventarioAforo, schemas.InventarioAforoFila),
+}
+SECTION_PATTERN = "^(ucap|terrenos|aforos)$"
+
+# Tamaño de los bloques de códigos en las consultas IN de la carga masiva.
+UPSERT_CHUNK_SIZE = 500
+
+
+def get_inventory(
+    db: Session, tenant_id: str, inventario_id: int
+) -> InventarioAlumbrado | None:
+    return (
+        db.query(InventarioAlumbrado)
+        .filter(
+            InventarioAlumbrado.id == inventario_id,
+            InventarioAlumbrado.tenant_id == tenant_id,
+        )
+        .first()
+    )
+
+
+def list_inventories(
+    db: Session, tenant_id: str, skip: int = 0, limit: int = 100
+) -> list[InventarioAlumbrado]:
+    return (
+        db.query(InventarioAlumbrado)
+        .filter(InventarioAlumbrado.tenant_id == tenant_id)
+        .order_by(InventarioAlumbrado.id)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+
+def create_inventory(db: Session, tenant_id: str, nombre: str) -> InventarioAlumbrado:
+    existing = (
+        db.query(InventarioAlumbrado.id)
+        .filter(InventarioAlumbrado.tenant_id == tenant_id, InventarioAlumbrado.nombre == nombre)
+        .first()
+    )
+    if existing:
+        raise ValueError("Ya existe un inventario con ese nombre")
+    inventario = InventarioAlumbrado(tenant_id=tenant_id, nombre=nombre, version=1)
+    db.add(inventario)
+    db.commit()
+    db.refresh(inventario)
+    return inventario
+
+
+def inventory_key(inventario: InventarioAlumbrado, version: int | None = None) -> str:
+    """Identifica una versión del inventario (la vigente por defecto) en el hash y las cachés."""
+    return f"{inventario.clave}:{version or inventario.version}"
+
+
+def inventory_cache_group(inventario: InventarioAlumbrado) -> str:
+    """Grupo de las entradas en caché que dependen del inventario."""
+    return f"inventario:{inventario.clave}"
+
+
+def pin_inventory_version(
+    payload: schemas.AlumbradoCalculoEntrada, inventario: InventarioAlumbrado
+) -> schemas.AlumbradoCalculoEntrada:
+    """
+    Entrada con `inventario_version` fijada: la pedida o, si no trae, la vigente.
+
+    Con la versión fijada la entrada identifica siempre las mismas filas,
+    aunque el inventario cambie después.
+    """
+    version = payload.inventario_version or inventario.version
+    if version > inventario.version:
+        raise ValueError(
+            f"El inventario {inventario.id} no tiene la versión {version} "
+            f"(la vigente es la {inventario.version})"
+        )
+    return payload.model_copy(update={"inventario_version": version})
+
+
+def delete_inventory(db: Session, inventario: InventarioAlumbrado) -> None:
+    """
+    Elimina el inventario con todas sus versiones.
+
+    Los cálculos guardados fijan una versión del inventario para poder
+    recalcularse; mientras alguno lo referencie el borrado se rechaza.
+    """
+    referenced = (
+        db.query(CalculoAlumbrado.id)
+        .filter(CalculoAlumbrado.inventario_id == inventario.id)
+        .first()
+    )
+    if referenced:
+        raise ValueError("El inventario está referenciado por cálculos guardados")
+    # Borrado masivo de filas: no depende de que la base aplique ON DELETE CASCADE.
+    for model, _ in INVENTORY_SECTIONS.values():
+        db.query(model).filter(model.inventario_id == inventario.id).delete(
+            synchronize_session=False
+        )
+    group = inventory_cache_group(inventario)
+    db.delete(inventario)
+    db.commit()
+    inventory_cache.invalidate_group(group)
+    calculation_cache.invalidate_group(group)
+
+
+def _current_rows(model):
+    return model.version_hasta.is_(None)
+
+
+def _rows_at(model, version: int):
+    return and_(
+        model.version_desde <= version,
+        or_(model.version_hasta.is_(None), model.version_hasta > version),
+    )
+
+
+def inventory_row_counts(db: Session, inventario: InventarioAlumbrado) -> dict[str, int]:
+    return {
+        section: db.query(func.count(model.id))
+        .filter(model.inventario_id == inventario.id, _current_rows(model))
+        .scalar()
+        for section, (model, _) in INVENTORY_SECTIONS.items()
+    }
+
+
+def list_inventory_rows(
+    db: Session,
+    inventario: InventarioAlumbrado,
+    section: str,
+    nivel_tension: int | None = None,
+    skip: int = 0,
+    limit: int = 100,
+) -> list:
+    model, _ = INVENTORY_SECTIONS[section]
+    query = db.query(model).filter(model.inventario_id == inventario.id, _current_rows(model))
+    if nivel_tension is not None:
+        query = query.filter(model.nivel_tension == nivel_tension)
+    return query.order_by(model.id).offset(skip).limit(limit).all()
+
+
+def upsert_inventory_rows(
+    db: Session,
+    inventario: InventarioAlumbrado,
+    section: str,
+    rows: list,
+) -> schemas.InventarioCargaResultado:
+    """
+    Inserta o reemplaza filas por `codigo` en una versión nueva del inventario.
+
+    Las filas vigentes con el mismo código se cierran en la versión nueva y
+    se agregan las filas nuevas, así que las versiones anteriores se siguen
+    pudiendo leer. Las filas existentes se buscan por bloques de códigos y se
+    escriben con operaciones masivas, sin cargar objetos ORM por fila.
+    """
+    model, _ = INVENTORY_SECTIONS[section]
+    by_code = {row.codigo: row.model_dump() for row in rows}
+    codes = list(by_code)
+    version = _bump_version(db, inventario)
+
+    existing: list[int] = []
+    for start in range(0, len(codes), UPSERT_CHUNK_SIZE):
+        chunk = codes[start : start + UPSERT_CHUNK_SIZE]
+        existing.extend(
+            row_id
+            for (row_id,) in db.query(model.id).filter(
+                model.inventario_id == inventario.id,
+                _current_rows(model),
+                model.codigo.in_(chunk),
+            )
+        )
+
+    if existing:
+        db.bulk_update_mappings(
+            model, [{"id": row_id, "version_hasta": version} for row_id in existing]
+        )
+    if by_code:
+        db.bulk_insert_mappings(
+            model,
+            [
+                {**values, "inventario_id": inventario.id, "version_desde": version}
+                for values in by_code.values()
+            ],
+        )
+    db.commit()
+    db.refresh(inventario)
+    return schemas.InventarioCargaResultado(
+        inventario_id=inventario.id,
+        version=inventario.version,
+        insertadas=len(by_code) - len(existing),
+        actualizadas=len(existing),
+    )
+
+
+def delete_inventory_row(
+    db: Session, inventario: InventarioAlumbrado, section: str, codigo: str
+) -> bool:
+    """Cierra la fila vigente con `codigo` en una versión nueva del inventario."""
+    model, _ = INVENTORY_SECTIONS[section]
+    current = (
+        db.query(model.id)
+        .filter(model.inventario_id == inventario.id, _current_rows(model), model.codigo == codigo)
+        .first()
+    )
+    if current is None:
+        return False
+    version = _bump_version(db, inventario)
+    db.query(model).filter(model.id == current.id).update(
+        {model.version_hasta: version}, synchronize_session=False
+    )
+    db.commit()
+    db.refresh(inventario)
+    return True
+
+
+def _bump_version(db: Session, inventario: InventarioAlumbrado) -> int:
+    # El incremento se hace en SQL: dos ediciones concurrentes no pueden
+    # confirmar la misma versión, que es la clave de la caché y del ETag. La
+    # fila queda bloqueada hasta el commit, así que la versión leída es la
+    # que marcan las filas de este cambio.
+    db.execute(
+        update(InventarioAlumbrado)
+        .where(InventarioAlumbrado.id == inventario.id)
+        .values(version=InventarioAlumbrado.version + 1)
+    )
+    return db.execute(
+        select(InventarioAlumbrado.version).where(InventarioAlumbrado.id == inventario.id)
+    ).scalar_one()
+
+
+@dataclass(frozen=True)
+class InventoryAggregates:
+    """Sumas por nivel de un inventario que no dependen de la tasa ni de los parámetros."""
+
+    cee_aforado_kwh: dict[int, float]
+    ucap: dict[int, list[UcapGroup]]
+    terrenos_valor: dict[int, float]
+
+    def totals(
+        self, rate: float, parameters: RegulatoryParameters = DEFAULT_PARAMETERS
+    ) -> SectionTotals:
+        return SectionTotals(
+            cee_aforado_kwh=dict(self.cee_aforado_kwh),
+            caae={
+                level: ucap_caae_sum(groups, rate, parameters.eficacia_referencia)
+                for level, groups in self.ucap.items()
+            },
+            terrenos_valor=dict(self.terrenos_valor),
+            indisponibilidad_kw_h=0.0,
+            vceei_kw_h={},
+        )
+
+
+def load_inventory_aggregates(
+    db: Session, inventario: InventarioAlumbrado, version: int
+) -> InventoryAggregates:
+    """
+    Agrega las filas de `version` con una consulta agrupada por sección.
+
+    Cada consulta usa el índice (inventario, nivel).
+    """
+    ucap: dict[int, list[UcapGroup]] = {}
+    ucap_rows = (
+        db.query(
+            InventarioUcap.nivel_tension,
+            InventarioUcap.vida_util_anios,
+            InventarioUcap.eficacia_lm_w,
+            func.count(InventarioUcap.id),
+            func.sum(InventarioUcap.cr_i),
+            func.sum(InventarioUcap.cr_l_base),
+        )
+        .filter(InventarioUcap.inventario_id == inventario.id, _rows_at(InventarioUcap, version))
+        .group_by(
+            InventarioUcap.nivel_tension,
+            InventarioUcap.vida_util_anios,
+            InventarioUcap.eficacia_lm_w,
+        )
+        .all()
+    )
+    for level, life, efficacy, count, cr_i, cr_l_base in ucap_rows:
+        ucap.setdefault(level, []).append(
+            UcapGroup(
+                vida_util_anios=life,
+                eficacia_lm_w=efficacy,
+                cantidad=count,
+                cr_i=cr_i,
+                cr_l_base=cr_l_base,
+            )
+        )
+
+    aforo_rows = (
+        db.query(
+            InventarioAforo.nivel_tension,
+            func.sum(
+                InventarioAforo.carga_kw
+                * InventarioAforo.horas_diarias
+                * InventarioAforo.dias_facturacion
+            ),
+        )
+        .filter(InventarioAforo.inventario_id == inventario.id, _rows_at(InventarioAforo, version))
+        .group_by(InventarioAforo.nivel_tension)
+        .all()
+    )
+    terreno_rows = (
+        db.query(
+            InventarioTerreno.nivel_tension,
+            func.sum(InventarioTerreno.area_m2 * InventarioTerreno.valor_catastral_m2),
+        )
+        .filter(
+            InventarioTerreno.inventario_id == inventario.id,
+            _rows_at(InventarioTerreno, version),
+        )
+        .group_by(InventarioTerreno.nivel_tension)
+        .all()
+    )
+    return InventoryAggregates(
+        cee_aforado_kwh=dict(aforo_rows),
+        ucap=ucap,
+        terrenos_valor=dict(terreno_rows),
+    )
+
+
+inventory_cache = CalculationCache(
+    max_entries=settings.ALUMBRADO_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ALUMBRADO_CACHE_TTL_SECONDS,
+)
+
+
+def inventory_totals(
+    db: Session,
+    inventario: InventarioAlumbrado,
+    rate: float,
+    parameters: RegulatoryParameters = DEFAULT_PARAMETERS,
+    version: int | None = None,
+) -> SectionTotals:
+    """
+    Totales de una versión del inventario (la vigente por defecto) para una tasa.
+
+    Las versiones no cambian, así que sus agregados se reutilizan de la caché.
+    """
+    version = version or inventario.version
+    if not settings.ENABLE_ALUMBRADO_RESULT_CACHE:
+        return load_inventory_aggregates(db, inventario, version).totals(rate, parameters)
+    aggregates = inventory_cache.get_or_compute(
+        f"{inventario.tenant_id}:{inventory_key(inventario, version)}",
+        lambda: load_inventory_aggregates(db, inventario, version),
+        inventory_cache_group(inventario),
+    )
+    return aggregates.totals(rate, parameters)
@@ -0,0 +1,439 @@
+import json
+import logging
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+from pydantic import ValidationError
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.alumbrado import TrabajoAlumbrado
+from app.schemas import alumbrado as schemas
+from app.services.alumbrado_allocation import allocate_cap, count_subscribers
+from app.services.alumbrado_batch import calculate_alumbrado_batch, format_validation_error
+from app.services.alumbrado_calculator import RegulatoryParameters, calculate_alumbrado_costs
+from app.services.alumbrado_inventory import (
+    get_inventory,
+    inventory_totals,
+    pin_inventory_version,
+)
+from app.services.alumbrado_parameters import get_parameters, get_parameters_version
+from app.services.alumbrado_recalculation import count_outdated_calculations, recalculate_outdated
+from app.services.alumbrado_store import (
+    COMPRESSION_LEVEL,
+    compress_model,
+    decompress_json,
+    get_calculation,
+)
+
+logger = logging.getLogger(__name__)
+
+JOB_CALCULATION = "calculo"
+JOB_BATCH = "lote"
+JOB_RECALCULATION = "recalculo"
+JOB_ALLOCATION = "distribucion"
+
+PENDING = "pendiente"
+RUNNING = "en_proceso"
+COMPLETED = "completado"
+FAILED = "fallido"
+
+# Candidatos que revisa cada intento de reclamo; otro worker puede ganar los primeros.
+CLAIM_CANDIDATES = 5
+
+
+class JobInterrupted(Exception):
+    """Los workers se detienen; el trabajo vuelve a la cola con el avance ya guardado."""
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def submit_calculation_job(
+    db: Session,
+    tenant_id: str,
+    payload: schemas.AlumbradoCalculoEntrada,
+    engine: str | None = None,
+) -> TrabajoAlumbrado:
+    return _submit(db, tenant_id, JOB_CALCULATION, compress_model(payload), 1, engine)
+
+
+def submit_batch_job(
+    db: Session,
+    tenant_id: str,
+    raw_payloads: list[dict[str, Any]],
+    engine: str | None = None,
+) -> TrabajoAlumbrado:
+    """Los ítems del lote se guardan sin validar; cada uno se valida al ejecutarse."""
+    data = zlib.compress(json.dumps(raw_payloads).encode(), COMPRESSION_LEVEL)
+    return _submit(db, tenant_id, JOB_BATCH, data, len(raw_payloads), engine)
+
+
+def submit_recalculation_job(
+    db: Session,
+    tenant_id: str,
+    parameters: RegulatoryParameters,
+    engine: str | None = None,
+) -> TrabajoAlumbrado:
+    """
+    Encola el recálculo de los cálculos guardados con versiones anteriores a `parameters`.
+
+    La versión queda fija en el trabajo; una versión publicada después
+    necesita su propio recálculo.
+    """
+    data = zlib.compress(
+        json.dumps({"version_parametros": parameters.version}).encode(), COMPRESSION_LEVEL
+    )
+    total_items = count_outdated_calculations(db, tenant_id, parameters.version)
+    return _submit(db, tenant_id, JOB_RECALCULATION, data, total_items, engine)
+
+
+def submit_allocation_job(
+    db: Session, tenant_id: str, payload: schemas.DistribucionAlumbradoEntrada
+) -> TrabajoAlumbrado:
+    total_items = sum(count_subscribers(db, tenant_id).values())
+    return _submit(db, tenant_id, JOB_ALLOCATION, compress_model(payload), total_items, None)
+
+
+def _submit(
+    db: Session,
+    tenant_id: str,
+    job_type: str,
+    data: bytes,
+    total_items: int,
+    engine: str | None,
+) -> TrabajoAlumbrado:
+    job = TrabajoAlumbrado(
+        tenant_id=tenant_id,
+        tipo=job_type,
+        estado=PENDING,
+        motor=engine,
+        total_items=total_items,
+        entrada_comprimida=data,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    job_workers.notify()
+    return job
+
+
+def get_job(db: Session, tenant_id: str, job_id: int) -> TrabajoAlumbrado | None:
+    return (
+        db.query(TrabajoAlumbrado)
+        .filter(TrabajoAlumbrado.id == job_id, TrabajoAlumbrado.tenant_id == tenant_id)
+        .first()
+    )
+
+
+def load_job_result(job: TrabajoAlumbrado) -> bytes:
+    """JSON del resultado tal como se guardó, listo para responder sin revalidar."""
+    return decompress_json(job.resultado_comprimido)
+
+
+def _claimable():
+    stale_before = _utcnow() - timedelta(seconds=settings.ALUMBRADO_JOB_LEASE_SECONDS)
+    return or_(
+        TrabajoAlumbrado.estado == PENDING,
+        and_(
+            TrabajoAlumbrado.estado == RUNNING,
+            TrabajoAlumbrado.fecha_actualizacion < stale_before,
+        ),
+    )
+
+
+def claim_next_job(db: Session) -> TrabajoAlumbrado | None:
+    """
+    Reclama el trabajo disponible más antiguo.
+
+    El reclamo es un UPDATE condicionado al mismo filtro de la consulta: si
+    otro worker (de este u otro proceso) ganó la fila, no se actualiza nada y
+    se prueba con el siguiente candidato.
+    """
+    candidates = (
+        db.query(TrabajoAlumbrado.id)
+        .filter(_claimable())
+        .order_by(TrabajoAlumbrado.id)
+        .limit(CLAIM_CANDIDATES)
+        .all()
+    )
+    for (job_id,) in candidates:
+        now = _utcnow()
+        claimed = (
+            db.query(TrabajoAlumbrado)
+            .filter(TrabajoAlumbrado.id == job_id, _claimable())
+            .update(
+                {
+                    TrabajoAlumbrado.estado: RUNNING,
+                    TrabajoAlumbrado.fecha_inicio: now,
+                    TrabajoAlumbrado.fecha_actualizacion: now,
+                    TrabajoAlumbrado.intentos: TrabajoAlumbrado.intentos + 1,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if claimed:
+            return db.get(TrabajoAlumbrado, job_id, populate_existing=True)
+    return None
+
+
+def _checkpoint(
+    db: Session, job: TrabajoAlumbrado, processed: int, stop: threading.Event | None
+) -> None:
+    """Guarda el avance (y el latido) y se detiene ahí si los workers se están apagando."""
+    job.items_procesados = processed
+    job.fecha_actualizacion = _utcnow()
+    db.commit()
+    if stop is not None and stop.is_set():
+        raise JobInterrupted
+
+
+def _run_calculation(
+    db: Session, job: TrabajoAlumbrado, stop: threading.Event | None
+) -> schemas.AlumbradoCalculoResultado:
+    payload = schemas.AlumbradoCalculoEntrada.model_validate_json(
+        decompress_json(job.entrada_comprimida)
+    )
+    parameters = get_parameters(db, job.tenant_id)
+    totals = None
+    if payload.inventario_id is not None:
+        inventario = get_inventory(db, tenant_id=job.tenant_id, inventario_id=payload.inventario_id)
+        if inventario is None:
+            raise ValueError("Inventario no encontrado")
+        payload = pin_inventory_version(payload, inventario)
+        totals = inventory_totals(
+            db, inventario, payload.tasa_retorno, parameters, payload.inventario_version
+        )
+    return calculate_alumbrado_costs(
+        payload=payload,
+        tenant_id=job.tenant_id,
+        engine=job.motor,
+        inventory_totals=totals,
+        parameters=parameters,
+    )
+
+
+def _run_batch(
+    db: Session, job: TrabajoAlumbrado, stop: threading.Event | None
+) -> schemas.AlumbradoLoteResultado:
+    """
+    Calcula el lote por bloques y guarda el avance (y el latido) después de cada uno.
+
+    Si el pool está saturado, los bloques se calculan en el hilo del trabajo
+    en lugar de fallar.
+    """
+    raw_payloads = json.loads(decompress_json(job.entrada_comprimida))
+    chunk_size = settings.ALUMBRADO_JOB_PROGRESS_CHUNK
+    parameters = get_parameters(db, job.tenant_id)
+    items: list[schemas.AlumbradoLoteItemResultado] = []
+    for start in range(0, len(raw_payloads), chunk_size):
+        partial = calculate_alumbrado_batch(
+            raw_payloads=raw_payloads[start : start + chunk_size],
+            tenant_id=job.tenant_id,
+            engine=job.motor,
+            parameters=parameters,
+            inline_when_saturated=True,
+        )
+        items.extend(
+            item.model_copy(update={"indice": start + item.indice})
+            for item in partial.resultados
+        )
+        _checkpoint(db, job, len(items), stop)
+
+    failed = sum(1 for item in items if item.error is not None)
+    return schemas.AlumbradoLoteResultado(
+        tenant_id=job.tenant_id,
+        total=len(items),
+        exitosos=len(items) - failed,
+        fallidos=failed,
+        resultados=items,
+    )
+
+
+def _run_recalculation(
+    db: Session, job: TrabajoAlumbrado, stop: threading.Event | None
+) -> schemas.AlumbradoRecalculoResultado:
+    """
+    Recalcula por bloques y guarda filas, reporte parcial y avance en cada commit.
+
+    Un trabajo reclamado de nuevo tras una interrupción retoma desde el
+    reporte parcial guardado en `resultado_comprimido`.
+    """
+    version = json.loads(decompress_json(job.entrada_comprimida))["version_parametros"]
+    parameters = get_parameters_version(db, job.tenant_id, version)
+    if parameters is None:
+        raise ValueError(f"No existe la versión {version} de parámetros")
+    if job.resultado_comprimido is not None:
+        report = schemas.AlumbradoRecalculoResultado.model_validate_json(
+            decompress_json(job.resultado_comprimido)
+        )
+    else:
+        report = schemas.AlumbradoRecalculoResultado(
+            tenant_id=job.tenant_id, version_parametros=version
+        )
+    job.total_items = report.revisados + count_outdated_calculations(
+        db, job.tenant_id, version, report.ultimo_calculo_id
+    )
+    for report in recalculate_outdated(db, job.tenant_id, parameters, report, engine=job.motor):
+        job.resultado_comprimido = compress_model(report)
+        _checkpoint(db, job, report.revisados, stop)
+    return report
+
+
+def _run_allocation(
+    db: Session, job: TrabajoAlumbrado, stop: threading.Event | None
+) -> schemas.AlumbradoDistribucionResultado:
+    """
+    Guarda los cargos y el avance después de cada bloque de clientes.
+
+    Mientras el trabajo corre, los cargos del cálculo pueden estar
+    incompletos; un reintento tras una interrupción borra los cargos a medias
+    y distribuye desde el primer cliente.
+    """
+    payload = schemas.DistribucionAlumbradoEntrada.model_validate_json(
+        decompress_json(job.entrada_comprimida)
+    )
+    calculo = get_calculation(db, tenant_id=job.tenant_id, calculo_id=payload.calculo_id)
+    if calculo is None:
+        raise ValueError("Cálculo no encontrado")
+    return allocate_cap(
+        db,
+        job.tenant_id,
+        calculo,
+        payload.pesos,
+        on_partition=lambda processed: _checkpoint(db, job, processed, stop),
+    )
+
+
+JOB_RUNNERS = {
+    JOB_CALCULATION: _run_calculation,
+    JOB_BATCH: _run_batch,
+    JOB_RECALCULATION: _run_recalculation,
+    JOB_ALLOCATION: _run_allocation,
+}
+
+
+def execute_job(db: Session, job: TrabajoAlumbrado, stop: threading.Event | None = None) -> None:
+    """
+    Ejecuta un trabajo reclamado y persiste su resultado o su error.
+
+    Con `stop` activado, el trabajo se detiene en el siguiente guardado de
+    avance y vuelve a la cola sin gastar un intento.
+    """
+    if job.intentos > settings.ALUMBRADO_JOB_MAX_ATTEMPTS:
+        _finish(db, job, FAILED, error="El trabajo superó el máximo de intentos")
+        return
+    try:
+        result = JOB_RUNNERS[job.tipo](db, job, stop)
+    except JobInterrupted:
+        job.estado = PENDING
+        job.intentos -= 1
+        job.fecha_actualizacion = _utcnow()
+        db.commit()
+    except ValidationError as exc:
+        _finish(db, job, FAILED, error=format_validation_error(exc))
+    except ValueError as exc:
+        _finish(db, job, FAILED, error=str(exc))
+    except Exception:
+        logger.exception("Error al ejecutar el trabajo de alumbrado %s", job.id)
+        db.rollback()
+        _finish(db, job, FAILED, error="Error interno al ejecutar el trabajo")
+    else:
+        job.resultado_comprimido = compress_model(result)
+        job.items_procesados = job.total_items
+        _finish(db, job, COMPLETED)
+
+
+def _finish(db: Session, job: TrabajoAlumbrado, state: str, error: str | None = None) -> None:
+    now = _utcnow()
+    job.estado = state
+    job.error = error
+    job.fecha_actualizacion = now
+    job.fecha_fin = now
+    db.commit()
+
+
+def run_next_job(db: Session, stop: threading.Event | None = None) -> bool:
+    """Reclama y ejecuta un trabajo; devuelve False si la cola estaba vacía."""
+    job = claim_next_job(db)
+    if job is None:
+        return False
+    execute_job(db, job, stop)
+    return True
+
+
+class JobWorkers:
+    """
+    Hilos que consumen la cola de trabajos.
+
+    Cada hilo usa su propia sesión. Entre trabajos esperan hasta
+    `ALUMBRADO_JOB_POLL_SECONDS` o hasta que `notify` avisa de uno nuevo; el
+    sondeo también recoge trabajos creados por otros procesos. Al detenerse,
+    los trabajos en curso se interrumpen en su siguiente guardado de avance.
+    """
+
+    def __init__(self) -> None:
+        self._threads: list[threading.Thread] = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self, session_factory: Callable[[], Session], workers: int) -> None:
+        self.stop()
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(
+                target=self._run,
+                args=(session_factory,),
+                name=f"alumbrado-trabajos-{index}",
+                daemon=True,
+            )
+            for index in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Detiene los hilos esperando como máximo `timeout` segundos en total
+        (`ALUMBRADO_JOB_STOP_TIMEOUT_SECONDS` por defecto). Un hilo que sigue
+        en un bloque largo se abandona; es un hilo daemon y su trabajo se
+        reclama al vencer el arriendo.
+        """
+        self._stop.set()
+        self._wake.set()
+        if timeout is None:
+            timeout = settings.ALUMBRADO_JOB_STOP_TIMEOUT_SECONDS
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+            if thread.is_alive():
+                logger.warning("El worker %s no terminó su bloque al detenerse", thread.name)
+        self._threads = []
+
+    def _run(self, session_factory: Callable[[], Session]) -> None:
+        while not self._stop.is_set():
+            processed = False
+            try:
+                with session_factory() as db:
+                    processed = run_next_job(db, self._stop)
+            except Exception:
+                logger.exception("Error en el worker de trabajos de alumbrado")
+            if not processed:
+                self._wake.wait(settings.ALUMBRADO_JOB_POLL_SECONDS)
+                self._wake.clear()
+
+
+job_workers = JobWorkers()
@@ -0,0 +1,178 @@
+import numpy as np
+
+from app.schemas import alumbrado as schemas
+from app.services.alumbrado_calculator import (
+    DEFAULT_PARAMETERS,
+    RegulatoryParameters,
+    annualized_capital,
+    aom_level_costs,
+    availability_index,
+    capital_by_life,
+    cee_total_kwh,
+    investment_level_costs,
+    money,
+    normalize_sections,
+    reject_inventory_reference,
+    to_level_map,
+    total_cotr,
+    within_environmental_cap,
+)
+
+COMPONENTS = ("csee", "cinv", "caom", "cap")
+
+# Límite inferior de cada campo muestreado; las muestras por debajo se recortan.
+FIELD_MINIMUM = {"tasa_retorno": 1e-9}
+
+ENERGY_LEVEL_FIELDS = {"tee", "cee_medido_kwh", "factor_carga_aforos"}
+
+
+def _sample(
+    rng: np.random.Generator,
+    distribution: schemas.DistribucionEntrada,
+    size: int,
+) -> np.ndarray:
+    if distribution.tipo == "normal":
+        values = rng.normal(distribution.media, distribution.desviacion, size)
+    elif distribution.tipo == "uniforme":
+        values = rng.uniform(distribution.minimo, distribution.maximo, size)
+    elif distribution.minimo == distribution.maximo:
+        values = np.full(size, distribution.minimo)
+    else:
+        values = rng.triangular(distribution.minimo, distribution.moda, distribution.maximo, size)
+    return np.maximum(values, FIELD_MINIMUM.get(distribution.campo, 0.0))
+
+
+def _summary(values: np.ndarray, percentiles: list[float]) -> schemas.AlumbradoMonteCarloComponente:
+    return schemas.AlumbradoMonteCarloComponente(
+        media=money(float(np.mean(values))),
+        desviacion=money(float(np.std(values))),
+        percentiles=[money(float(value)) for value in np.percentile(values, percentiles)],
+    )
+
+
+def run_monte_carlo(
+    payload: schemas.AlumbradoMonteCarloEntrada,
+    tenant_id: str,
+    parameters: RegulatoryParameters = DEFAULT_PARAMETERS,
+) -> schemas.AlumbradoMonteCarloResultado:
+    """
+    Evalúa el CAP para N muestras de los campos inciertos en una sola pasada.
+
+    Las listas de la entrada se reducen una vez a sumas por nivel; cada etapa
+    del cálculo opera sobre arreglos de N muestras (o escalares cuando el
+    campo no tiene distribución), sin construir una entrada por muestra.
+    """
+    base = payload.calculo
+    reject_inventory_reference(base)
+    normalized = normalize_sections(base)
+    totals = normalized.totals(base.tasa_retorno, parameters)
+    energy_level_map = to_level_map(base.energia_niveles, "nivel_tension")
+    investment_level_map = to_level_map(base.inversion_niveles, "nivel_tension")
+    aom_level_map = to_level_map(base.aom_niveles, "nivel_tension")
+
+    for distribution in payload.distribuciones:
+        if distribution.nivel_tension is None:
+            continue
+        levels = (
+            energy_level_map if distribution.campo in ENERGY_LEVEL_FIELDS else aom_level_map
+        )
+        if distribution.nivel_tension not in levels:
+            raise ValueError(
+                f"No existe el nivel de tensión {distribution.nivel_tension} "
+                f"para la distribución de {distribution.campo}"
+            )
+
+    seed = payload.semilla
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % (2**63))
+    rng = np.random.default_rng(seed)
+    samples = payload.muestras
+    sampled = {
+        (distribution.campo, distribution.nivel_tension): _sample(rng, distribution, samples)
+        for distribution in payload.distribuciones
+    }
+
+    def value(field: str, level: int | None, default: float):
+        return sampled.get((field, level), default)
+
+    # 1) CSEE
+    csee = 0.0
+    tee_by_level = {}
+    for level in sorted(energy_level_map):
+        item = energy_level_map[level]
+        tee = tee_by_level[level] = value("tee", level, item.tee)
+        cee_total = cee_total_kwh(
+            value("cee_medido_kwh", level, item.cee_medido_kwh),
+            totals.cee_aforado_kwh[level] * value("factor_carga_aforos", level, 1.0),
+            base.usar_formulacion_mixta_cee,
+        )
+        csee = csee + tee * cee_total
+
+    # 2) ID
+    id_value = np.clip(
+        availability_index(
+            totals.indisponibilidad_kw_h * value("factor_horas_indisponibilidad", None, 1.0),
+            base.disponibilidad.potencia_total_kw,
+            base.disponibilidad.horas_periodo,
+        ),
+        0.0,
+        1.0,
+    )
+
+    # 3) CINV
+    rate = value("tasa_retorno", None, base.tasa_retorno)
+    cinv = 0.0
+    for level in sorted(investment_level_map):
+        item = investment_level_map[level]
+        caae = annualized_capital(
+            capital_by_life(normalized.ucap[level], parameters.eficacia_referencia), rate
+        )
+        cat = item.porcentaje_terreno * totals.terrenos_valor[level]
+        cinv = cinv + investment_level_costs(caae, cat, base.ne_fraccion, id_value).cinv_n
+
+    # 4) CAOM
+    faoml = parameters.faoml(base.anno_aplicacion)
+    faoms = parameters.faoms_marino if base.ambiente_marino else 0.0
+    cral_total = sum(item.cral_n for item in base.aom_niveles)
+    caom = 0.0
+    for level in sorted(aom_level_map):
+        item = aom_level_map[level]
+        if level not in tee_by_level:
+            raise ValueError(
+                f"No existe TEE para nivel de tensión {level}; "
+                "se requiere para calcular VCEEI_n"
+            )
+        caom = caom + aom_level_costs(
+            item.cra_n,
+            item.cral_n,
+            tee_by_level[level],
+            totals.vceei_kw_h[level] * value("factor_horas_vceei", level, 1.0),
+            cral_total=cral_total,
+            faom_n=base.faom_n,
+            faoml=faoml,
+            faoms=faoms,
+            id_value=id_value,
+        ).caom_n
+
+    # 5) COTR y 6) CAP
+    cotr_total = total_cotr(base.cotr)
+    components = {"csee": csee, "cinv": cinv, "caom": caom}
+    components["cap"] = csee + cinv + caom + cotr_total
+    components = {
+        name: np.broadcast_to(np.asarray(values, dtype=np.float64), (samples,))
+        for name, values in components.items()
+    }
+    within_cap = within_environmental_cap(base.cotr.costos_ambientales, components["caom"])
+
+    return schemas.AlumbradoMonteCarloResultado(
+        tenant_id=tenant_id,
+        municipio=base.municipio,
+        periodo=base.periodo,
+        muestras=samples,
+        semilla=seed,
+        percentiles=payload.percentiles,
+        componentes={
+            name: _summary(components[name], payload.percentiles) for name in COMPONENTS
+        },
+        fraccion_cumple_tope_ambiental=round(float(np.mean(within_cap)), 4),
+    )
@@ -0,0 +1,172 @@
+import asyncio
+import re
+from dataclasses import dataclass
+from typing import Any
+
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.schemas import alumbrado as schemas
+from app.services.alumbrado_cache import calculation_cache, calculation_hash, payload_json_hash
+from app.services.alumbrado_calculator import (
+    DEFAULT_PARAMETERS,
+    RegulatoryParameters,
+    calculate_alumbrado_costs,
+)
+from app.services.alumbrado_pool import submit_calculation, warm_calculation_pool
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - depende del entorno
+    msgpack = None
+
+# Campo obligatorio de cada fila de sección; sus apariciones en el cuerpo (JSON
+# o MessagePack) acotan el número de filas sin decodificarlo.
+ROW_KEYS = (
+    b"carga_kw",
+    b"vida_util_anios",
+    b"area_m2",
+    b"horas_sin_servicio",
+    b"horas_indisponibilidad",
+)
+
+
+def estimate_item_count(body: bytes) -> int:
+    return sum(body.count(key) for key in ROW_KEYS)
+
+
+def should_offload(body: bytes) -> bool:
+    threshold = settings.ALUMBRADO_OFFLOAD_MIN_ITEMS
+    return threshold > 0 and estimate_item_count(body) >= threshold
+
+
+def parse_calculation_body(
+    body: bytes, msgpack_body: bool = False
+) -> schemas.AlumbradoCalculoEntrada:
+    """Valida el cuerpo de `/calcular` en JSON o MessagePack."""
+    if not msgpack_body:
+        return schemas.AlumbradoCalculoEntrada.model_validate_json(body)
+    try:
+        data = msgpack.unpackb(body)
+    except ValueError:
+        raise ValueError("El cuerpo MessagePack no es válido")
+    return schemas.AlumbradoCalculoEntrada.model_validate(data)
+
+
+# Clave `inventario_id` con un valor distinto de null, en JSON o en MessagePack
+# (cadena corta de 13 bytes, prefijo 0xad; null es 0xc0).
+INVENTORY_REFERENCE_JSON = re.compile(rb'"inventario_id"\s*:\s*[^\sn]')
+INVENTORY_REFERENCE_MSGPACK = re.compile(rb"\xadinventario_id(?!\xc0)")
+
+
+def references_inventory(body: bytes, msgpack_body: bool = False) -> bool:
+    """
+    Indica, sin decodificar el cuerpo, si la entrada referencia un inventario.
+
+    Un falso positivo (la clave dentro de un texto) solo lleva el cálculo al
+    hilo del servidor; el pool igual detecta las referencias que no se vean
+    aquí.
+    """
+    pattern = INVENTORY_REFERENCE_MSGPACK if msgpack_body else INVENTORY_REFERENCE_JSON
+    return pattern.search(body) is not None
+
+
+def body_cache_key(
+    body: bytes, tenant_id: str, msgpack_body: bool, parameters_version: int = 0
+) -> str:
+    """Clave de caché del cuerpo recibido, antes de validarlo y canonizarlo."""
+    body_format = "msgpack" if msgpack_body else "json"
+    content_hash = payload_json_hash(body, tenant_id, parameters_version=parameters_version)
+    return f"cuerpo:{body_format}:{content_hash}"
+
+
+@dataclass(frozen=True)
+class OffloadedCalculation:
+    """
+    Desenlace de un cuerpo de `/calcular` validado y calculado en el pool.
+
+    Solo viajan de vuelta el hash, el resultado y los errores; la entrada
+    validada se queda en el proceso del pool. `inventario` indica que la
+    entrada referencia un inventario, que se resuelve en el proceso web.
+    No depende de la solicitud, así que se guarda en la caché por cuerpo.
+    """
+
+    content_hash: str | None = None
+    result: schemas.AlumbradoCalculoResultado | None = None
+    validation_errors: list[dict[str, Any]] | None = None
+    error: str | None = None
+    inventario: bool = False
+
+
+def calculate_body(
+    body: bytes,
+    msgpack_body: bool,
+    tenant_id: str,
+    engine: str,
+    parameters: RegulatoryParameters = DEFAULT_PARAMETERS,
+) -> OffloadedCalculation:
+    try:
+        payload = parse_calculation_body(body, msgpack_body)
+    except ValidationError as exc:
+        return OffloadedCalculation(
+            validation_errors=exc.errors(include_url=False, include_input=False)
+        )
+    except ValueError as exc:
+        return OffloadedCalculation(error=str(exc))
+    if payload.inventario_id is not None:
+        return OffloadedCalculation(inventario=True)
+
+    content_hash = calculation_hash(payload, tenant_id, parameters_version=parameters.version)
+    try:
+        result = calculate_alumbrado_costs(
+            payload=payload, tenant_id=tenant_id, engine=engine, parameters=parameters
+        )
+    except ValueError as exc:
+        return OffloadedCalculation(content_hash=content_hash, error=str(exc))
+    return OffloadedCalculation(content_hash=content_hash, result=result)
+
+
+async def offload_calculation(
+    body: bytes,
+    tenant_id: str,
+    engine: str | None = None,
+    msgpack_body: bool = False,
+    parameters: RegulatoryParameters = DEFAULT_PARAMETERS,
+) -> OffloadedCalculation:
+    """
+    Valida y calcula un cuerpo de `/calcular` en el pool de procesos.
+
+    La espera no ocupa un hilo del servidor. Antes de enviar el trabajo se
+    consulta la caché con la clave del cuerpo recibido: un cuerpo repetido
+    no vuelve al pool y las solicitudes concurrentes con el mismo cuerpo
+    esperan el mismo cálculo. El resultado también se guarda con su hash
+    canónico, el que usa el cálculo en el hilo de la solicitud. Lanza
+    `PoolSaturatedError` si el pool ya tiene su cola llena.
+    """
+
+    async def compute() -> OffloadedCalculation:
+        future = submit_calculation(
+            calculate_body,
+            body,
+            msgpack_body,
+            tenant_id,
+            engine or settings.ALUMBRADO_CALCULATION_ENGINE,
+            parameters,
+        )
+        return await asyncio.wrap_future(future)
+
+    if not settings.ENABLE_ALUMBRADO_RESULT_CACHE:
+        return await compute()
+    key = body_cache_key(body, tenant_id, msgpack_body, parameters.version)
+    outcome = await calculation_cache.get_or_compute_async(key, compute)
+    if outcome.result is not None:
+        calculation_cache.put(outcome.content_hash, outcome.result)
+    return outcome
+
+
+def _ready() -> None:
+    """Tarea vacía; el worker que la recibe ya importó el motor de cálculo."""
+
+
+def warm_offload_pool() -> None:
+    warm_calculation_pool(_ready)
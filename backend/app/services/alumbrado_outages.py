@@ -0,0 +1,413 @@
+import csv
+import io
+import warnings
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from itertools import islice
+from typing import BinaryIO, Iterator
+
+import numpy as np
+
+from app.core.config import settings
+from app.schemas import alumbrado as schemas
+from app.services.alumbrado_calculator import money
+from app.services.alumbrado_import import ImportedSection, InventoryImportError
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depende del entorno
+    pq = None
+
+SECTION = "interrupciones"
+OUTAGE_COLUMNS = ("circuito", "nivel_tension", "potencia_kw", "inicio", "fin")
+# Filas convertidas a arreglos por bloque; acota la memoria de las listas de texto.
+CHUNK_ROWS = 100_000
+SECONDS_PER_HOUR = 3600.0
+NAT = np.iinfo(np.int64).min
+
+
+@dataclass
+class OutageLog:
+    """
+    Registros de interrupción como arreglos compactos (unos 30 bytes por fila).
+
+    Los circuitos se guardan como enteros; `circuit_ids` traduce cada código
+    de circuito a su entero. Los tiempos son segundos desde la época.
+    """
+
+    circuit_ids: dict[str, int] = field(default_factory=dict)
+    circuits: list[np.ndarray] = field(default_factory=list)
+    levels: list[np.ndarray] = field(default_factory=list)
+    power: list[np.ndarray] = field(default_factory=list)
+    starts: list[np.ndarray] = field(default_factory=list)
+    ends: list[np.ndarray] = field(default_factory=list)
+    rows: int = 0
+
+    def append(
+        self,
+        circuits: np.ndarray,
+        levels: np.ndarray,
+        power: np.ndarray,
+        starts: np.ndarray,
+        ends: np.ndarray,
+    ) -> None:
+        uniques, inverse = np.unique(circuits, return_inverse=True)
+        codes = np.array(
+            [self.circuit_ids.setdefault(str(code), len(self.circuit_ids)) for code in uniques],
+            dtype=np.int64,
+        )
+        self.circuits.append(codes[inverse].astype(np.int32))
+        self.levels.append(levels.astype(np.int8))
+        self.power.append(power)
+        self.starts.append(starts)
+        self.ends.append(ends)
+        self.rows += len(power)
+        if self.rows > settings.ALUMBRADO_OUTAGE_MAX_RECORDS:
+            raise ValueError(
+                "El registro de interrupciones excede el máximo de "
+                f"{settings.ALUMBRADO_OUTAGE_MAX_RECORDS} filas"
+            )
+
+    def columns(self) -> tuple[np.ndarray, ...]:
+        parts = (self.circuits, self.levels, self.power, self.starts, self.ends)
+        dtypes = (np.int32, np.int8, np.float64, np.int64, np.int64)
+        return tuple(
+            np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+            for chunks, dtype in zip(parts, dtypes)
+        )
+
+
+def _parse_numbers(
+    imported: ImportedSection, name: str, values: np.ndarray, offset: int
+) -> np.ndarray:
+    text = np.char.strip(values)
+    blank = text == ""
+    try:
+        parsed = np.where(blank, "nan", text).astype(np.float64)
+    except ValueError:
+        # Solo si la conversión en bloque falla se recorre la columna celda a celda.
+        parsed = np.full(len(values), np.nan)
+        for index in np.flatnonzero(~blank):
+            try:
+                parsed[index] = float(text[index])
+            except ValueError:
+                imported.error(
+                    offset + int(index) + 1, name, f"Valor no numérico: {text[index]!r}"
+                )
+    for index in np.flatnonzero(blank):
+        imported.error(offset + int(index) + 1, name, "Valor obligatorio")
+    for index in np.flatnonzero(np.isinf(parsed)):
+        imported.error(offset + int(index) + 1, name, "Valor no finito")
+    return parsed
+
+
+def _parse_timestamps(
+    imported: ImportedSection, name: str, values: np.ndarray, offset: int
+) -> np.ndarray:
+    text = np.char.strip(values)
+    blank = text == ""
+    # Las fechas con zona horaria se convierten a UTC; numpy avisa y el aviso se ignora.
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        try:
+            parsed = text.astype("datetime64[s]")
+        except ValueError:
+            parsed = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[s]")
+            for index in np.flatnonzero(~blank):
+                try:
+                    parsed[index] = np.datetime64(text[index], "s")
+                except ValueError:
+                    imported.error(
+                        offset + int(index) + 1, name, f"Fecha inválida: {text[index]!r}"
+                    )
+    for index in np.flatnonzero(blank):
+        imported.error(offset + int(index) + 1, name, "Valor obligatorio")
+    return parsed.astype(np.int64)
+
+
+def _epoch_seconds(value: datetime) -> int:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return int(np.datetime64(value, "s").astype(np.int64))
+
+
+def _append_chunk(
+    log: OutageLog,
+    imported: ImportedSection,
+    columns: dict[str, np.ndarray],
+    offset: int,
+) -> None:
+    circuits = np.char.strip(columns["circuito"].astype(str))
+    for index in np.flatnonzero(circuits == ""):
+        imported.error(offset + int(index) + 1, "circuito", "Valor obligatorio")
+    levels = columns["nivel_tension"]
+    for index in np.flatnonzero(~np.isnan(levels) & ~np.isin(levels, [1, 2])):
+        imported.error(offset + int(index) + 1, "nivel_tension", "Debe ser 1 o 2")
+    power = columns["potencia_kw"]
+    for index in np.flatnonzero(power < 0):
+        imported.error(offset + int(index) + 1, "potencia_kw", "Debe ser mayor o igual a 0")
+    starts, ends = columns["inicio"], columns["fin"]
+    dated = (starts != NAT) & (ends != NAT)
+    for index in np.flatnonzero(dated & (ends < starts)):
+        imported.error(offset + int(index) + 1, "fin", "Debe ser posterior a inicio")
+    imported.rows += len(circuits)
+    # Con errores se sigue leyendo para reportarlos, pero ya no se guardan filas.
+    if not imported.error_count:
+        log.append(circuits, levels, power, starts, ends)
+
+
+def _csv_chunks(stream: BinaryIO) -> Iterator[tuple[list[str], list[list[str]]]]:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        first_line = text.readline()
+        if not first_line.strip():
+            return
+        delimiter = ";" if first_line.count(";") > first_line.count(",") else ","
+        header = next(csv.reader([first_line], delimiter=delimiter))
+        names = [name.strip().lower() for name in header]
+        reader = csv.reader(text, delimiter=delimiter)
+        while chunk := list(islice(reader, CHUNK_ROWS)):
+            yield names, [row for row in chunk if row]
+    finally:
+        # Sin `detach` el envoltorio cerraría el archivo subido al liberarse.
+        text.detach()
+
+
+def read_outage_csv(stream: BinaryIO) -> tuple[OutageLog, ImportedSection]:
+    """
+    Lee un CSV de interrupciones por bloques de `CHUNK_ROWS` filas.
+
+    Cada bloque se convierte a arreglos antes de leer el siguiente, de modo
+    que nunca hay más de un bloque como texto en memoria.
+    """
+    log = OutageLog()
+    imported = ImportedSection(section=SECTION)
+    offset = 0
+    for names, rows in _csv_chunks(stream):
+        missing = [name for name in OUTAGE_COLUMNS if name not in names]
+        if missing:
+            for name in missing:
+                imported.error(0, name, "Falta la columna obligatoria")
+            break
+        if not rows:
+            continue
+        width = len(names)
+        for index, row in enumerate(rows):
+            if len(row) != width:
+                imported.error(
+                    offset + index + 1,
+                    "",
+                    f"Se esperaban {width} columnas y se encontraron {len(row)}",
+                )
+                rows[index] = (row + [""] * width)[:width]
+        cells = np.asarray(rows, dtype=str).reshape(len(rows), width)
+        raw = {name: cells[:, names.index(name)] for name in OUTAGE_COLUMNS}
+        columns = {"circuito": raw["circuito"]}
+        for name in ("nivel_tension", "potencia_kw"):
+            columns[name] = _parse_numbers(imported, name, raw[name], offset)
+        for name in ("inicio", "fin"):
+            columns[name] = _parse_timestamps(imported, name, raw[name], offset)
+        _append_chunk(log, imported, columns, offset)
+        offset += len(rows)
+    return log, imported
+
+
+def read_outage_parquet(stream: BinaryIO) -> tuple[OutageLog, ImportedSection]:
+    if pq is None:
+        raise ValueError("La importación Parquet requiere instalar pyarrow")
+    log = OutageLog()
+    imported = ImportedSection(section=SECTION)
+    parquet = pq.ParquetFile(stream)
+    names = {name.strip().lower(): name for name in parquet.schema_arrow.names}
+    missing = [name for name in OUTAGE_COLUMNS if name not in names]
+    for name in missing:
+        imported.error(0, name, "Falta la columna obligatoria")
+    if missing:
+        return log, imported
+
+    offset = 0
+    for batch in parquet.iter_batches(
+        batch_size=CHUNK_ROWS, columns=[names[name] for name in OUTAGE_COLUMNS]
+    ):
+        for name, column in zip(OUTAGE_COLUMNS, batch.columns):
+            nulls = column.is_null().to_numpy(zero_copy_only=False)
+            for index in np.flatnonzero(nulls):
+                imported.error(offset + int(index) + 1, name, "Valor obligatorio")
+        circuit, level, power, start, end = batch.columns
+        try:
+            columns = {
+                "circuito": circuit.cast("string").fill_null("").to_numpy(zero_copy_only=False),
+                "nivel_tension": level.cast("float64").to_numpy(zero_copy_only=False),
+                "potencia_kw": power.cast("float64").to_numpy(zero_copy_only=False),
+                "inicio": start.cast("timestamp[s]").cast("int64").fill_null(NAT).to_numpy(),
+                "fin": end.cast("timestamp[s]").cast("int64").fill_null(NAT).to_numpy(),
+            }
+        except Exception:
+            imported.error(0, "", "Las columnas no tienen el tipo esperado")
+            break
+        _append_chunk(log, imported, columns, offset)
+        offset += batch.num_rows
+    return log, imported
+
+
+def _covering_maximum(
+    size: int, lo: np.ndarray, hi: np.ndarray, values: np.ndarray
+) -> np.ndarray:
+    """
+    Máximo de `values` entre los rangos [lo, hi) que cubren cada posición.
+
+    Cada rango se cubre con dos bloques de 2^k posiciones (el máximo admite
+    solapes) y los bloques se bajan nivel por nivel a sus dos mitades, en
+    O((rangos + posiciones) · log posiciones). Las posiciones sin rango
+    quedan en -inf.
+    """
+    levels = np.floor(np.log2(hi - lo)).astype(np.int64)
+    current = np.full(size, -np.inf)
+    for level in range(int(levels.max()), -1, -1):
+        block = 1 << level
+        pushed = current.copy()
+        pushed[block:] = np.maximum(pushed[block:], current[: size - block])
+        selected = levels == level
+        np.maximum.at(pushed, lo[selected], values[selected])
+        np.maximum.at(pushed, hi[selected] - block, values[selected])
+        current = pushed
+    return current
+
+
+def merge_outages(
+    log: OutageLog,
+    desde: datetime | None = None,
+    hasta: datetime | None = None,
+) -> schemas.AlumbradoInterrupcionesResultado:
+    """
+    Une los intervalos solapados de cada circuito en segmentos elementales.
+
+    Cada circuito se desplaza en el eje del tiempo para que no se cruce con
+    los demás, y todos los inicios y fines parten el eje en segmentos. La
+    potencia de un segmento es la mayor de los registros activos en él, así
+    que un solape cuenta una sola vez con su potencia máxima. Una
+    interrupción es una racha de segmentos cubiertos. Después se suman las
+    horas por (nivel, circuito, potencia): el ID y el VCEEI solo dependen de
+    potencia × horas, así que hay a lo sumo un evento por circuito y potencia.
+    """
+    circuits, levels, power, starts, ends = log.columns()
+    if desde is not None:
+        starts = np.maximum(starts, _epoch_seconds(desde))
+    if hasta is not None:
+        ends = np.minimum(ends, _epoch_seconds(hasta))
+    keep = ends > starts
+    circuits, levels, power, starts, ends = (
+        values[keep] for values in (circuits, levels, power, starts, ends)
+    )
+
+    eventos: list[schemas.EventoDisponibilidadEntrada] = []
+    niveles: dict[int, list[schemas.EventoVceeiEntrada]] = {}
+    interruptions = 0
+    if len(starts):
+        order = np.lexsort((starts, circuits, levels))
+        circuits, levels, power, starts, ends = (
+            values[order] for values in (circuits, levels, power, starts, ends)
+        )
+        new_key = np.r_[True, (levels[1:] != levels[:-1]) | (circuits[1:] != circuits[:-1])]
+        origin = starts.min()
+        span = int(ends.max() - origin) + 1
+        shift = (np.cumsum(new_key) - 1) * span - origin
+        shifted_starts, shifted_ends = starts + shift, ends + shift
+
+        bounds = np.unique(np.concatenate([shifted_starts, shifted_ends]))
+        segment_power = _covering_maximum(
+            len(bounds) - 1,
+            np.searchsorted(bounds, shifted_starts),
+            np.searchsorted(bounds, shifted_ends),
+            power.astype(np.float64),
+        )
+        covered = np.isfinite(segment_power)
+        interruptions = int(np.count_nonzero(covered & ~np.r_[False, covered[:-1]]))
+
+        group = bounds[:-1][covered] // span
+        keys = np.column_stack(
+            [levels[new_key][group], circuits[new_key][group], segment_power[covered]]
+        )
+        hours = np.diff(bounds)[covered] / SECONDS_PER_HOUR
+        unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        total_hours = np.bincount(inverse.ravel(), weights=hours, minlength=len(unique_keys))
+        for (level, _, kw), event_hours in zip(unique_keys, total_hours):
+            eventos.append(
+                schemas.EventoDisponibilidadEntrada(
+                    potencia_kw=float(kw), horas_sin_servicio=float(event_hours)
+                )
+            )
+            niveles.setdefault(int(level), []).append(
+                schemas.EventoVceeiEntrada(
+                    potencia_kw=float(kw), horas_indisponibilidad=float(event_hours)
+                )
+            )
+
+    return schemas.AlumbradoInterrupcionesResultado(
+        registros=log.rows,
+        interrupciones=interruptions,
+        circuitos=len(log.circuit_ids),
+        indisponibilidad_kw_h=money(
+            sum(event.potencia_kw * event.horas_sin_servicio for event in eventos)
+        ),
+        eventos_disponibilidad=eventos,
+        niveles=[
+            schemas.InterrupcionesNivelResultado(
+                nivel_tension=level,
+                vceei_eventos=events,
+                vceei_kw_h=money(
+                    sum(event.potencia_kw * event.horas_indisponibilidad for event in events)
+                ),
+            )
+            for level, events in sorted(niveles.items())
+        ],
+    )
+
+
+def aggregate_outage_log(
+    filename: str,
+    stream: BinaryIO,
+    desde: datetime | None = None,
+    hasta: datetime | None = None,
+) -> schemas.AlumbradoInterrupcionesResultado:
+    """
+    Eventos de disponibilidad y VCEEI a partir de un registro crudo de interrupciones.
+
+    El archivo (CSV o Parquet) trae `circuito`, `nivel_tension`,
+    `potencia_kw`, `inicio` y `fin`; `desde` y `hasta` recortan los
+    intervalos al periodo facturado. Si alguna fila es inválida se lanza
+    `InventoryImportError` con el detalle por fila.
+    """
+    if filename.lower().endswith(".parquet"):
+        log, imported = read_outage_parquet(stream)
+    else:
+        log, imported = read_outage_csv(stream)
+    if imported.error_count:
+        raise InventoryImportError(imported.errors, imported.error_count)
+    return merge_outages(log, desde=desde, hasta=hasta)
+
+
+def apply_outage_events(
+    header: schemas.AlumbradoCalculoEntrada,
+    outages: schemas.AlumbradoInterrupcionesResultado,
+) -> schemas.AlumbradoCalculoEntrada:
+    """Suma los eventos agregados a `disponibilidad.eventos` y a `vceei_eventos` por nivel."""
+    declared = {item.nivel_tension for item in header.aom_niveles}
+    for nivel in outages.niveles:
+        if nivel.nivel_tension not in declared:
+            raise ValueError(
+                f"El nivel de tensión {nivel.nivel_tension} no está declarado en aom_niveles"
+            )
+    by_level = {nivel.nivel_tension: nivel.vceei_eventos for nivel in outages.niveles}
+    disponibilidad = header.disponibilidad.model_copy(
+        update={"eventos": header.disponibilidad.eventos + outages.eventos_disponibilidad}
+    )
+    aom_niveles = [
+        item.model_copy(
+            update={"vceei_eventos": item.vceei_eventos + by_level.get(item.nivel_tension, [])}
+        )
+        for item in header.aom_niveles
+    ]
+    return header.model_copy(
+        update={"disponibilidad": disponibilidad, "aom_niveles": aom_niveles}
+    )
@@ -0,0 +1,142 @@
+import json
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.alumbrado import ParametrosAlumbrado
+from app.schemas import alumbrado as schemas
+from app.services.alumbrado_cache import CalculationCache
+from app.services.alumbrado_calculator import DEFAULT_PARAMETERS, RegulatoryParameters
+
+# Parámetros vigentes por tenant. Una publicación en este proceso invalida su
+# entrada; los demás procesos la ven al vencer el TTL.
+parameters_cache = CalculationCache(
+    max_entries=settings.ALUMBRADO_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ALUMBRADO_PARAMETERS_CACHE_TTL_SECONDS,
+)
+
+
+def _to_parameters(row: ParametrosAlumbrado) -> RegulatoryParameters:
+    return RegulatoryParameters(
+        version=row.version,
+        eficacia_referencia=row.eficacia_referencia,
+        faoms_marino=row.faoms_marino,
+        faoml_por_anno={
+            int(year): value for year, value in json.loads(row.faoml_por_anno).items()
+        },
+        faoml_minimo=row.faoml_minimo,
+        anno_faoml_minimo=row.anno_faoml_minimo,
+    )
+
+
+def _latest_row(db: Session, tenant_id: str) -> ParametrosAlumbrado | None:
+    return (
+        db.query(ParametrosAlumbrado)
+        .filter(ParametrosAlumbrado.tenant_id == tenant_id)
+        .order_by(ParametrosAlumbrado.version.desc())
+        .first()
+    )
+
+
+def load_parameters(db: Session, tenant_id: str) -> RegulatoryParameters:
+    row = _latest_row(db, tenant_id)
+    return DEFAULT_PARAMETERS if row is None else _to_parameters(row)
+
+
+def get_parameters(db: Session, tenant_id: str) -> RegulatoryParameters:
+    """Parámetros vigentes del tenant, leídos de la caché en proceso."""
+    return parameters_cache.get_or_compute(tenant_id, lambda: load_parameters(db, tenant_id))
+
+
+def get_parameters_version(
+    db: Session, tenant_id: str, version: int
+) -> RegulatoryParameters | None:
+    """Una versión publicada del tenant; las versiones no cambian una vez creadas."""
+    if version == DEFAULT_PARAMETERS.version:
+        return DEFAULT_PARAMETERS
+
+    def load() -> RegulatoryParameters | None:
+        row = (
+            db.query(ParametrosAlumbrado)
+            .filter(
+                ParametrosAlumbrado.tenant_id == tenant_id,
+                ParametrosAlumbrado.version == version,
+            )
+            .first()
+        )
+        return None if row is None else _to_parameters(row)
+
+    return parameters_cache.get_or_compute(f"{tenant_id}:{version}", load)
+
+
+def describe_parameters(
+    parameters: RegulatoryParameters, row: ParametrosAlumbrado | None = None
+) -> schemas.ParametrosRegulatorios:
+    return schemas.ParametrosRegulatorios(
+        version=parameters.version,
+        descripcion=row.descripcion if row is not None else None,
+        eficacia_referencia=parameters.eficacia_referencia,
+        faoms_marino=parameters.faoms_marino,
+        faoml_por_anno=dict(parameters.faoml_por_anno),
+        faoml_minimo=parameters.faoml_minimo,
+        anno_faoml_minimo=parameters.anno_faoml_minimo,
+        fecha_creacion=row.fecha_creacion if row is not None else None,
+    )
+
+
+def list_parameter_versions(db: Session, tenant_id: str) -> list[schemas.ParametrosRegulatorios]:
+    rows = (
+        db.query(ParametrosAlumbrado)
+        .filter(ParametrosAlumbrado.tenant_id == tenant_id)
+        .order_by(ParametrosAlumbrado.version)
+        .all()
+    )
+    return [describe_parameters(DEFAULT_PARAMETERS)] + [
+        describe_parameters(_to_parameters(row), row) for row in rows
+    ]
+
+
+def publish_parameters(
+    db: Session, tenant_id: str, changes: schemas.ParametrosRegulatoriosEntrada
+) -> schemas.ParametrosRegulatorios:
+    """
+    Publica la siguiente versión del tenant a partir de la vigente.
+
+    Los años de `faoml_por_anno` se combinan con los de la versión vigente.
+    Si otra publicación del mismo tenant gana la carrera por el número de
+    versión, se lanza ValueError.
+    """
+    current = load_parameters(db, tenant_id)
+    faoml_por_anno = {**current.faoml_por_anno, **changes.faoml_por_anno}
+    row = ParametrosAlumbrado(
+        tenant_id=tenant_id,
+        version=current.version + 1,
+        descripcion=changes.descripcion,
+        eficacia_referencia=(
+            changes.eficacia_referencia
+            if changes.eficacia_referencia is not None
+            else current.eficacia_referencia
+        ),
+        faoms_marino=(
+            changes.faoms_marino if changes.faoms_marino is not None else current.faoms_marino
+        ),
+        faoml_por_anno=json.dumps(dict(sorted(faoml_por_anno.items()))),
+        faoml_minimo=(
+            changes.faoml_minimo if changes.faoml_minimo is not None else current.faoml_minimo
+        ),
+        anno_faoml_minimo=(
+            changes.anno_faoml_minimo
+            if changes.anno_faoml_minimo is not None
+            else current.anno_faoml_minimo
+        ),
+    )
+    db.add(row)
+    try:
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        raise ValueError("Otra versión de parámetros se publicó al mismo tiempo") from exc
+    db.refresh(row)
+    parameters_cache.invalidate(tenant_id)
+    return describe_parameters(_to_parameters(row), row)
@@ -0,0 +1,214 @@
+from collections import Counter
+from dataclasses import replace
+
+from sqlalchemy.orm import Session
+
+from app.models.alumbrado import CalculoAlumbrado
+from app.schemas import alumbrado as schemas
+from app.services.alumbrado_cache import calculation_hash
+from app.services.alumbrado_calculator import (
+    AVAILABILITY_EVENT_SPEC,
+    DEFAULT_PARAMETERS,
+    VCEEI_EVENT_SPEC,
+    RegulatoryParameters,
+    SectionTotals,
+    aforo_energy_sum,
+    aforo_specs,
+    build_calculation_result,
+    group_ucaps,
+    integrate_load_profiles,
+    money,
+    terrenos_value,
+    ucap_caae_sum,
+    weighted_event_sum,
+)
+from app.services.alumbrado_inventory import get_inventory, inventory_key, inventory_totals
+from app.services.alumbrado_parameters import get_parameters_version
+from app.services.alumbrado_store import load_input, load_result, load_totals, update_calculation
+
+# Un cálculo sin inventario no suma nada al nivel reemplazado.
+EMPTY_INVENTORY_TOTALS = SectionTotals(
+    cee_aforado_kwh={}, caae={}, terrenos_valor={}, indisponibilidad_kw_h=0.0, vceei_kw_h={}
+)
+
+# Componentes del CAP que cambian con cada sección del parche.
+AFFECTED_COMPONENTS = {
+    "energia_nivel": ["csee", "caom"],
+    "inversion_nivel": ["cinv"],
+    "aom_nivel": ["caom"],
+    "disponibilidad": ["id_disponibilidad", "cinv", "caom"],
+    "agregar_vceei_eventos": ["caom"],
+}
+
+
+def _replace_level(items: list, replacement, section: str) -> list:
+    levels = [item.nivel_tension for item in items]
+    if replacement.nivel_tension not in levels:
+        raise ValueError(
+            f"No existe el nivel de tensión {replacement.nivel_tension} en {section}"
+        )
+    return [
+        replacement if item.nivel_tension == replacement.nivel_tension else item
+        for item in items
+    ]
+
+
+def apply_patch(
+    payload: schemas.AlumbradoCalculoEntrada,
+    totals: SectionTotals,
+    patch: schemas.CalculoAlumbradoParche,
+    parameters: RegulatoryParameters = DEFAULT_PARAMETERS,
+    inventory_totals: SectionTotals | None = None,
+) -> tuple[schemas.AlumbradoCalculoEntrada, SectionTotals]:
+    """
+    Aplica el parche a la entrada y a las sumas por nivel guardadas.
+
+    Solo se reduce la lista de la sección modificada; las sumas del resto de
+    niveles y secciones se reutilizan tal como quedaron en el cálculo anterior.
+    Si la entrada referencia un inventario, `inventory_totals` trae sus sumas
+    en la versión fijada, que se vuelven a sumar al nivel reemplazado.
+    """
+    inventory = inventory_totals or EMPTY_INVENTORY_TOTALS
+    if patch.energia_nivel is not None:
+        item = patch.energia_nivel
+        payload = payload.model_copy(
+            update={
+                "energia_niveles": _replace_level(
+                    payload.energia_niveles, item, "energia_niveles"
+                )
+            }
+        )
+        cee_aforado_kwh = dict(totals.cee_aforado_kwh)
+        cee_aforado_kwh[item.nivel_tension] = aforo_energy_sum(
+            aforo_specs(item.aforos, integrate_load_profiles(payload))
+        ) + inventory.cee_aforado_kwh.get(item.nivel_tension, 0.0)
+        return payload, replace(totals, cee_aforado_kwh=cee_aforado_kwh)
+
+    if patch.inversion_nivel is not None:
+        item = patch.inversion_nivel
+        payload = payload.model_copy(
+            update={
+                "inversion_niveles": _replace_level(
+                    payload.inversion_niveles, item, "inversion_niveles"
+                )
+            }
+        )
+        caae = dict(totals.caae)
+        caae[item.nivel_tension] = ucap_caae_sum(
+            group_ucaps(item.ucap), payload.tasa_retorno, parameters.eficacia_referencia
+        ) + inventory.caae.get(item.nivel_tension, 0.0)
+        terrenos_valor = dict(totals.terrenos_valor)
+        terrenos_valor[item.nivel_tension] = terrenos_value(item.terrenos) + (
+            inventory.terrenos_valor.get(item.nivel_tension, 0.0)
+        )
+        return payload, replace(totals, caae=caae, terrenos_valor=terrenos_valor)
+
+    if patch.aom_nivel is not None:
+        item = patch.aom_nivel
+        payload = payload.model_copy(
+            update={"aom_niveles": _replace_level(payload.aom_niveles, item, "aom_niveles")}
+        )
+        vceei_kw_h = dict(totals.vceei_kw_h)
+        vceei_kw_h[item.nivel_tension] = weighted_event_sum(
+            Counter(map(VCEEI_EVENT_SPEC, item.vceei_eventos))
+        )
+        return payload, replace(totals, vceei_kw_h=vceei_kw_h)
+
+    if patch.disponibilidad is not None:
+        payload = payload.model_copy(update={"disponibilidad": patch.disponibilidad})
+        return payload, replace(
+            totals,
+            indisponibilidad_kw_h=weighted_event_sum(
+                Counter(map(AVAILABILITY_EVENT_SPEC, patch.disponibilidad.eventos))
+            ),
+        )
+
+    added = patch.agregar_vceei_eventos
+    aom_level_map = {item.nivel_tension: item for item in payload.aom_niveles}
+    level_item = aom_level_map.get(added.nivel_tension)
+    if level_item is None:
+        raise ValueError(f"No existe el nivel de tensión {added.nivel_tension} en aom_niveles")
+    updated_item = level_item.model_copy(
+        update={"vceei_eventos": [*level_item.vceei_eventos, *added.eventos]}
+    )
+    payload = payload.model_copy(
+        update={"aom_niveles": _replace_level(payload.aom_niveles, updated_item, "aom_niveles")}
+    )
+    vceei_kw_h = dict(totals.vceei_kw_h)
+    vceei_kw_h[added.nivel_tension] += weighted_event_sum(
+        Counter(map(VCEEI_EVENT_SPEC, added.eventos))
+    )
+    return payload, replace(totals, vceei_kw_h=vceei_kw_h)
+
+
+def calculation_delta(
+    previous: schemas.AlumbradoCalculoResultado,
+    current: schemas.AlumbradoCalculoResultado,
+    affected: list[str],
+) -> schemas.CalculoAlumbradoDelta:
+    return schemas.CalculoAlumbradoDelta(
+        componentes_afectados=affected,
+        id_disponibilidad=money(current.id_disponibilidad - previous.id_disponibilidad),
+        csee=money(current.csee - previous.csee),
+        cinv=money(current.cinv - previous.cinv),
+        caom=money(current.caom - previous.caom),
+        cap=money(current.cap - previous.cap),
+    )
+
+
+def patch_calculation(
+    db: Session,
+    calculo: CalculoAlumbrado,
+    patch: schemas.CalculoAlumbradoParche,
+) -> tuple[schemas.AlumbradoCalculoResultado, schemas.CalculoAlumbradoDelta]:
+    """
+    Recalcula un cálculo guardado a partir de un cambio en una sola sección.
+
+    Usa la versión de parámetros con la que se guardó, la misma de las sumas
+    que se reutilizan; el cambio de versión lo hace el recálculo masivo.
+    """
+    parameters = get_parameters_version(db, calculo.tenant_id, calculo.version_parametros)
+    if parameters is None:
+        raise ValueError(
+            f"No existe la versión {calculo.version_parametros} de parámetros del cálculo"
+        )
+    previous = load_result(calculo)
+    payload = load_input(calculo)
+    inventario = None
+    if payload.inventario_id is not None:
+        inventario = get_inventory(db, calculo.tenant_id, payload.inventario_id)
+        if inventario is None:
+            raise ValueError("El inventario del cálculo ya no existe")
+    payload, totals = apply_patch(
+        payload,
+        load_totals(calculo),
+        patch,
+        parameters,
+        inventory_totals=(
+            inventory_totals(
+                db, inventario, payload.tasa_retorno, parameters, payload.inventario_version
+            )
+            if inventario
+            else None
+        ),
+    )
+    result = build_calculation_result(
+        payload=payload, tenant_id=calculo.tenant_id, totals=totals, parameters=parameters
+    )
+    update_calculation(
+        db,
+        calculo,
+        payload=payload,
+        result=result,
+        totals=totals,
+        content_hash=calculation_hash(
+            payload,
+            calculo.tenant_id,
+            inventory_key=(
+                inventory_key(inventario, payload.inventario_version) if inventario else None
+            ),
+            parameters_version=parameters.version,
+        ),
+    )
+    section = next(iter(patch.model_fields_set))
+    return result, calculation_delta(previous, result, AFFECTED_COMPONENTS[section])
@@ -0,0 +1,86 @@
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from threading import Lock
+from typing import Any, Callable
+
+from app.core.config import settings
+
+_POOL: ProcessPoolExecutor | None = None
+_POOL_LOCK = Lock()
+_PENDING = 0
+_PENDING_LOCK = Lock()
+
+
+class PoolSaturatedError(RuntimeError):
+    """El pool ya tiene `ALUMBRADO_POOL_MAX_PENDING` cálculos enviados sin terminar."""
+
+
+def get_calculation_pool() -> ProcessPoolExecutor:
+    """
+    Devuelve el pool de procesos compartido para cálculos de alumbrado.
+
+    El pool se crea en el primer uso y se mantiene caliente hasta el apagado
+    de la aplicación. Se usa "spawn" para no heredar hilos ni conexiones del
+    servidor web.
+    """
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(
+                max_workers=settings.ALUMBRADO_POOL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _POOL
+
+
+def shutdown_calculation_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def pending_calculations() -> int:
+    with _PENDING_LOCK:
+        return _PENDING
+
+
+def _release(_: Future) -> None:
+    global _PENDING
+    with _PENDING_LOCK:
+        _PENDING -= 1
+
+
+def submit_calculation(fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+    """
+    Envía un cálculo al pool respetando el límite de cola.
+
+    Cuenta los cálculos enviados con esta función que aún no terminan (en
+    ejecución o en espera); si ya hay `ALUMBRADO_POOL_MAX_PENDING` lanza
+    `PoolSaturatedError` en lugar de encolar.
+    """
+    global _PENDING
+    with _PENDING_LOCK:
+        if _PENDING >= settings.ALUMBRADO_POOL_MAX_PENDING:
+            raise PoolSaturatedError("El pool de cálculo está saturado")
+        _PENDING += 1
+    try:
+        future = get_calculation_pool().submit(fn, *args, **kwargs)
+    except BaseException:
+        _release(None)
+        raise
+    future.add_done_callback(_release)
+    return future
+
+
+def warm_calculation_pool(task: Callable[[], Any]) -> None:
+    """
+    Arranca todos los procesos del pool antes de la primera solicitud.
+
+    `task` se ejecuta una vez por worker; importar su módulo deja cargadas
+    en cada proceso las dependencias del cálculo.
+    """
+    pool = get_calculation_pool()
+    for future in [pool.submit(task) for _ in range(settings.ALUMBRADO_POOL_WORKERS)]:
+        future.result()
@@ -0,0 +1,130 @@
+import bisect
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Iterator
+
+# Límites superiores (ms) de los buckets de los histogramas por etapa.
+HISTOGRAM_BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class StageProfile:
+    """
+    Tiempos por etapa de una solicitud.
+
+    `mark` registra el tiempo transcurrido desde la marca anterior (o desde
+    `restart`), de modo que las etapas numeradas del cálculo se instrumentan
+    con una línea al final de cada una.
+    """
+
+    def __init__(self) -> None:
+        self.stages: list[tuple[str, float, int]] = []
+        self._checkpoint = time.perf_counter()
+
+    def restart(self) -> None:
+        self._checkpoint = time.perf_counter()
+
+    def mark(self, name: str, items: int = 0) -> None:
+        now = time.perf_counter()
+        self.stages.append((name, now - self._checkpoint, items))
+        self._checkpoint = now
+
+    @contextmanager
+    def measure(self, name: str, items: int = 0) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - started, items))
+
+    def server_timing(self) -> str:
+        """Valor del header `Server-Timing`; `desc` lleva la cantidad de ítems."""
+        return ", ".join(
+            f'{name};desc="n={items}";dur={seconds * 1000:.3f}'
+            for name, seconds, items in self.stages
+        )
+
+
+class _DisabledProfile:
+    """Perfil nulo: sus métodos no hacen nada cuando el perfilado está apagado."""
+
+    def restart(self) -> None:
+        pass
+
+    def mark(self, name: str, items: int = 0) -> None:
+        pass
+
+    def measure(self, name: str, items: int = 0):
+        return nullcontext()
+
+
+_DISABLED_PROFILE = _DisabledProfile()
+_active_profile: ContextVar[StageProfile | None] = ContextVar(
+    "alumbrado_stage_profile", default=None
+)
+
+
+def stage_timer() -> StageProfile | _DisabledProfile:
+    """Perfil de la solicitud en curso, o uno nulo si no se está perfilando."""
+    return _active_profile.get() or _DISABLED_PROFILE
+
+
+@contextmanager
+def profiled() -> Iterator[StageProfile]:
+    profile = StageProfile()
+    token = _active_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _active_profile.reset(token)
+
+
+class StageHistograms:
+    """Histogramas acumulados de duración e ítems por etapa."""
+
+    def __init__(self, buckets_ms: tuple[float, ...] = HISTOGRAM_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self._stages: dict[str, dict[str, Any]] = {}
+        self._lock = Lock()
+
+    def record(self, profile: StageProfile) -> None:
+        with self._lock:
+            for name, seconds, items in profile.stages:
+                milliseconds = seconds * 1000
+                stage = self._stages.get(name)
+                if stage is None:
+                    stage = self._stages[name] = {
+                        "conteo": 0,
+                        "suma_ms": 0.0,
+                        "max_ms": 0.0,
+                        "items": 0,
+                        "buckets": [0] * (len(self.buckets_ms) + 1),
+                    }
+                stage["conteo"] += 1
+                stage["suma_ms"] += milliseconds
+                stage["max_ms"] = max(stage["max_ms"], milliseconds)
+                stage["items"] += items
+                stage["buckets"][bisect.bisect_left(self.buckets_ms, milliseconds)] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stages.clear()
+
+    def stats(self) -> dict[str, Any]:
+        labels = [f"<={limit:g}" for limit in self.buckets_ms] + ["+Inf"]
+        with self._lock:
+            return {
+                name: {
+                    "conteo": stage["conteo"],
+                    "suma_ms": round(stage["suma_ms"], 3),
+                    "promedio_ms": round(stage["suma_ms"] / stage["conteo"], 3),
+                    "max_ms": round(stage["max_ms"], 3),
+                    "items": stage["items"],
+                    "buckets_ms": dict(zip(labels, stage["buckets"])),
+                }
+                for name, stage in self._stages.items()
+            }
+
+
+stage_histograms = StageHistograms()
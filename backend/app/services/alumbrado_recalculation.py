@@ -0,0 +1,316 @@
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+from sqlalchemy.orm import Query, Session
+
+from app.core.config import settings
+from app.models.alumbrado import CalculoAlumbrado
+from app.schemas import alumbrado as schemas
+from app.services.alumbrado_cache import payload_json_hash
+from app.services.alumbrado_calculator import (
+    RegulatoryParameters,
+    SectionTotals,
+    add_section_totals,
+    build_calculation_result,
+    reduce_sections,
+)
+from app.services.alumbrado_inventory import get_inventory, inventory_key, inventory_totals
+from app.services.alumbrado_parameters import get_parameters_version
+from app.services.alumbrado_patch import calculation_delta
+from app.services.alumbrado_pool import PoolSaturatedError, submit_calculation
+from app.services.alumbrado_store import (
+    assign_result,
+    decompress_json,
+    load_input,
+    load_result,
+    load_totals,
+)
+
+
+@dataclass(frozen=True)
+class StoredCalculation:
+    """
+    Copia de las columnas de un `CalculoAlumbrado` que viaja al pool.
+
+    Conserva los nombres de las columnas para leerse con las funciones de
+    `alumbrado_store`. Si la entrada referencia un inventario, lleva la clave
+    de su versión fijada y sus sumas con los parámetros nuevos, resueltas en
+    el proceso que tiene la base de datos.
+    """
+
+    id: int
+    tenant_id: str
+    municipio: str
+    periodo: str
+    anno_aplicacion: int
+    version_parametros: int
+    entrada_comprimida: bytes
+    resultado_comprimido: bytes
+    totales_comprimidos: bytes
+    inventory_key: str | None = None
+    inventory_totals: SectionTotals | None = None
+
+
+@dataclass(frozen=True)
+class RecalculatedItem:
+    """Resultado nuevo de un cálculo guardado; `diferencia` es None si no cambió."""
+
+    calculo_id: int
+    result: schemas.AlumbradoCalculoResultado | None = None
+    totals: SectionTotals | None = None
+    content_hash: str | None = None
+    diferencia: schemas.RecalculoDiferencia | None = None
+
+
+def affected_components(
+    previous: RegulatoryParameters, current: RegulatoryParameters, year: int
+) -> list[str]:
+    """Componentes del CAP que cambian entre dos versiones para un año de aplicación."""
+    components = []
+    if previous.eficacia_referencia != current.eficacia_referencia:
+        components.append("cinv")
+    if (
+        previous.faoml(year) != current.faoml(year)
+        or previous.faoms_marino != current.faoms_marino
+    ):
+        components.append("caom")
+    return components
+
+
+def recalculate_item(
+    item: StoredCalculation,
+    parameters: RegulatoryParameters,
+    previous: RegulatoryParameters,
+    engine: str | None = None,
+) -> RecalculatedItem:
+    """
+    Recalcula un cálculo guardado con `parameters`.
+
+    Si ningún componente cambia para su año solo se actualizan la versión y
+    el hash, sin validar la entrada. Si la eficacia de referencia no cambió,
+    las sumas por nivel guardadas se reutilizan y solo se repiten las etapas.
+    """
+    stored_result = load_result(item)
+    content_hash = payload_json_hash(
+        decompress_json(item.entrada_comprimida),
+        item.tenant_id,
+        inventory_key=item.inventory_key,
+        parameters_version=parameters.version,
+    )
+    components = affected_components(previous, parameters, item.anno_aplicacion)
+    if not components:
+        return RecalculatedItem(
+            calculo_id=item.id,
+            result=stored_result.model_copy(update={"version_parametros": parameters.version}),
+            totals=load_totals(item),
+            content_hash=content_hash,
+        )
+
+    try:
+        payload = load_input(item)
+        if "cinv" in components:
+            totals = reduce_sections(payload, engine=engine, parameters=parameters)
+            if payload.inventario_id is not None:
+                if item.inventory_totals is None:
+                    raise ValueError("El inventario del cálculo ya no existe")
+                totals = add_section_totals(totals, item.inventory_totals)
+        else:
+            totals = load_totals(item)
+        result = build_calculation_result(
+            payload=payload, tenant_id=item.tenant_id, totals=totals, parameters=parameters
+        )
+    except ValueError as exc:
+        return RecalculatedItem(
+            calculo_id=item.id,
+            diferencia=schemas.RecalculoDiferencia(
+                calculo_id=item.id,
+                municipio=item.municipio,
+                periodo=item.periodo,
+                version_anterior=item.version_parametros,
+                cap_anterior=stored_result.cap,
+                error=str(exc),
+            ),
+        )
+
+    unchanged = {"version_parametros"}
+    diferencia = None
+    if result.model_dump(exclude=unchanged) != stored_result.model_dump(exclude=unchanged):
+        diferencia = schemas.RecalculoDiferencia(
+            calculo_id=item.id,
+            municipio=item.municipio,
+            periodo=item.periodo,
+            version_anterior=item.version_parametros,
+            cap_anterior=stored_result.cap,
+            cap_nuevo=result.cap,
+            delta=calculation_delta(stored_result, result, components),
+        )
+    return RecalculatedItem(
+        calculo_id=item.id,
+        result=result,
+        totals=totals,
+        content_hash=content_hash,
+        diferencia=diferencia,
+    )
+
+
+def recalculate_chunk(
+    items: list[StoredCalculation],
+    parameters: RegulatoryParameters,
+    previous: dict[int, RegulatoryParameters],
+    engine: str | None = None,
+) -> list[RecalculatedItem]:
+    """Bloque de `recalculate_item`; es la tarea que se envía al pool."""
+    return [
+        recalculate_item(item, parameters, previous[item.version_parametros], engine)
+        for item in items
+    ]
+
+
+def outdated_calculations(
+    db: Session, tenant_id: str, version: int, after_id: int = 0
+) -> Query:
+    """Cálculos del tenant guardados con una versión anterior, en orden de id."""
+    return (
+        db.query(CalculoAlumbrado)
+        .filter(
+            CalculoAlumbrado.tenant_id == tenant_id,
+            CalculoAlumbrado.version_parametros < version,
+            CalculoAlumbrado.id > after_id,
+        )
+        .order_by(CalculoAlumbrado.id)
+    )
+
+
+def count_outdated_calculations(
+    db: Session, tenant_id: str, version: int, after_id: int = 0
+) -> int:
+    return outdated_calculations(db, tenant_id, version, after_id).order_by(None).count()
+
+
+def _stored(
+    db: Session, calculo: CalculoAlumbrado, parameters: RegulatoryParameters
+) -> StoredCalculation:
+    key = totals = None
+    inventario = (
+        get_inventory(db, calculo.tenant_id, calculo.inventario_id)
+        if calculo.inventario_id is not None
+        else None
+    )
+    if inventario is not None:
+        key = inventory_key(inventario, calculo.inventario_version)
+        payload = load_input(calculo)
+        totals = inventory_totals(
+            db, inventario, payload.tasa_retorno, parameters, calculo.inventario_version
+        )
+    return StoredCalculation(
+        id=calculo.id,
+        tenant_id=calculo.tenant_id,
+        municipio=calculo.municipio,
+        periodo=calculo.periodo,
+        anno_aplicacion=calculo.anno_aplicacion,
+        version_parametros=calculo.version_parametros,
+        entrada_comprimida=calculo.entrada_comprimida,
+        resultado_comprimido=calculo.resultado_comprimido,
+        totales_comprimidos=calculo.totales_comprimidos,
+        inventory_key=key,
+        inventory_totals=totals,
+    )
+
+
+def _previous_parameters(
+    db: Session, tenant_id: str, versions: set[int]
+) -> dict[int, RegulatoryParameters]:
+    previous = {}
+    for version in versions:
+        parameters = get_parameters_version(db, tenant_id, version)
+        if parameters is None:
+            raise ValueError(f"No existe la versión {version} de parámetros")
+        previous[version] = parameters
+    return previous
+
+
+def _recalculated_chunks(
+    db: Session,
+    tenant_id: str,
+    parameters: RegulatoryParameters,
+    after_id: int,
+    engine: str | None,
+) -> Iterator[tuple[list[CalculoAlumbrado], list[RecalculatedItem]]]:
+    """
+    Bloques recalculados en orden de id.
+
+    Con el pool se mantienen tantos bloques en vuelo como workers; cada uno
+    se entrega en orden aunque otro posterior termine antes. Los bloques se
+    envían con `submit_calculation` y, si el pool está saturado, se calculan
+    en el hilo del trabajo en lugar de fallar.
+    """
+    chunk_size = settings.ALUMBRADO_JOB_PROGRESS_CHUNK
+    remaining = count_outdated_calculations(db, tenant_id, parameters.version, after_id)
+    parallel = remaining >= max(settings.ALUMBRADO_BATCH_PARALLEL_MIN_ITEMS, 2)
+    window = settings.ALUMBRADO_POOL_WORKERS if parallel else 1
+    pending = deque()
+    exhausted = False
+    while True:
+        while not exhausted and len(pending) < window:
+            rows = (
+                outdated_calculations(db, tenant_id, parameters.version, after_id)
+                .limit(chunk_size)
+                .all()
+            )
+            if not rows:
+                exhausted = True
+                break
+            after_id = rows[-1].id
+            args = (
+                [_stored(db, row, parameters) for row in rows],
+                parameters,
+                _previous_parameters(db, tenant_id, {row.version_parametros for row in rows}),
+                engine or settings.ALUMBRADO_CALCULATION_ENGINE,
+            )
+            if parallel:
+                try:
+                    pending.append((rows, submit_calculation(recalculate_chunk, *args)))
+                    continue
+                except PoolSaturatedError:
+                    pass
+            pending.append((rows, recalculate_chunk(*args)))
+        if not pending:
+            return
+        rows, outcome = pending.popleft()
+        yield rows, outcome.result() if isinstance(outcome, Future) else outcome
+
+
+def recalculate_outdated(
+    db: Session,
+    tenant_id: str,
+    parameters: RegulatoryParameters,
+    report: schemas.AlumbradoRecalculoResultado,
+    engine: str | None = None,
+) -> Iterator[schemas.AlumbradoRecalculoResultado]:
+    """
+    Recalcula por bloques los cálculos guardados con versiones anteriores.
+
+    Retoma después de `report.ultimo_calculo_id`. Tras aplicar cada bloque a
+    las filas de la sesión entrega el reporte acumulado sin confirmar la
+    transacción: quien llama guarda filas, reporte y avance en un mismo
+    commit, de modo que una interrupción solo repite el bloque en curso. Los
+    cálculos que fallan conservan su versión y quedan en el reporte.
+    """
+    chunks = _recalculated_chunks(db, tenant_id, parameters, report.ultimo_calculo_id, engine)
+    for rows, outcomes in chunks:
+        for row, outcome in zip(rows, outcomes):
+            report.revisados += 1
+            if outcome.result is None:
+                report.fallidos += 1
+            else:
+                assign_result(db, row, outcome.result, outcome.totals, outcome.content_hash)
+                if outcome.diferencia is None:
+                    report.sin_cambios += 1
+                else:
+                    report.actualizados += 1
+            if outcome.diferencia is not None:
+                report.diferencias.append(outcome.diferencia)
+        report.ultimo_calculo_id = rows[-1].id
+        yield report
@@ -0,0 +1,290 @@
+from dataclasses import dataclass
+from itertools import product
+
+from app.schemas import alumbrado as schemas
+from app.services.alumbrado_calculator import (
+    DEFAULT_PARAMETERS,
+    NormalizedSections,
+    RegulatoryParameters,
+    annualized_capital,
+    aom_level_costs,
+    availability_index,
+    capital_by_life,
+    cee_total_kwh,
+    investment_level_costs,
+    ipp_factor,
+    money,
+    normalize_sections,
+    reject_inventory_reference,
+    to_level_map,
+    total_cotr,
+    within_environmental_cap,
+)
+
+SCENARIO_COLUMNS = [
+    "tasa_retorno",
+    "anno_aplicacion",
+    "faoml",
+    "factor_ipp",
+    "csee",
+    "cinv",
+    "caom",
+    "cotr",
+    "cap",
+    "cap_actualizado",
+    "cumple_tope_ambiental",
+]
+
+
+@dataclass(frozen=True)
+class InvestmentLevelBasis:
+    nivel_tension: int
+    capital_by_life: dict[int, float]
+    cat_n: float
+
+
+@dataclass(frozen=True)
+class AOMLevelBasis:
+    nivel_tension: int
+    cra_n: float
+    cral_n: float
+    tee: float
+    vceei_kw_h: float
+
+
+@dataclass(frozen=True)
+class CalculationBasis:
+    """
+    Partes del cálculo que no dependen de la tasa de retorno, del FAOML ni del IPP.
+
+    CSEE e ID se resuelven una sola vez; el capital de las UCAP queda agrupado
+    por vida útil para anualizarlo con cualquier tasa sin recorrer el inventario.
+    Las etapas usan las fórmulas de `alumbrado_calculator`.
+    """
+
+    csee: float
+    id_value: float
+    ne_fraccion: float
+    faom_n: float
+    faoms: float
+    cral_total: float
+    cotr: float
+    costos_ambientales: float
+    investment_levels: list[InvestmentLevelBasis]
+    aom_levels: list[AOMLevelBasis]
+
+    def cinv(self, rate: float) -> float:
+        return sum(
+            investment_level_costs(
+                annualized_capital(level.capital_by_life, rate),
+                level.cat_n,
+                self.ne_fraccion,
+                self.id_value,
+            ).cinv_n
+            for level in self.investment_levels
+        )
+
+    def caom(self, faoml: float) -> float:
+        return sum(
+            aom_level_costs(
+                level.cra_n,
+                level.cral_n,
+                level.tee,
+                level.vceei_kw_h,
+                cral_total=self.cral_total,
+                faom_n=self.faom_n,
+                faoml=faoml,
+                faoms=self.faoms,
+                id_value=self.id_value,
+            ).caom_n
+            for level in self.aom_levels
+        )
+
+    def within_environmental_cap(self, caom: float) -> bool:
+        return within_environmental_cap(self.costos_ambientales, caom)
+
+
+def build_calculation_basis(
+    payload: schemas.AlumbradoCalculoEntrada,
+    normalized: NormalizedSections | None = None,
+    parameters: RegulatoryParameters = DEFAULT_PARAMETERS,
+) -> CalculationBasis:
+    reject_inventory_reference(payload)
+    energy_level_map = to_level_map(payload.energia_niveles, "nivel_tension")
+    investment_level_map = to_level_map(payload.inversion_niveles, "nivel_tension")
+    aom_level_map = to_level_map(payload.aom_niveles, "nivel_tension")
+    normalized = normalized or normalize_sections(payload)
+    totals = normalized.totals(payload.tasa_retorno, parameters)
+
+    csee = 0.0
+    for level in sorted(energy_level_map):
+        item = energy_level_map[level]
+        csee += item.tee * cee_total_kwh(
+            item.cee_medido_kwh,
+            totals.cee_aforado_kwh[level],
+            payload.usar_formulacion_mixta_cee,
+        )
+
+    id_value = availability_index(
+        totals.indisponibilidad_kw_h,
+        payload.disponibilidad.potencia_total_kw,
+        payload.disponibilidad.horas_periodo,
+    )
+    id_value = min(max(id_value, 0.0), 1.0)
+
+    aom_levels = []
+    for level in sorted(aom_level_map):
+        item = aom_level_map[level]
+        energy_item = energy_level_map.get(level)
+        if not energy_item:
+            raise ValueError(
+                f"No existe TEE para nivel de tensión {level}; "
+                "se requiere para calcular VCEEI_n"
+            )
+        aom_levels.append(
+            AOMLevelBasis(
+                nivel_tension=level,
+                cra_n=item.cra_n,
+                cral_n=item.cral_n,
+                tee=energy_item.tee,
+                vceei_kw_h=totals.vceei_kw_h[level],
+            )
+        )
+
+    return CalculationBasis(
+        csee=csee,
+        id_value=id_value,
+        ne_fraccion=payload.ne_fraccion,
+        faom_n=payload.faom_n,
+        faoms=parameters.faoms_marino if payload.ambiente_marino else 0.0,
+        cral_total=sum(item.cral_n for item in payload.aom_niveles),
+        cotr=total_cotr(payload.cotr),
+        costos_ambientales=payload.cotr.costos_ambientales,
+        investment_levels=[
+            InvestmentLevelBasis(
+                nivel_tension=level,
+                capital_by_life=capital_by_life(
+                    normalized.ucap[level], parameters.eficacia_referencia
+                ),
+                cat_n=investment_level_map[level].porcentaje_terreno
+                * totals.terrenos_valor[level],
+            )
+            for level in sorted(investment_level_map)
+        ],
+        aom_levels=aom_levels,
+    )
+
+
+def project_alumbrado_cap(
+    payload: schemas.AlumbradoProyeccionEntrada,
+    tenant_id: str,
+    parameters: RegulatoryParameters = DEFAULT_PARAMETERS,
+) -> schemas.AlumbradoProyeccionResultado:
+    """
+    Proyecta el CAP año a año sobre una misma entrada.
+
+    CSEE, CINV, COTR e ID se calculan una sola vez; por año solo se evalúa el
+    término de CAOM que depende del FAOML, y años con el mismo FAOML (desde
+    `anno_faoml_minimo`) reutilizan el mismo CAOM. El IPP de cada año sale de
+    `actualizaciones_ipp` o, si no está, de la entrada base.
+    """
+    base = payload.calculo
+    basis = build_calculation_basis(base, parameters=parameters)
+    cinv = basis.cinv(base.tasa_retorno)
+    caom_by_faoml: dict[float, float] = {}
+
+    years = []
+    for year in range(payload.anno_inicio, payload.anno_fin + 1):
+        faoml = parameters.faoml(year)
+        caom = caom_by_faoml.get(faoml)
+        if caom is None:
+            caom = caom_by_faoml[faoml] = basis.caom(faoml)
+
+        cap = basis.csee + cinv + caom + basis.cotr
+        ipp = payload.actualizaciones_ipp.get(year, base.actualizacion_ipp)
+        factor_ipp = None
+        cap_updated = None
+        if ipp is not None:
+            factor_ipp = ipp_factor(ipp)
+            cap_updated = money(basis.csee + cinv * factor_ipp + caom * factor_ipp + basis.cotr)
+            factor_ipp = money(factor_ipp)
+        years.append(
+            schemas.AlumbradoProyeccionAnno(
+                anno_aplicacion=year,
+                faoml=money(faoml),
+                csee=money(basis.csee),
+                cinv=money(cinv),
+                caom=money(caom),
+                cotr=money(basis.cotr),
+                cap=money(cap),
+                factor_ipp=factor_ipp,
+                cap_actualizado=cap_updated,
+                cumple_tope_ambiental=basis.within_environmental_cap(caom),
+            )
+        )
+
+    return schemas.AlumbradoProyeccionResultado(
+        tenant_id=tenant_id,
+        municipio=base.municipio,
+        periodo=base.periodo,
+        tasa_retorno=base.tasa_retorno,
+        annos=years,
+    )
+
+
+def sweep_alumbrado_scenarios(
+    payload: schemas.AlumbradoEscenariosEntrada,
+    tenant_id: str,
+    parameters: RegulatoryParameters = DEFAULT_PARAMETERS,
+) -> schemas.AlumbradoEscenariosResultado:
+    """
+    Evalúa la grilla de escenarios sobre una misma entrada base.
+
+    CINV se calcula una vez por tasa distinta y CAOM una vez por año distinto;
+    cada combinación solo suma componentes ya resueltos.
+    """
+    base = payload.calculo
+    basis = build_calculation_basis(base, parameters=parameters)
+
+    rates = payload.tasas_retorno or [base.tasa_retorno]
+    years = payload.annos_aplicacion or [base.anno_aplicacion]
+    ipp_updates = payload.actualizaciones_ipp or [base.actualizacion_ipp]
+
+    cinv_by_rate = {rate: basis.cinv(rate) for rate in set(rates)}
+    caom_by_year = {year: basis.caom(parameters.faoml(year)) for year in set(years)}
+
+    rows = []
+    for rate, year, ipp in product(rates, years, ipp_updates):
+        cinv = cinv_by_rate[rate]
+        caom = caom_by_year[year]
+        cap = basis.csee + cinv + caom + basis.cotr
+        factor_ipp = None
+        cap_updated = None
+        if ipp is not None:
+            factor_ipp = ipp_factor(ipp)
+            cap_updated = money(basis.csee + cinv * factor_ipp + caom * factor_ipp + basis.cotr)
+            factor_ipp = money(factor_ipp)
+        rows.append(
+            [
+                rate,
+                year,
+                money(parameters.faoml(year)),
+                factor_ipp,
+                money(basis.csee),
+                money(cinv),
+                money(caom),
+                money(basis.cotr),
+                money(cap),
+                cap_updated,
+                basis.within_environmental_cap(caom),
+            ]
+        )
+
+    return schemas.AlumbradoEscenariosResultado(
+        tenant_id=tenant_id,
+        municipio=base.municipio,
+        periodo=base.periodo,
+        total_escenarios=len(rows),
+        columnas=SCENARIO_COLUMNS,
+        filas=rows,
+    )
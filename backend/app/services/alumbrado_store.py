@@ -0,0 +1,210 @@
+import base64
+import json
+import zlib
+from dataclasses import asdict
+from typing import Any
+
+from pydantic import BaseModel
+from sqlalchemy import and_, delete, or_
+from sqlalchemy.orm import Session
+
+from app.models.alumbrado import CalculoAlumbrado, CargoAlumbrado
+from app.schemas import alumbrado as schemas
+from app.services.alumbrado_calculator import SectionTotals
+
+COMPRESSION_LEVEL = 6
+
+
+def compress_model(model: BaseModel) -> bytes:
+    return zlib.compress(model.model_dump_json().encode(), COMPRESSION_LEVEL)
+
+
+def decompress_json(blob: bytes) -> bytes:
+    return zlib.decompress(blob)
+
+
+def load_input(calculo: CalculoAlumbrado) -> schemas.AlumbradoCalculoEntrada:
+    return schemas.AlumbradoCalculoEntrada.model_validate_json(
+        decompress_json(calculo.entrada_comprimida)
+    )
+
+
+def load_result(calculo: CalculoAlumbrado) -> schemas.AlumbradoCalculoResultado:
+    return schemas.AlumbradoCalculoResultado.model_validate_json(
+        decompress_json(calculo.resultado_comprimido)
+    )
+
+
+def compress_totals(totals: SectionTotals) -> bytes:
+    return zlib.compress(json.dumps(asdict(totals)).encode(), COMPRESSION_LEVEL)
+
+
+def load_totals(calculo: CalculoAlumbrado) -> SectionTotals:
+    """Las claves de nivel vuelven de JSON como texto y se restauran a entero."""
+    data = json.loads(decompress_json(calculo.totales_comprimidos))
+    return SectionTotals(
+        cee_aforado_kwh=_int_keys(data["cee_aforado_kwh"]),
+        caae=_int_keys(data["caae"]),
+        terrenos_valor=_int_keys(data["terrenos_valor"]),
+        indisponibilidad_kw_h=data["indisponibilidad_kw_h"],
+        vceei_kw_h=_int_keys(data["vceei_kw_h"]),
+    )
+
+
+def _int_keys(values: dict[str, float]) -> dict[int, float]:
+    return {int(level): value for level, value in values.items()}
+
+
+def encode_cursor(periodo: str, calculo_id: int) -> str:
+    raw = json.dumps([periodo, calculo_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        periodo, calculo_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(periodo), int(calculo_id)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Cursor de paginación inválido") from exc
+
+
+def save_calculation(
+    db: Session,
+    tenant_id: str,
+    payload: schemas.AlumbradoCalculoEntrada,
+    result: schemas.AlumbradoCalculoResultado,
+    totals: SectionTotals,
+    content_hash: str,
+) -> CalculoAlumbrado:
+    calculo = CalculoAlumbrado(tenant_id=tenant_id)
+    _assign_calculation(db, calculo, payload, result, totals, content_hash)
+    db.add(calculo)
+    db.commit()
+    db.refresh(calculo)
+    return calculo
+
+
+def update_calculation(
+    db: Session,
+    calculo: CalculoAlumbrado,
+    payload: schemas.AlumbradoCalculoEntrada,
+    result: schemas.AlumbradoCalculoResultado,
+    totals: SectionTotals,
+    content_hash: str,
+) -> CalculoAlumbrado:
+    _assign_calculation(db, calculo, payload, result, totals, content_hash)
+    db.commit()
+    db.refresh(calculo)
+    return calculo
+
+
+def _assign_calculation(
+    db: Session,
+    calculo: CalculoAlumbrado,
+    payload: schemas.AlumbradoCalculoEntrada,
+    result: schemas.AlumbradoCalculoResultado,
+    totals: SectionTotals,
+    content_hash: str,
+) -> None:
+    calculo.municipio = payload.municipio
+    calculo.periodo = payload.periodo
+    calculo.anno_aplicacion = payload.anno_aplicacion
+    calculo.inventario_id = payload.inventario_id
+    calculo.inventario_version = payload.inventario_version
+    calculo.entrada_comprimida = compress_model(payload)
+    assign_result(db, calculo, result, totals, content_hash)
+
+
+def assign_result(
+    db: Session,
+    calculo: CalculoAlumbrado,
+    result: schemas.AlumbradoCalculoResultado,
+    totals: SectionTotals,
+    content_hash: str,
+) -> None:
+    """
+    Reemplaza el resultado de un cálculo cuya entrada no cambia.
+
+    Si el CAP cambia se borran los cargos distribuidos del cálculo, que
+    sumaban el CAP anterior; hay que volver a distribuirlo.
+    """
+    if calculo.id is not None and calculo.cap != result.cap:
+        db.execute(delete(CargoAlumbrado).where(CargoAlumbrado.calculo_id == calculo.id))
+    calculo.hash_entrada = content_hash
+    calculo.csee = result.csee
+    calculo.cinv = result.cinv
+    calculo.caom = result.caom
+    calculo.cotr = result.cotr
+    calculo.cap = result.cap
+    calculo.version_parametros = result.version_parametros
+    calculo.resultado_comprimido = compress_model(result)
+    calculo.totales_comprimidos = compress_totals(totals)
+
+
+def get_calculation(db: Session, tenant_id: str, calculo_id: int) -> CalculoAlumbrado | None:
+    return (
+        db.query(CalculoAlumbrado)
+        .filter(CalculoAlumbrado.id == calculo_id, CalculoAlumbrado.tenant_id == tenant_id)
+        .first()
+    )
+
+
+def get_calculation_by_hash(
+    db: Session, tenant_id: str, content_hash: str
+) -> CalculoAlumbrado | None:
+    """Último cálculo guardado con ese hash de entrada."""
+    return (
+        db.query(CalculoAlumbrado)
+        .filter(
+            CalculoAlumbrado.tenant_id == tenant_id,
+            CalculoAlumbrado.hash_entrada == content_hash,
+        )
+        .order_by(CalculoAlumbrado.id.desc())
+        .first()
+    )
+
+
+def list_calculations(
+    db: Session,
+    tenant_id: str,
+    municipio: str | None = None,
+    periodo_desde: str | None = None,
+    periodo_hasta: str | None = None,
+    cursor: str | None = None,
+    limit: int = 50,
+) -> tuple[list[CalculoAlumbrado], str | None]:
+    """
+    Lista cálculos ordenados por (periodo, id) con paginación por cursor.
+
+    El cursor codifica la última clave entregada; la siguiente página se
+    obtiene con un rango sobre el índice en lugar de OFFSET.
+    """
+    filters: list[Any] = [CalculoAlumbrado.tenant_id == tenant_id]
+    if municipio:
+        filters.append(CalculoAlumbrado.municipio == municipio)
+    if periodo_desde:
+        filters.append(CalculoAlumbrado.periodo >= periodo_desde)
+    if periodo_hasta:
+        filters.append(CalculoAlumbrado.periodo <= periodo_hasta)
+    if cursor:
+        last_periodo, last_id = decode_cursor(cursor)
+        filters.append(
+            or_(
+                CalculoAlumbrado.periodo > last_periodo,
+                and_(CalculoAlumbrado.periodo == last_periodo, CalculoAlumbrado.id > last_id),
+            )
+        )
+
+    rows = (
+        db.query(CalculoAlumbrado)
+        .filter(*filters)
+        .order_by(CalculoAlumbrado.periodo, CalculoAlumbrado.id)
+        .limit(limit + 1)
+        .all()
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].periodo, rows[-1].id)
+    return rows, next_cursor
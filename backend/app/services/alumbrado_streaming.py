@@ -0,0 +1,202 @@
+from collections.abc import AsyncIterator
+
+from pydantic import TypeAdapter, ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.schemas import alumbrado as schemas
+from app.services.alumbrado_batch import format_validation_error
+from app.services.alumbrado_calculator import (
+    DEFAULT_PARAMETERS,
+    RegulatoryParameters,
+    SectionTotals,
+    UcapGroup,
+    annualization_factor,
+    build_calculation_result,
+    integrate_load_profiles,
+    normalize_sections,
+    reject_inventory_reference,
+    resolve_aforo,
+)
+
+LINE_ADAPTER = TypeAdapter(schemas.AlumbradoFlujoLinea)
+
+# Líneas que se validan juntas en cada paso por el pool de hilos.
+STREAM_BATCH_LINES = 2000
+
+
+class StreamingCalculation:
+    """
+    Acumuladores por nivel para una entrada recibida línea a línea.
+
+    Cada línea se valida y se suma de inmediato a los totales de su sección,
+    así que la memoria usada no depende del número de luminarias. Las listas
+    que vengan dentro del encabezado se suman al iniciar.
+    """
+
+    def __init__(
+        self,
+        header: schemas.AlumbradoCalculoEntrada,
+        parameters: RegulatoryParameters = DEFAULT_PARAMETERS,
+    ):
+        reject_inventory_reference(header)
+        totals = normalize_sections(header).totals(header.tasa_retorno, parameters)
+        self.header = header
+        self.parameters = parameters
+        self.profiles = integrate_load_profiles(header)
+        self.lines = 0
+        self._cee_aforado_kwh = dict(totals.cee_aforado_kwh)
+        self._caae = dict(totals.caae)
+        self._terrenos_valor = dict(totals.terrenos_valor)
+        self._indisponibilidad_kw_h = totals.indisponibilidad_kw_h
+        self._vceei_kw_h = dict(totals.vceei_kw_h)
+
+    def add(self, line: bytes | str) -> None:
+        item = LINE_ADAPTER.validate_json(line)
+        if isinstance(item, schemas.AforoLinea):
+            carga_kw, horas, dias = resolve_aforo(
+                item.carga_kw,
+                item.horas_diarias,
+                item.dias_facturacion,
+                item.perfil,
+                self.profiles,
+            )
+            self._accumulate(
+                self._cee_aforado_kwh,
+                item.nivel_tension,
+                "energia_niveles",
+                carga_kw * horas * dias,
+            )
+        elif isinstance(item, schemas.UcapLinea):
+            group = UcapGroup(
+                vida_util_anios=item.vida_util_anios,
+                eficacia_lm_w=item.eficacia_lm_w,
+                cantidad=1,
+                cr_i=item.cr_i,
+                cr_l_base=item.cr_l_base,
+            )
+            self._accumulate(
+                self._caae,
+                item.nivel_tension,
+                "inversion_niveles",
+                group.capital(self.parameters.eficacia_referencia)
+                * annualization_factor(self.header.tasa_retorno, item.vida_util_anios),
+            )
+        elif isinstance(item, schemas.TerrenoLinea):
+            self._accumulate(
+                self._terrenos_valor,
+                item.nivel_tension,
+                "inversion_niveles",
+                item.area_m2 * item.valor_catastral_m2,
+            )
+        elif isinstance(item, schemas.EventoVceeiLinea):
+            self._accumulate(
+                self._vceei_kw_h,
+                item.nivel_tension,
+                "aom_niveles",
+                item.potencia_kw * item.horas_indisponibilidad,
+            )
+        else:
+            self._indisponibilidad_kw_h += item.potencia_kw * item.horas_sin_servicio
+        self.lines += 1
+
+    @staticmethod
+    def _accumulate(sums: dict[int, float], level: int, section: str, value: float) -> None:
+        if level not in sums:
+            raise ValueError(f"El nivel de tensión {level} no está declarado en {section}")
+        sums[level] += value
+
+    def totals(self) -> SectionTotals:
+        return SectionTotals(
+            cee_aforado_kwh=dict(self._cee_aforado_kwh),
+            caae=dict(self._caae),
+            terrenos_valor=dict(self._terrenos_valor),
+            indisponibilidad_kw_h=self._indisponibilidad_kw_h,
+            vceei_kw_h=dict(self._vceei_kw_h),
+        )
+
+    def result(self, tenant_id: str) -> schemas.AlumbradoCalculoResultado:
+        return build_calculation_result(
+            payload=self.header,
+            tenant_id=tenant_id,
+            totals=self.totals(),
+            parameters=self.parameters,
+        )
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterator[bytes],
+    max_line_bytes: int | None = None,
+) -> AsyncIterator[bytes]:
+    max_line_bytes = max_line_bytes or settings.ALUMBRADO_STREAM_MAX_LINE_BYTES
+    pending = b""
+    async for chunk in chunks:
+        *lines, pending = (pending + chunk).split(b"\n")
+        for line in lines:
+            if len(line) > max_line_bytes:
+                raise ValueError(f"Una línea supera el máximo de {max_line_bytes} bytes")
+            yield line
+        if len(pending) > max_line_bytes:
+            raise ValueError(f"Una línea supera el máximo de {max_line_bytes} bytes")
+    if pending:
+        yield pending
+
+
+class NdjsonReader:
+    """Estado de un flujo NDJSON: la primera línea no vacía es el encabezado."""
+
+    def __init__(self, parameters: RegulatoryParameters = DEFAULT_PARAMETERS):
+        self.parameters = parameters
+        self.calculation: StreamingCalculation | None = None
+        self.line_number = 0
+
+    def add_lines(self, lines: list[bytes]) -> None:
+        for line in lines:
+            self.line_number += 1
+            if not line.strip():
+                continue
+            try:
+                if self.calculation is None:
+                    self.calculation = StreamingCalculation(
+                        schemas.AlumbradoCalculoEntrada.model_validate_json(line),
+                        self.parameters,
+                    )
+                else:
+                    self.calculation.add(line)
+            except ValidationError as exc:
+                raise ValueError(
+                    f"Línea {self.line_number}: {format_validation_error(exc)}"
+                ) from exc
+            except ValueError as exc:
+                raise ValueError(f"Línea {self.line_number}: {exc}") from exc
+
+    def result(self, tenant_id: str) -> schemas.AlumbradoCalculoResultado:
+        if self.calculation is None:
+            raise ValueError("El flujo NDJSON no contiene un encabezado")
+        return self.calculation.result(tenant_id)
+
+
+async def calculate_from_ndjson(
+    chunks: AsyncIterator[bytes],
+    tenant_id: str,
+    parameters: RegulatoryParameters = DEFAULT_PARAMETERS,
+) -> schemas.AlumbradoCalculoResultado:
+    """
+    Calcula el CAP a partir de un flujo NDJSON.
+
+    La primera línea es el encabezado (`AlumbradoCalculoEntrada`, normalmente
+    con las listas vacías) y cada línea siguiente es un aforo, UCAP, terreno
+    o evento identificado por `seccion`. En el event loop solo se separan las
+    líneas; la validación y la acumulación se hacen en un hilo, de a
+    `STREAM_BATCH_LINES` líneas, para no bloquear las demás solicitudes.
+    """
+    reader = NdjsonReader(parameters)
+    batch: list[bytes] = []
+    async for line in iter_ndjson_lines(chunks):
+        batch.append(line)
+        if len(batch) >= STREAM_BATCH_LINES:
+            await run_in_threadpool(reader.add_lines, batch)
+            batch = []
+    if batch:
+        await run_in_threadpool(reader.add_lines, batch)
+    return await run_in_threadpool(reader.result, tenant_id)
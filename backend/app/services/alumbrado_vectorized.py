@@ -0,0 +1,60 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class SectionColumns:
+    """
+    Listas de entrada como arreglos paralelos por nivel de tensión.
+
+    Las claves internas coinciden con los campos de los esquemas de entrada
+    (por ejemplo `carga_kw` o `vida_util_anios`).
+    """
+
+    aforos: dict[int, dict[str, np.ndarray]]
+    ucap: dict[int, dict[str, np.ndarray]]
+    terrenos: dict[int, dict[str, np.ndarray]]
+    eventos_disponibilidad: dict[str, np.ndarray]
+    vceei_eventos: dict[int, dict[str, np.ndarray]]
+
+
+def weighted_sum(values: np.ndarray, weights: np.ndarray) -> float:
+    if values.size == 0:
+        return 0.0
+    return float(np.dot(values, weights))
+
+
+def aforo_energy_kwh(
+    carga_kw: np.ndarray,
+    horas_diarias: np.ndarray,
+    dias_facturacion: np.ndarray,
+) -> float:
+    if carga_kw.size == 0:
+        return 0.0
+    return float(np.sum(carga_kw * horas_diarias * dias_facturacion))
+
+
+def annualization_factors(rate: float, vida_util_anios: np.ndarray) -> np.ndarray:
+    if np.any(vida_util_anios <= 0):
+        raise ValueError("vida_util_anios debe ser mayor a cero")
+    if rate == 0:
+        return 1.0 / vida_util_anios
+    denominator = 1 - np.power(1 + rate, -vida_util_anios)
+    if np.any(denominator == 0):
+        raise ValueError("No fue posible calcular el factor de anualización")
+    return rate / denominator
+
+
+def ucap_caae(
+    cr_i: np.ndarray,
+    cr_l_base: np.ndarray,
+    eficacia_lm_w: np.ndarray,
+    vida_util_anios: np.ndarray,
+    rate: float,
+    eficacia_referencia: float,
+) -> float:
+    if cr_i.size == 0:
+        return 0.0
+    cr_l_adjusted = np.where(cr_l_base > 0, (eficacia_lm_w / eficacia_referencia) * cr_l_base, 0.0)
+    return float(np.dot(cr_i + cr_l_adjusted, annualization_factors(rate, vida_util_anios)))
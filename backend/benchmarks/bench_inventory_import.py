@@ -0,0 +1,46 @@
+"""
+Mide la importación CSV de inventarios UCAP por número de filas.
+
+Uso (desde backend/):
+
+    python -m benchmarks.bench_inventory_import --rows 100000 1000000
+"""
+
+import argparse
+import random
+
+from app.services.alumbrado_import import read_csv_section, validate_section
+
+from benchmarks.bench_calculator_engines import best_of
+
+
+def build_ucap_csv(rows: int, seed: int = 7) -> bytes:
+    rng = random.Random(seed)
+    lines = ["nivel_tension,cr_i,cr_l_base,eficacia_lm_w,vida_util_anios"]
+    lines.extend(
+        f"{rng.randint(1, 2)},{rng.uniform(100, 2000):.2f},{rng.uniform(50, 800):.2f},"
+        f"{rng.choice([110, 130, 150])},{rng.choice([10, 15, 20, 25])}"
+        for _ in range(rows)
+    )
+    return "\n".join(lines).encode()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'filas':>10} {'MB':>8} {'lectura (s)':>12} {'validación (s)':>15}")
+    for rows in args.rows:
+        data = build_ucap_csv(rows)
+        imported = read_csv_section("ucap", data)
+        read_seconds = best_of(args.repeat, lambda: read_csv_section("ucap", data))
+        validate_seconds = best_of(1, lambda: validate_section(imported))
+        print(
+            f"{rows:>10} {len(data) / 1e6:>8.1f} {read_seconds:>12.3f} {validate_seconds:>15.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
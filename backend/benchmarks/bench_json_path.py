@@ -0,0 +1,66 @@
+"""
+Compara el costo por solicitud del camino JSON estándar de FastAPI con el de
+`ModelJSONRoute` + `ModelJSONResponse`.
+
+Ambas aplicaciones exponen el mismo endpoint, que devuelve un resultado ya
+calculado: el tiempo medido es solo decodificación, validación y
+serialización.
+
+Uso (desde backend/):
+
+    python -m benchmarks.bench_json_path --sizes 10000 100000 300000
+"""
+
+import argparse
+
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.serialization import ModelJSONResponse, ModelJSONRoute
+from app.schemas import alumbrado as schemas
+from app.services.alumbrado_calculator import calculate_alumbrado_costs
+from benchmarks.bench_calculator_engines import best_of, build_large_payload
+
+
+def build_app(result: schemas.AlumbradoCalculoResultado, fast: bool) -> FastAPI:
+    router = APIRouter(route_class=ModelJSONRoute) if fast else APIRouter()
+
+    @router.post("/calcular", response_model=schemas.AlumbradoCalculoResultado)
+    def calculate(payload: schemas.AlumbradoCalculoEntrada):
+        return ModelJSONResponse(result) if fast else result
+
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 300_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'items':>10} {'MB':>8} {'estándar (s)':>13} {'rápido (s)':>11} {'speedup':>8}")
+    for size in args.sizes:
+        payload = build_large_payload(size)
+        body = payload.model_dump_json().encode()
+        result = calculate_alumbrado_costs(payload=payload, tenant_id="bench", engine="numpy")
+        headers = {"Content-Type": "application/json"}
+        timings = []
+        for fast in (False, True):
+            client = TestClient(build_app(result, fast=fast))
+            timings.append(
+                best_of(
+                    args.repeat,
+                    lambda: client.post("/calcular", content=body, headers=headers),
+                )
+            )
+        standard_seconds, fast_seconds = timings
+        print(
+            f"{size:>10} {len(body) / 1e6:>8.1f} {standard_seconds:>13.4f} {fast_seconds:>11.4f} "
+            f"{standard_seconds / fast_seconds:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Generador con semilla de entradas realistas de `/alumbrado/calcular`.
+
+Las cantidades se reparten entre los dos niveles de tensión (70% nivel 1).
+Los valores siguen rangos típicos de un municipio: luminarias LED de 10 a 25
+años de vida útil, aforos nocturnos de 12 horas y eventos de indisponibilidad
+de pocas horas.
+"""
+
+import random
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class PayloadScale:
+    ucap: int
+    aforos: int
+    eventos: int
+    terrenos: int
+
+
+SCALES = {
+    "pequeno": PayloadScale(ucap=1_000, aforos=500, eventos=200, terrenos=10),
+    "mediano": PayloadScale(ucap=10_000, aforos=5_000, eventos=2_000, terrenos=50),
+    "grande": PayloadScale(ucap=100_000, aforos=50_000, eventos=20_000, terrenos=200),
+}
+
+LEVELS = (1, 2)
+LEVEL_SHARE = {1: 0.7, 2: 0.3}
+
+
+def _split(total: int) -> dict[int, int]:
+    first = round(total * LEVEL_SHARE[1])
+    return {1: first, 2: total - first}
+
+
+def generate_payload(scale: PayloadScale, seed: int = 7) -> dict:
+    """Entrada como diccionario JSON; la misma semilla produce la misma entrada."""
+    rng = random.Random(seed)
+    ucap = _split(scale.ucap)
+    aforos = _split(scale.aforos)
+    terrenos = _split(scale.terrenos)
+    vceei = _split(scale.eventos // 2)
+    installed_kw = scale.ucap * 0.12
+
+    return {
+        "municipio": "Municipio Benchmark",
+        "periodo": "2026-01",
+        "anno_aplicacion": 2026,
+        "tasa_retorno": 0.1189,
+        "energia_niveles": [
+            {
+                "nivel_tension": level,
+                "tee": 520.0 if level == 1 else 480.0,
+                "cee_medido_kwh": round(rng.uniform(1e4, 5e4), 2),
+                "aforos": [
+                    {
+                        "clase_iluminacion": rng.randint(1, 3),
+                        "carga_kw": round(rng.uniform(0.03, 0.4), 3),
+                        "horas_diarias": 12.0,
+                        "dias_facturacion": 30.0,
+                    }
+                    for _ in range(aforos[level])
+                ],
+            }
+            for level in LEVELS
+        ],
+        "inversion_niveles": [
+            {
+                "nivel_tension": level,
+                "ucap": [
+                    {
+                        "cr_i": round(rng.uniform(300, 2500), 2),
+                        "cr_l_base": round(rng.uniform(100, 900), 2),
+                        "eficacia_lm_w": rng.choice([110.0, 130.0, 150.0, 170.0]),
+                        "vida_util_anios": rng.choice([10, 15, 20, 25]),
+                    }
+                    for _ in range(ucap[level])
+                ],
+                "terrenos": [
+                    {
+                        "area_m2": round(rng.uniform(20, 400), 1),
+                        "valor_catastral_m2": round(rng.uniform(5e4, 4e5), 0),
+                    }
+                    for _ in range(terrenos[level])
+                ],
+            }
+            for level in LEVELS
+        ],
+        "disponibilidad": {
+            "potencia_total_kw": round(installed_kw, 2),
+            "horas_periodo": 720.0,
+            "eventos": [
+                {
+                    "potencia_kw": round(rng.uniform(0.05, 0.4), 3),
+                    "horas_sin_servicio": round(rng.uniform(0.5, 12), 2),
+                }
+                for _ in range(scale.eventos - scale.eventos // 2)
+            ],
+        },
+        "aom_niveles": [
+            {
+                "nivel_tension": level,
+                "cra_n": round(scale.ucap * 1500 * LEVEL_SHARE[level], 2),
+                "cral_n": round(scale.ucap * 400 * LEVEL_SHARE[level], 2),
+                "vceei_eventos": [
+                    {
+                        "potencia_kw": round(rng.uniform(0.05, 0.4), 3),
+                        "horas_indisponibilidad": round(rng.uniform(0.5, 8), 2),
+                    }
+                    for _ in range(vceei[level])
+                ],
+            }
+            for level in LEVELS
+        ],
+        "cotr": {"interventoria": round(scale.ucap * 12.5, 2), "polizas": 850000.0},
+        "actualizacion_ipp": {"ipp_base": 125.4, "ipp_mes_anterior": 131.9},
+    }
@@ -0,0 +1,212 @@
+"""
+Suite de benchmarks del cálculo de alumbrado con línea base y chequeo de regresiones.
+
+Mide, para cada escala de `benchmarks.payloads.SCALES`:
+
+- validacion: `AlumbradoCalculoEntrada.model_validate_json` sobre el cuerpo.
+- calculo_python / calculo_numpy: `calculate_alumbrado_costs` con cada motor.
+- recibo: `build_simple_receipt` con los componentes del resultado.
+- e2e: `POST /api/alumbrado/calcular` con TestClient (sin caché ni auth).
+
+De cada caso se guarda la mediana y el mínimo del tiempo por llamada y el pico
+de memoria medido con tracemalloc en una corrida aparte. La corrida incluye
+además el tiempo de una carga de calibración fija, con el que el chequeo de
+regresiones descuenta la velocidad de la máquina.
+
+Uso (desde backend/):
+
+    python -m benchmarks.suite --escalas pequeno mediano --salida resultados.json
+    python -m benchmarks.suite --actualizar-linea-base
+    python -m benchmarks.suite --verificar --umbral 0.5
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+from app.schemas import alumbrado as schemas
+from app.services.alumbrado_calculator import calculate_alumbrado_costs
+from app.services.alumbrado_receipt import build_simple_receipt
+from benchmarks.payloads import SCALES, generate_payload
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+# Por debajo de este pico de memoria se compara contra el piso, no contra el valor medido.
+MEMORY_FLOOR_BYTES = 64 * 1024
+DEFAULT_SCALES = ["pequeno", "mediano"]
+
+
+def measure(function: Callable[[], Any], repeat: int) -> dict[str, float]:
+    """
+    Tiempo por llamada con `timeit` (GC desactivado durante la medición).
+
+    Cada muestra repite la función las veces necesarias para durar al menos
+    0.2 s, así los casos de microsegundos no quedan dominados por el ruido.
+    """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    timings = [total / number for total in timer.repeat(repeat=repeat, number=number)]
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "mediana_s": statistics.median(timings),
+        "min_s": min(timings),
+        "pico_memoria_bytes": peak,
+    }
+
+
+def _calibration_workload() -> None:
+    values = [(index * 7919) % 10007 for index in range(20_000)]
+    sorted(values)
+    sum(value * 0.5 for value in values)
+
+
+def calibrate(repeat: int) -> float:
+    """Tiempo de una carga fija; normaliza las mediciones según la velocidad de la máquina."""
+    return measure(_calibration_workload, repeat)["min_s"]
+
+
+def build_client():
+    from fastapi.testclient import TestClient
+
+    from app.api.dependencies import get_current_user
+    from app.core.config import settings
+    from app.main import app
+
+    settings.ENABLE_ALUMBRADO_RESULT_CACHE = False
+    app.dependency_overrides[get_current_user] = lambda: None
+    return TestClient(app)
+
+
+def run_scale(name: str, repeat: int, client) -> dict[str, dict[str, float]]:
+    body = json.dumps(generate_payload(SCALES[name])).encode()
+    payload = schemas.AlumbradoCalculoEntrada.model_validate_json(body)
+    result = calculate_alumbrado_costs(payload=payload, tenant_id="bench")
+    components = schemas.ReciboComponentesEntrada(
+        csee=result.csee, cinv=result.cinv, caom=result.caom, cotr=result.cotr
+    )
+    headers = {"Content-Type": "application/json"}
+
+    def post():
+        response = client.post("/api/alumbrado/calcular", content=body, headers=headers)
+        response.raise_for_status()
+
+    cases = {
+        "validacion": lambda: schemas.AlumbradoCalculoEntrada.model_validate_json(body),
+        "calculo_python": lambda: calculate_alumbrado_costs(
+            payload=payload, tenant_id="bench", engine="python"
+        ),
+        "calculo_numpy": lambda: calculate_alumbrado_costs(
+            payload=payload, tenant_id="bench", engine="numpy"
+        ),
+        "recibo": lambda: build_simple_receipt(
+            tenant_id="bench",
+            municipio=result.municipio,
+            periodo=result.periodo,
+            metodologia=result.metodologia,
+            metadata=schemas.ReciboSimpleMetadataEntrada(),
+            componentes=components,
+        ),
+        "e2e": post,
+    }
+    return {case: measure(function, repeat) for case, function in cases.items()}
+
+
+def compare_results(
+    current: dict[str, Any],
+    baseline: dict[str, Any],
+    threshold: float,
+    memory_threshold: float,
+) -> list[str]:
+    """
+    Casos que empeoraron frente a la línea base.
+
+    Se compara el mínimo de tiempo por llamada, dividido por el tiempo de
+    calibración de su propia corrida, con `threshold`; así la comparación no
+    depende de la velocidad ni de la carga de la máquina. El pico de memoria
+    se compara con `memory_threshold`. Ambos umbrales son fracciones
+    (0.25 = 25%) y los casos que no están en ambos lados se ignoran.
+    """
+    regressions = []
+    speed = current["calibracion_s"] / baseline["calibracion_s"]
+    for scale, cases in current["resultados"].items():
+        for case, metrics in cases.items():
+            reference = baseline.get("resultados", {}).get(scale, {}).get(case)
+            if reference is None:
+                continue
+            limit = reference["min_s"] * speed * (1 + threshold)
+            if metrics["min_s"] > limit:
+                regressions.append(
+                    f"{scale}/{case}: {metrics['min_s']:.6f}s > {limit:.6f}s "
+                    f"(línea base {reference['min_s']:.6f}s, velocidad relativa {speed:.2f})"
+                )
+            memory_limit = max(reference["pico_memoria_bytes"], MEMORY_FLOOR_BYTES) * (
+                1 + memory_threshold
+            )
+            if metrics["pico_memoria_bytes"] > memory_limit:
+                regressions.append(
+                    f"{scale}/{case}: memoria {metrics['pico_memoria_bytes']} B > "
+                    f"{memory_limit:.0f} B (línea base {reference['pico_memoria_bytes']} B)"
+                )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--escalas", nargs="+", choices=sorted(SCALES), default=DEFAULT_SCALES)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--salida", type=Path, help="Archivo JSON con los resultados")
+    parser.add_argument("--linea-base", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--actualizar-linea-base", action="store_true")
+    parser.add_argument("--verificar", action="store_true")
+    parser.add_argument("--umbral", type=float, default=0.5)
+    parser.add_argument("--umbral-memoria", type=float, default=0.25)
+    args = parser.parse_args()
+
+    client = build_client()
+    results = {
+        "version": 1,
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "resultados": {},
+    }
+    calibration = [calibrate(args.repeticiones)]
+    print(f"{'escala':<10} {'caso':<16} {'mediana (s)':>12} {'mín (s)':>10} {'pico (MB)':>10}")
+    for scale in args.escalas:
+        results["resultados"][scale] = run_scale(scale, args.repeticiones, client)
+        for case, metrics in results["resultados"][scale].items():
+            print(
+                f"{scale:<10} {case:<16} {metrics['mediana_s']:>12.4f} "
+                f"{metrics['min_s']:>10.4f} {metrics['pico_memoria_bytes'] / 1e6:>10.2f}"
+            )
+        calibration.append(calibrate(args.repeticiones))
+    results["calibracion_s"] = min(calibration)
+
+    if args.salida:
+        args.salida.write_text(json.dumps(results, indent=2) + "\n")
+    if args.actualizar_linea_base:
+        args.linea_base.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Línea base actualizada en {args.linea_base}")
+    if args.verificar:
+        baseline = json.loads(args.linea_base.read_text())
+        regressions = compare_results(results, baseline, args.umbral, args.umbral_memoria)
+        for regression in regressions:
+            print(f"REGRESIÓN {regression}")
+        if regressions:
+            return 1
+        print("Sin regresiones frente a la línea base")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,9 @@
+import json
+
+import pytest
+from app.core.config import settings
+from app.services.alumbrado_cache import calculation_cache
+from app.services.alumbrado_parameters import parameters_cache
 from fastapi import status
 
 
@@ -85,6 +91,35 @@ def test_get_alumbrado_parameters(client, admin_token_headers):
     assert data["faoml"] == 0.074
 
 
+def test_publish_alumbrado_parameters(client, admin_token_headers, user_token_headers):
+    parameters_cache.clear()
+    denied = client.post(
+        "/api/alumbrado/parametros", json={"eficacia_referencia": 140}, headers=user_token_headers
+    )
+    assert denied.status_code == status.HTTP_403_FORBIDDEN
+
+    base = client.post("/api/alumbrado/calcular", json=build_payload(), headers=admin_token_headers)
+    response = client.post(
+        "/api/alumbrado/parametros",
+        json={"descripcion": "Ajuste FAOML", "faoml_por_anno": {"2026": 0.08}},
+        headers=admin_token_headers,
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["version"] == 1
+
+    current = client.get("/api/alumbrado/parametros?anno=2026", headers=admin_token_headers)
+    assert (current.json()["version"], current.json()["faoml"]) == (1, 0.08)
+    calculated = client.post(
+        "/api/alumbrado/calcular", json=build_payload(), headers=admin_token_headers
+    )
+    assert calculated.json()["version_parametros"] == 1
+    assert calculated.headers["etag"] != base.headers["etag"]
+
+    versions = client.get("/api/alumbrado/parametros/versiones", headers=admin_token_headers)
+    assert [item["version"] for item in versions.json()] == [0, 1]
+    parameters_cache.clear()
+
+
 def test_calculate_alumbrado(client, admin_token_headers):
     response = client.post("/api/alumbrado/calcular", json=build_payload(), headers=admin_token_headers)
     assert response.status_code == status.HTTP_200_OK
@@ -96,6 +131,17 @@ def test_calculate_alumbrado(client, admin_token_headers):
     assert len(data["energia_niveles"]) == 2
 
 
+def test_calculate_alumbrado_numpy_engine(client, admin_token_headers):
+    default = client.post("/api/alumbrado/calcular", json=build_payload(), headers=admin_token_headers)
+    response = client.post(
+        "/api/alumbrado/calcular?motor=numpy",
+        json=build_payload(),
+        headers=admin_token_headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["cap"] == default.json()["cap"]
+
+
 def test_calculate_alumbrado_environmental_limit(client, admin_token_headers):
     payload = build_payload()
     payload["cotr"]["costos_ambientales"] = 20
@@ -160,3 +206,469 @@ def test_create_simple_receipt_from_calculation(client, admin_token_headers):
     assert data["total"] > 0
     assert data["fuente_datos"] == "normalizacion_pdf_v1"
 
+
+
+def test_calculate_alumbrado_batch(client, admin_token_headers):
+    invalid = build_payload()
+    invalid["cotr"]["costos_ambientales"] = 20
+    response = client.post(
+        "/api/alumbrado/calcular/lote",
+        json=[build_payload(), invalid],
+        headers=admin_token_headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["total"] == 2
+    assert data["exitosos"] == 1
+    assert data["resultados"][0]["resultado"]["cap"] > 0
+    assert "costos ambientales" in data["resultados"][1]["error"]
+
+
+def test_calculate_alumbrado_batch_rejects_empty(client, admin_token_headers):
+    response = client.post("/api/alumbrado/calcular/lote", json=[], headers=admin_token_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_sweep_alumbrado_scenarios(client, admin_token_headers):
+    payload = {
+        "calculo": build_payload(),
+        "tasas_retorno": [0.08, 0.1],
+        "annos_aplicacion": [2025, 2026, 2027],
+    }
+    response = client.post("/api/alumbrado/escenarios", json=payload, headers=admin_token_headers)
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["total_escenarios"] == 6
+    assert len(data["filas"]) == 6
+    assert "cap" in data["columnas"]
+
+
+def test_calculate_alumbrado_msgpack(client, admin_token_headers):
+    msgpack = pytest.importorskip("msgpack")
+    payload = build_payload()
+    expected = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+    assert "accept" in expected.headers["vary"].lower()
+
+    response = client.post(
+        "/api/alumbrado/calcular",
+        content=msgpack.packb(payload),
+        headers={
+            **admin_token_headers,
+            "Content-Type": "application/msgpack",
+            "Accept": "application/msgpack",
+        },
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content) == expected.json()
+
+    batch = client.post(
+        "/api/alumbrado/calcular/lote",
+        content=msgpack.packb([payload, {}]),
+        headers={**admin_token_headers, "Content-Type": "application/msgpack"},
+    )
+    assert batch.status_code == status.HTTP_200_OK
+    assert batch.headers["content-type"] == "application/json"
+    assert batch.json()["exitosos"] == 1
+
+    payload["tasa_retorno"] = 0
+    invalid = client.post(
+        "/api/alumbrado/calcular",
+        content=msgpack.packb(payload),
+        headers={**admin_token_headers, "Content-Type": "application/msgpack"},
+    )
+    assert invalid.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_sweep_alumbrado_scenarios_arrow(client, admin_token_headers):
+    pa = pytest.importorskip("pyarrow")
+    payload = {"calculo": build_payload(), "tasas_retorno": [0.08, 0.1]}
+    expected = client.post(
+        "/api/alumbrado/escenarios", json=payload, headers=admin_token_headers
+    ).json()
+
+    response = client.post(
+        "/api/alumbrado/escenarios",
+        json=payload,
+        headers={
+            **admin_token_headers,
+            "Accept": "application/vnd.apache.arrow.stream, application/json;q=0.5",
+        },
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column_names == expected["columnas"]
+    cap = expected["columnas"].index("cap")
+    assert table.column("cap").to_pylist() == [row[cap] for row in expected["filas"]]
+    assert json.loads(table.schema.metadata[b"total_escenarios"]) == 2
+
+    # Arrow solo aplica a respuestas tabulares; el resto sigue en JSON.
+    calculation = client.post(
+        "/api/alumbrado/calcular",
+        json=build_payload(),
+        headers={**admin_token_headers, "Accept": "application/vnd.apache.arrow.stream"},
+    )
+    assert calculation.headers["content-type"] == "application/json"
+
+
+def test_calculate_alumbrado_offloads_large_payloads(client, admin_token_headers, monkeypatch):
+    calculation_cache.clear()
+    payload = build_payload()
+    in_thread = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+
+    calculation_cache.clear()
+    monkeypatch.setattr(settings, "ALUMBRADO_OFFLOAD_MIN_ITEMS", 1)
+    offloaded = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+    assert offloaded.status_code == status.HTTP_200_OK
+    assert offloaded.json() == in_thread.json()
+    assert offloaded.headers["ETag"] == in_thread.headers["ETag"]
+
+    hits = calculation_cache.hits
+    not_modified = client.post(
+        "/api/alumbrado/calcular",
+        json=payload,
+        headers={**admin_token_headers, "If-None-Match": offloaded.headers["ETag"]},
+    )
+    assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+    assert calculation_cache.hits == hits + 1
+
+    invalid = client.post(
+        "/api/alumbrado/calcular",
+        json={**payload, "tasa_retorno": -1},
+        headers=admin_token_headers,
+    )
+    assert invalid.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert invalid.json()["detail"][0]["loc"] == ["body", "tasa_retorno"]
+
+    monkeypatch.setattr(settings, "ALUMBRADO_POOL_MAX_PENDING", 0)
+    missing_inventory = client.post(
+        "/api/alumbrado/calcular",
+        json={**payload, "inventario_id": 999},
+        headers=admin_token_headers,
+    )
+    assert missing_inventory.status_code == status.HTTP_404_NOT_FOUND
+
+    calculation_cache.clear()
+    saturated = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+    assert saturated.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert saturated.headers["Retry-After"] == str(settings.ALUMBRADO_POOL_RETRY_AFTER_SECONDS)
+
+
+def test_calculate_alumbrado_etag(client, admin_token_headers):
+    calculation_cache.clear()
+    first = client.post("/api/alumbrado/calcular", json=build_payload(), headers=admin_token_headers)
+    etag = first.headers["ETag"]
+
+    second = client.post("/api/alumbrado/calcular", json=build_payload(), headers=admin_token_headers)
+    not_modified = client.post(
+        "/api/alumbrado/calcular",
+        json=build_payload(),
+        headers={**admin_token_headers, "If-None-Match": etag},
+    )
+    metrics = client.get("/api/alumbrado/metricas", headers=admin_token_headers).json()
+
+    assert second.headers["ETag"] == etag
+    assert second.json() == first.json()
+    assert not_modified.status_code == status.HTTP_304_NOT_MODIFIED
+    assert metrics["cache"]["aciertos"] == 1
+    assert metrics["cache"]["fallos"] == 1
+
+    wildcard = client.post(
+        "/api/alumbrado/calcular",
+        json=build_payload(),
+        headers={**admin_token_headers, "If-None-Match": "*"},
+    )
+    assert wildcard.status_code == status.HTTP_200_OK
+
+
+def test_calculate_alumbrado_stream(client, admin_token_headers):
+    payload = build_payload()
+    header = {
+        **payload,
+        "energia_niveles": [{**level, "aforos": []} for level in payload["energia_niveles"]],
+    }
+    aforo_lines = [
+        json.dumps({"seccion": "aforo", "nivel_tension": level["nivel_tension"], **aforo})
+        for level in payload["energia_niveles"]
+        for aforo in level["aforos"]
+    ]
+    body = "\n".join([json.dumps(header), *aforo_lines])
+
+    response = client.post(
+        "/api/alumbrado/calcular/flujo",
+        content=body,
+        headers={**admin_token_headers, "Content-Type": "application/x-ndjson"},
+    )
+    expected = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == expected.json()
+
+    invalid = client.post(
+        "/api/alumbrado/calcular/flujo",
+        content=body + '\n{"seccion": "aforo", "nivel_tension": 3}',
+        headers={**admin_token_headers, "Content-Type": "application/x-ndjson"},
+    )
+    assert invalid.status_code == status.HTTP_400_BAD_REQUEST
+    assert invalid.json()["detail"].startswith("Línea 3:")
+
+
+def test_calculate_alumbrado_from_inventory(client, admin_token_headers):
+    payload = build_payload()
+    header = {
+        **payload,
+        "energia_niveles": [{**level, "aforos": []} for level in payload["energia_niveles"]],
+    }
+
+    response = client.post(
+        "/api/alumbrado/calcular/inventario",
+        data={"encabezado": json.dumps(header)},
+        files={
+            "aforos": (
+                "aforos.csv",
+                b"nivel_tension,clase_iluminacion,carga_kw,horas_diarias,dias_facturacion\n"
+                b"1,1,1,2,3\n",
+                "text/csv",
+            )
+        },
+        headers=admin_token_headers,
+    )
+    expected = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == expected.json()
+
+    invalid = client.post(
+        "/api/alumbrado/calcular/inventario",
+        data={"encabezado": json.dumps(header)},
+        files={"aforos": ("aforos.csv", b"nivel_tension,carga_kw\n3,1\n", "text/csv")},
+        headers=admin_token_headers,
+    )
+    assert invalid.status_code == status.HTTP_400_BAD_REQUEST
+    assert invalid.json()["detail"]["total_errores"] == 4
+
+
+def test_calculate_alumbrado_with_load_profiles(client, admin_token_headers):
+    payload = build_payload()
+    payload["perfiles_carga"] = [{"nombre": "atenuado", "factores": [1.0] * 12 + [0.0] * 12}]
+    aforo = {**payload["energia_niveles"][0]["aforos"][0], "horas_diarias": None}
+    payload["energia_niveles"][0]["aforos"].append({**aforo, "perfil": "atenuado"})
+
+    python = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+    numpy = client.post(
+        "/api/alumbrado/calcular",
+        params={"motor": "numpy"},
+        json=payload,
+        headers=admin_token_headers,
+    )
+    assert python.status_code == status.HTTP_200_OK
+    assert python.json() == numpy.json()
+    assert python.json()["energia_niveles"][0]["cee_aforado_kwh"] == 1 * 2 * 3 + 1 * 12 * 3
+
+    payload["energia_niveles"][0]["aforos"][-1]["perfil"] = "otro"
+    missing = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+    assert missing.status_code == status.HTTP_400_BAD_REQUEST
+
+    payload["energia_niveles"][0]["aforos"][-1]["horas_diarias"] = 2
+    both = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+    assert both.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert both.json()["detail"][0]["loc"] == ["body", "energia_niveles", 0, "aforos", 1]
+    assert "a la vez" in both.json()["detail"][0]["msg"]
+
+    payload["energia_niveles"][0]["aforos"][-1]["horas_diarias"] = None
+    payload["perfiles_carga"] *= 2
+    duplicated = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+    assert duplicated.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_calculate_alumbrado_columns(client, admin_token_headers):
+    payload = build_payload()
+    columnar = {
+        **payload,
+        "inversion_niveles": [
+            {**level, "ucap": [], "terrenos": []} for level in payload["inversion_niveles"]
+        ],
+        "columnas": {
+            "ucap": {
+                "nivel_tension": [1, 2],
+                "cr_i": [1000, 500],
+                "cr_l_base": [130, 0],
+                "eficacia_lm_w": [130, None],
+                "vida_util_anios": [1, 1],
+            },
+            "terrenos": {"nivel_tension": [1], "area_m2": [10], "valor_catastral_m2": [100]},
+        },
+    }
+
+    response = client.post(
+        "/api/alumbrado/calcular/columnas", json=columnar, headers=admin_token_headers
+    )
+    expected = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == expected.json()
+
+    columnar["columnas"]["terrenos"]["area_m2"].append(5)
+    invalid = client.post(
+        "/api/alumbrado/calcular/columnas", json=columnar, headers=admin_token_headers
+    )
+    assert invalid.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+OUTAGE_CSV = (
+    b"circuito,nivel_tension,potencia_kw,inicio,fin\n"
+    b"C-1,1,0.01,2026-01-01T00:00:00,2026-01-01T06:00:00\n"
+    b"C-1,1,0.01,2026-01-01T04:00:00,2026-01-01T10:00:00\n"
+)
+
+
+def test_aggregate_outage_log(client, admin_token_headers):
+    response = client.post(
+        "/api/alumbrado/interrupciones",
+        params={"hasta": "2026-01-01T08:00:00"},
+        files={"registros": ("registros.csv", OUTAGE_CSV, "text/csv")},
+        headers=admin_token_headers,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert (data["registros"], data["interrupciones"]) == (2, 1)
+    assert data["eventos_disponibilidad"] == [{"potencia_kw": 0.01, "horas_sin_servicio": 8.0}]
+    assert data["niveles"][0]["vceei_kw_h"] == 0.08
+
+    invalid = client.post(
+        "/api/alumbrado/interrupciones",
+        files={"registros": ("registros.csv", b"circuito,inicio\nC-1,2026-01-01\n", "text/csv")},
+        headers=admin_token_headers,
+    )
+    assert invalid.status_code == status.HTTP_400_BAD_REQUEST
+    assert invalid.json()["detail"]["total_errores"] == 3
+
+
+def test_calculate_alumbrado_from_inventory_with_outages(client, admin_token_headers):
+    header = build_payload()
+    header["disponibilidad"]["eventos"] = []
+    header["cotr"]["costos_ambientales"] = 0
+    payload = build_payload()
+    payload["cotr"]["costos_ambientales"] = 0
+    payload["disponibilidad"]["eventos"] = [{"potencia_kw": 0.01, "horas_sin_servicio": 10}]
+    payload["aom_niveles"][0]["vceei_eventos"].append(
+        {"potencia_kw": 0.01, "horas_indisponibilidad": 10}
+    )
+
+    response = client.post(
+        "/api/alumbrado/calcular/inventario",
+        data={"encabezado": json.dumps(header)},
+        files={"interrupciones": ("registros.csv", OUTAGE_CSV, "text/csv")},
+        headers=admin_token_headers,
+    )
+    expected = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == expected.json()
+
+
+def test_project_alumbrado(client, admin_token_headers):
+    response = client.post(
+        "/api/alumbrado/proyeccion",
+        json={"calculo": build_payload(), "anno_inicio": 2026, "anno_fin": 2029},
+        headers=admin_token_headers,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    years = response.json()["annos"]
+    assert [year["faoml"] for year in years] == [0.07, 0.07, 0.06, 0.06]
+
+    invalid = client.post(
+        "/api/alumbrado/proyeccion",
+        json={"calculo": build_payload(), "anno_inicio": 2030, "anno_fin": 2026},
+        headers=admin_token_headers,
+    )
+    assert invalid.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_monte_carlo_alumbrado(client, admin_token_headers):
+    request = {
+        "calculo": build_payload(),
+        "muestras": 1000,
+        "semilla": 42,
+        "distribuciones": [
+            {"campo": "tee", "nivel_tension": 1, "tipo": "normal", "media": 100, "desviacion": 10}
+        ],
+    }
+    response = client.post(
+        "/api/alumbrado/montecarlo", json=request, headers=admin_token_headers
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert body["semilla"] == 42
+    assert body["percentiles"] == [5, 50, 95]
+    assert set(body["componentes"]) == {"csee", "cinv", "caom", "cap"}
+
+    too_many = client.post(
+        "/api/alumbrado/montecarlo",
+        json={**request, "muestras": 10_000_000},
+        headers=admin_token_headers,
+    )
+    assert too_many.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_calculate_alumbrado_fast_path_keeps_validation_errors(client, admin_token_headers):
+    payload = build_payload()
+    payload["tasa_retorno"] = -1
+    invalid = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+
+    assert invalid.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert invalid.json()["detail"][0]["loc"] == ["body", "tasa_retorno"]
+
+    malformed = client.post(
+        "/api/alumbrado/calcular",
+        content=b'{"municipio": ',
+        headers={**admin_token_headers, "Content-Type": "application/json"},
+    )
+    assert malformed.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert malformed.json()["detail"][0]["type"] == "json_invalid"
+
+
+def test_receipt_from_calculation_hash(client, admin_token_headers):
+    calculated = client.post(
+        "/api/alumbrado/calcular", json=build_payload(), headers=admin_token_headers
+    )
+    content_hash = calculated.headers["ETag"].strip('"')
+
+    response = client.post(
+        "/api/alumbrado/recibo/simple/desde-calculo",
+        json={"hash_calculo": content_hash},
+        headers=admin_token_headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["total"] == calculated.json()["cap"]
+
+    ambiguous = client.post(
+        "/api/alumbrado/recibo/simple/desde-calculo",
+        json={"calculo": build_payload(), "hash_calculo": content_hash},
+        headers=admin_token_headers,
+    )
+    assert ambiguous.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_calculate_alumbrado_server_timing(client, admin_token_headers, monkeypatch):
+    calculation_cache.clear()
+    disabled = client.post(
+        "/api/alumbrado/calcular", json=build_payload(), headers=admin_token_headers
+    )
+    assert "Server-Timing" not in disabled.headers
+
+    calculation_cache.clear()
+    monkeypatch.setattr(settings, "ENABLE_ALUMBRADO_PROFILING", True)
+    response = client.post(
+        "/api/alumbrado/calcular", json=build_payload(), headers=admin_token_headers
+    )
+
+    timing = response.headers["Server-Timing"]
+    for stage in ("validacion", "reduccion", "csee", "recibo", "serializacion"):
+        assert f"{stage};" in timing
+    metrics = client.get("/api/alumbrado/metricas", headers=admin_token_headers).json()
+    assert metrics["etapas"]["csee"]["conteo"] >= 1
@@ -0,0 +1,242 @@
+import pytest
+from fastapi import status
+
+from test_alumbrado import build_payload
+
+
+def create_calculation(
+    client, headers, periodo="2026-01", municipio="Alcaldía de Prueba", payload=None
+):
+    payload = payload or build_payload()
+    payload["periodo"] = periodo
+    payload["municipio"] = municipio
+    response = client.post("/api/alumbrado/calculos/", json=payload, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def test_create_and_read_calculation(client, admin_token_headers, monkeypatch):
+    created = create_calculation(client, admin_token_headers)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("No se debe recalcular al leer un cálculo guardado")
+
+    monkeypatch.setattr("app.services.alumbrado_cache.calculate_alumbrado_costs", fail)
+    response = client.get(f"/api/alumbrado/calculos/{created['id']}", headers=admin_token_headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["resultado"] == created["resultado"]
+    assert data["cap"] == created["resultado"]["cap"]
+    assert len(data["hash_entrada"]) == 64
+
+    entrada = client.get(
+        f"/api/alumbrado/calculos/{created['id']}/entrada", headers=admin_token_headers
+    )
+    assert entrada.json()["periodo"] == "2026-01"
+
+
+def test_list_calculations_with_keyset_pagination(client, admin_token_headers):
+    for periodo in ["2026-03", "2026-01", "2026-02", "2026-04"]:
+        create_calculation(client, admin_token_headers, periodo=periodo)
+    create_calculation(client, admin_token_headers, periodo="2026-02", municipio="Otro Municipio")
+
+    params = {
+        "municipio": "Alcaldía de Prueba",
+        "periodo_desde": "2026-02",
+        "periodo_hasta": "2026-04",
+        "limit": 2,
+    }
+    first = client.get("/api/alumbrado/calculos/", params=params, headers=admin_token_headers).json()
+    second = client.get(
+        "/api/alumbrado/calculos/",
+        params={**params, "cursor": first["siguiente_cursor"]},
+        headers=admin_token_headers,
+    ).json()
+
+    assert [item["periodo"] for item in first["items"]] == ["2026-02", "2026-03"]
+    assert [item["periodo"] for item in second["items"]] == ["2026-04"]
+    assert second["siguiente_cursor"] is None
+
+
+def test_read_calculation_not_found(client, admin_token_headers):
+    response = client.get("/api/alumbrado/calculos/999", headers=admin_token_headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_invalid_cursor(client, admin_token_headers):
+    response = client.get(
+        "/api/alumbrado/calculos/", params={"cursor": "no-es-cursor"}, headers=admin_token_headers
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_patch_energy_level_returns_result_and_delta(client, admin_token_headers):
+    created = create_calculation(client, admin_token_headers)
+    energia_nivel = build_payload()["energia_niveles"][0]
+    energia_nivel["aforos"][0]["carga_kw"] = 2
+
+    response = client.patch(
+        f"/api/alumbrado/calculos/{created['id']}",
+        json={"energia_nivel": energia_nivel},
+        headers=admin_token_headers,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    full_payload = build_payload()
+    full_payload["energia_niveles"][0] = energia_nivel
+    expected = client.post("/api/alumbrado/calcular", json=full_payload, headers=admin_token_headers)
+    assert data["resultado"] == expected.json()
+    assert data["delta"]["componentes_afectados"] == ["csee", "caom"]
+    assert data["delta"]["csee"] == round(expected.json()["csee"] - created["resultado"]["csee"], 2)
+    assert data["hash_entrada"] != created["hash_entrada"]
+
+    stored = client.get(f"/api/alumbrado/calculos/{created['id']}", headers=admin_token_headers)
+    assert stored.json()["resultado"] == data["resultado"]
+
+
+def test_patch_appends_vceei_events(client, admin_token_headers):
+    created = create_calculation(client, admin_token_headers)
+
+    response = client.patch(
+        f"/api/alumbrado/calculos/{created['id']}",
+        json={
+            "agregar_vceei_eventos": {
+                "nivel_tension": 2,
+                "eventos": [{"potencia_kw": 0.01, "horas_indisponibilidad": 1}],
+            }
+        },
+        headers=admin_token_headers,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    delta = response.json()["delta"]
+    assert delta["caom"] == -2.0
+    assert delta["csee"] == 0.0
+    entrada = client.get(
+        f"/api/alumbrado/calculos/{created['id']}/entrada", headers=admin_token_headers
+    ).json()
+    assert len(entrada["aom_niveles"][1]["vceei_eventos"]) == 1
+
+
+def test_patch_rejects_multiple_sections_and_unknown_levels(client, admin_token_headers):
+    payload = build_payload()
+    for section in ["energia_niveles", "inversion_niveles", "aom_niveles"]:
+        payload[section] = payload[section][:1]
+    payload["cotr"]["costos_ambientales"] = 0
+    created = client.post("/api/alumbrado/calculos/", json=payload, headers=admin_token_headers)
+    url = f"/api/alumbrado/calculos/{created.json()['id']}"
+
+    response = client.patch(
+        url,
+        json={"disponibilidad": payload["disponibilidad"], "aom_nivel": payload["aom_niveles"][0]},
+        headers=admin_token_headers,
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    response = client.patch(
+        url,
+        json={"energia_nivel": {"nivel_tension": 2, "tee": 1}},
+        headers=admin_token_headers,
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "nivel de tensión 2" in response.json()["detail"]
+
+
+def test_receipt_from_stored_calculation(client, admin_token_headers, monkeypatch):
+    created = create_calculation(client, admin_token_headers)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("No se debe recalcular para reimprimir un recibo")
+
+    monkeypatch.setattr("app.services.alumbrado_cache.calculate_alumbrado_costs", fail)
+    by_id = client.post(
+        "/api/alumbrado/recibo/simple/desde-calculo",
+        json={"calculo_id": created["id"], "metadata": {"observaciones": "Reimpresión"}},
+        headers=admin_token_headers,
+    )
+    by_hash = client.post(
+        "/api/alumbrado/recibo/simple/desde-calculo",
+        json={"hash_calculo": created["hash_entrada"]},
+        headers=admin_token_headers,
+    )
+
+    assert by_id.status_code == status.HTTP_200_OK
+    assert by_hash.status_code == status.HTTP_200_OK
+    assert by_id.json()["total"] == created["resultado"]["cap"]
+    assert by_hash.json()["componentes"] == by_id.json()["componentes"]
+    assert "Reimpresión" in by_id.json()["contenido_texto"]
+
+    missing = client.post(
+        "/api/alumbrado/recibo/simple/desde-calculo",
+        json={"hash_calculo": "0" * 64},
+        headers=admin_token_headers,
+    )
+    assert missing.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_compare_two_stored_calculations(client, admin_token_headers, monkeypatch):
+    base = create_calculation(client, admin_token_headers, periodo="2026-01")
+    payload = build_payload()
+    payload["energia_niveles"][0]["cee_medido_kwh"] = 20
+    compared = create_calculation(client, admin_token_headers, periodo="2026-02", payload=payload)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("La comparación no debe recalcular")
+
+    monkeypatch.setattr("app.services.alumbrado_cache.calculate_alumbrado_costs", fail)
+    response = client.get(
+        "/api/alumbrado/calculos/comparacion",
+        params={"base_id": base["id"], "comparado_id": compared["id"]},
+        headers=admin_token_headers,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["base"]["periodo"] == "2026-01"
+    assert data["componentes"]["csee"]["delta"] == pytest.approx(
+        compared["resultado"]["csee"] - base["resultado"]["csee"], abs=0.01
+    )
+    nivel_1, nivel_2 = data["niveles"]
+    assert nivel_1["csee_n"]["delta"] > 0
+    assert nivel_2["csee_n"]["delta"] == 0
+    assert nivel_1["cinv_n"]["delta"] == 0
+
+
+def test_compare_periods_for_whole_tenant(client, admin_token_headers):
+    for periodo in ["2026-01", "2026-02", "2026-03"]:
+        create_calculation(client, admin_token_headers, periodo=periodo)
+    latest = create_calculation(client, admin_token_headers, periodo="2026-02")
+    create_calculation(client, admin_token_headers, periodo="2026-01", municipio="Otro Municipio")
+    create_calculation(client, admin_token_headers, periodo="2026-02", municipio="Otro Municipio")
+
+    response = client.get(
+        "/api/alumbrado/calculos/comparacion/periodos",
+        params={"periodo_desde": "2026-01"},
+        headers=admin_token_headers,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    comparisons = response.json()["comparaciones"]
+    assert [
+        (item["comparado"]["municipio"], item["base"]["periodo"], item["comparado"]["periodo"])
+        for item in comparisons
+    ] == [
+        ("Alcaldía de Prueba", "2026-01", "2026-02"),
+        ("Alcaldía de Prueba", "2026-02", "2026-03"),
+        ("Otro Municipio", "2026-01", "2026-02"),
+    ]
+    assert comparisons[0]["comparado"]["id"] == latest["id"]
+    assert comparisons[0]["componentes"]["cap"]["delta"] == 0
+    assert comparisons[0]["componentes"]["cap"]["variacion_porcentual"] == 0
+
+
+def test_compare_calculations_not_found(client, admin_token_headers):
+    created = create_calculation(client, admin_token_headers)
+    response = client.get(
+        "/api/alumbrado/calculos/comparacion",
+        params={"base_id": created["id"], "comparado_id": 999},
+        headers=admin_token_headers,
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,251 @@
+from app.models.alumbrado import InventarioAlumbrado
+from app.schemas.alumbrado import InventarioTerrenoFila
+from app.services.alumbrado_cache import calculation_cache
+from app.services.alumbrado_inventory import upsert_inventory_rows
+from fastapi import status
+from sqlalchemy.orm import Session
+
+from test_alumbrado import build_payload
+
+
+def create_inventory(client, headers):
+    response = client.post(
+        "/api/alumbrado/inventarios/", json={"nombre": "Inventario 2026"}, headers=headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def load_payload_inventory(client, headers, inventario_id):
+    payload = build_payload()
+    ucap_rows = [
+        {
+            "codigo": f"U-{level['nivel_tension']}-{index}",
+            "nivel_tension": level["nivel_tension"],
+            **ucap,
+        }
+        for level in payload["inversion_niveles"]
+        for index, ucap in enumerate(level["ucap"])
+    ]
+    terreno_rows = [
+        {"codigo": f"T-{index}", "nivel_tension": level["nivel_tension"], **terreno}
+        for level in payload["inversion_niveles"]
+        for index, terreno in enumerate(level["terrenos"])
+    ]
+    base_url = f"/api/alumbrado/inventarios/{inventario_id}"
+    client.put(f"{base_url}/ucap", json=ucap_rows, headers=headers)
+    response = client.put(f"{base_url}/terrenos", json=terreno_rows, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    for level in payload["inversion_niveles"]:
+        level["ucap"] = []
+        level["terrenos"] = []
+    payload["inventario_id"] = inventario_id
+    return payload
+
+
+def test_calculate_with_inventory_reference(client, admin_token_headers):
+    calculation_cache.clear()
+    inventario = create_inventory(client, admin_token_headers)
+    payload = load_payload_inventory(client, admin_token_headers, inventario["id"])
+
+    response = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+    expected = client.post(
+        "/api/alumbrado/calcular", json=build_payload(), headers=admin_token_headers
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == expected.json()
+
+    update = client.put(
+        f"/api/alumbrado/inventarios/{inventario['id']}/terrenos",
+        json=[{"codigo": "T-0", "nivel_tension": 1, "area_m2": 20, "valor_catastral_m2": 100}],
+        headers=admin_token_headers,
+    )
+    assert update.json() == {
+        "inventario_id": inventario["id"],
+        "version": 4,
+        "insertadas": 0,
+        "actualizadas": 1,
+    }
+
+    updated = client.post(
+        "/api/alumbrado/calcular",
+        json=payload,
+        headers={**admin_token_headers, "If-None-Match": response.headers["ETag"]},
+    )
+    assert updated.status_code == status.HTTP_200_OK
+    assert updated.headers["ETag"] != response.headers["ETag"]
+    assert updated.json()["inversion_niveles"][0]["cat_n"] == 138.0
+
+
+def test_recreated_inventory_does_not_reuse_cached_results(client, admin_token_headers):
+    calculation_cache.clear()
+    first = create_inventory(client, admin_token_headers)
+    payload = load_payload_inventory(client, admin_token_headers, first["id"])
+    original = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+    original_version = client.get(
+        f"/api/alumbrado/inventarios/{first['id']}", headers=admin_token_headers
+    ).json()["version"]
+    client.delete(f"/api/alumbrado/inventarios/{first['id']}", headers=admin_token_headers)
+
+    second = create_inventory(client, admin_token_headers)
+    base_url = f"/api/alumbrado/inventarios/{second['id']}"
+    client.put(f"{base_url}/ucap", json=[], headers=admin_token_headers)
+    client.put(
+        f"{base_url}/terrenos",
+        json=[{"codigo": "T-0", "nivel_tension": 1, "area_m2": 10_000, "valor_catastral_m2": 100}],
+        headers=admin_token_headers,
+    )
+    second_version = client.get(base_url, headers=admin_token_headers).json()["version"]
+    payload["inventario_id"] = second["id"]
+    recreated = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+    payload["tasa_retorno"] = 0.2
+    other_rate = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+
+    assert (second["id"], second_version) == (first["id"], original_version)
+    assert recreated.headers["ETag"] != original.headers["ETag"]
+    assert recreated.json()["cinv"] != original.json()["cinv"]
+    assert other_rate.json()["inversion_niveles"][0]["cat_n"] == (
+        recreated.json()["inversion_niveles"][0]["cat_n"]
+    )
+
+
+def test_concurrent_inventory_edits_get_distinct_versions(client, admin_token_headers, db):
+    inventario = create_inventory(client, admin_token_headers)
+    other = Session(bind=db.get_bind())
+    stale = other.get(InventarioAlumbrado, inventario["id"])
+    load_payload_inventory(client, admin_token_headers, inventario["id"])
+
+    row = InventarioTerrenoFila(codigo="T-9", nivel_tension=1, area_m2=5, valor_catastral_m2=10)
+    result = upsert_inventory_rows(other, stale, "terrenos", [row])
+    other.close()
+
+    assert result.version == 4
+
+
+def test_inventory_rows_crud(client, admin_token_headers):
+    inventario = create_inventory(client, admin_token_headers)
+    load_payload_inventory(client, admin_token_headers, inventario["id"])
+    base_url = f"/api/alumbrado/inventarios/{inventario['id']}"
+
+    detail = client.get(base_url, headers=admin_token_headers).json()
+    assert detail["filas"] == {"ucap": 2, "terrenos": 1, "aforos": 0}
+
+    rows = client.get(f"{base_url}/ucap", params={"nivel_tension": 2}, headers=admin_token_headers)
+    assert [row["codigo"] for row in rows.json()] == ["U-2-0"]
+
+    deleted = client.delete(f"{base_url}/ucap/U-2-0", headers=admin_token_headers)
+    assert deleted.status_code == status.HTTP_204_NO_CONTENT
+    missing = client.delete(f"{base_url}/ucap/U-2-0", headers=admin_token_headers)
+    assert missing.status_code == status.HTTP_404_NOT_FOUND
+
+    invalid = client.put(
+        f"{base_url}/aforos",
+        json=[{"codigo": "A-1", "nivel_tension": 1}],
+        headers=admin_token_headers,
+    )
+    assert invalid.status_code == status.HTTP_400_BAD_REQUEST
+
+    profiled = client.put(
+        f"{base_url}/aforos",
+        json=[
+            {
+                "codigo": "A-1",
+                "nivel_tension": 1,
+                "clase_iluminacion": 1,
+                "carga_kw": 1,
+                "dias_facturacion": 30,
+                "perfil": "atenuado",
+            }
+        ],
+        headers=admin_token_headers,
+    )
+    assert profiled.status_code == status.HTTP_400_BAD_REQUEST
+
+    assert client.delete(base_url, headers=admin_token_headers).status_code == 204
+    assert client.get(base_url, headers=admin_token_headers).status_code == 404
+
+
+def test_inventory_versions_are_immutable_snapshots(client, admin_token_headers):
+    calculation_cache.clear()
+    inventario = create_inventory(client, admin_token_headers)
+    payload = load_payload_inventory(client, admin_token_headers, inventario["id"])
+    expected = client.post(
+        "/api/alumbrado/calcular", json=build_payload(), headers=admin_token_headers
+    ).json()
+
+    stored = client.post("/api/alumbrado/calculos/", json=payload, headers=admin_token_headers)
+    assert stored.status_code == status.HTTP_200_OK
+    assert (stored.json()["inventario_id"], stored.json()["inventario_version"]) == (
+        inventario["id"],
+        3,
+    )
+    assert stored.json()["resultado"] == expected
+
+    client.put(
+        f"/api/alumbrado/inventarios/{inventario['id']}/terrenos",
+        json=[{"codigo": "T-0", "nivel_tension": 1, "area_m2": 20, "valor_catastral_m2": 100}],
+        headers=admin_token_headers,
+    )
+    client.delete(
+        f"/api/alumbrado/inventarios/{inventario['id']}/ucap/U-2-0", headers=admin_token_headers
+    )
+    pinned = client.post(
+        "/api/alumbrado/calcular",
+        json={**payload, "inventario_version": 3},
+        headers=admin_token_headers,
+    )
+    current = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+    assert pinned.json() == expected
+    assert current.json()["cinv"] != expected["cinv"]
+
+    missing = client.post(
+        "/api/alumbrado/calcular",
+        json={**payload, "inventario_version": 9},
+        headers=admin_token_headers,
+    )
+    assert missing.status_code == status.HTTP_404_NOT_FOUND
+
+    calculo_id = stored.json()["id"]
+    entrada = client.get(
+        f"/api/alumbrado/calculos/{calculo_id}/entrada", headers=admin_token_headers
+    ).json()
+    assert entrada["inventario_version"] == 3
+
+    added = {"area_m2": 5, "valor_catastral_m2": 100}
+    patched = client.patch(
+        f"/api/alumbrado/calculos/{calculo_id}",
+        json={"inversion_nivel": {"nivel_tension": 1, "ucap": [], "terrenos": [added]}},
+        headers=admin_token_headers,
+    )
+    full_payload = build_payload()
+    full_payload["inversion_niveles"][0]["terrenos"].append(added)
+    assert patched.status_code == status.HTTP_200_OK
+    assert patched.json()["resultado"] == client.post(
+        "/api/alumbrado/calcular", json=full_payload, headers=admin_token_headers
+    ).json()
+
+    blocked = client.delete(
+        f"/api/alumbrado/inventarios/{inventario['id']}", headers=admin_token_headers
+    )
+    assert blocked.status_code == status.HTTP_409_CONFLICT
+
+
+def test_inventory_reference_is_rejected_by_derived_operations(client, admin_token_headers):
+    payload = build_payload()
+    payload["inventario_id"] = 1
+
+    missing = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+    assert missing.status_code == status.HTTP_404_NOT_FOUND
+
+    stored = client.post("/api/alumbrado/calculos/", json=payload, headers=admin_token_headers)
+    assert stored.status_code == status.HTTP_404_NOT_FOUND
+
+    projection = client.post(
+        "/api/alumbrado/proyeccion",
+        json={"calculo": payload, "anno_inicio": 2026, "anno_fin": 2027},
+        headers=admin_token_headers,
+    )
+    assert projection.status_code == status.HTTP_400_BAD_REQUEST
+    assert "inventario_id" in projection.json()["detail"]
@@ -0,0 +1,185 @@
+from fastapi import status
+
+from app.models.cliente import Cliente
+from app.services.alumbrado_jobs import run_next_job
+from app.services.alumbrado_parameters import parameters_cache
+from test_alumbrado import build_payload
+
+
+def test_calculation_job_lifecycle(client, admin_token_headers, db):
+    payload = build_payload()
+    response = client.post(
+        "/api/alumbrado/trabajos/calculo", json=payload, headers=admin_token_headers
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    trabajo = response.json()
+    assert trabajo["estado"] == "pendiente"
+    assert trabajo["progreso"] == 0
+
+    pending = client.get(
+        f"/api/alumbrado/trabajos/{trabajo['id']}/resultado", headers=admin_token_headers
+    )
+    assert pending.status_code == status.HTTP_409_CONFLICT
+
+    assert run_next_job(db) is True
+    assert run_next_job(db) is False
+
+    estado = client.get(f"/api/alumbrado/trabajos/{trabajo['id']}", headers=admin_token_headers)
+    assert estado.json()["estado"] == "completado"
+    assert estado.json()["progreso"] == 1
+    assert estado.json()["intentos"] == 1
+
+    resultado = client.get(
+        f"/api/alumbrado/trabajos/{trabajo['id']}/resultado", headers=admin_token_headers
+    )
+    sync = client.post("/api/alumbrado/calcular", json=payload, headers=admin_token_headers)
+    assert resultado.status_code == status.HTTP_200_OK
+    assert resultado.json()["cap"] == sync.json()["cap"]
+
+
+def test_batch_job_reports_invalid_items_by_index(client, admin_token_headers, db):
+    invalid = build_payload()
+    invalid["tasa_retorno"] = -1
+    response = client.post(
+        "/api/alumbrado/trabajos/lote",
+        json=[build_payload(), invalid, build_payload()],
+        headers=admin_token_headers,
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.json()["total_items"] == 3
+
+    run_next_job(db)
+    data = client.get(
+        f"/api/alumbrado/trabajos/{response.json()['id']}/resultado",
+        headers=admin_token_headers,
+    ).json()
+
+    assert (data["total"], data["exitosos"], data["fallidos"]) == (3, 2, 1)
+    assert [item["indice"] for item in data["resultados"]] == [0, 1, 2]
+    assert "tasa_retorno" in data["resultados"][1]["error"]
+
+
+def test_batch_job_rejects_empty_batch(client, admin_token_headers):
+    response = client.post("/api/alumbrado/trabajos/lote", json=[], headers=admin_token_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_read_job_not_found(client, admin_token_headers):
+    response = client.get("/api/alumbrado/trabajos/999", headers=admin_token_headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_recalculation_job_reports_changed_calculations(client, admin_token_headers, db):
+    parameters_cache.clear()
+    payload = build_payload()
+    payload["cotr"]["costos_ambientales"] = 0
+    created = client.post("/api/alumbrado/calculos/", json=payload, headers=admin_token_headers)
+    client.post(
+        "/api/alumbrado/parametros",
+        json={"faoml_por_anno": {"2026": 0.08}},
+        headers=admin_token_headers,
+    )
+
+    response = client.post("/api/alumbrado/trabajos/recalculo", headers=admin_token_headers)
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.json()["tipo"] == "recalculo"
+    assert response.json()["total_items"] == 1
+
+    run_next_job(db)
+    data = client.get(
+        f"/api/alumbrado/trabajos/{response.json()['id']}/resultado",
+        headers=admin_token_headers,
+    ).json()
+    stored = client.get(
+        f"/api/alumbrado/calculos/{created.json()['id']}", headers=admin_token_headers
+    ).json()
+
+    assert (data["version_parametros"], data["actualizados"]) == (1, 1)
+    assert data["diferencias"][0]["cap_nuevo"] == stored["cap"]
+    assert stored["resultado"]["version_parametros"] == 1
+    parameters_cache.clear()
+
+
+def test_allocation_job_writes_charges_per_cliente(
+    client, admin_token_headers, user_token_headers, db
+):
+    db.add_all(
+        Cliente(tenant_id="public", numero_cuenta=str(index), estrato=estrato)
+        for index, estrato in enumerate([1, 1, 2, 4, 6])
+    )
+    db.commit()
+    created = client.post(
+        "/api/alumbrado/calculos/", json=build_payload(), headers=admin_token_headers
+    ).json()
+    body = {"calculo_id": created["id"], "pesos": {"1": 0.5, "2": 0.6, "4": 1, "6": 1.2}}
+
+    denied = client.post(
+        "/api/alumbrado/trabajos/distribucion", json=body, headers=user_token_headers
+    )
+    assert denied.status_code == status.HTTP_403_FORBIDDEN
+    response = client.post(
+        "/api/alumbrado/trabajos/distribucion", json=body, headers=admin_token_headers
+    )
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.json()["total_items"] == 5
+
+    run_next_job(db)
+    data = client.get(
+        f"/api/alumbrado/trabajos/{response.json()['id']}/resultado",
+        headers=admin_token_headers,
+    ).json()
+    assert data["total_distribuido"] == created["cap"]
+    assert [estrato["suscriptores"] for estrato in data["estratos"]] == [2, 1, 1, 1]
+
+    first = client.get(
+        f"/api/alumbrado/calculos/{created['id']}/cargos",
+        params={"limit": 3},
+        headers=admin_token_headers,
+    ).json()
+    rest = client.get(
+        f"/api/alumbrado/calculos/{created['id']}/cargos",
+        params={"despues_de": first["siguiente_cliente_id"]},
+        headers=admin_token_headers,
+    ).json()
+    charges = first["items"] + rest["items"]
+    assert rest["siguiente_cliente_id"] is None
+    assert len(charges) == 5
+    assert round(sum(charge["valor"] for charge in charges), 2) == created["cap"]
+
+
+def test_patch_that_changes_cap_clears_charges(client, admin_token_headers, db):
+    db.add_all(
+        Cliente(tenant_id="public", numero_cuenta=str(index), estrato=1) for index in range(3)
+    )
+    db.commit()
+    created = client.post(
+        "/api/alumbrado/calculos/", json=build_payload(), headers=admin_token_headers
+    ).json()
+    client.post(
+        "/api/alumbrado/trabajos/distribucion",
+        json={"calculo_id": created["id"], "pesos": {"1": 1}},
+        headers=admin_token_headers,
+    )
+    run_next_job(db)
+    charges_url = f"/api/alumbrado/calculos/{created['id']}/cargos"
+    assert len(client.get(charges_url, headers=admin_token_headers).json()["items"]) == 3
+
+    energia_nivel = build_payload()["energia_niveles"][0]
+    energia_nivel["aforos"][0]["carga_kw"] = 2
+    patched = client.patch(
+        f"/api/alumbrado/calculos/{created['id']}",
+        json={"energia_nivel": energia_nivel},
+        headers=admin_token_headers,
+    )
+
+    assert patched.json()["cap"] != created["cap"]
+    assert client.get(charges_url, headers=admin_token_headers).json()["items"] == []
+
+
+def test_allocation_job_requires_existing_calculation(client, admin_token_headers):
+    response = client.post(
+        "/api/alumbrado/trabajos/distribucion",
+        json={"calculo_id": 999, "pesos": {"1": 1}},
+        headers=admin_token_headers,
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
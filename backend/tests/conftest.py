@@ -1,4 +1,5 @@
 import pytest
+from app.core.config import settings
 from app.core.security import get_password_hash
 from app.db.database import Base, get_db
 from app.main import app
@@ -21,6 +22,12 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Cada TestClient ejecuta el lifespan; no arrancar el pool de procesos en cada prueba.
+settings.ENABLE_ALUMBRADO_POOL_WARMUP = False
+# Las pruebas ejecutan los trabajos con `run_next_job`; los workers del lifespan
+# usarían la base de datos de la aplicación y competirían por la cola.
+settings.ALUMBRADO_JOB_WORKERS = 0
+
 @pytest.fixture(scope="function")
 def db():
     # Crear tablas en la base de datos
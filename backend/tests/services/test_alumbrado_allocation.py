@@ -0,0 +1,86 @@
+from fractions import Fraction
+
+import pytest
+
+from app.core.config import settings
+from app.models.alumbrado import CargoAlumbrado
+from app.models.cliente import Cliente
+from app.services.alumbrado_allocation import allocate_cap, plan_allocation, to_centavos
+from app.services.alumbrado_cache import calculation_hash
+from app.services.alumbrado_calculator import build_calculation_result, reduce_sections
+from app.services.alumbrado_store import save_calculation
+
+from test_alumbrado_calculator import build_payload
+
+WEIGHTS = {1: 0.5, 2: 0.6, 3: 0.85, 4: 1.0, 5: 1.2, 6: 1.2}
+
+
+def store_calculation(db, tenant_id="public"):
+    payload = build_payload()
+    totals = reduce_sections(payload)
+    result = build_calculation_result(payload, tenant_id, totals)
+    return save_calculation(
+        db, tenant_id, payload, result, totals, calculation_hash(payload, tenant_id)
+    )
+
+
+def add_clientes(db, estratos, tenant_id="public"):
+    db.add_all(
+        Cliente(tenant_id=tenant_id, numero_cuenta=f"{tenant_id}-{index}", estrato=estrato)
+        for index, estrato in enumerate(estratos)
+    )
+    db.commit()
+
+
+def test_plan_allocation_reconciles_residue_to_the_centavo():
+    subscribers = {1: 3, 4: 2, 6: 1}
+    shares = plan_allocation(100_001, subscribers, {1: 0.5, 4: 1.0, 6: 1.2})
+
+    assert sum(share.total for share in shares.values()) == 100_001
+    for share in shares.values():
+        assert share.base <= share.exact < share.base + 1
+    assert shares[4].exact == 2 * shares[1].exact
+    assert shares[6].exact == Fraction(1.2) / Fraction(0.5) * shares[1].exact
+
+
+def test_allocate_cap_streams_in_chunks_and_replaces_previous_charges(db, monkeypatch):
+    monkeypatch.setattr(settings, "ALUMBRADO_ALLOCATION_CHUNK", 4)
+    calculo = store_calculation(db)
+    add_clientes(db, [(index * 7) % 6 + 1 for index in range(23)])
+    add_clientes(db, [1, 2], tenant_id="otro")
+
+    result = allocate_cap(db, "public", calculo, WEIGHTS)
+    db.commit()
+    result_again = allocate_cap(db, "public", calculo, WEIGHTS)
+    db.commit()
+
+    charges = db.query(CargoAlumbrado).order_by(CargoAlumbrado.cliente_id).all()
+    assert result_again == result
+    assert len(charges) == result.suscriptores == 23
+    assert sum(charge.valor_centavos for charge in charges) == to_centavos(calculo.cap)
+    assert result.total_distribuido == calculo.cap
+    for estrato in result.estratos:
+        values = [charge.valor_centavos for charge in charges if charge.estrato == estrato.estrato]
+        adjusted = round(estrato.valor_base * 100) + 1
+        assert values == sorted(values, reverse=True)
+        assert values.count(adjusted) == estrato.suscriptores_con_ajuste
+
+
+def test_allocate_cap_requires_weight_for_every_estrato(db):
+    calculo = store_calculation(db)
+    add_clientes(db, [1, 3, None])
+
+    with pytest.raises(ValueError, match="3, sin estrato"):
+        allocate_cap(db, "public", calculo, {1: 1.0})
+    assert db.query(CargoAlumbrado).count() == 0
+
+
+def test_allocate_cap_reports_progress_per_partition(db, monkeypatch):
+    monkeypatch.setattr(settings, "ALUMBRADO_ALLOCATION_CHUNK", 4)
+    calculo = store_calculation(db)
+    add_clientes(db, [(index % 6) + 1 for index in range(10)])
+    progress = []
+
+    allocate_cap(db, "public", calculo, WEIGHTS, on_partition=progress.append)
+
+    assert progress == [4, 8, 10]
@@ -0,0 +1,95 @@
+import pytest
+
+from app.core.config import settings
+from app.services.alumbrado_batch import calculate_alumbrado_batch
+from app.services.alumbrado_pool import PoolSaturatedError, shutdown_calculation_pool
+
+
+def build_payload(municipio: str = "Alcaldía de Prueba") -> dict:
+    return {
+        "municipio": municipio,
+        "periodo": "2026-01",
+        "anno_aplicacion": 2026,
+        "tasa_retorno": 0.1,
+        "energia_niveles": [
+            {
+                "nivel_tension": 1,
+                "tee": 100,
+                "cee_medido_kwh": 10,
+                "aforos": [
+                    {
+                        "clase_iluminacion": 1,
+                        "carga_kw": 1,
+                        "horas_diarias": 2,
+                        "dias_facturacion": 3,
+                    }
+                ],
+            }
+        ],
+        "inversion_niveles": [
+            {
+                "nivel_tension": 1,
+                "ucap": [{"cr_i": 1000, "cr_l_base": 0, "vida_util_anios": 1}],
+                "terrenos": [],
+            }
+        ],
+        "disponibilidad": {"potencia_total_kw": 10, "horas_periodo": 100, "eventos": []},
+        "aom_niveles": [{"nivel_tension": 1, "cra_n": 700, "cral_n": 300}],
+    }
+
+
+def test_batch_preserves_order_and_reports_item_errors():
+    invalid = build_payload()
+    invalid["tasa_retorno"] = -1
+    payloads = [build_payload("Municipio A"), invalid, build_payload("Municipio B")]
+
+    result = calculate_alumbrado_batch(raw_payloads=payloads, tenant_id="public")
+
+    assert result.total == 3
+    assert result.exitosos == 2
+    assert result.fallidos == 1
+    assert [item.indice for item in result.resultados] == [0, 1, 2]
+    assert result.resultados[0].resultado.municipio == "Municipio A"
+    assert result.resultados[1].resultado is None
+    assert "tasa_retorno" in result.resultados[1].error
+    assert result.resultados[2].resultado.municipio == "Municipio B"
+
+
+def test_batch_uses_process_pool(monkeypatch):
+    monkeypatch.setattr(settings, "ALUMBRADO_POOL_WORKERS", 2)
+    monkeypatch.setattr(settings, "ALUMBRADO_BATCH_PARALLEL_MIN_ITEMS", 2)
+    payloads = [build_payload(f"Municipio {index}") for index in range(6)]
+    serial = calculate_alumbrado_batch(raw_payloads=payloads[:1], tenant_id="public")
+
+    try:
+        result = calculate_alumbrado_batch(raw_payloads=payloads, tenant_id="public")
+    finally:
+        shutdown_calculation_pool()
+
+    assert result.exitosos == 6
+    assert [item.resultado.municipio for item in result.resultados] == [
+        f"Municipio {index}" for index in range(6)
+    ]
+    assert result.resultados[0].resultado.cap == pytest.approx(serial.resultados[0].resultado.cap)
+
+
+def test_batch_chunks_respect_pending_limit(monkeypatch):
+    monkeypatch.setattr(settings, "ALUMBRADO_POOL_WORKERS", 1)
+    monkeypatch.setattr(settings, "ALUMBRADO_BATCH_PARALLEL_MIN_ITEMS", 2)
+    monkeypatch.setattr(settings, "ALUMBRADO_POOL_MAX_PENDING", 2)
+    payloads = [build_payload(f"Municipio {index}") for index in range(6)]
+
+    try:
+        with pytest.raises(PoolSaturatedError):
+            calculate_alumbrado_batch(raw_payloads=payloads, tenant_id="public")
+
+        result = calculate_alumbrado_batch(
+            raw_payloads=payloads, tenant_id="public", inline_when_saturated=True
+        )
+    finally:
+        shutdown_calculation_pool()
+
+    assert result.exitosos == 6
+    assert [item.resultado.municipio for item in result.resultados] == [
+        f"Municipio {index}" for index in range(6)
+    ]
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.schemas.alumbrado import AlumbradoCalculoEntrada
+from app.services.alumbrado_cache import CalculationCache, calculation_hash
+from test_alumbrado_calculator import build_payload
+
+
+def test_calculation_hash_is_canonical():
+    payload = build_payload()
+    reordered = AlumbradoCalculoEntrada.model_validate(
+        dict(reversed(list(payload.model_dump(exclude_defaults=True).items())))
+    )
+
+    assert calculation_hash(payload, "public") == calculation_hash(reordered, "public")
+    assert calculation_hash(payload, "public") != calculation_hash(payload, "otro-tenant")
+
+
+def test_cache_hits_and_evicts_least_recently_used():
+    cache = CalculationCache(max_entries=2, ttl_seconds=60)
+
+    assert cache.get_or_compute("a", lambda: 1) == 1
+    assert cache.get_or_compute("b", lambda: 2) == 2
+    assert cache.get_or_compute("a", lambda: 0) == 1
+    cache.get_or_compute("c", lambda: 3)
+
+    assert cache.get_or_compute("b", lambda: 20) == 20
+    assert cache.hits == 1
+    assert cache.misses == 4
+
+
+def test_cache_expires_entries():
+    cache = CalculationCache(max_entries=2, ttl_seconds=0.01)
+    cache.get_or_compute("a", lambda: 1)
+    time.sleep(0.02)
+
+    assert cache.get_or_compute("a", lambda: 2) == 2
+
+
+def test_cache_coalesces_concurrent_requests_and_errors():
+    cache = CalculationCache(max_entries=4, ttl_seconds=60)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(timeout=5)
+        raise ValueError("fallo compartido")
+
+    errors = []
+
+    def request():
+        try:
+            cache.get_or_compute("k", compute)
+        except ValueError as exc:
+            errors.append(str(exc))
+
+    leader = threading.Thread(target=request)
+    leader.start()
+    started.wait(timeout=5)
+    followers = [threading.Thread(target=request) for _ in range(3)]
+    for follower in followers:
+        follower.start()
+    while cache.coalesced < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(timeout=5)
+
+    assert len(calls) == 1
+    assert errors == ["fallo compartido"] * 4
+    assert cache.stats()["entradas"] == 0
+    with pytest.raises(ValueError):
+        cache.get_or_compute("k", compute)
+
+
+def test_cache_coalesces_async_requests():
+    cache = CalculationCache(max_entries=4, ttl_seconds=60)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "resultado"
+
+    async def requests():
+        return await asyncio.gather(
+            *(cache.get_or_compute_async("k", compute) for _ in range(3))
+        )
+
+    assert asyncio.run(requests()) == ["resultado"] * 3
+    assert cache.get_or_compute("k", compute) == "resultado"
+    assert len(calls) == 1
+    assert (cache.misses, cache.coalesced, cache.hits) == (1, 2, 1)
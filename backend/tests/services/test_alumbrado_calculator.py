@@ -1,7 +1,16 @@
+import numpy as np
 import pytest
 
-from app.schemas.alumbrado import AlumbradoCalculoEntrada
-from app.services.alumbrado_calculator import calculate_alumbrado_costs, get_faoml_for_year
+from app.schemas.alumbrado import AlumbradoCalculoEntrada, PerfilCargaEntrada
+from app.services.alumbrado_calculator import (
+    annualized_capital,
+    aom_level_costs,
+    calculate_alumbrado_costs,
+    cee_total_kwh,
+    get_faoml_for_year,
+    normalize_sections,
+    reduce_sections,
+)
 
 
 def build_payload(costos_ambientales: float = 5.0) -> AlumbradoCalculoEntrada:
@@ -113,3 +122,99 @@ def test_environmental_cost_limit():
     with pytest.raises(ValueError, match="costos ambientales"):
         calculate_alumbrado_costs(payload=payload, tenant_id="public")
 
+
+
+def test_numpy_engine_matches_python_engine():
+    payload = build_payload()
+    python_result = calculate_alumbrado_costs(payload=payload, tenant_id="public", engine="python")
+    numpy_result = calculate_alumbrado_costs(payload=payload, tenant_id="public", engine="numpy")
+
+    assert numpy_result == python_result
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError, match="Motor de cálculo"):
+        calculate_alumbrado_costs(payload=build_payload(), tenant_id="public", engine="fortran")
+
+
+def test_normalize_sections_collapses_repeated_rows():
+    payload = build_payload()
+    level = payload.inversion_niveles[0]
+    level.ucap = level.ucap * 500 + [
+        level.ucap[0].model_copy(update={"cr_i": 10.0}),
+    ]
+    payload.energia_niveles[0].aforos = payload.energia_niveles[0].aforos * 300
+
+    normalized = normalize_sections(payload)
+
+    assert len(normalized.aforos[1]) == 1
+    assert sum(normalized.aforos[1].values()) == 300
+    assert len(normalized.ucap[1]) == 1
+    assert normalized.ucap[1][0].cantidad == 501
+    assert normalized.ucap[1][0].cr_i == pytest.approx(500 * 1000 + 10)
+    assert calculate_alumbrado_costs(payload, "public", engine="python") == calculate_alumbrado_costs(
+        payload, "public", engine="numpy"
+    )
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+def test_aforos_with_hourly_load_profiles(engine):
+    dimmed = [1.0] * 6 + [0.5] * 6 + [0.0] * 12
+    payload = build_payload()
+    payload.perfiles_carga = [
+        PerfilCargaEntrada(nombre="atenuado", factores=dimmed),
+        PerfilCargaEntrada(nombre="serie", factores=[0.25] * 72),
+    ]
+    aforo = payload.energia_niveles[0].aforos[0]
+    profiled = [
+        aforo.model_copy(update={"horas_diarias": None, "perfil": "atenuado"}),
+        aforo.model_copy(update={"horas_diarias": None, "perfil": "serie"}),
+    ]
+    payload.energia_niveles[0].aforos = [aforo] + profiled * 1000
+
+    totals = reduce_sections(payload, engine=engine)
+
+    flat = aforo.carga_kw * aforo.horas_diarias * aforo.dias_facturacion
+    daily = aforo.carga_kw * sum(dimmed) * aforo.dias_facturacion
+    series = aforo.carga_kw * 0.25 * 72
+    assert totals.cee_aforado_kwh[1] == pytest.approx(flat + 1000 * (daily + series))
+
+
+@pytest.mark.parametrize("engine", ["python", "numpy"])
+@pytest.mark.parametrize(
+    ("changes", "message"),
+    [
+        ({"perfil": "inexistente", "horas_diarias": None}, "no está declarado"),
+        ({"perfil": "plano"}, "a la vez"),
+        ({"horas_diarias": None}, "horas_diarias o perfil"),
+    ],
+)
+def test_invalid_profile_references(engine, changes, message):
+    payload = build_payload()
+    payload.perfiles_carga = [PerfilCargaEntrada(nombre="plano", factores=[1.0] * 24)]
+    aforos = payload.energia_niveles[0].aforos
+    aforos.append(aforos[0].model_copy(update=changes))
+
+    with pytest.raises(ValueError, match=message):
+        reduce_sections(payload, engine=engine)
+
+
+def test_stage_formulas_accept_sample_arrays():
+    measured = np.array([0.0, 10.0])
+    assert cee_total_kwh(measured, 6.0, False).tolist() == [6.0, 10.0]
+    assert cee_total_kwh(0.0, 6.0, False) == 6.0
+
+    rates = np.array([0.1, 0.2])
+    capital = {1: 1000.0, 5: 500.0}
+    assert annualized_capital(capital, rates).tolist() == pytest.approx(
+        [annualized_capital(capital, rate) for rate in rates.tolist()]
+    )
+
+    id_values = np.array([1.0, 0.5])
+    costs = aom_level_costs(
+        700, 300, 100, 2.0, cral_total=300, faom_n=0.1, faoml=0.07, faoms=0, id_value=id_values
+    )
+    scalar = aom_level_costs(
+        700, 300, 100, 2.0, cral_total=300, faom_n=0.1, faoml=0.07, faoms=0, id_value=0.5
+    )
+    assert costs.caom_n[1] == pytest.approx(scalar.caom_n)
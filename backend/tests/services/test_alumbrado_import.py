@@ -0,0 +1,195 @@
+import pytest
+from pydantic import ValidationError
+
+from app.schemas.alumbrado import AlumbradoCalculoColumnasEntrada, PerfilCargaEntrada
+from app.services.alumbrado_calculator import calculate_alumbrado_costs
+from app.services.alumbrado_import import (
+    InventoryImportError,
+    calculate_from_columns,
+    calculate_from_inventory,
+    read_csv_section,
+    validate_section,
+)
+
+from test_alumbrado_calculator import build_payload
+
+
+def build_header():
+    payload = build_payload()
+    header = payload.model_copy(deep=True)
+    for level in header.inversion_niveles:
+        level.ucap = []
+        level.terrenos = []
+    return payload, header
+
+
+def test_calculate_from_inventory_matches_full_calculation():
+    payload, header = build_header()
+    ucap_csv = (
+        b"nivel_tension,cr_i,cr_l_base,eficacia_lm_w,vida_util_anios\n"
+        b"1,1000,130,130,1\n"
+        b"2,500,0,,1\n"
+    )
+    terrenos_csv = b"nivel_tension;area_m2;valor_catastral_m2\n1;10;100,0\n"
+
+    result = calculate_from_inventory(
+        header,
+        {"ucap": ("ucap.csv", ucap_csv), "terrenos": ("terrenos.csv", terrenos_csv)},
+        tenant_id="public",
+    )
+
+    assert result == calculate_alumbrado_costs(payload=payload, tenant_id="public")
+
+
+def test_calculate_from_inventory_reports_row_errors():
+    _, header = build_header()
+    ucap_csv = (
+        b"nivel_tension,cr_i,cr_l_base,vida_util_anios\n"
+        b"1,abc,0,10\n"
+        b"2,100,50,0\n"
+        b"1,100\n"
+    )
+
+    with pytest.raises(InventoryImportError) as exc_info:
+        calculate_from_inventory(header, {"ucap": ("ucap.csv", ucap_csv)}, tenant_id="public")
+
+    errors = {(error.fila, error.columna) for error in exc_info.value.errors}
+    assert errors == {
+        (1, "cr_i"),
+        (2, "vida_util_anios"),
+        (2, "eficacia_lm_w"),
+        (3, ""),
+        (3, "vida_util_anios"),
+    }
+
+
+def test_read_csv_section_with_quoted_cells():
+    imported = read_csv_section(
+        "aforos",
+        b'nivel_tension,clase_iluminacion,carga_kw,horas_diarias,dias_facturacion\n'
+        b'1,2,"1.5",12,30\n',
+    )
+    validate_section(imported)
+
+    assert imported.error_count == 0
+    assert imported.columns["carga_kw"].tolist() == [1.5]
+
+
+
+def test_read_csv_section_ignores_undeclared_columns():
+    imported = read_csv_section(
+        "terrenos",
+        b"codigo,nivel_tension,area_m2,valor_catastral_m2\n"
+        b"LOTE-1,1,10,100\n"
+        b"LOTE-2,2,x1,50\n",
+    )
+
+    assert "codigo" not in imported.columns
+    assert imported.columns["area_m2"][0] == 10
+    [error] = imported.errors
+    assert (error.fila, error.columna) == (2, "area_m2")
+    assert error.mensaje == "Valor no numérico: 'x1'"
+
+def build_columnar_payload(payload):
+    """Pasa todas las filas de `payload` a columnas y deja las listas vacías."""
+    data = payload.model_dump()
+    aforos = [
+        {"nivel_tension": level["nivel_tension"], **aforo}
+        for level in data["energia_niveles"]
+        for aforo in level.pop("aforos")
+    ]
+    ucap = [
+        {"nivel_tension": level["nivel_tension"], **ucap}
+        for level in data["inversion_niveles"]
+        for ucap in level.pop("ucap")
+    ]
+    terrenos = [
+        {"nivel_tension": level["nivel_tension"], **terreno}
+        for level in data["inversion_niveles"]
+        for terreno in level.pop("terrenos")
+    ]
+    vceei = [
+        {"nivel_tension": level["nivel_tension"], **evento}
+        for level in data["aom_niveles"]
+        for evento in level.pop("vceei_eventos")
+    ]
+    eventos = data["disponibilidad"].pop("eventos")
+
+    def columns(rows, names):
+        return {name: [row[name] for row in rows] for name in names}
+
+    data["columnas"] = {
+        "aforos": columns(aforos, aforos[0].keys()),
+        "ucap": columns(ucap, ucap[0].keys()),
+        "terrenos": columns(terrenos, terrenos[0].keys()),
+        "eventos_disponibilidad": columns(eventos, eventos[0].keys()),
+        "vceei_eventos": columns(vceei, vceei[0].keys()),
+    }
+    return AlumbradoCalculoColumnasEntrada.model_validate(data)
+
+
+def test_calculate_from_columns_matches_full_calculation():
+    payload = build_payload(costos_ambientales=0)
+    payload.perfiles_carga = [
+        PerfilCargaEntrada(nombre="atenuado", factores=[1.0] * 12 + [0.5] * 12)
+    ]
+    payload.energia_niveles[1].aforos = [
+        payload.energia_niveles[0].aforos[0].model_copy(
+            update={"horas_diarias": None, "perfil": "atenuado"}
+        )
+    ]
+
+    result = calculate_from_columns(build_columnar_payload(payload), tenant_id="public")
+
+    assert result == calculate_alumbrado_costs(payload=payload, tenant_id="public")
+    assert result.energia_niveles[1].cee_aforado_kwh == 1 * 18 * 3
+
+
+def test_columnar_sections_are_validated_per_column():
+    data = build_columnar_payload(build_payload()).model_dump()
+
+    data["columnas"]["ucap"]["cr_i"].append(10)
+    with pytest.raises(ValidationError, match="misma longitud"):
+        AlumbradoCalculoColumnasEntrada.model_validate(data)
+
+    data["columnas"]["ucap"]["cr_i"].pop()
+    data["columnas"]["ucap"]["eficacia_lm_w"] = None
+    with pytest.raises(ValidationError, match="eficacia_lm_w es obligatoria"):
+        AlumbradoCalculoColumnasEntrada.model_validate(data)
+
+    data["columnas"]["ucap"]["eficacia_lm_w"] = [130, None]
+    data["columnas"]["ucap"]["vida_util_anios"][0] = 0
+    with pytest.raises(ValidationError, match="vida_util_anios"):
+        AlumbradoCalculoColumnasEntrada.model_validate(data)
+
+
+def test_calculate_from_columns_rejects_undeclared_levels():
+    payload = build_payload()
+    columnar = build_columnar_payload(payload)
+    columnar.aom_niveles = columnar.aom_niveles[:1]
+    columnar.columnas.vceei_eventos.nivel_tension = [2]
+
+    with pytest.raises(ValueError, match="no está declarado en aom_niveles"):
+        calculate_from_columns(columnar, tenant_id="public")
+
+
+@pytest.mark.parametrize("quote", ["", '"'])
+def test_read_csv_section_reports_file_rows_after_blank_lines(quote):
+    imported = read_csv_section(
+        "terrenos",
+        b"nivel_tension,area_m2,valor_catastral_m2\n"
+        b"\n"
+        b"1,10,100\n"
+        b"\n"
+        + f"2,{quote}x1{quote},50\n".encode()
+        + b"3,5\n",
+    )
+    validate_section(imported)
+
+    assert imported.rows == 3
+    assert {(error.fila, error.columna) for error in imported.errors} == {
+        (4, "area_m2"),
+        (5, ""),
+        (5, "nivel_tension"),
+        (5, "valor_catastral_m2"),
+    }
@@ -0,0 +1,98 @@
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.services.alumbrado_jobs import (
+    COMPLETED,
+    FAILED,
+    PENDING,
+    RUNNING,
+    JobWorkers,
+    claim_next_job,
+    execute_job,
+    run_next_job,
+    submit_batch_job,
+    submit_calculation_job,
+)
+from test_alumbrado_calculator import build_payload
+
+
+def test_batch_job_commits_progress_per_chunk(db, monkeypatch):
+    monkeypatch.setattr(settings, "ALUMBRADO_JOB_PROGRESS_CHUNK", 2)
+    job = submit_batch_job(db, tenant_id="public", raw_payloads=[build_payload().model_dump(mode="json")] * 5)
+    progress = []
+    original_commit = db.commit
+
+    def tracking_commit():
+        original_commit()
+        progress.append(job.items_procesados)
+
+    monkeypatch.setattr(db, "commit", tracking_commit)
+    assert run_next_job(db) is True
+
+    assert job.estado == COMPLETED
+    assert [value for value in progress if value][:3] == [2, 4, 5]
+
+
+def test_abandoned_job_is_reclaimed_after_lease(db):
+    job = submit_calculation_job(db, tenant_id="public", payload=build_payload())
+
+    claimed = claim_next_job(db)
+    assert claimed.id == job.id and claimed.estado == RUNNING
+    assert claim_next_job(db) is None
+
+    claimed.fecha_actualizacion = datetime.now(timezone.utc) - timedelta(
+        seconds=settings.ALUMBRADO_JOB_LEASE_SECONDS + 1
+    )
+    db.commit()
+
+    reclaimed = claim_next_job(db)
+    assert reclaimed.id == job.id
+    assert reclaimed.intentos == 2
+    execute_job(db, reclaimed)
+    assert reclaimed.estado == COMPLETED
+
+
+def test_job_fails_after_max_attempts(db, monkeypatch):
+    monkeypatch.setattr(settings, "ALUMBRADO_JOB_MAX_ATTEMPTS", 1)
+    submit_calculation_job(db, tenant_id="public", payload=build_payload())
+
+    job = claim_next_job(db)
+    job.intentos = 2
+    execute_job(db, job)
+
+    assert job.estado == FAILED
+    assert "intentos" in job.error
+
+
+def test_stopped_worker_requeues_job_after_current_chunk(db, monkeypatch):
+    monkeypatch.setattr(settings, "ALUMBRADO_JOB_PROGRESS_CHUNK", 2)
+    job = submit_batch_job(
+        db, tenant_id="public", raw_payloads=[build_payload().model_dump(mode="json")] * 5
+    )
+    stop = threading.Event()
+    stop.set()
+
+    assert run_next_job(db, stop) is True
+    assert (job.estado, job.items_procesados, job.intentos) == (PENDING, 2, 0)
+
+    assert run_next_job(db) is True
+    assert (job.estado, job.items_procesados, job.intentos) == (COMPLETED, 5, 1)
+
+
+def test_job_workers_stop_waits_a_bounded_time(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(
+        "app.services.alumbrado_jobs.run_next_job", lambda db, stop: release.wait(5)
+    )
+    workers = JobWorkers()
+    workers.start(lambda: nullcontext(), 1)
+
+    started = time.monotonic()
+    workers.stop(timeout=0.1)
+
+    assert time.monotonic() - started < 1
+    assert not workers.running
+    release.set()
@@ -0,0 +1,77 @@
+import pytest
+
+from app.schemas.alumbrado import AlumbradoMonteCarloEntrada
+from app.services.alumbrado_calculator import calculate_alumbrado_costs
+from app.services.alumbrado_montecarlo import run_monte_carlo
+from test_alumbrado_calculator import build_payload
+
+
+def test_degenerate_distributions_reproduce_deterministic_result():
+    base = build_payload()
+    request = AlumbradoMonteCarloEntrada(
+        calculo=base,
+        muestras=500,
+        semilla=7,
+        distribuciones=[
+            {"campo": "tee", "nivel_tension": 1, "tipo": "normal", "media": 100, "desviacion": 0},
+            {"campo": "tasa_retorno", "tipo": "uniforme", "minimo": 0.1, "maximo": 0.1},
+            {
+                "campo": "factor_horas_indisponibilidad",
+                "tipo": "triangular",
+                "minimo": 1,
+                "moda": 1,
+                "maximo": 1,
+            },
+        ],
+    )
+
+    result = run_monte_carlo(payload=request, tenant_id="public")
+    expected = calculate_alumbrado_costs(payload=base, tenant_id="public")
+
+    for name in ("csee", "cinv", "caom", "cap"):
+        component = result.componentes[name]
+        assert component.media == pytest.approx(getattr(expected, name), abs=0.01)
+        assert component.desviacion == pytest.approx(0.0, abs=0.01)
+        assert component.percentiles == pytest.approx([component.media] * 3, abs=0.01)
+    assert result.fraccion_cumple_tope_ambiental == 1.0
+
+
+def test_same_seed_gives_identical_summary():
+    request = AlumbradoMonteCarloEntrada(
+        calculo=build_payload(costos_ambientales=0.0),
+        muestras=2000,
+        semilla=123,
+        percentiles=[10, 90],
+        distribuciones=[
+            {"campo": "tee", "nivel_tension": 2, "tipo": "normal", "media": 200, "desviacion": 20},
+            {
+                "campo": "factor_horas_vceei",
+                "nivel_tension": 1,
+                "tipo": "uniforme",
+                "minimo": 0.5,
+                "maximo": 1.5,
+            },
+        ],
+    )
+
+    first = run_monte_carlo(payload=request, tenant_id="public")
+    second = run_monte_carlo(payload=request, tenant_id="public")
+
+    assert first == second
+    cap = first.componentes["cap"]
+    assert cap.desviacion > 0
+    assert cap.percentiles[0] < cap.media < cap.percentiles[1]
+
+
+def test_distribution_for_undeclared_level_is_rejected():
+    base = build_payload()
+    base.energia_niveles = base.energia_niveles[:1]
+    request = AlumbradoMonteCarloEntrada(
+        calculo=base,
+        distribuciones=[
+            {"campo": "tee", "nivel_tension": 2, "tipo": "normal", "media": 1, "desviacion": 0},
+        ],
+    )
+
+    with pytest.raises(ValueError, match="nivel de tensión 2"):
+        run_monte_carlo(payload=request, tenant_id="public")
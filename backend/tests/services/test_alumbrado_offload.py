@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.alumbrado_cache import calculation_hash
+from app.services.alumbrado_calculator import calculate_alumbrado_costs
+from app.services.alumbrado_offload import (
+    calculate_body,
+    estimate_item_count,
+    references_inventory,
+    should_offload,
+)
+from app.services.alumbrado_pool import (
+    PoolSaturatedError,
+    pending_calculations,
+    shutdown_calculation_pool,
+    submit_calculation,
+)
+
+from test_alumbrado_calculator import build_payload
+
+
+def test_estimate_item_count_counts_section_rows():
+    body = build_payload().model_dump_json().encode()
+
+    # Un aforo, dos UCAP, un terreno, un evento de disponibilidad y uno de VCEEI.
+    assert estimate_item_count(body) == 6
+
+
+def test_should_offload_respects_threshold(monkeypatch):
+    body = build_payload().model_dump_json().encode()
+
+    monkeypatch.setattr(settings, "ALUMBRADO_OFFLOAD_MIN_ITEMS", 6)
+    assert should_offload(body)
+    monkeypatch.setattr(settings, "ALUMBRADO_OFFLOAD_MIN_ITEMS", 7)
+    assert not should_offload(body)
+    monkeypatch.setattr(settings, "ALUMBRADO_OFFLOAD_MIN_ITEMS", 0)
+    assert not should_offload(body)
+
+
+def test_calculate_body_matches_in_thread_calculation():
+    payload = build_payload()
+    outcome = calculate_body(payload.model_dump_json().encode(), False, "public", "numpy")
+
+    assert outcome.result == calculate_alumbrado_costs(payload=payload, tenant_id="public")
+    assert outcome.content_hash == calculation_hash(payload, "public")
+    assert outcome.error is None
+
+
+def test_calculate_body_reports_errors():
+    payload = build_payload()
+    payload.tasa_retorno = -1
+    invalid = calculate_body(payload.model_dump_json().encode(), False, "public", "python")
+    assert invalid.validation_errors[0]["loc"] == ("tasa_retorno",)
+
+    payload = build_payload()
+    payload.inventario_id = 3
+    with_inventory = calculate_body(payload.model_dump_json().encode(), False, "public", "python")
+    assert with_inventory.inventario
+    assert with_inventory.result is None
+
+
+def test_references_inventory_without_decoding():
+    msgpack = pytest.importorskip("msgpack")
+    payload = build_payload()
+    assert not references_inventory(payload.model_dump_json().encode())
+    assert not references_inventory(msgpack.packb(payload.model_dump(mode="json")), msgpack_body=True)
+
+    payload.inventario_id = 3
+    assert references_inventory(payload.model_dump_json().encode())
+    assert references_inventory(msgpack.packb(payload.model_dump(mode="json")), msgpack_body=True)
+
+
+def test_submit_calculation_limits_pending_work(monkeypatch):
+    monkeypatch.setattr(settings, "ALUMBRADO_POOL_WORKERS", 1)
+    monkeypatch.setattr(settings, "ALUMBRADO_POOL_MAX_PENDING", 1)
+    try:
+        future = submit_calculation(time.sleep, 0.2)
+        with pytest.raises(PoolSaturatedError):
+            submit_calculation(time.sleep, 0)
+        future.result()
+        # El callback que libera el cupo corre apenas termina el futuro.
+        deadline = time.monotonic() + 5
+        while pending_calculations() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert pending_calculations() == 0
+        submit_calculation(time.sleep, 0).result()
+    finally:
+        shutdown_calculation_pool()
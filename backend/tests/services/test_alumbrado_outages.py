@@ -0,0 +1,155 @@
+import io
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.schemas.alumbrado import EventoDisponibilidadEntrada, EventoVceeiEntrada
+from app.services.alumbrado_calculator import calculate_alumbrado_costs
+from app.services.alumbrado_import import InventoryImportError
+from app.services.alumbrado_outages import aggregate_outage_log, apply_outage_events
+
+from test_alumbrado_calculator import build_payload
+
+START = datetime(2026, 1, 1)
+
+
+def outage_csv(rows, delimiter=","):
+    lines = [delimiter.join(["circuito", "nivel_tension", "potencia_kw", "inicio", "fin"])]
+    for circuit, level, power, start_hours, end_hours in rows:
+        start = (START + timedelta(hours=start_hours)).isoformat()
+        end = (START + timedelta(hours=end_hours)).isoformat()
+        lines.append(delimiter.join([circuit, str(level), str(power), start, end]))
+    return io.BytesIO("\n".join(lines).encode())
+
+
+def test_overlapping_intervals_are_merged_per_circuit():
+    rows = [
+        ("C-1", 1, 0.5, 0, 2),
+        ("C-1", 1, 0.5, 1, 3),
+        ("C-1", 1, 0.5, 3, 4),
+        ("C-1", 1, 0.5, 10, 11),
+        ("C-2", 1, 0.2, 1, 2),
+        ("C-3", 2, 1.0, 5, 6),
+    ]
+
+    result = aggregate_outage_log("registros.csv", outage_csv(rows))
+
+    assert (result.registros, result.interrupciones, result.circuitos) == (6, 4, 3)
+    assert sorted(
+        (event.potencia_kw, event.horas_sin_servicio) for event in result.eventos_disponibilidad
+    ) == [(0.2, 1.0), (0.5, 5.0), (1.0, 1.0)]
+    assert result.indisponibilidad_kw_h == pytest.approx(0.2 + 2.5 + 1.0)
+    assert [nivel.nivel_tension for nivel in result.niveles] == [1, 2]
+    assert result.niveles[0].vceei_kw_h == pytest.approx(2.7)
+
+
+def test_sweep_matches_hour_by_hour_count():
+    rng = random.Random(3)
+    rows = []
+    for _ in range(400):
+        start = rng.randint(0, 200)
+        rows.append((f"C-{rng.randint(1, 8)}", 1, 1.0, start, start + rng.randint(1, 12)))
+    covered = {(circuit, hour) for circuit, _, _, start, end in rows for hour in range(start, end)}
+
+    result = aggregate_outage_log("registros.csv", outage_csv(rows, delimiter=";"))
+
+    assert result.indisponibilidad_kw_h == pytest.approx(len(covered))
+
+
+def test_overlapping_intervals_keep_the_active_power():
+    rows = [("C-A", 1, 100, 0, 10), ("C-A", 1, 5, 9, 104), ("C-B", 1, 10, 0, 1)]
+
+    result = aggregate_outage_log("registros.csv", outage_csv(rows))
+
+    assert result.interrupciones == 2
+    assert sorted(
+        (event.potencia_kw, event.horas_sin_servicio) for event in result.eventos_disponibilidad
+    ) == [(5.0, 94.0), (10.0, 1.0), (100.0, 10.0)]
+    assert result.indisponibilidad_kw_h == pytest.approx(100 * 10 + 5 * 94 + 10)
+
+
+def test_sweep_matches_hour_by_hour_maximum():
+    rng = random.Random(5)
+    rows = []
+    for _ in range(300):
+        start = rng.randint(0, 150)
+        power = rng.choice([1.0, 2.0, 5.0])
+        rows.append((f"C-{rng.randint(1, 6)}", 1, power, start, start + rng.randint(1, 10)))
+    hourly: dict[tuple[str, int], float] = {}
+    for circuit, _, power, start, end in rows:
+        for hour in range(start, end):
+            hourly[(circuit, hour)] = max(hourly.get((circuit, hour), 0.0), power)
+
+    result = aggregate_outage_log("registros.csv", outage_csv(rows))
+
+    assert result.indisponibilidad_kw_h == pytest.approx(sum(hourly.values()))
+
+
+def test_intervals_are_clipped_to_the_period():
+    rows = [("C-1", 1, 2.0, -5, 3), ("C-1", 1, 2.0, 20, 30), ("C-2", 1, 1.0, 40, 50)]
+
+    result = aggregate_outage_log(
+        "registros.csv",
+        outage_csv(rows),
+        desde=START,
+        hasta=START + timedelta(hours=24),
+    )
+
+    assert result.interrupciones == 2
+    assert result.indisponibilidad_kw_h == pytest.approx(2.0 * 3 + 2.0 * 4)
+
+
+def test_invalid_rows_are_reported():
+    data = io.BytesIO(
+        b"circuito,nivel_tension,potencia_kw,inicio,fin\n"
+        b"C-1,3,1,2026-01-01T00:00,2026-01-01T01:00\n"
+        b"C-1,1,-1,2026-01-01T02:00,2026-01-01T01:00\n"
+        b",1,1,ayer,\n"
+    )
+
+    with pytest.raises(InventoryImportError) as error:
+        aggregate_outage_log("registros.csv", data)
+
+    assert error.value.total == 6
+    assert {(item.fila, item.columna) for item in error.value.errors} == {
+        (1, "nivel_tension"),
+        (2, "potencia_kw"),
+        (2, "fin"),
+        (3, "circuito"),
+        (3, "inicio"),
+        (3, "fin"),
+    }
+
+
+def test_outage_events_feed_id_and_vceei():
+    payload = build_payload(costos_ambientales=0)
+    header = payload.model_copy(deep=True)
+    header.disponibilidad.eventos = []
+    header.aom_niveles[0].vceei_eventos = []
+    rows = [("C-1", 1, 0.1, 0, 0.5), ("C-1", 1, 0.1, 0.25, 1), ("C-2", 1, 0.05, 0, 2)]
+
+    outages = aggregate_outage_log("registros.csv", outage_csv(rows))
+    result = calculate_alumbrado_costs(
+        payload=apply_outage_events(header, outages), tenant_id="public"
+    )
+    expected = payload.model_copy(deep=True)
+    expected.disponibilidad.eventos = [
+        EventoDisponibilidadEntrada(potencia_kw=0.05, horas_sin_servicio=2),
+        EventoDisponibilidadEntrada(potencia_kw=0.1, horas_sin_servicio=1),
+    ]
+    expected.aom_niveles[0].vceei_eventos = [
+        EventoVceeiEntrada(potencia_kw=0.05, horas_indisponibilidad=2),
+        EventoVceeiEntrada(potencia_kw=0.1, horas_indisponibilidad=1),
+    ]
+
+    assert result == calculate_alumbrado_costs(payload=expected, tenant_id="public")
+
+
+def test_outage_level_must_be_declared():
+    header = build_payload()
+    header.aom_niveles = header.aom_niveles[:1]
+    outages = aggregate_outage_log("registros.csv", outage_csv([("C-1", 2, 1, 0, 1)]))
+
+    with pytest.raises(ValueError, match="aom_niveles"):
+        apply_outage_events(header, outages)
@@ -0,0 +1,46 @@
+from app.schemas.alumbrado import CalculoAlumbradoParche
+from app.services.alumbrado_calculator import reduce_sections
+from app.services.alumbrado_patch import apply_patch
+
+from test_alumbrado_calculator import build_payload
+
+
+def test_apply_patch_matches_full_reduction():
+    payload = build_payload()
+    patches = [
+        {
+            "energia_nivel": {
+                "nivel_tension": 2,
+                "tee": 200,
+                "aforos": [
+                    {"clase_iluminacion": 2, "carga_kw": 3, "horas_diarias": 12, "dias_facturacion": 30}
+                ],
+            }
+        },
+        {
+            "inversion_nivel": {
+                "nivel_tension": 1,
+                "ucap": [{"cr_i": 800, "vida_util_anios": 10}],
+                "terrenos": [{"area_m2": 4, "valor_catastral_m2": 50}],
+            }
+        },
+        {
+            "disponibilidad": {
+                "potencia_total_kw": 10,
+                "horas_periodo": 100,
+                "eventos": [{"potencia_kw": 2, "horas_sin_servicio": 5}],
+            }
+        },
+        {
+            "agregar_vceei_eventos": {
+                "nivel_tension": 2,
+                "eventos": [{"potencia_kw": 0.5, "horas_indisponibilidad": 4}],
+            }
+        },
+    ]
+
+    totals = reduce_sections(payload, engine="python")
+    for raw_patch in patches:
+        patch = CalculoAlumbradoParche.model_validate(raw_patch)
+        payload, totals = apply_patch(payload, totals, patch)
+        assert totals == reduce_sections(payload, engine="python")
@@ -0,0 +1,43 @@
+from app.services.alumbrado_calculator import calculate_alumbrado_costs
+from app.services.alumbrado_profiling import StageHistograms, profiled, stage_timer
+from test_alumbrado_calculator import build_payload
+
+CALCULATION_STAGES = ["reduccion", "csee", "id", "cinv", "caom", "cotr", "cap", "ipp", "recibo"]
+
+
+def test_calculation_marks_every_stage_when_profiled():
+    with profiled() as profile:
+        calculate_alumbrado_costs(payload=build_payload(), tenant_id="public")
+
+    assert [name for name, _, _ in profile.stages] == CALCULATION_STAGES
+    items = {name: count for name, _, count in profile.stages}
+    assert items["reduccion"] == 6
+    assert items["csee"] == 2
+    assert items["ipp"] == 1
+    assert all(seconds >= 0 for _, seconds, _ in profile.stages)
+    assert 'csee;desc="n=2";dur=' in profile.server_timing()
+
+
+def test_stage_timer_is_inert_outside_a_profile():
+    timer = stage_timer()
+    timer.mark("csee", 1)
+    with timer.measure("validacion"):
+        pass
+
+    with profiled() as profile:
+        calculate_alumbrado_costs(payload=build_payload(), tenant_id="public")
+    assert "validacion" not in [name for name, _, _ in profile.stages]
+
+
+def test_histograms_accumulate_counts_and_buckets():
+    histograms = StageHistograms(buckets_ms=(1, 10))
+    with profiled() as profile:
+        profile.stages.extend([("csee", 0.0005, 2), ("csee", 0.005, 2), ("cap", 0.5, 0)])
+    histograms.record(profile)
+
+    stats = histograms.stats()
+    assert stats["csee"]["conteo"] == 2
+    assert stats["csee"]["items"] == 4
+    assert stats["csee"]["buckets_ms"] == {"<=1": 1, "<=10": 1, "+Inf": 0}
+    assert stats["cap"]["buckets_ms"]["+Inf"] == 1
+    assert stats["cap"]["max_ms"] == 500.0
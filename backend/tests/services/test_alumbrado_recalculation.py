@@ -0,0 +1,215 @@
+import zlib
+
+import pytest
+
+from app.core.config import settings
+from app.schemas.alumbrado import (
+    AlumbradoRecalculoResultado,
+    InventarioUcapFila,
+    ParametrosRegulatoriosEntrada,
+)
+from app.services import alumbrado_recalculation
+from app.services.alumbrado_cache import calculation_hash
+from app.services.alumbrado_calculator import (
+    add_section_totals,
+    build_calculation_result,
+    calculate_alumbrado_costs,
+    reduce_sections,
+)
+from app.services.alumbrado_inventory import (
+    create_inventory,
+    inventory_key,
+    inventory_totals,
+    upsert_inventory_rows,
+)
+from app.services.alumbrado_jobs import COMPLETED, run_next_job, submit_recalculation_job
+from app.services.alumbrado_parameters import (
+    get_parameters,
+    load_parameters,
+    parameters_cache,
+    publish_parameters,
+)
+from app.services.alumbrado_pool import (
+    PoolSaturatedError,
+    pending_calculations,
+    shutdown_calculation_pool,
+    submit_calculation,
+)
+from app.services.alumbrado_recalculation import recalculate_outdated
+from app.services.alumbrado_store import load_result, save_calculation
+
+from test_alumbrado_calculator import build_payload
+
+
+@pytest.fixture(autouse=True)
+def clear_parameters_cache():
+    parameters_cache.clear()
+    yield
+    parameters_cache.clear()
+
+
+def store(db, payload, tenant_id="public"):
+    totals = reduce_sections(payload)
+    result = build_calculation_result(payload, tenant_id, totals)
+    return save_calculation(
+        db, tenant_id, payload, result, totals, calculation_hash(payload, tenant_id)
+    )
+
+
+def publish(db, tenant_id="public", **changes):
+    return publish_parameters(db, tenant_id, ParametrosRegulatoriosEntrada(**changes))
+
+
+def test_publish_merges_onto_current_version(db):
+    assert get_parameters(db, "public").version == 0
+
+    first = publish(db, faoml_por_anno={2026: 0.08})
+    second = publish(db, eficacia_referencia=140)
+
+    assert (first.version, second.version) == (1, 2)
+    assert second.faoml_por_anno[2026] == 0.08
+    assert second.faoml_por_anno[2027] == load_parameters(db, "otro").faoml(2027)
+    assert second.eficacia_referencia == 140
+    assert get_parameters(db, "public").version == 2
+    assert load_parameters(db, "otro").version == 0
+
+
+def test_recalculation_job_updates_only_affected_calculations(db):
+    payload = build_payload(costos_ambientales=0)
+    affected = store(db, payload)
+    unaffected = store(db, payload.model_copy(update={"anno_aplicacion": 2027}))
+    unaffected_cap = unaffected.cap
+    publish(db, faoml_por_anno={2026: 0.08})
+
+    job = submit_recalculation_job(db, "public", load_parameters(db, "public"))
+    assert job.total_items == 2
+    assert run_next_job(db) is True
+    assert job.estado == COMPLETED
+
+    report = AlumbradoRecalculoResultado.model_validate_json(
+        zlib.decompress(job.resultado_comprimido)
+    )
+    assert (report.revisados, report.actualizados, report.sin_cambios) == (2, 1, 1)
+    [diferencia] = report.diferencias
+    assert diferencia.calculo_id == affected.id
+    assert diferencia.delta.componentes_afectados == ["caom"]
+
+    db.refresh(affected)
+    db.refresh(unaffected)
+    parameters = get_parameters(db, "public")
+    expected = calculate_alumbrado_costs(payload, "public", parameters=parameters)
+    assert affected.version_parametros == unaffected.version_parametros == 1
+    assert load_result(affected) == expected
+    assert diferencia.cap_nuevo == expected.cap != diferencia.cap_anterior
+    assert affected.hash_entrada == calculation_hash(payload, "public", parameters_version=1)
+    assert unaffected.cap == unaffected_cap
+
+
+def test_recalculation_resumes_after_last_committed_chunk(db, monkeypatch):
+    monkeypatch.setattr(settings, "ALUMBRADO_JOB_PROGRESS_CHUNK", 1)
+    rows = [store(db, build_payload(costos_ambientales=0)) for _ in range(3)]
+    publish(db, eficacia_referencia=140)
+    parameters = get_parameters(db, "public")
+    report = AlumbradoRecalculoResultado(tenant_id="public", version_parametros=1)
+
+    partial = next(recalculate_outdated(db, "public", parameters, report))
+    db.commit()
+    assert partial.ultimo_calculo_id == rows[0].id
+
+    resumed = AlumbradoRecalculoResultado.model_validate_json(partial.model_dump_json())
+    for final in recalculate_outdated(db, "public", parameters, resumed):
+        db.commit()
+
+    assert (final.revisados, final.actualizados) == (3, 3)
+    assert all(row.version_parametros == 1 for row in rows)
+
+
+def test_recalculation_computes_inline_when_pool_is_saturated(db, monkeypatch):
+    monkeypatch.setattr(settings, "ALUMBRADO_JOB_PROGRESS_CHUNK", 1)
+    monkeypatch.setattr(settings, "ALUMBRADO_POOL_WORKERS", 2)
+    monkeypatch.setattr(settings, "ALUMBRADO_BATCH_PARALLEL_MIN_ITEMS", 2)
+    monkeypatch.setattr(settings, "ALUMBRADO_POOL_MAX_PENDING", 1)
+    saturated = []
+
+    def submit(fn, *args):
+        try:
+            return submit_calculation(fn, *args)
+        except PoolSaturatedError:
+            saturated.append(args[0][0].id)
+            raise
+
+    monkeypatch.setattr(alumbrado_recalculation, "submit_calculation", submit)
+    rows = [store(db, build_payload(costos_ambientales=0)) for _ in range(4)]
+    publish(db, eficacia_referencia=140)
+    parameters = get_parameters(db, "public")
+    report = AlumbradoRecalculoResultado(tenant_id="public", version_parametros=1)
+
+    try:
+        for final in recalculate_outdated(db, "public", parameters, report):
+            db.commit()
+    finally:
+        shutdown_calculation_pool()
+
+    assert (final.revisados, final.actualizados) == (4, 4)
+    assert final.ultimo_calculo_id == rows[-1].id
+    assert saturated
+    assert pending_calculations() == 0
+
+
+def test_recalculation_reads_the_pinned_inventory_version(db):
+    payload = build_payload(costos_ambientales=0)
+    inventario = create_inventory(db, "public", "Inventario 2026")
+    ucap = [
+        InventarioUcapFila(
+            codigo=f"U-{level.nivel_tension}",
+            nivel_tension=level.nivel_tension,
+            **level.ucap[0].model_dump(),
+        )
+        for level in payload.inversion_niveles
+    ]
+    upsert_inventory_rows(db, inventario, "ucap", ucap)
+    header = payload.model_copy(deep=True)
+    for level in header.inversion_niveles:
+        level.ucap = []
+    header.inventario_id = inventario.id
+    header.inventario_version = inventario.version
+    totals = add_section_totals(
+        reduce_sections(header), inventory_totals(db, inventario, header.tasa_retorno)
+    )
+    calculo = save_calculation(
+        db,
+        "public",
+        header,
+        build_calculation_result(header, "public", totals),
+        totals,
+        calculation_hash(header, "public", inventory_key(inventario, inventario.version)),
+    )
+    upsert_inventory_rows(db, inventario, "ucap", [ucap[0].model_copy(update={"cr_i": 5000})])
+    publish(db, eficacia_referencia=140)
+    parameters = get_parameters(db, "public")
+    report = AlumbradoRecalculoResultado(tenant_id="public", version_parametros=1)
+
+    for final in recalculate_outdated(db, "public", parameters, report):
+        db.commit()
+
+    db.refresh(calculo)
+    assert final.actualizados == 1
+    assert (calculo.inventario_id, calculo.inventario_version) == (inventario.id, 2)
+    assert load_result(calculo) == calculate_alumbrado_costs(
+        payload, "public", parameters=parameters
+    )
+
+
+def test_failed_recalculation_keeps_previous_version(db):
+    calculo = store(db, build_payload(costos_ambientales=0))
+    calculo.entrada_comprimida = zlib.compress(b'{"municipio": "Sin datos"}')
+    db.commit()
+    publish(db, faoms_marino=0.01)
+
+    report = AlumbradoRecalculoResultado(tenant_id="public", version_parametros=1)
+    for report in recalculate_outdated(db, "public", get_parameters(db, "public"), report):
+        db.commit()
+
+    assert (report.revisados, report.fallidos) == (1, 1)
+    assert report.diferencias[0].error
+    assert calculo.version_parametros == 0
@@ -0,0 +1,90 @@
+import pytest
+
+from app.schemas.alumbrado import (
+    ActualizacionIPPEntrada,
+    AlumbradoEscenariosEntrada,
+    AlumbradoProyeccionEntrada,
+)
+from app.services.alumbrado_calculator import calculate_alumbrado_costs
+from app.services.alumbrado_scenarios import (
+    SCENARIO_COLUMNS,
+    project_alumbrado_cap,
+    sweep_alumbrado_scenarios,
+)
+from test_alumbrado_calculator import build_payload
+
+
+def test_sweep_matches_full_calculation_for_every_point():
+    base = build_payload(costos_ambientales=0.0)
+    request = AlumbradoEscenariosEntrada(
+        calculo=base,
+        tasas_retorno=[0.08, 0.1, 0.12],
+        annos_aplicacion=[2024, 2026, 2030],
+        actualizaciones_ipp=[
+            {"ipp_base": 100, "ipp_mes_anterior": 105},
+            {"ipp_base": 100, "ipp_mes_anterior": 110},
+        ],
+    )
+
+    result = sweep_alumbrado_scenarios(payload=request, tenant_id="public")
+
+    assert result.total_escenarios == 18
+    assert result.columnas == SCENARIO_COLUMNS
+    for row in result.filas:
+        values = dict(zip(result.columnas, row))
+        expected = calculate_alumbrado_costs(
+            payload=base.model_copy(
+                update={
+                    "tasa_retorno": values["tasa_retorno"],
+                    "anno_aplicacion": values["anno_aplicacion"],
+                    "actualizacion_ipp": ActualizacionIPPEntrada(
+                        ipp_base=100,
+                        ipp_mes_anterior=round(values["factor_ipp"] * 100),
+                    ),
+                }
+            ),
+            tenant_id="public",
+        )
+        assert values["csee"] == pytest.approx(expected.csee)
+        assert values["cinv"] == pytest.approx(expected.cinv)
+        assert values["caom"] == pytest.approx(expected.caom)
+        assert values["cap"] == pytest.approx(expected.cap)
+        assert values["faoml"] == pytest.approx(expected.faoml)
+        assert values["cap_actualizado"] == pytest.approx(expected.actualizacion_ipp.cap_actualizado)
+
+
+def test_sweep_flags_environmental_cap_instead_of_failing():
+    request = AlumbradoEscenariosEntrada(
+        calculo=build_payload(costos_ambientales=20.0),
+        annos_aplicacion=[2026],
+    )
+
+    result = sweep_alumbrado_scenarios(payload=request, tenant_id="public")
+
+    values = dict(zip(result.columnas, result.filas[0]))
+    assert values["cumple_tope_ambiental"] is False
+
+
+def test_projection_matches_full_calculation_per_year():
+    base = build_payload(costos_ambientales=0.0)
+    request = AlumbradoProyeccionEntrada(
+        calculo=base,
+        anno_inicio=2022,
+        anno_fin=2035,
+        actualizaciones_ipp={2030: {"ipp_base": 100, "ipp_mes_anterior": 104}},
+    )
+
+    result = project_alumbrado_cap(payload=request, tenant_id="public")
+
+    assert [year.anno_aplicacion for year in result.annos] == list(range(2022, 2036))
+    for year in result.annos:
+        expected = calculate_alumbrado_costs(
+            payload=base.model_copy(update={"anno_aplicacion": year.anno_aplicacion}),
+            tenant_id="public",
+        )
+        assert year.faoml == expected.faoml
+        assert year.cinv == pytest.approx(expected.cinv)
+        assert year.caom == pytest.approx(expected.caom)
+        assert year.cap == pytest.approx(expected.cap)
+    assert result.annos[8].factor_ipp == 1.04
+    assert result.annos[7].factor_ipp == expected.actualizacion_ipp.factor_ipp
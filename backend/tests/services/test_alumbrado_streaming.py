@@ -0,0 +1,97 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from app.schemas.alumbrado import PerfilCargaEntrada
+from app.services.alumbrado_calculator import calculate_alumbrado_costs
+from app.services import alumbrado_streaming
+from app.services.alumbrado_streaming import calculate_from_ndjson, iter_ndjson_lines
+
+from test_alumbrado_calculator import build_payload
+
+
+def to_ndjson(payload: dict) -> bytes:
+    """Separa una entrada de `/calcular` en encabezado y una línea por ítem."""
+    header = json.loads(json.dumps(payload))
+    lines = []
+    for level in header["energia_niveles"]:
+        for aforo in level.pop("aforos"):
+            lines.append({"seccion": "aforo", "nivel_tension": level["nivel_tension"], **aforo})
+    for level in header["inversion_niveles"]:
+        for ucap in level.pop("ucap"):
+            lines.append({"seccion": "ucap", "nivel_tension": level["nivel_tension"], **ucap})
+        for terreno in level.pop("terrenos"):
+            lines.append(
+                {"seccion": "terreno", "nivel_tension": level["nivel_tension"], **terreno}
+            )
+    for event in header["disponibilidad"].pop("eventos"):
+        lines.append({"seccion": "evento_disponibilidad", **event})
+    for level in header["aom_niveles"]:
+        for event in level.pop("vceei_eventos"):
+            lines.append(
+                {"seccion": "vceei_evento", "nivel_tension": level["nivel_tension"], **event}
+            )
+    return b"\n".join(json.dumps(line).encode() for line in [header, *lines]) + b"\n"
+
+
+async def _chunks(body: bytes, size: int):
+    for start in range(0, len(body), size):
+        yield body[start : start + size]
+
+
+def test_calculate_from_ndjson_matches_full_calculation():
+    payload = build_payload()
+    body = to_ndjson(payload.model_dump(mode="json"))
+
+    result = asyncio.run(calculate_from_ndjson(_chunks(body, 7), tenant_id="public"))
+
+    assert result == calculate_alumbrado_costs(payload=payload, tenant_id="public")
+
+
+def test_ndjson_aforos_use_header_load_profiles():
+    payload = build_payload()
+    payload.perfiles_carga = [PerfilCargaEntrada(nombre="atenuado", factores=[0.5] * 24)]
+    aforos = payload.energia_niveles[0].aforos
+    aforos.append(aforos[0].model_copy(update={"horas_diarias": None, "perfil": "atenuado"}))
+    body = to_ndjson(payload.model_dump(mode="json"))
+
+    result = asyncio.run(calculate_from_ndjson(_chunks(body, 64), tenant_id="public"))
+
+    assert result == calculate_alumbrado_costs(payload=payload, tenant_id="public")
+
+
+def test_calculate_from_ndjson_validates_lines_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(alumbrado_streaming, "STREAM_BATCH_LINES", 2)
+    threads = set()
+    original_add = alumbrado_streaming.StreamingCalculation.add
+
+    def tracking_add(self, line):
+        threads.add(threading.current_thread())
+        original_add(self, line)
+
+    monkeypatch.setattr(alumbrado_streaming.StreamingCalculation, "add", tracking_add)
+    payload = build_payload()
+    body = to_ndjson(payload.model_dump(mode="json"))
+
+    result = asyncio.run(calculate_from_ndjson(_chunks(body, 64), tenant_id="public"))
+
+    assert result == calculate_alumbrado_costs(payload=payload, tenant_id="public")
+    assert threads and threading.main_thread() not in threads
+
+
+def test_calculate_from_ndjson_reports_line_errors():
+    body = to_ndjson(build_payload().model_dump(mode="json"))
+    body += b'{"seccion": "ucap", "nivel_tension": 1, "vida_util_anios": 0}\n'
+
+    with pytest.raises(ValueError, match=r"^Línea 8: ucap.vida_util_anios"):
+        asyncio.run(calculate_from_ndjson(_chunks(body, 64), tenant_id="public"))
+
+
+def test_iter_ndjson_lines_rejects_long_lines():
+    async def collect():
+        return [line async for line in iter_ndjson_lines(_chunks(b"x" * 50, 10), 20)]
+
+    with pytest.raises(ValueError, match="máximo de 20 bytes"):
+        asyncio.run(collect())
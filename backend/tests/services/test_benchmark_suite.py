@@ -0,0 +1,35 @@
+from app.schemas.alumbrado import AlumbradoCalculoEntrada
+from app.services.alumbrado_calculator import calculate_alumbrado_costs
+from benchmarks.payloads import PayloadScale, generate_payload
+from benchmarks.suite import compare_results
+
+
+def test_generated_payload_is_valid_and_seeded():
+    scale = PayloadScale(ucap=40, aforos=20, eventos=10, terrenos=4)
+
+    first = generate_payload(scale, seed=3)
+    assert first == generate_payload(scale, seed=3)
+    assert first != generate_payload(scale, seed=4)
+
+    payload = AlumbradoCalculoEntrada.model_validate(first)
+    assert sum(len(level.ucap) for level in payload.inversion_niveles) == 40
+    assert sum(len(level.aforos) for level in payload.energia_niveles) == 20
+    assert calculate_alumbrado_costs(payload=payload, tenant_id="bench").cap > 0
+
+
+def test_compare_results_normalizes_by_calibration():
+    baseline = {
+        "calibracion_s": 0.01,
+        "resultados": {"pequeno": {"e2e": {"min_s": 0.1, "pico_memoria_bytes": 1_000_000}}},
+    }
+
+    def run(calibration, seconds, memory=1_000_000):
+        return {
+            "calibracion_s": calibration,
+            "resultados": {"pequeno": {"e2e": {"min_s": seconds, "pico_memoria_bytes": memory}}},
+        }
+
+    # Una máquina dos veces más lenta no cuenta como regresión.
+    assert compare_results(run(0.02, 0.2), baseline, 0.25, 0.25) == []
+    assert len(compare_results(run(0.01, 0.13), baseline, 0.25, 0.25)) == 1
+    assert "memoria" in compare_results(run(0.01, 0.1, 2_000_000), baseline, 0.25, 0.25)[0]